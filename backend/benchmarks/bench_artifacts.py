@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Benchmark: artifact store and download server (shared/utils/artifact_store.py)
+
+Stores synthetic disclosure packets (streamed, then stored again to show
+dedup), then downloads them concurrently over HTTP. It compares the sendfile
+server with a baseline that reads the whole packet into memory per request,
+and times keep-alive range reads.
+
+Usage:
+    python benchmarks/bench_artifacts.py [--size-mb 50] [--packets 4] [--downloads 64] [--concurrency 16]
+"""
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+# Add shared utils to path
+sys.path.append(str(Path(__file__).parent.parent / "shared" / "utils"))
+
+from artifact_store import ArtifactStore, ArtifactServer, CHUNK_SIZE
+
+
+class ReadAllServer(ArtifactServer):
+    """Baseline: read the whole object into memory and write it per request"""
+
+    async def _serve(self, writer, method, target, headers, keep_alive):
+        digest = target.split("/")[-1]
+        with open(self.store.path(digest), "rb") as f:
+            body = f.read()
+        await self._respond(writer, 200, {"Content-Type": "application/pdf"}, body, keep_alive)
+        self.stats["bytes_sent"] += len(body)
+
+
+def packet_chunks(size: int, seed: int):
+    rng = random.Random(seed)
+    block = rng.randbytes(CHUNK_SIZE)
+    for i in range(0, size, CHUNK_SIZE):
+        # Vary each chunk a little so packets differ
+        yield block[:CHUNK_SIZE - 8] + (i ^ seed).to_bytes(8, "little") if size - i >= CHUNK_SIZE else block[:size - i]
+
+
+async def download(host: str, port: int, path: str, range_header: str = None) -> int:
+    reader, writer = await asyncio.open_connection(host, port)
+    extra = f"Range: {range_header}\r\n" if range_header else ""
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n{extra}\r\n".encode())
+    head = await reader.readuntil(b"\r\n\r\n")
+    length = int(next(line.split(b":")[1] for line in head.split(b"\r\n") if line.lower().startswith(b"content-length")))
+    received = 0
+    while received < length:
+        chunk = await reader.read(1 << 20)
+        if not chunk:
+            break
+        received += len(chunk)
+    writer.close()
+    return received
+
+
+async def download_all(server, digests, downloads: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i):
+        async with semaphore:
+            started = time.perf_counter()
+            size = await download(server.host, server.port, f"/artifacts/{digests[i % len(digests)]}")
+            latencies.append(time.perf_counter() - started)
+            return size
+
+    started = time.perf_counter()
+    sizes = await asyncio.gather(*(one(i) for i in range(downloads)))
+    return sum(sizes), time.perf_counter() - started, sorted(latencies)
+
+
+async def range_reads(server, digest: str, size: int, count: int, length: int = 65536):
+    reader, writer = await asyncio.open_connection(server.host, server.port)
+    rng = random.Random(2)
+    latencies = []
+    for _ in range(count):
+        start = rng.randrange(0, size - length)
+        started = time.perf_counter()
+        writer.write(f"GET /artifacts/{digest} HTTP/1.1\r\nHost: x\r\n"
+                     f"Range: bytes={start}-{start + length - 1}\r\n\r\n".encode())
+        await reader.readuntil(b"\r\n\r\n")
+        await reader.readexactly(length)
+        latencies.append(time.perf_counter() - started)
+    writer.close()
+    return sorted(latencies)
+
+
+def pct(samples, p):
+    return samples[min(len(samples) - 1, int(p / 100 * len(samples)))] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=50)
+    parser.add_argument("--packets", type=int, default=4)
+    parser.add_argument("--downloads", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--range-reads", type=int, default=1000)
+    args = parser.parse_args()
+    size = args.size_mb << 20
+
+    with tempfile.TemporaryDirectory() as root:
+        store = ArtifactStore(root)
+        started = time.perf_counter()
+        digests = [store.put_stream(packet_chunks(size, seed), "application/pdf")["digest"]
+                   for seed in range(args.packets)]
+        write_s = time.perf_counter() - started
+        started = time.perf_counter()
+        again = store.put_stream(packet_chunks(size, 0), "application/pdf")
+        print(f"Stored {args.packets} x {args.size_mb} MB packets at {args.packets * args.size_mb / write_s:,.0f} MB/s; "
+              f"storing one again deduplicated={again['deduplicated']} in {time.perf_counter() - started:.2f}s")
+
+        for name, server_class in (("sendfile", ArtifactServer), ("read whole file", ReadAllServer)):
+            server = server_class(store).start()
+            tracemalloc.start()
+            total, elapsed, latencies = asyncio.run(download_all(server, digests, args.downloads, args.concurrency))
+            peak_mb = tracemalloc.get_traced_memory()[1] / 1e6
+            tracemalloc.stop()
+            server.close()
+            print(f"  {name:<16} {args.downloads} downloads x{args.concurrency} concurrent: "
+                  f"{total / elapsed / 1e6:,.0f} MB/s  p50 {pct(latencies, 50):.0f}ms  p99 {pct(latencies, 99):.0f}ms  "
+                  f"peak Python memory {peak_mb:,.0f} MB")
+
+        server = ArtifactServer(store).start()
+        latencies = asyncio.run(range_reads(server, digests[0], size, args.range_reads))
+        server.close()
+        print(f"  64 KB range reads (keep-alive): p50 {pct(latencies, 50):.3f}ms  p99 {pct(latencies, 99):.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Benchmark: ClientSide disclosure packet assembly (tools/disclosure_packets.py)
+
+Assembles packets with the static sections cached, and compares against a
+baseline that renders every section again for each packet.
+
+Usage:
+    python benchmarks/bench_disclosures.py [--packets 5000] [--type full]
+"""
+import sys
+import time
+import argparse
+from pathlib import Path
+
+# Add the ClientSide tools to path
+sys.path.append(str(Path(__file__).parent.parent / "mcp-servers" / "clientside" / "tools"))
+
+from disclosure_packets import DisclosureAssembler
+
+
+class UncachedAssembler(DisclosureAssembler):
+    """Baseline: render every static section for every packet"""
+
+    def _section_pages(self, section_id):
+        self._cache.clear()
+        return super()._section_pages(section_id)
+
+
+def fields(i: int) -> dict:
+    return {
+        "disclosure_id": f"disclosure_{i}",
+        "transaction_id": f"txn_{i}",
+        "property_address": f"{i % 9000 + 1} Oak St, Austin TX 78701",
+        "year_built": 1950 + i % 70,
+        "client_names": [f"Buyer {i}", f"Co-buyer {i}"],
+        "seller_names": [f"Seller {i}"],
+        "agent_name": "Alex Kim",
+        "brokerage": "EstateWise Realty",
+    }
+
+
+def run(assembler, packet_type: str, count: int):
+    latencies, size = [], 0
+    started = time.perf_counter()
+    for i in range(count):
+        t = time.perf_counter()
+        size += len(assembler.assemble(packet_type, fields(i))["pdf"])
+        latencies.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return count / elapsed, latencies[len(latencies) // 2] * 1000, latencies[int(len(latencies) * 0.99)] * 1000, size / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--packets", type=int, default=5000)
+    parser.add_argument("--type", default="full")
+    args = parser.parse_args()
+
+    cached = DisclosureAssembler()
+    started = time.perf_counter()
+    cached.warm()
+    print(f"Rendered {len(cached.sections)} static sections in {(time.perf_counter() - started) * 1000:.1f}ms")
+
+    for name, assembler, count in (("cached sections", cached, args.packets),
+                                   ("render everything", UncachedAssembler(), max(1, args.packets // 10))):
+        rate, p50, p99, size = run(assembler, args.type, count)
+        print(f"  {name:<18} {count} '{args.type}' packets: {rate:,.0f}/s  p50 {p50:.3f}ms  p99 {p99:.3f}ms  "
+              f"{size / 1024:.1f} KB each")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Benchmark: rolling market stats (mcp-servers/clientside/tools/market_stats.py)
+
+Seeds MarketStats from a synthetic sales table, records a stream of new
+sales spread over a year (so weeks expire as the window rolls), and times:
+
+    record      one add_sale per new sale, including amortized expiry
+    query       stats(zip, type) with the summary cached
+    refresh     stats(zip, type) right after a sale invalidated it
+    scan        the same figures computed by filtering the whole table with NumPy
+
+Usage:
+    python benchmarks/bench_market_stats.py [--rows 1000000] [--sales 200000] [--zips 200]
+"""
+import sys
+import time
+import argparse
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+
+# Add shared utils and clientside tools to path
+sys.path.append(str(Path(__file__).parent.parent / "shared" / "utils"))
+sys.path.append(str(Path(__file__).parent.parent / "mcp-servers" / "clientside" / "tools"))
+
+from property_table import PropertyTable
+from market_stats import MarketStats
+
+TYPES = ["single_family", "condo", "townhouse", "multi_family"]
+
+
+def build_table(rows: int, zips: int, seed: int = 7) -> PropertyTable:
+    """Sales table with just the columns market stats reads, built from arrays"""
+    rng = np.random.default_rng(seed)
+    sqft = rng.integers(600, 4000, rows).astype(np.int32)
+    numeric = {"price": (sqft * rng.uniform(300, 900, rows)).round(-3), "square_feet": sqft}
+    codes = {"zip_code": rng.integers(0, zips, rows).astype(np.int32),
+             "property_type": rng.integers(0, len(TYPES), rows).astype(np.int32)}
+    categories = {"zip_code": [f"{94000 + z}" for z in range(zips)], "property_type": TYPES}
+    return PropertyTable(numeric, codes, categories, {}, np.arange(rows, dtype=np.int64))
+
+
+def scan(table: PropertyTable, zip_code: int, property_type: int) -> dict:
+    keep = (table.column("zip_code") == zip_code) & (table.column("property_type") == property_type)
+    ppsf = table.column("price")[keep] / table.column("square_feet")[keep]
+    p25, median, p75 = np.percentile(ppsf, [25, 50, 75])
+    return {"median": median, "p25": p25, "p75": p75, "mean": ppsf.mean()}
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return samples[len(samples) // 2] * 1e6, samples[int(len(samples) * 0.99)] * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Sales in the seed table")
+    parser.add_argument("--sales", type=int, default=200_000, help="New sales recorded afterwards")
+    parser.add_argument("--zips", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=20_000)
+    args = parser.parse_args()
+
+    table = build_table(args.rows, args.zips)
+    today = [date(2026, 1, 1)]
+    stats = MarketStats(window_days=180, clock=lambda: today[0])
+    started = time.perf_counter()
+    stats.load_table(table)
+    print(f"Seeded {args.rows:,} sales into {stats.snapshot()['keys']} keys in {time.perf_counter() - started:.2f}s")
+
+    rng = np.random.default_rng(1)
+    zips = rng.integers(0, args.zips, args.sales)
+    types = rng.integers(0, len(TYPES), args.sales)
+    sqft = rng.integers(600, 4000, args.sales)
+    list_prices = sqft * rng.uniform(300, 900, args.sales)
+    ratios = rng.uniform(0.92, 1.08, args.sales)
+    dom = rng.integers(1, 120, args.sales)
+    per_day = max(1, args.sales // 365)
+    record = []
+    for i in range(args.sales):
+        if i % per_day == 0:
+            today[0] += timedelta(days=1)
+        sale = {"zip_code": f"{94000 + zips[i]}", "property_type": TYPES[types[i]],
+                "price": float(list_prices[i] * ratios[i]), "square_feet": int(sqft[i]),
+                "list_price": float(list_prices[i]), "days_on_market": int(dom[i])}
+        started = time.perf_counter()
+        stats.add_sale(sale)
+        record.append(time.perf_counter() - started)
+    total = sum(record)
+    p50, p99 = percentiles(record)
+    print(f"record   {args.sales:,} sales over {(today[0] - date(2026, 1, 1)).days} days: "
+          f"{args.sales / total:,.0f}/s, p50 {p50:.1f}µs p99 {p99:.1f}µs")
+
+    query, refresh = [], []
+    for i in range(args.queries):
+        zip_code, property_type = f"{94000 + i % args.zips}", TYPES[i % len(TYPES)]
+        stats.stats(zip_code, property_type)
+        started = time.perf_counter()
+        stats.stats(zip_code, property_type)
+        query.append(time.perf_counter() - started)
+        stats.add_sale({"zip_code": zip_code, "property_type": property_type, "price": 700_000,
+                        "square_feet": 1200, "list_price": 690_000, "days_on_market": 20})
+        started = time.perf_counter()
+        stats.stats(zip_code, property_type)
+        refresh.append(time.perf_counter() - started)
+    for name, samples in (("query", query), ("refresh", refresh)):
+        p50, p99 = percentiles(samples)
+        print(f"{name:<8} p50 {p50:7.1f}µs  p99 {p99:7.1f}µs")
+
+    scans = []
+    for i in range(min(200, args.queries)):
+        started = time.perf_counter()
+        scan(table, i % args.zips, i % len(TYPES))
+        scans.append(time.perf_counter() - started)
+    p50, p99 = percentiles(scans)
+    print(f"scan     p50 {p50:7.1f}µs  p99 {p99:7.1f}µs  ({args.rows:,} rows, $/sqft only)")
+    print(stats.snapshot())
+
+
+if __name__ == "__main__":
+    main()
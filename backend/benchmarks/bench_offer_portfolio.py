@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Benchmark: portfolio offer comparison (ClientTools.compare_offer_portfolio)
+
+A listing agent's active listings, each with a handful of offers, compared
+two ways against the stub LLM (benchmarks/stub_llm.py):
+
+    per property   one compare_offers call per listing, one after another
+    portfolio      one compare_offer_portfolio call: a single ranking pass,
+                   then the LLM analyses run concurrently under one bound
+
+Also times ranking alone (rank_offers per listing vs rank_offer_groups), and
+reports how many analyses read the shared system prompt from the prompt cache.
+
+Usage:
+    python benchmarks/bench_offer_portfolio.py [--properties 40] [--offers 6] [--llm-latency 0.3] [--concurrency 8]
+"""
+import sys
+import time
+import random
+import asyncio
+import argparse
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add shared utils, clientside tools and benchmarks to path
+sys.path.append(str(Path(__file__).parent.parent / "shared" / "utils"))
+sys.path.append(str(Path(__file__).parent.parent / "mcp-servers" / "clientside" / "tools"))
+sys.path.append(str(Path(__file__).parent))
+
+import llm_router
+from llm_router import LLMRouter
+from claude_client import ClaudeClient
+from offer_utils import rank_offers, rank_offer_groups
+from client_tools import ClientTools
+from stub_llm import StubLLM
+
+LETTERS = [
+    "We fell in love with the garden and would be honored to raise our family here.",
+    "Cash buyer, no financing risk, flexible on the close.",
+    None,
+    "We have been outbid four times this year and this house is exactly what we want.",
+]
+
+
+def make_portfolio(properties: int, offers: int, seed: int = 11) -> list:
+    rng = random.Random(seed)
+    portfolio = []
+    for p in range(properties):
+        list_price = rng.randint(400, 1500) * 1000
+        portfolio.append({"property_id": f"listing-{p}", "offers": [{
+            "price": int(list_price * rng.uniform(0.95, 1.08)),
+            "close_date": (datetime(2026, 11, 1) + timedelta(days=rng.randint(14, 60))).isoformat(),
+            "contingencies": rng.sample(["inspection", "financing", "appraisal", "sale of home"], rng.randint(0, 3)),
+            "financing": rng.choice(["cash", "conventional", "FHA", "VA"]),
+            "earnest_money": rng.randint(5, 50) * 1000,
+            "buyer_letter": rng.choice(LETTERS),
+        } for _ in range(offers)]})
+    return portfolio
+
+
+async def per_property(tools: ClientTools, portfolio: list) -> float:
+    started = time.perf_counter()
+    for item in portfolio:
+        await tools.compare_offers(item["offers"])
+    return time.perf_counter() - started
+
+
+async def as_portfolio(tools: ClientTools, portfolio: list, concurrency: int):
+    first = []
+    started = time.perf_counter()
+
+    async def on_result(done, total, result):
+        if done == 1:
+            first.append(time.perf_counter() - started)
+
+    result = await tools.compare_offer_portfolio(portfolio, concurrency, on_result)
+    return time.perf_counter() - started, first[0], result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--properties", type=int, default=40)
+    parser.add_argument("--offers", type=int, default=6, help="Offers per property")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Stub LLM response time in seconds")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent LLM calls in portfolio mode")
+    args = parser.parse_args()
+
+    portfolio = make_portfolio(args.properties, args.offers)
+    groups = [item["offers"] for item in portfolio]
+    rank_offer_groups(groups)  # load the embedding model before timing
+    started = time.perf_counter()
+    for group in groups:
+        rank_offers(group)
+    looped = time.perf_counter() - started
+    started = time.perf_counter()
+    rank_offer_groups(groups)
+    grouped = time.perf_counter() - started
+    print(f"Ranking {args.properties} x {args.offers} offers: {looped * 1000:.1f}ms per property, "
+          f"{grouped * 1000:.1f}ms in one pass")
+
+    previous_router = llm_router._router
+    with StubLLM(latency=args.llm_latency) as llm:
+        llm_router._router = LLMRouter({"claude": ClaudeClient(api_key="bench", base_url=llm.url)})
+        try:
+            tools = ClientTools()
+            sequential = asyncio.run(per_property(tools, portfolio))
+            reads_before = llm.stats()["cache_reads"]
+            total, first, result = asyncio.run(as_portfolio(tools, portfolio, args.concurrency))
+            cache_reads = llm.stats()["cache_reads"] - reads_before
+        finally:
+            llm_router._router = previous_router
+
+    print(f"{args.properties} properties, LLM latency {args.llm_latency * 1000:.0f}ms:")
+    print(f"  per property  {sequential:6.2f}s")
+    print(f"  portfolio     {total:6.2f}s  ({sequential / total:.1f}x; first result after {first * 1000:.0f}ms, "
+          f"{args.concurrency} concurrent LLM calls, {cache_reads} prompt-cache reads)")
+    failed = [r["property_id"] for r in result["results"] if r["status"] != "success"]
+    if failed:
+        print(f"  failed: {failed}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Benchmark: compiled schema validators and slotted records vs. the previous
+required-fields loop with plain dataclasses.
+
+Usage:
+    python benchmarks/bench_schema_validators.py [--records 1000000]
+"""
+import gc
+import sys
+import time
+import typing
+import argparse
+import tracemalloc
+from dataclasses import dataclass, fields, MISSING
+from pathlib import Path
+from typing import Optional
+
+# Add shared utils to path
+sys.path.append(str(Path(__file__).parent.parent / "shared" / "utils"))
+
+from schema_validators import validate_many, Property
+
+
+@dataclass
+class LegacyProperty:
+    """Property schema as it was before slots/frozen"""
+    address: str
+    city: str
+    state: str
+    zip_code: str
+    price: Optional[float] = None
+    bedrooms: Optional[int] = None
+    bathrooms: Optional[float] = None
+    square_feet: Optional[int] = None
+    mls_id: Optional[str] = None
+    property_type: Optional[str] = None
+
+
+def legacy_validate_property(data):
+    required_fields = ["address", "city", "state", "zip_code"]
+    for field in required_fields:
+        if field not in data:
+            raise ValueError(f"Missing required field: {field}")
+    return LegacyProperty(**data)
+
+
+_TYPES = typing.get_type_hints(LegacyProperty)
+
+
+def interpreted_validate_property(data):
+    """Straightforward per-field type checking, for comparison with compiled validators"""
+    errors = []
+    for f in fields(LegacyProperty):
+        if f.name not in data:
+            if f.default is MISSING:
+                errors.append(f"{f.name}: Missing required field")
+            continue
+        expected = _TYPES[f.name]
+        if typing.get_origin(expected) is typing.Union:
+            expected = tuple(a for a in typing.get_args(expected))
+        if not isinstance(data[f.name], expected):
+            errors.append(f"{f.name}: wrong type")
+    unknown = set(data) - {f.name for f in fields(LegacyProperty)}
+    errors += [f"{k}: Unknown field" for k in unknown]
+    if errors:
+        raise ValueError("; ".join(errors))
+    return LegacyProperty(**data)
+
+
+def make_records(n: int):
+    return [
+        {
+            "address": f"{i} Oak St",
+            "city": "San Francisco",
+            "state": "CA",
+            "zip_code": "94110",
+            "price": 950000.0 + i,
+            "bedrooms": 3,
+            "bathrooms": 2.0,
+            "square_feet": 1800,
+            "mls_id": f"ML{i}",
+            "property_type": "single_family",
+        }
+        for i in range(n)
+    ]
+
+
+def measure(label, fn, records):
+    """Time fn over records, then re-run it under tracemalloc for retained memory"""
+    gc.collect()
+    started = time.perf_counter()
+    result = fn(records)
+    elapsed = time.perf_counter() - started
+    del result
+    gc.collect()
+
+    tracemalloc.start()
+    result = fn(records)
+    retained, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{label:<32} {elapsed:7.2f}s  {len(records) / elapsed:>11,.0f} rec/s  "
+        f"{retained / 1024 / 1024:8.1f} MiB retained"
+    )
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--records", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    records = make_records(args.records)
+    print(f"Validating {args.records:,} Property records")
+
+    measure("legacy (no type checks)", lambda rs: [legacy_validate_property(r) for r in rs], records)
+    measure("interpreted type checks", lambda rs: [interpreted_validate_property(r) for r in rs], records)
+    batch = measure("compiled validate_many (slotted)", lambda rs: validate_many(Property, rs), records)
+    assert batch.ok and len(batch.valid) == args.records
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Benchmark: MCP server cold start.
+
+For each server, measures
+  - import cost of main.py with ``python -X importtime`` (total and the
+    heaviest top-level packages), and
+  - time from process launch until /livez answers (port open) and until
+    /readyz reports ready (background warm-up finished).
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 3] [--servers leadgen,clientside]
+        [--properties 200000] [--output startup.json]
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import statistics
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import Dict, Any, List
+
+import httpx
+
+BACKEND = Path(__file__).parent.parent
+sys.path.append(str(Path(__file__).parent))
+
+from load_mcp_servers import SERVERS, build_property_table, free_port
+
+
+def import_profile(name: str, top: int = 8) -> Dict[str, Any]:
+    """Parse ``-X importtime`` output for ``import main`` in a server directory"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND / "mcp-servers" / name, capture_output=True, text=True, check=True,
+    )
+    total_us = 0
+    packages: Dict[str, int] = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        depth = (len(module) - len(module.lstrip())) // 2
+        module = module.strip()
+        if module == "main":
+            total_us = int(cumulative)
+        elif depth == 1:
+            root = module.split(".")[0]
+            packages[root] = packages.get(root, 0) + int(cumulative)
+    heaviest = sorted(packages.items(), key=lambda kv: kv[1], reverse=True)[:top]
+    return {
+        "import_main_ms": round(total_us / 1000, 1),
+        "heaviest_imports_ms": {k: round(v / 1000, 1) for k, v in heaviest},
+    }
+
+
+def time_to_ready(name: str, env: Dict[str, str], timeout: float = 60.0) -> Dict[str, float]:
+    """Launch a server and time /livez and /readyz from process start"""
+    port = free_port()
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "main.py"],
+        cwd=BACKEND / "mcp-servers" / name,
+        env={**os.environ, **env, SERVERS[name]["port_env"]: str(port)},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base = f"http://127.0.0.1:{port}"
+    result: Dict[str, float] = {}
+    try:
+        with httpx.Client(timeout=2.0) as client:
+            while time.perf_counter() - started < timeout:
+                if proc.poll() is not None:
+                    raise RuntimeError(f"{name} exited with code {proc.returncode}")
+                try:
+                    if "live_ms" not in result:
+                        if client.get(f"{base}/livez").status_code == 200:
+                            result["live_ms"] = (time.perf_counter() - started) * 1000
+                    else:
+                        response = client.get(f"{base}/readyz")
+                        if response.status_code == 200:
+                            result["ready_ms"] = (time.perf_counter() - started) * 1000
+                            result["warmup"] = response.json()["warmup"]
+                            return result
+                except (httpx.TransportError, socket.error):
+                    pass
+                time.sleep(0.005)
+        raise TimeoutError(f"{name} not ready after {timeout:.0f}s")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure MCP server cold start")
+    parser.add_argument("--servers", default=",".join(SERVERS))
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--properties", type=int, default=200000, help="Synthetic sales for ClientSide warm-up")
+    parser.add_argument("--output", default=None, help="Write results JSON here")
+    args = parser.parse_args()
+
+    servers = [s.strip() for s in args.servers.split(",") if s.strip()]
+    report: Dict[str, Any] = {"runs": args.runs, "properties": args.properties, "servers": {}}
+
+    with tempfile.TemporaryDirectory() as workdir:
+        env = {"LLM_HEDGE": "0"}
+        if "clientside" in servers and args.properties:
+            env["PROPERTY_TABLE_PATH"] = os.path.join(workdir, "properties")
+            build_property_table(env["PROPERTY_TABLE_PATH"], args.properties)
+
+        for name in servers:
+            profile = import_profile(name)
+            runs: List[Dict[str, Any]] = [time_to_ready(name, env) for _ in range(args.runs)]
+            summary = {
+                **profile,
+                "live_ms": round(statistics.median(r["live_ms"] for r in runs), 1),
+                "ready_ms": round(statistics.median(r["ready_ms"] for r in runs), 1),
+                "warmup": runs[-1]["warmup"],
+            }
+            report["servers"][name] = summary
+            heaviest = ", ".join(f"{k} {v:.0f}ms" for k, v in list(profile["heaviest_imports_ms"].items())[:4])
+            print(f"{name:<11} import main {summary['import_main_ms']:>7.1f}ms  "
+                  f"live {summary['live_ms']:>7.1f}ms  ready {summary['ready_ms']:>7.1f}ms  ({heaviest})")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+        print(f"📄 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark: tracing overhead per tool call (shared/utils/trace_context.py, tracing.py)
+
+Calls an in-process tool that opens a few child spans, as compare_offers does
+(ranking, analysis, LLM router, LLM client), and compares:
+
+    untraced      no tracing middleware
+    ids only      spans created and propagated, no collector configured
+    exported      spans batched to the stub OTLP collector (benchmarks/stub_otlp.py)
+
+Also times a single span on its own, inside and outside a traced call.
+
+Usage:
+    python benchmarks/bench_tracing.py [--calls 2000] [--spans 4]
+"""
+import sys
+import time
+import asyncio
+import argparse
+from pathlib import Path
+
+# Add shared utils and benchmarks to path
+sys.path.append(str(Path(__file__).parent.parent / "shared" / "utils"))
+sys.path.append(str(Path(__file__).parent))
+
+from fastmcp import FastMCP, Client
+import trace_context
+from tracing import TracingMiddleware
+from stub_otlp import StubCollector
+
+
+def build(traced: bool, spans: int) -> FastMCP:
+    server = FastMCP("BenchMCP")
+    if traced:
+        server.add_middleware(TracingMiddleware())
+
+    @server.tool
+    async def compare(offers: int = 5) -> int:
+        total = 0
+        for i in range(spans):
+            with trace_context.span("step", {"offers.count": offers}):
+                total += sum(range(offers * 20))
+        return total
+
+    return server
+
+
+async def run(server: FastMCP, calls: int):
+    latencies = []
+    async with Client(server) as client:
+        for _ in range(min(200, calls)):
+            await client.call_tool("compare", {})
+        for _ in range(calls):
+            started = time.perf_counter()
+            await client.call_tool("compare", {})
+            latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return sum(latencies) / calls * 1e6, latencies[len(latencies) // 2] * 1e6, latencies[int(calls * 0.99)] * 1e6
+
+
+def span_cost(count: int = 200000):
+    started = time.perf_counter()
+    for _ in range(count):
+        with trace_context.span("noop"):
+            pass
+    outside = (time.perf_counter() - started) / count
+    with trace_context.start_trace("bench") as root:
+        root.sampled = False  # time creating spans, not exporting them
+        started = time.perf_counter()
+        for _ in range(count):
+            with trace_context.span("child", {"k": 1}):
+                pass
+        inside = (time.perf_counter() - started) / count
+    return outside * 1e9, inside * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--spans", type=int, default=4, help="Child spans per call")
+    args = parser.parse_args()
+
+    outside, inside = span_cost()
+    print(f"One span: {outside:.0f}ns outside a traced call, {inside:.0f}ns inside one")
+
+    trace_context.configure(None)
+    rows = [("untraced", asyncio.run(run(build(False, args.spans), args.calls)), None),
+            ("ids only", asyncio.run(run(build(True, args.spans), args.calls)), None)]
+    with StubCollector() as collector:
+        exporter = trace_context.configure(trace_context.OTLPExporter(collector.url, "bench-mcp"))
+        rows.append(("exported", asyncio.run(run(build(True, args.spans), args.calls)), exporter))
+        exporter.flush(30.0)
+        trace_context.configure(None)
+
+    baseline = rows[0][1][0]
+    print(f"{args.calls} calls with {args.spans} child spans each:")
+    for name, (mean, p50, p99), exporter in rows:
+        line = f"  {name:<10} mean {mean:6.0f}µs  p50 {p50:6.0f}µs  p99 {p99:6.0f}µs  overhead {mean - baseline:+5.0f}µs"
+        if exporter is not None:
+            stats = exporter.snapshot()
+            line += f"  ({stats['exported']} spans in {stats['batches']} batches, {stats['dropped']} dropped)"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
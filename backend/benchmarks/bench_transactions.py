@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Benchmark: Paperwork transaction pipeline (tools/transaction_engine.py)
+
+Bulk-opens synthetic transactions, then times pipeline queries, status
+transitions and a restart that replays the write-ahead log.
+
+Usage:
+    python benchmarks/bench_transactions.py [--transactions 1000000] [--queries 1000]
+"""
+import sys
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add shared utils and the Paperwork server to path
+sys.path.append(str(Path(__file__).parent.parent / "shared" / "utils"))
+sys.path.append(str(Path(__file__).parent.parent / "mcp-servers" / "paperwork"))
+
+from tools.transaction_engine import TransactionEngine, TransitionError
+
+STATUSES = ["pending", "active", "active", "closed", "cancelled"]
+STREETS = ["Oak", "Maple", "Pine", "Cedar", "Elm", "Lake", "Hill", "Park"]
+
+
+def synthetic_transactions(count: int, today: datetime, agents: int, seed: int = 0):
+    rng = random.Random(seed)
+    for i in range(count):
+        yield {
+            "transaction_id": f"txn_{i}",
+            "property": {"address": f"{rng.randint(1, 9999)} {rng.choice(STREETS)} St", "city": "Austin",
+                         "state": "TX", "zip_code": f"787{rng.randint(0, 99):02d}", "price": rng.randint(200, 900) * 1000},
+            "clients": [{"name": f"Client {i}", "email": f"client{i}@example.com"}],
+            "status": rng.choice(STATUSES),
+            "agent_id": f"agent_{rng.randrange(agents)}",
+            "close_date": (today + timedelta(days=rng.randint(-365, 365))).date().isoformat(),
+        }
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return {p: round(samples[min(len(samples) - 1, int(p / 100 * len(samples)))] * 1000, 3) for p in (50, 99)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transactions", type=int, default=1_000_000)
+    parser.add_argument("--agents", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--batch", type=int, default=50_000, help="transactions per open_many call")
+    args = parser.parse_args()
+
+    today = datetime.now()
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory() as state_dir:
+        engine = TransactionEngine(state_dir).load()
+        tracemalloc.start()
+        started = time.perf_counter()
+        batch = []
+        for record in synthetic_transactions(args.transactions, today, args.agents):
+            batch.append(record)
+            if len(batch) == args.batch:
+                engine.open_many(batch)
+                batch = []
+        engine.open_many(batch)
+        load_s = time.perf_counter() - started
+        memory_mb = tracemalloc.get_traced_memory()[0] / 1e6
+        tracemalloc.stop()
+        print(f"Opened {len(engine):,} transactions in {load_s:.1f}s "
+              f"({len(engine) / load_s:,.0f}/s); index memory {memory_mb:.0f} MB")
+
+        queries = {
+            "active closing in 14 days": lambda: engine.closing_within(14, limit=50),
+            "pending+active, any date (first 50)": lambda: engine.query(status=["pending", "active"], limit=50),
+            "one agent's active deals": lambda: engine.query(
+                status="active", agent_id=f"agent_{rng.randrange(args.agents)}", limit=50),
+            "closed last 30 days (ids)": lambda: engine.query(
+                status="closed", closing_from=today - timedelta(days=30), closing_to=today, limit=1000, ids_only=True),
+        }
+        for name, query in queries.items():
+            samples = []
+            for _ in range(args.queries):
+                started = time.perf_counter()
+                result = query()
+                samples.append(time.perf_counter() - started)
+            p = percentiles(samples)
+            print(f"  {name:<38} total {result['total']:>8,}  p50 {p[50]:.3f}ms  p99 {p[99]:.3f}ms")
+
+        samples, rejected = [], 0
+        for _ in range(args.queries):
+            transaction_id = f"txn_{rng.randrange(args.transactions)}"
+            current = engine.get(transaction_id)["status"]
+            target = {"pending": "active", "active": "closed", "cancelled": "pending"}.get(current, "pending")
+            started = time.perf_counter()
+            try:
+                engine.advance(transaction_id, target)
+            except TransitionError:
+                rejected += 1
+            samples.append(time.perf_counter() - started)
+        p = percentiles(samples)
+        print(f"  {'advance (fsync per transition)':<38} {rejected:>14} rejected  p50 {p[50]:.3f}ms  p99 {p[99]:.3f}ms")
+
+        engine.close()
+        started = time.perf_counter()
+        restarted = TransactionEngine(state_dir).load()
+        print(f"Restart replayed the journal in {time.perf_counter() - started:.1f}s "
+              f"({len(restarted):,} transactions)")
+        started = time.perf_counter()
+        restarted.compact()
+        print(f"Compaction wrote a snapshot in {time.perf_counter() - started:.1f}s")
+        restarted.close()
+
+
+if __name__ == "__main__":
+    main()
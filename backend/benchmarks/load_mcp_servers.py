@@ -0,0 +1,480 @@
+#!/usr/bin/env python3
+"""
+Load test: drive every tool on the LeadGen, Paperwork and ClientSide MCP
+servers over the MCP HTTP transport and report per-tool throughput, latency
+percentiles and error rates.
+
+By default the three servers are started as subprocesses on spare ports,
+with both LLM clients pointed at a local stub (see stub_llm.py), the
+ClientSide server backed by a synthetic PropertyTable and the follow-up,
+transaction and artifact stores in a scratch directory. Results are written
+as JSON so runs can be compared between commits.
+
+Usage:
+    python benchmarks/load_mcp_servers.py [--requests 200] [--concurrency 16]
+        [--llm-latency 0.2] [--llm-error-rate 0.02] [--servers clientside,leadgen]
+        [--tools compare_offers,qualify_lead] [--output results.json]
+        [--compare benchmarks/results/<previous run>.json]
+
+    # Against servers that are already running (LLM configuration is theirs)
+    python benchmarks/load_mcp_servers.py --no-spawn --host 127.0.0.1
+"""
+import os
+import sys
+import json
+import time
+import socket
+import random
+import base64
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Any, List, Callable, Optional
+
+import httpx
+import numpy as np
+from fastmcp import Client
+
+BACKEND = Path(__file__).parent.parent
+RESULTS_DIR = Path(__file__).parent / "results"
+
+sys.path.append(str(BACKEND / "shared" / "utils"))
+sys.path.append(str(Path(__file__).parent))
+
+from stub_llm import StubLLM
+
+SERVERS = {
+    "leadgen": {"port_env": "LEADGEN_MCP_PORT", "port": 3001},
+    "paperwork": {"port_env": "PAPERWORK_MCP_PORT", "port": 3002},
+    "clientside": {"port_env": "CLIENTSIDE_MCP_PORT", "port": 3003},
+}
+
+ZIPS = ["94110", "94114", "94117", "78701"]
+STREETS = ["Oak", "Elm", "Pine", "Maple", "Cedar"]
+LETTERS = [
+    "We love the light in the kitchen and can close quickly with cash.",
+    "Our family has been searching for two years; this home feels right.",
+    "Pre-approved with a conventional loan and flexible on move-in date.",
+]
+# Ids created by one tool (transactions, documents, follow-ups) and used by
+# the next are tagged per run, so re-runs against live servers don't collide
+RUN = uuid.uuid4().hex[:6]
+DOCUMENT = base64.b64encode(b"%PDF-1.4\n" + b"0" * 4096).decode()
+
+
+def _address(i: int) -> str:
+    return f"{i} {STREETS[i % len(STREETS)]} St"
+
+
+def _offers(rng: random.Random) -> List[Dict[str, Any]]:
+    return [
+        {
+            "price": rng.randint(900, 1400) * 1000,
+            "close_date": f"2026-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "contingencies": rng.sample(["inspection", "financing", "appraisal"], rng.randint(0, 2)),
+            "financing": rng.choice(["cash", "conventional", "FHA"]),
+            "earnest_money": rng.randint(10, 60) * 1000,
+            "buyer_letter": rng.choice(LETTERS),
+        }
+        for _ in range(rng.randint(2, 6))
+    ]
+
+
+def _transaction(rng: random.Random, i: int) -> Dict[str, Any]:
+    close = datetime.now() + timedelta(days=rng.randint(10, 90))
+    return {
+        "transaction_id": f"txn_{RUN}_{i}",
+        "property": {"address": _address(i), "city": "San Francisco", "state": "CA",
+                     "zip_code": rng.choice(ZIPS), "price": rng.randint(500, 2000) * 1000},
+        "clients": [{"name": f"Client {i}", "email": f"client{i}@example.com"}],
+        "agent_id": f"agent_{i % 10}",
+        "close_date": close.date().isoformat(),
+    }
+
+
+def _sales(rng: random.Random, n: int) -> List[Dict[str, Any]]:
+    sales = []
+    for _ in range(n):
+        sqft = rng.randint(800, 3500)
+        price = float(round(sqft * rng.uniform(450, 650), -3))
+        sales.append({
+            "address": _address(rng.randrange(1000, 100000)), "zip_code": rng.choice(ZIPS),
+            "property_type": "single_family", "price": price, "list_price": price * rng.uniform(0.9, 1.05),
+            "square_feet": sqft, "bedrooms": rng.randint(1, 5), "bathrooms": rng.choice([1.0, 2.0, 3.0]),
+            "year_built": rng.randint(1920, 2024), "days_on_market": rng.randint(3, 90),
+        })
+    return sales
+
+
+# Per-server tool payload generators: (rng, call number) -> arguments. Tools
+# run in this order, so a tool that reads what an earlier one wrote (e.g.
+# get_document after store_document) finds it for the same call number.
+WORKLOAD: Dict[str, Dict[str, Callable[[random.Random, int], Dict[str, Any]]]] = {
+    "leadgen": {
+        "ping": lambda rng, i: {},
+        "generate_lead": lambda rng, i: {
+            "property_address": _address(i), "client_name": f"Client {i}",
+            "client_email": f"client{i}@example.com", "client_phone": "555-0100",
+            "notes": "Met at open house",
+        },
+        "find_duplicate_lead": lambda rng, i: {
+            "client_name": f"Client {rng.randrange(max(i, 1))}", "client_email": f"client{i}@example.com",
+            "property_address": _address(i),
+        },
+        "follow_up": lambda rng, i: {"lead_id": f"lead_{i}", "message": "Checking in", "follow_up_type": "email"},
+        # Follow-ups are sent by the server's scheduler once due, not by a tool
+        "schedule_follow_ups": lambda rng, i: {
+            "lead_id": f"lead_{RUN}_{i}", "cadence": rng.choice(["hot", "warm", "cold"]), "start_in_hours": 24.0,
+        },
+        "follow_up_status": lambda rng, i: {"lead_id": f"lead_{RUN}_{i}"},
+        "cancel_follow_ups": lambda rng, i: {"lead_id": f"lead_{RUN}_{i}"},
+        "qualify_lead": lambda rng, i: {
+            "name": f"Client {i}", "email": f"client{i}@example.com",
+            "inquiry": rng.choice(["Ready to make a cash offer asap", "Interested in details", "Just browsing"]),
+        },
+        "similar_leads": lambda rng, i: {"text": rng.choice(LETTERS), "k": 5},
+        "search": lambda rng, i: {"query": rng.choice(["open house", "Oak St", "Client"]), "limit": 10},
+    },
+    "paperwork": {
+        "ping": lambda rng, i: {},
+        "fill_contract": lambda rng, i: {
+            "contract_type": "purchase",
+            "transaction_data": {"address": _address(i), "price": rng.randint(500, 2000) * 1000, "buyer": f"Client {i}"},
+        },
+        "track_document": lambda rng, i: {"document_id": f"doc_{i}", "status": "pending", "notes": "Awaiting signature"},
+        "send_document": lambda rng, i: {"document_id": f"doc_{i}", "recipient_email": f"client{i}@example.com"},
+        "draft_contract": lambda rng, i: {
+            "address": _address(i), "buyer_name": f"Client {i}", "offer_price": float(rng.randint(500, 2000) * 1000),
+        },
+        "track_contract_status": lambda rng, i: {"property_id": f"prop_{i}"},
+        "store_document": lambda rng, i: {
+            "document_id": f"doc_{RUN}_{i}", "content_base64": DOCUMENT, "content_type": "application/pdf",
+        },
+        "get_document": lambda rng, i: {"document_id": f"doc_{RUN}_{i}"},
+        "open_transaction": lambda rng, i: {"transaction": _transaction(rng, i)},
+        "advance_transaction": lambda rng, i: {"transaction_id": f"txn_{RUN}_{i}", "status": "active"},
+        "link_transaction": lambda rng, i: {"transaction_id": f"txn_{RUN}_{i}", "lead_id": f"lead_{i}",
+                                            "contract_id": f"contract_{i}"},
+        "get_transaction": lambda rng, i: {"transaction_id": f"txn_{RUN}_{i}"},
+        "query_transactions": lambda rng, i: {
+            "status": rng.choice([["active"], ["pending", "active"]]), "closing_within_days": 60, "limit": 50,
+        },
+        "search": lambda rng, i: {"query": rng.choice(["purchase", "Oak St", "Client"]), "limit": 10},
+    },
+    "clientside": {
+        "ping": lambda rng, i: {},
+        "generate_comps": lambda rng, i: {"address": _address(rng.randrange(1000))},
+        "estimate_value": lambda rng, i: {"address": _address(rng.randrange(1000))},
+        "estimate_values": lambda rng, i: {"properties": [_address(rng.randrange(1000)) for _ in range(50)]},
+        "send_disclosure": lambda rng, i: {
+            "client_email": f"client{i}@example.com", "disclosure_type": "agency", "transaction_id": f"txn_{i}",
+        },
+        "compare_offers": lambda rng, i: {"offers": _offers(rng)},
+        "compare_offer_portfolio": lambda rng, i: {
+            "properties": [{"property_id": f"listing_{j}", "offers": _offers(rng)} for j in range(10)],
+        },
+        "simulate_offer_rankings": lambda rng, i: {"offers": _offers(rng), "samples": 10000, "seed": i},
+        "market_stats": lambda rng, i: {"zip_code": rng.choice(ZIPS)},
+        "record_sales": lambda rng, i: {"sales": _sales(rng, 20)},
+        "search": lambda rng, i: {"query": rng.choice(["Oak St", "agency", "disclosure"]), "limit": 10},
+    },
+}
+
+
+def build_property_table(path: str, n: int, seed: int = 7) -> None:
+    """Write a synthetic sales table for the ClientSide comps/valuation tools"""
+    from schema_validators import Property
+    from property_table import PropertyTable
+
+    rng = random.Random(seed)
+    props = []
+    for i in range(n):
+        sqft = rng.randint(800, 3500)
+        props.append(Property(
+            address=_address(i), city="San Francisco", state="CA", zip_code=ZIPS[i % len(ZIPS)],
+            price=float(round(sqft * rng.uniform(450, 650), -3)), bedrooms=rng.randint(1, 5),
+            bathrooms=rng.choice([1.0, 1.5, 2.0, 3.0]), square_feet=sqft,
+            property_type="single_family", year_built=rng.randint(1920, 2024),
+        ))
+    PropertyTable.from_properties(props).save(path)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(name: str, port: int, env: Dict[str, str], log_dir: str,
+                 backend: Path = BACKEND) -> subprocess.Popen:
+    """Run one server's main.py from a backend tree (this one by default)"""
+    server_dir = Path(backend) / "mcp-servers" / name
+    log = open(os.path.join(log_dir, f"{name}.log"), "w")
+    return subprocess.Popen(
+        [sys.executable, "main.py"],
+        cwd=server_dir,
+        env={**os.environ, **env, SERVERS[name]["port_env"]: str(port)},
+        stdout=log,
+        stderr=subprocess.STDOUT,
+    )
+
+
+async def wait_ready(url: str, process: Optional[subprocess.Popen], timeout: float = 60.0) -> None:
+    """Wait until /readyz reports warm-up finished and the MCP endpoint answers"""
+    readyz = url.rsplit("/", 1)[0] + "/readyz"
+    deadline = time.monotonic() + timeout
+    while True:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Server for {url} exited with code {process.returncode}")
+        try:
+            async with httpx.AsyncClient(timeout=5) as http:
+                if (await http.get(readyz)).status_code not in (200, 404):
+                    raise RuntimeError("not ready")
+            async with Client(url, timeout=5) as client:
+                await client.list_tools()
+                return
+        except Exception:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Server at {url} not ready after {timeout:.0f}s")
+            await asyncio.sleep(0.25)
+
+
+def _is_error(result) -> Optional[str]:
+    if result.is_error:
+        return "tool_error"
+    data = result.structured_content
+    if isinstance(data, dict) and data.get("status") == "error":
+        return "status_error"
+    return None
+
+
+def summarize(latencies: List[float], errors: Dict[str, int], wall: float) -> Dict[str, Any]:
+    """Throughput, latency percentiles (ms) and error rate for one tool"""
+    total = len(latencies)
+    failed = sum(errors.values())
+    lat = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    return {
+        "requests": total,
+        "errors": failed,
+        "error_rate": round(failed / total, 4) if total else 0.0,
+        "error_kinds": dict(errors),
+        "throughput_rps": round(total / wall, 2) if wall > 0 else 0.0,
+        "latency_ms": {
+            "mean": round(float(lat.mean()), 2),
+            "p50": round(float(np.percentile(lat, 50)), 2),
+            "p90": round(float(np.percentile(lat, 90)), 2),
+            "p99": round(float(np.percentile(lat, 99)), 2),
+            "max": round(float(lat.max()), 2),
+        },
+        "wall_s": round(wall, 3),
+    }
+
+
+async def run_tool(url: str, tool: str, make_args, requests: int, concurrency: int,
+                   seed: int, timeout: float) -> Dict[str, Any]:
+    """Fire `requests` calls at one tool from `concurrency` client sessions"""
+    rng = random.Random(seed)
+    payloads = [make_args(rng, i) for i in range(requests)]
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    counter = iter(range(requests))
+
+    async def worker(client: Client):
+        for i in counter:
+            started = time.perf_counter()
+            try:
+                result = await client.call_tool(tool, payloads[i], raise_on_error=False, timeout=timeout)
+                kind = _is_error(result)
+            except Exception as e:
+                kind = type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            if kind:
+                errors[kind] = errors.get(kind, 0) + 1
+
+    # Sessions are opened before the clock starts so setup isn't measured
+    clients = [Client(url, timeout=timeout) for _ in range(concurrency)]
+    for client in clients:
+        await client.__aenter__()
+    try:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(c) for c in clients))
+        wall = time.perf_counter() - started
+    finally:
+        for client in clients:
+            await client.__aexit__(None, None, None)
+    return summarize(latencies, errors, wall)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND,
+                             capture_output=True, text=True, check=True)
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=BACKEND,
+                               capture_output=True, text=True).stdout.strip()
+        return out.stdout.strip() + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_benchmark(servers: List[str],
+                        tools: Optional[List[str]] = None,
+                        requests: int = 200,
+                        concurrency: int = 16,
+                        llm_latency: float = 0.2,
+                        llm_jitter: float = 0.05,
+                        llm_error_rate: float = 0.0,
+                        properties: int = 20000,
+                        spawn: bool = True,
+                        host: str = "127.0.0.1",
+                        timeout: float = 60.0,
+                        seed: int = 42) -> Dict[str, Any]:
+    """Run the load test and return the results document"""
+    config = {
+        "servers": servers, "tools": tools, "requests": requests, "concurrency": concurrency,
+        "llm_latency": llm_latency, "llm_jitter": llm_jitter, "llm_error_rate": llm_error_rate,
+        "properties": properties, "spawn": spawn, "seed": seed,
+    }
+    results: Dict[str, Any] = {}
+    processes: Dict[str, subprocess.Popen] = {}
+    stub = None
+
+    with tempfile.TemporaryDirectory() as workdir:
+        try:
+            ports = {name: SERVERS[name]["port"] for name in servers}
+            if spawn:
+                stub = StubLLM(latency=llm_latency, jitter=llm_jitter, error_rate=llm_error_rate, seed=seed).start()
+                # Every benchmark session shares one client address, so per-client
+                # quotas would throttle the driver rather than measure the server
+                env = {**stub.env(), "LLM_HEDGE": "0", "ADMISSION_CLIENT_RATE": "0",
+                       "FOLLOWUP_STATE_DIR": os.path.join(workdir, "follow-ups"),
+                       "TRANSACTION_STATE_DIR": os.path.join(workdir, "transactions"),
+                       "ARTIFACT_STORE_DIR": os.path.join(workdir, "artifacts"),
+                       "ARTIFACT_PORT": str(free_port())}
+                if "clientside" in servers and properties:
+                    table_path = os.path.join(workdir, "properties")
+                    build_property_table(table_path, properties)
+                    env["PROPERTY_TABLE_PATH"] = table_path
+                for name in servers:
+                    ports[name] = free_port()
+                    processes[name] = start_server(name, ports[name], env, workdir)
+
+            for name in servers:
+                url = f"http://{host}:{ports[name]}/mcp"
+                await wait_ready(url, processes.get(name))
+                async with Client(url, timeout=timeout) as client:
+                    served = {tool.name for tool in await client.list_tools()}
+                missing = sorted(served - set(WORKLOAD[name]))
+                if missing:
+                    print(f"⚠️  {name}: no workload for {', '.join(missing)}")
+                for tool, make_args in WORKLOAD[name].items():
+                    if tools and tool not in tools:
+                        continue
+                    key = f"{name}.{tool}"
+                    print(f"⏱️  {key} ({requests} requests, concurrency {concurrency})")
+                    results[key] = await run_tool(url, tool, make_args, requests, concurrency, seed, timeout)
+                    print(format_row(key, results[key]))
+        finally:
+            for process in processes.values():
+                process.terminate()
+            for process in processes.values():
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+            if stub is not None:
+                stub.close()
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": config,
+        "llm_stub": stub.stats() if stub else None,
+        "results": results,
+    }
+
+
+def format_row(key: str, r: Dict[str, Any]) -> str:
+    lat = r["latency_ms"]
+    return (f"   {key:<34} {r['throughput_rps']:>9.1f} req/s  p50 {lat['p50']:>8.1f}ms  "
+            f"p90 {lat['p90']:>8.1f}ms  p99 {lat['p99']:>8.1f}ms  errors {r['error_rate']:.1%}")
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """Per-tool change in throughput, p50 and p99 relative to a previous run"""
+    def pct(new, old):
+        return f"{(new - old) / old:+.1%}" if old else "n/a"
+
+    lines = [f"Comparing {current.get('commit')} against {baseline.get('commit')}"]
+    for key, new in current["results"].items():
+        old = baseline.get("results", {}).get(key)
+        if not old:
+            lines.append(f"   {key:<34} (no baseline)")
+            continue
+        lines.append(
+            f"   {key:<34} throughput {pct(new['throughput_rps'], old['throughput_rps']):>8}  "
+            f"p50 {pct(new['latency_ms']['p50'], old['latency_ms']['p50']):>8}  "
+            f"p99 {pct(new['latency_ms']['p99'], old['latency_ms']['p99']):>8}  "
+            f"errors {old['error_rate']:.1%} -> {new['error_rate']:.1%}"
+        )
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the EstateWise MCP servers")
+    parser.add_argument("--servers", default=",".join(SERVERS), help="Comma-separated servers to drive")
+    parser.add_argument("--tools", default=None, help="Comma-separated tool names (default: all)")
+    parser.add_argument("--requests", type=int, default=200, help="Calls per tool")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent client sessions per tool")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Stub LLM mean delay (s)")
+    parser.add_argument("--llm-jitter", type=float, default=0.05, help="Stub LLM delay std dev (s)")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="Stub LLM failure fraction")
+    parser.add_argument("--properties", type=int, default=20000, help="Synthetic sales for ClientSide (0 = none)")
+    parser.add_argument("--no-spawn", action="store_true", help="Use already-running servers on default ports")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-call timeout (s)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="Results JSON path (default: benchmarks/results/)")
+    parser.add_argument("--compare", default=None, help="Previous results JSON to compare against")
+    args = parser.parse_args()
+
+    servers = [s.strip() for s in args.servers.split(",") if s.strip()]
+    unknown = set(servers) - set(SERVERS)
+    if unknown:
+        parser.error(f"Unknown servers: {', '.join(sorted(unknown))}")
+
+    report = asyncio.run(run_benchmark(
+        servers,
+        tools=[t.strip() for t in args.tools.split(",")] if args.tools else None,
+        requests=args.requests,
+        concurrency=args.concurrency,
+        llm_latency=args.llm_latency,
+        llm_jitter=args.llm_jitter,
+        llm_error_rate=args.llm_error_rate,
+        properties=args.properties,
+        spawn=not args.no_spawn,
+        host=args.host,
+        timeout=args.timeout,
+        seed=args.seed,
+    ))
+
+    output = Path(args.output) if args.output else (
+        RESULTS_DIR / f"mcp-load-{report['commit'] or 'unknown'}-{report['timestamp'].replace(':', '')}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"\n📄 Results written to {output}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        print("\n".join(compare(report, baseline)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Recorded-response stand-in for the OpenAI and Claude chat APIs, for replays.
+
+A replay or shadow run (benchmarks/replay_calls.py) should not reach the real
+providers: that costs money, adds their latency noise to both builds, and
+gives different answers on every run, so outputs could never be compared.
+RecordedLLM serves the answers a real provider gave instead.
+
+Two modes:
+
+    record   proxies each chat request to the real provider and saves the
+             answer (and how long it took) to a JSON-lines file
+    replay   answers from that file; a request that was never recorded gets
+             the stub's canned answer (benchmarks/stub_llm.py) and counts as
+             a miss, or an HTTP 500 with ``strict``
+
+Recordings are keyed by the system prompt and messages only, not the model or
+provider, so a recording made through OpenAI also answers a build that has
+switched to Claude. Answers are shaped for whichever provider is asked. The
+batch APIs are served by the stub as usual.
+
+Usage:
+    python benchmarks/recorded_llm.py --record responses.jsonl --openai-upstream https://api.openai.com/v1
+    python benchmarks/recorded_llm.py --replay responses.jsonl [--port 8766] [--recorded-latency] [--strict]
+"""
+import json
+import time
+import hashlib
+import argparse
+import threading
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
+
+import httpx
+
+from stub_llm import StubLLM, _system_text
+
+# Request headers passed through to the provider when recording
+FORWARD_HEADERS = ("authorization", "x-api-key", "anthropic-version", "anthropic-beta", "content-type")
+
+
+def request_key(body: Dict[str, Any]) -> str:
+    """Provider-independent key of a chat request: its system prompt and messages"""
+    messages = []
+    for message in body.get("messages", []):
+        if message.get("role") == "system":
+            continue
+        content = message.get("content")
+        if isinstance(content, list):
+            content = "".join(block.get("text", "") for block in content if isinstance(block, dict))
+        messages.append([message.get("role"), content])
+    canonical = json.dumps([_system_text(body), messages], separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode()).hexdigest()[:24]
+
+
+def response_text(response: Dict[str, Any], claude: bool) -> Optional[str]:
+    try:
+        if claude:
+            return "".join(block.get("text", "") for block in response["content"] if block.get("type") == "text")
+        return response["choices"][0]["message"]["content"]
+    except (KeyError, IndexError, TypeError):
+        return None
+
+
+class RecordedLLM(StubLLM):
+    """StubLLM that records real provider answers, or replays them"""
+
+    def __init__(self,
+                 path: str,
+                 record: bool = False,
+                 upstreams: Optional[Dict[str, str]] = None,
+                 strict: bool = False,
+                 recorded_latency: bool = False,
+                 **kwargs):
+        """
+        Args:
+            path: JSON-lines file of recorded answers
+            record: Proxy to the providers and append their answers to path
+            upstreams: Provider base URLs when recording ({"openai": ..., "claude": ...})
+            strict: Answer unrecorded requests with HTTP 500 instead of a canned reply
+            recorded_latency: Delay each replayed answer by the time the provider took
+            **kwargs: StubLLM options (host, port, latency, jitter, error_rate, seed)
+        """
+        super().__init__(**kwargs)
+        self.path = path
+        self.recording = record
+        self.upstreams = {name: url.rstrip("/") for name, url in (upstreams or {}).items() if url}
+        self.strict = strict
+        self.recorded_latency = recorded_latency
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+        self.responses: Dict[str, Dict[str, Any]] = {}
+        self._file_lock = threading.Lock()
+        if Path(path).exists():
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.responses[entry["key"]] = entry
+        self._client = httpx.Client(timeout=120.0) if record else None
+
+    def answer(self, body: Dict[str, Any], claude: bool, headers) -> Tuple[int, Dict[str, Any]]:
+        key = request_key(body)
+        if self.recording:
+            return self._forward(key, body, claude, headers)
+        entry = self.responses.get(key)
+        if entry is None:
+            with self._lock:
+                self.misses += 1
+            if self.strict:
+                return 500, {"error": {"message": f"No recorded response for request {key}"}}
+            return super().answer(body, claude, headers)
+        with self._lock:
+            self.hits += 1
+        if self.recorded_latency:
+            time.sleep(entry.get("latency_ms", 0) / 1000)
+        return 200, self._respond(body, claude, entry["text"])
+
+    def _forward(self, key: str, body: Dict[str, Any], claude: bool, headers) -> Tuple[int, Dict[str, Any]]:
+        provider = "claude" if claude else "openai"
+        upstream = self.upstreams.get(provider)
+        if upstream is None:
+            return 502, {"error": {"message": f"No upstream configured for {provider}"}}
+        forward = {name: headers[name] for name in FORWARD_HEADERS if headers.get(name)}
+        started = time.perf_counter()
+        try:
+            response = self._client.post(f"{upstream}/{'messages' if claude else 'chat/completions'}",
+                                         json=body, headers=forward)
+            payload = response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            return 502, {"error": {"message": f"Upstream {provider} failed: {e}"}}
+        text = response_text(payload, claude) if response.status_code == 200 else None
+        if text is not None:
+            entry = {"key": key, "provider": provider, "model": body.get("model"), "text": text,
+                     "latency_ms": round((time.perf_counter() - started) * 1000, 1)}
+            with self._file_lock:
+                self.responses[key] = entry
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                self.recorded += 1
+        return response.status_code, payload
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "mode": "record" if self.recording else "replay",
+                "responses": len(self.responses), "hits": self.hits, "misses": self.misses,
+                "recorded": self.recorded}
+
+    def close(self):
+        super().close()
+        if self._client is not None:
+            self._client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--record", metavar="FILE", help="Proxy to the providers and save their answers")
+    mode.add_argument("--replay", metavar="FILE", help="Answer from saved answers")
+    parser.add_argument("--openai-upstream", default=None, help="OpenAI base URL when recording")
+    parser.add_argument("--claude-upstream", default=None, help="Claude base URL when recording")
+    parser.add_argument("--strict", action="store_true", help="Fail unrecorded requests instead of stubbing them")
+    parser.add_argument("--recorded-latency", action="store_true", help="Replay with the providers' response times")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    llm = RecordedLLM(args.record or args.replay, record=bool(args.record),
+                      upstreams={"openai": args.openai_upstream, "claude": args.claude_upstream},
+                      strict=args.strict, recorded_latency=args.recorded_latency, host=args.host, port=args.port)
+    print(f"🎞️  Recorded LLM ({llm.stats()['mode']}, {len(llm.responses)} responses) listening on {llm.url}")
+    try:
+        llm.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(llm.stats())
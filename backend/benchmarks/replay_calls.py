@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""
+Replay recorded tool calls against an MCP server, optionally shadowing them
+to a candidate build and comparing the two.
+
+Reads a call log written by the servers (logs.txt or CALL_LOG_PATH, one
+structured record per tool call; see shared/utils/call_log.py) and sends
+every call again with its recorded arguments, spaced as they were recorded:
+
+    --speed 1     original pacing
+    --speed 10    ten times faster
+    --speed 0     as fast as --concurrency allows
+
+With --shadow, each call goes to the baseline (--target) and the candidate
+at the same moment, and the report compares them per tool: latency
+percentiles side by side with the recorded durations, error rates, and the
+calls whose outputs differ (with the JSON paths that changed). Timestamps,
+generated ids and timings are ignored in the comparison (``comparable`` in
+call_log.py; --ignore adds more keys). Outputs are also checked against the
+recorded output digests. Calls logged with redacted arguments (the
+servers' default, see call_log.py) are sent with the placeholders and
+counted under ``redacted_calls``; capture traffic with
+CALL_LOG_ARGUMENTS=full for a faithful replay.
+
+With --spawn the servers are started here on spare ports: the baseline from
+this tree and, with --candidate-dir, the candidate from another checkout
+(e.g. a ``git worktree`` of the branch under test). Both use a recorded-LLM
+stand-in (benchmarks/recorded_llm.py) answering from --llm-responses, so
+LLM answers are the same for both builds and cost nothing. Stateful tools
+write to whatever stores the environment points at; point those at scratch
+copies. The spawned servers log their own calls to a temp directory.
+
+Results are written as JSON tagged with the commit.
+
+Usage:
+    python benchmarks/replay_calls.py LOG --target http://127.0.0.1:3003/mcp [--speed 1]
+        [--shadow http://127.0.0.1:4003/mcp] [--server clientside] [--tools compare_offers]
+        [--limit 1000] [--concurrency 32] [--output results.json] [--fail-on-diff]
+
+    # Spawn this tree and a candidate checkout against recorded LLM answers
+    python benchmarks/replay_calls.py mcp-servers/clientside/logs.txt --spawn
+        --candidate-dir ../candidate/backend --llm-responses responses.jsonl --speed 5
+"""
+import os
+import re
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+from fastmcp import Client
+
+sys.path.append(str(Path(__file__).parent.parent / "shared" / "utils"))
+sys.path.append(str(Path(__file__).parent))
+
+from call_log import VOLATILE_KEYS, comparable, digest, diff_paths, read_calls, select
+from load_mcp_servers import RESULTS_DIR, free_port, start_server, wait_ready, summarize, git_commit
+from recorded_llm import RecordedLLM
+
+# Mismatching calls listed in the report
+MAX_MISMATCHES = 50
+
+
+def _output(result) -> Any:
+    """A client result in the form CallLogMiddleware records it"""
+    if result.structured_content is not None:
+        return result.structured_content
+    return [getattr(block, "text", None) for block in result.content]
+
+
+def _error_kind(result) -> Optional[str]:
+    if result.is_error:
+        return "tool_error"
+    data = result.structured_content
+    if isinstance(data, dict) and data.get("status") == "error":
+        return "status_error"
+    return None
+
+
+class Target:
+    """One server under replay: a pool of client sessions and what it answered"""
+
+    def __init__(self, name: str, endpoint, concurrency: int, timeout: float):
+        self.name = name
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self.clients = [Client(endpoint, timeout=timeout) for _ in range(concurrency)]
+        self.pool: asyncio.Queue = asyncio.Queue()
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, Dict[str, int]] = {}
+
+    async def __aenter__(self) -> "Target":
+        for client in self.clients:
+            await client.__aenter__()
+            self.pool.put_nowait(client)
+        return self
+
+    async def __aexit__(self, *exc):
+        for client in self.clients:
+            await client.__aexit__(None, None, None)
+
+    async def call(self, tool: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """Status and output of one call, timed from when a session was free"""
+        client = await self.pool.get()
+        started = time.perf_counter()
+        try:
+            result = await client.call_tool(tool, arguments, raise_on_error=False, timeout=self.timeout)
+            kind, output = _error_kind(result), _output(result)
+            status = "error" if result.is_error else "ok"
+        except Exception as e:
+            kind, output, status = type(e).__name__, f"{type(e).__name__}: {e}", "error"
+        finally:
+            self.pool.put_nowait(client)
+        self.latencies.setdefault(tool, []).append(time.perf_counter() - started)
+        if kind:
+            errors = self.errors.setdefault(tool, {})
+            errors[kind] = errors.get(kind, 0) + 1
+        return {"status": status, "output": output}
+
+    def report(self, wall: float) -> Dict[str, Any]:
+        tools = {tool: summarize(latencies, self.errors.get(tool, {}), wall)
+                 for tool, latencies in sorted(self.latencies.items())}
+        everything = [x for latencies in self.latencies.values() for x in latencies]
+        errors: Dict[str, int] = {}
+        for kinds in self.errors.values():
+            for kind, n in kinds.items():
+                errors[kind] = errors.get(kind, 0) + n
+        return {"endpoint": self.endpoint if isinstance(self.endpoint, str) else repr(self.endpoint),
+                "all": summarize(everything, errors, wall), "tools": tools}
+
+
+def _recorded_latency(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    by_tool: Dict[str, List[float]] = {}
+    for record in records:
+        by_tool.setdefault(record["tool"], []).append(record["duration_ms"])
+    out = {}
+    for tool, durations in sorted(by_tool.items()):
+        lat = np.array(durations)
+        out[tool] = {"requests": len(durations), "latency_ms": {
+            "p50": round(float(np.percentile(lat, 50)), 2),
+            "p90": round(float(np.percentile(lat, 90)), 2),
+            "p99": round(float(np.percentile(lat, 99)), 2),
+        }}
+    return out
+
+
+async def replay(records: List[Dict[str, Any]],
+                 target,
+                 shadow=None,
+                 speed: float = 1.0,
+                 concurrency: int = 16,
+                 timeout: float = 60.0,
+                 ignore: Optional[str] = None) -> Dict[str, Any]:
+    """Replay records against target (and shadow), returning the comparison.
+
+    target and shadow are MCP URLs or in-process FastMCP servers.
+    """
+    volatile = re.compile(f"{VOLATILE_KEYS.pattern}|{ignore}") if ignore else VOLATILE_KEYS
+    records = sorted(records, key=lambda r: r["t"])
+    targets = [Target("baseline", target, concurrency, timeout)]
+    if shadow is not None:
+        targets.append(Target("candidate", shadow, concurrency, timeout))
+    lags: List[float] = []
+    mismatched: List[Dict[str, Any]] = []
+    matches_recorded = {t.name: 0 for t in targets}
+    status_changes = 0
+
+    async def send(record: Dict[str, Any], due: float):
+        nonlocal status_changes
+        lags.append(max(0.0, time.perf_counter() - due))
+        answers = await asyncio.gather(*(t.call(record["tool"], record["arguments"]) for t in targets))
+        for t, answer in zip(targets, answers):
+            if answer["status"] == "ok" and answer["output"] is not None \
+                    and digest(answer["output"]) == record.get("output_digest"):
+                matches_recorded[t.name] += 1
+        if shadow is None:
+            return
+        base, candidate = answers
+        if base["status"] != candidate["status"]:
+            status_changes += 1
+        paths = diff_paths(comparable(base["output"], volatile), comparable(candidate["output"], volatile))
+        if paths or base["status"] != candidate["status"]:
+            mismatched.append({"tool": record["tool"], "ts": record.get("ts"), "arguments": record["arguments"],
+                               "status": [base["status"], candidate["status"]], "paths": paths})
+
+    async with _all(targets):
+        start = time.perf_counter()
+        first = records[0]["t"] if records else 0.0
+        tasks = []
+        for record in records:
+            due = start + ((record["t"] - first) / speed if speed > 0 else 0.0)
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(send(record, due)))
+        await asyncio.gather(*tasks)
+        wall = time.perf_counter() - start
+
+    lag = np.array(lags) * 1000 if lags else np.zeros(1)
+    mismatched.sort(key=lambda m: m["ts"] or "")
+    report = {
+        "calls": len(records),
+        "wall_s": round(wall, 3),
+        "recorded_span_s": round(records[-1]["t"] - records[0]["t"], 3) if records else 0.0,
+        "lag_ms": {"p50": round(float(np.percentile(lag, 50)), 2), "max": round(float(lag.max()), 2)},
+        "recorded": _recorded_latency(records),
+        "targets": {t.name: t.report(wall) for t in targets},
+        "outputs": {
+            "with_recorded_digest": sum(1 for r in records if r.get("output_digest")),
+            "redacted_calls": sum(1 for r in records if r.get("redacted")),
+            "match_recorded": matches_recorded,
+        },
+    }
+    if shadow is not None:
+        report["outputs"].update({"compared": len(records), "mismatched": len(mismatched),
+                                  "status_changes": status_changes, "mismatches": mismatched[:MAX_MISMATCHES]})
+    return report
+
+
+class _all:
+    """Enter several targets as one async context"""
+
+    def __init__(self, targets: List[Target]):
+        self.targets = targets
+
+    async def __aenter__(self):
+        for target in self.targets:
+            await target.__aenter__()
+
+    async def __aexit__(self, *exc):
+        for target in self.targets:
+            await target.__aexit__(*exc)
+
+
+def format_report(report: Dict[str, Any]) -> List[str]:
+    lines = [f"Replayed {report['calls']} calls spanning {report['recorded_span_s']:.1f}s in {report['wall_s']:.1f}s "
+             f"(schedule lag p50 {report['lag_ms']['p50']:.1f}ms, max {report['lag_ms']['max']:.1f}ms)"]
+    names = list(report["targets"])
+    header = "   " + f"{'tool':<28}" + "".join(f"{name + ' p50/p99':>24}" for name in ["recorded"] + names)
+    lines.append(header)
+    for tool, recorded in report["recorded"].items():
+        cells = [f"{recorded['latency_ms']['p50']:.1f}/{recorded['latency_ms']['p99']:.1f}ms"]
+        for name in names:
+            r = report["targets"][name]["tools"].get(tool)
+            cells.append(f"{r['latency_ms']['p50']:.1f}/{r['latency_ms']['p99']:.1f}ms" if r else "-")
+        lines.append(f"   {tool:<28}" + "".join(f"{c:>24}" for c in cells))
+    outputs = report["outputs"]
+    lines.append("   outputs matching the recorded digest: " + ", ".join(
+        f"{name} {n}/{outputs['with_recorded_digest']}" for name, n in outputs["match_recorded"].items()))
+    if "mismatched" in outputs:
+        lines.append(f"   baseline vs candidate: {outputs['mismatched']} of {outputs['compared']} outputs differ, "
+                     f"{outputs['status_changes']} changed status")
+        for m in outputs["mismatches"][:10]:
+            lines.append(f"      {m['tool']} @ {m['ts']}: {', '.join(m['paths']) or m['status']}")
+    return lines
+
+
+async def run_replay(log: str,
+                     target: Optional[str] = None,
+                     shadow: Optional[str] = None,
+                     server: Optional[str] = None,
+                     tools: Optional[List[str]] = None,
+                     limit: Optional[int] = None,
+                     speed: float = 1.0,
+                     concurrency: int = 16,
+                     timeout: float = 60.0,
+                     ignore: Optional[str] = None,
+                     spawn: bool = False,
+                     candidate_dir: Optional[str] = None,
+                     llm_responses: Optional[str] = None,
+                     recorded_latency: bool = False) -> Dict[str, Any]:
+    """Read a call log, replay it (spawning servers if asked) and return the results document"""
+    skipped: Dict[str, int] = {}
+    records = list(select(read_calls(log, skipped), servers=[server] if server else None, tools=tools))
+    if limit:
+        records = records[:limit]
+    servers = sorted({r.get("server") for r in records} - {None})
+    if spawn:
+        if len(servers) != 1:
+            raise ValueError(f"--spawn needs calls from one server (found {servers}); pick one with --server")
+        server = servers[0]
+
+    config = {"log": log, "server": server, "tools": tools, "limit": limit, "speed": speed,
+              "concurrency": concurrency, "ignore": ignore, "spawn": spawn, "candidate_dir": candidate_dir,
+              "llm_responses": llm_responses, "skipped_lines": skipped.get("unparsed", 0)}
+    processes: List[subprocess.Popen] = []
+    llm = None
+    with tempfile.TemporaryDirectory() as workdir:
+        try:
+            if spawn:
+                llm = RecordedLLM(llm_responses or os.path.join(workdir, "no-responses.jsonl"),
+                                  recorded_latency=recorded_latency).start()
+                builds = [("baseline", None)] + ([("candidate", candidate_dir)] if candidate_dir else [])
+                urls = []
+                for build, backend in builds:
+                    env = {**llm.env(), "LLM_HEDGE": "0", "ADMISSION_CLIENT_RATE": "0",
+                           "CALL_LOG_PATH": os.path.join(workdir, f"{build}-{{server}}.jsonl")}
+                    log_dir = os.path.join(workdir, build)
+                    os.makedirs(log_dir)
+                    port = free_port()
+                    kwargs = {"backend": Path(backend)} if backend else {}
+                    processes.append(start_server(server, port, env, log_dir, **kwargs))
+                    urls.append(f"http://127.0.0.1:{port}/mcp")
+                target, shadow = urls[0], (urls[1] if len(urls) > 1 else shadow)
+            for url, process in zip([target, shadow], processes + [None, None]):
+                if url is not None:
+                    await wait_ready(url, process)
+            print(f"▶️  Replaying {len(records)} calls from {log} at "
+                  f"{'full speed' if speed <= 0 else f'{speed:g}x'}"
+                  f"{' with shadow traffic' if shadow else ''}")
+            report = await replay(records, target, shadow, speed, concurrency, timeout, ignore)
+        finally:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+            if llm is not None:
+                llm.close()
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": config,
+        "llm": llm.stats() if llm else None,
+        **report,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("log", help="Call log to replay (logs.txt or CALL_LOG_PATH)")
+    parser.add_argument("--target", default=None, help="Baseline MCP URL")
+    parser.add_argument("--shadow", default=None, help="Candidate MCP URL to mirror every call to")
+    parser.add_argument("--spawn", action="store_true", help="Start the baseline from this tree")
+    parser.add_argument("--candidate-dir", default=None, help="With --spawn, backend dir of the candidate build")
+    parser.add_argument("--llm-responses", default=None, help="With --spawn, recorded LLM answers (recorded_llm.py)")
+    parser.add_argument("--recorded-latency", action="store_true", help="Replay LLM answers with their recorded delay")
+    parser.add_argument("--server", default=None, help="Only calls recorded by this server")
+    parser.add_argument("--tools", default=None, help="Comma-separated tool names (default: all)")
+    parser.add_argument("--limit", type=int, default=None, help="Replay the first N calls")
+    parser.add_argument("--speed", type=float, default=1.0, help="Pacing multiplier (0 = as fast as possible)")
+    parser.add_argument("--concurrency", type=int, default=16, help="Client sessions per server")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-call timeout (s)")
+    parser.add_argument("--ignore", default=None, help="Regex of extra output keys to leave out of comparisons")
+    parser.add_argument("--output", default=None, help="Results JSON path (default: benchmarks/results/)")
+    parser.add_argument("--fail-on-diff", action="store_true", help="Exit 1 when baseline and candidate differ")
+    args = parser.parse_args()
+    if not args.spawn and not args.target:
+        parser.error("Give --target URL or --spawn")
+    if args.candidate_dir and not args.spawn:
+        parser.error("--candidate-dir needs --spawn")
+
+    report = asyncio.run(run_replay(
+        args.log,
+        target=args.target,
+        shadow=args.shadow,
+        server=args.server,
+        tools=[t.strip() for t in args.tools.split(",")] if args.tools else None,
+        limit=args.limit,
+        speed=args.speed,
+        concurrency=args.concurrency,
+        timeout=args.timeout,
+        ignore=args.ignore,
+        spawn=args.spawn,
+        candidate_dir=args.candidate_dir,
+        llm_responses=args.llm_responses,
+        recorded_latency=args.recorded_latency,
+    ))
+    print("\n".join(format_report(report)))
+
+    output = Path(args.output) if args.output else (
+        RESULTS_DIR / f"replay-{report['commit'] or 'unknown'}-{report['timestamp'].replace(':', '')}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, default=str))
+    print(f"\n📄 Results written to {output}")
+    if report["llm"] and report["llm"]["misses"]:
+        print(f"⚠️  {report['llm']['misses']} LLM requests had no recorded answer and got the stub's reply")
+    if args.fail_on_diff and report["outputs"].get("mismatched"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
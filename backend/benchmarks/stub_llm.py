@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the OpenAI and Claude chat APIs, for benchmarks.
+
+Serves both ``/chat/completions`` (OpenAI) and ``/messages`` (Claude) with
+tunable latency and error rate, and answers with JSON shaped like what the
+calling tool asks for (lead scores, offer analyses), so the MCP servers can
+be driven end to end without network access or API spend.
+
+Also serves the two batch APIs (OpenAI ``/files`` + ``/batches``, Claude
+``/messages/batches``) for the batch job runner. A batch finishes
+``batch_delay`` seconds after it is created, and the error rate applies to
+each request in it.
+
+``/follow-ups`` stands in for LeadGen's follow-up delivery webhook
+(FOLLOWUP_WEBHOOK_URL) and keeps one delivery per idempotency key.
+
+Chat answers carry token usage. A system prompt seen before is reported as a
+prompt-cache read, as the providers do for a cached prefix. On Claude that
+applies to system blocks marked ``cache_control``; on OpenAI it applies to
+any repeated system prompt. This shows whether calls share a cacheable
+prefix.
+
+Point the servers at it with OPENAI_BASE_URL / CLAUDE_BASE_URL.
+
+Usage:
+    python benchmarks/stub_llm.py [--port 8765] [--latency 0.2] [--jitter 0.05] [--error-rate 0.02]
+"""
+import re
+import json
+import time
+import random
+import argparse
+import threading
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from collections import deque
+from typing import Dict, Any, Tuple
+
+
+def _system_text(body: Dict[str, Any]) -> str:
+    system = body.get("system") or ""
+    if isinstance(system, list):
+        # Claude system prompts may be a list of text blocks
+        return "".join(block.get("text", "") for block in system)
+    for message in body.get("messages", []):
+        if message.get("role") == "system":
+            return message.get("content") or ""
+    return system
+
+
+def _cacheable_prefix(body: Dict[str, Any], claude: bool) -> str:
+    """System prompt text the provider would cache for this request ("" if none)"""
+    system = body.get("system")
+    if claude:
+        if not isinstance(system, list) or not any("cache_control" in block for block in system):
+            return ""
+        last = max(i for i, block in enumerate(system) if "cache_control" in block)
+        return "".join(block.get("text", "") for block in system[:last + 1])
+    return _system_text(body)
+
+
+def _prompt_text(body: Dict[str, Any]) -> str:
+    system = body.get("system") or ""
+    parts = [_system_text(body) if isinstance(system, list) else system]
+    for message in body.get("messages", []):
+        content = message.get("content")
+        parts.append(content if isinstance(content, str) else json.dumps(content))
+    return "\n".join(parts)
+
+
+def _usage(prompt: str, text: str) -> Dict[str, int]:
+    return {"input_tokens": len(prompt.split()), "output_tokens": len(text.split())}
+
+
+def _reply(prompt: str) -> Dict[str, Any]:
+    """Canned answer in the shape the prompt asks for"""
+    if "hot/warm/cold" in prompt:
+        score = "hot" if re.search(r"urgent|asap|cash", prompt, re.I) else "warm"
+        return {"score": score, "explanation": "Stub LLM lead score"}
+    if "pros_cons_table" in prompt or "offer" in prompt.lower():
+        ranks = sorted({int(r) for r in re.findall(r'"rank":\s*(\d+)', prompt)}) or [1]
+        return {
+            "summary": f"Stub analysis of {len(ranks)} offers",
+            "pros_cons_table": [
+                {"rank": rank, "pros": ["Stub pro"], "cons": ["Stub con"]} for rank in ranks
+            ],
+        }
+    return {"text": "Stub LLM response"}
+
+
+class StubLLM:
+    """Threaded HTTP server mimicking both LLM providers"""
+
+    def __init__(self,
+                 host: str = "127.0.0.1",
+                 port: int = 0,
+                 latency: float = 0.0,
+                 jitter: float = 0.0,
+                 error_rate: float = 0.0,
+                 seed: int = None,
+                 batch_delay: float = 0.0):
+        """
+        Args:
+            host: Interface to bind
+            port: Port to bind (0 picks a free port)
+            latency: Mean response delay in seconds
+            jitter: Standard deviation of the delay in seconds
+            error_rate: Fraction of requests answered with HTTP 500
+            seed: Seed for reproducible delays and failures
+            batch_delay: Seconds until a submitted batch reports completion
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.batch_delay = batch_delay
+        self.calls = 0
+        self.errors = 0
+        self.files: Dict[str, str] = {}
+        self.batches: Dict[str, Dict[str, Any]] = {}
+        # Follow-ups delivered to the stand-in webhook, by idempotency key
+        self.follow_ups: Dict[str, Dict[str, Any]] = {}
+        # traceparent headers of recent chat requests, to check trace propagation
+        self.traceparents: deque = deque(maxlen=1000)
+        # System prompts seen so far, standing in for the providers' prompt cache
+        self._prompt_cache: set = set()
+        self.cache_reads = 0
+        self.cached_tokens = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("content-length", 0))
+                raw = self.rfile.read(length)
+                path = self.path.rstrip("/")
+                if path.endswith("/files"):
+                    self._send(200, stub._store_file(self.headers.get("content-type", ""), raw))
+                    return
+                try:
+                    body = json.loads(raw or b"{}")
+                except ValueError:
+                    body = {}
+                if path.endswith("/batches"):
+                    self._send(200, stub._create_batch(body, claude=path.endswith("/messages/batches")))
+                    return
+                if path.endswith("/follow-ups"):
+                    with stub._lock:
+                        stub.follow_ups.setdefault(self.headers.get("idempotency-key", ""), body)
+                    self._send(200, {"status": "delivered"})
+                    return
+                if self.headers.get("traceparent"):
+                    stub.traceparents.append(self.headers["traceparent"])
+                delay, fail = stub._draw()
+                time.sleep(delay)
+                if fail:
+                    self._send(500, {"error": {"message": "Stub LLM injected failure"}})
+                    return
+
+                self._send(*stub.answer(body, path.endswith("/messages"), self.headers))
+
+            def do_GET(self):
+                path = self.path.rstrip("/")
+                if path.endswith("/content"):
+                    content = stub.files.get(path.split("/")[-2])
+                    if content is None:
+                        self._send(404, {"error": {"message": "No such file"}})
+                        return
+                    payload = content.encode()
+                    self.send_response(200)
+                    self.send_header("content-type", "application/jsonl")
+                    self.send_header("content-length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                    return
+                parts = path.split("/")
+                results = parts[-1] == "results"
+                batch = stub.batches.get(parts[-2] if results else parts[-1])
+                if batch is None:
+                    self._send(404, {"error": {"message": "No such batch"}})
+                elif results:
+                    self.path = f"/files/{batch['output_file_id']}/content"
+                    self.do_GET()
+                else:
+                    self._send(200, stub._batch_status(batch))
+
+            def _send(self, code: int, body: Dict[str, Any]):
+                payload = json.dumps(body).encode()
+                self.send_response(code)
+                self.send_header("content-type", "application/json")
+                self.send_header("content-length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://{host}:{self.httpd.server_address[1]}"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def answer(self, body: Dict[str, Any], claude: bool, headers) -> Tuple[int, Dict[str, Any]]:
+        """Status and response body for one chat request; subclasses change where the text comes from"""
+        return 200, self._respond(body, claude, json.dumps(_reply(_prompt_text(body))))
+
+    def _respond(self, body: Dict[str, Any], claude: bool, text: str) -> Dict[str, Any]:
+        """A chat response carrying text, shaped for the provider that was asked"""
+        usage = _usage(_prompt_text(body), text)
+        cached = self._cache_read(_cacheable_prefix(body, claude))
+        if claude:
+            usage["input_tokens"] -= cached
+            usage["cache_read_input_tokens"] = cached
+            return {"content": [{"type": "text", "text": text}], "usage": usage}
+        return {
+            "choices": [{"message": {"role": "assistant", "content": text}}],
+            "usage": {"prompt_tokens": usage["input_tokens"], "completion_tokens": usage["output_tokens"],
+                      "prompt_tokens_details": {"cached_tokens": cached}},
+        }
+
+    def _draw(self):
+        with self._lock:
+            self.calls += 1
+            delay = max(0.0, self._rng.gauss(self.latency, self.jitter)) if self.jitter else self.latency
+            fail = self._rng.random() < self.error_rate
+            if fail:
+                self.errors += 1
+        return delay, fail
+
+    def _store_file(self, content_type: str, raw: bytes) -> Dict[str, Any]:
+        message = BytesParser().parsebytes(f"content-type: {content_type}\r\n\r\n".encode() + raw)
+        content = ""
+        for part in message.walk():
+            if part.get_filename():
+                content = part.get_payload(decode=True).decode()
+        with self._lock:
+            file_id = f"file-{len(self.files) + 1}"
+            self.files[file_id] = content
+        return {"id": file_id, "object": "file", "purpose": "batch"}
+
+    def _cache_read(self, prefix: str) -> int:
+        """Tokens of prefix served from the simulated prompt cache (caching it on first sight)"""
+        if not prefix:
+            return 0
+        with self._lock:
+            if prefix not in self._prompt_cache:
+                self._prompt_cache.add(prefix)
+                return 0
+            self.cache_reads += 1
+            self.cached_tokens += len(prefix.split())
+        return len(prefix.split())
+
+    def _create_batch(self, body: Dict[str, Any], claude: bool) -> Dict[str, Any]:
+        if claude:
+            requests = [(r["custom_id"], r["params"]) for r in body.get("requests", [])]
+        else:
+            lines = self.files.get(body.get("input_file_id"), "").splitlines()
+            requests = [(r["custom_id"], r["body"]) for r in map(json.loads, filter(None, lines))]
+
+        out = []
+        for custom_id, request in requests:
+            _, fail = self._draw()
+            prompt = _prompt_text(request)
+            text = json.dumps(_reply(prompt))
+            usage = _usage(prompt, text)
+            if claude:
+                result = {"type": "errored", "error": {"type": "api_error", "message": "Stub LLM injected failure"}} if fail else {
+                    "type": "succeeded",
+                    "message": {"content": [{"type": "text", "text": text}], "usage": usage},
+                }
+                out.append({"custom_id": custom_id, "result": result})
+            else:
+                response = {"status_code": 500, "body": {"error": {"message": "Stub LLM injected failure"}}} if fail else {
+                    "status_code": 200,
+                    "body": {
+                        "choices": [{"message": {"role": "assistant", "content": text}}],
+                        "usage": {"prompt_tokens": usage["input_tokens"], "completion_tokens": usage["output_tokens"]},
+                    },
+                }
+                out.append({"custom_id": custom_id, "response": response, "error": None})
+
+        with self._lock:
+            batch_id = f"{'msgbatch' if claude else 'batch'}_{len(self.batches) + 1}"
+            output_file_id = f"file-{len(self.files) + 1}"
+            self.files[output_file_id] = "".join(json.dumps(line) + "\n" for line in out)
+            self.batches[batch_id] = {
+                "id": batch_id, "claude": claude, "requests": len(out),
+                "ready_at": time.monotonic() + self.batch_delay, "output_file_id": output_file_id,
+            }
+        return self._batch_status(self.batches[batch_id])
+
+    def _batch_status(self, batch: Dict[str, Any]) -> Dict[str, Any]:
+        done = time.monotonic() >= batch["ready_at"]
+        if batch["claude"]:
+            return {
+                "id": batch["id"],
+                "processing_status": "ended" if done else "in_progress",
+                "results_url": f"{self.url}/messages/batches/{batch['id']}/results" if done else None,
+            }
+        return {
+            "id": batch["id"],
+            "status": "completed" if done else "in_progress",
+            "output_file_id": batch["output_file_id"] if done else None,
+            "request_counts": {"total": batch["requests"]},
+        }
+
+    def env(self) -> Dict[str, str]:
+        """Environment that points both LLM clients and follow-up delivery at this stub"""
+        return {
+            "OPENAI_API_KEY": "stub",
+            "CLAUDE_API_KEY": "stub",
+            "OPENAI_BASE_URL": self.url,
+            "CLAUDE_BASE_URL": self.url,
+            "FOLLOWUP_WEBHOOK_URL": f"{self.url}/follow-ups",
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "cache_reads": self.cache_reads,
+            "cached_tokens": self.cached_tokens,
+            "latency": self.latency,
+            "jitter": self.jitter,
+            "error_rate": self.error_rate,
+        }
+
+    def start(self) -> "StubLLM":
+        self._thread.start()
+        return self
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> "StubLLM":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="Mean delay in seconds")
+    parser.add_argument("--jitter", type=float, default=0.05, help="Delay standard deviation in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests that fail")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    stub = StubLLM(args.host, args.port, args.latency, args.jitter, args.error_rate, args.seed)
+    print(f"🤖 Stub LLM listening on {stub.url} (latency {args.latency}s ± {args.jitter}s, "
+          f"error rate {args.error_rate:.0%})")
+    try:
+        stub.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
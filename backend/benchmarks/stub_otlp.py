@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for an OpenTelemetry collector, for tracing checks and benchmarks.
+
+Accepts OTLP/HTTP JSON on ``POST /v1/traces`` (what trace_context.py's
+exporter sends) and keeps the spans in memory. ``GET /traces`` lists the
+traces received, with their span count, services and root span, and
+``GET /traces/<trace id>`` returns one trace's spans in start order, so a
+dashboard action can be followed across the MCP servers without running a
+real collector. With ``--dump`` every span is also appended to a JSON-lines
+file.
+
+Point the servers at it with OTEL_EXPORTER_OTLP_ENDPOINT.
+
+Usage:
+    python benchmarks/stub_otlp.py [--port 4318] [--latency 0] [--dump spans.jsonl]
+"""
+import json
+import time
+import argparse
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional
+
+
+def _attributes(items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    values = {}
+    for item in items or []:
+        value = item.get("value", {})
+        if "intValue" in value:
+            values[item["key"]] = int(value["intValue"])
+        elif "arrayValue" in value:
+            values[item["key"]] = [next(iter(v.values()), None) for v in value["arrayValue"].get("values", [])]
+        else:
+            values[item["key"]] = next(iter(value.values()), None)
+    return values
+
+
+def flatten(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Spans of an OTLP/HTTP JSON request, each with its service name and plain attributes"""
+    spans = []
+    for resource_spans in payload.get("resourceSpans", []):
+        service = _attributes(resource_spans.get("resource", {}).get("attributes")).get("service.name")
+        for scope_spans in resource_spans.get("scopeSpans", []):
+            for span in scope_spans.get("spans", []):
+                start, end = int(span["startTimeUnixNano"]), int(span["endTimeUnixNano"])
+                spans.append({
+                    "service": service,
+                    "trace_id": span["traceId"],
+                    "span_id": span["spanId"],
+                    "parent_id": span.get("parentSpanId") or None,
+                    "name": span["name"],
+                    "kind": span.get("kind", 1),
+                    "start_ns": start,
+                    "duration_ms": round((end - start) / 1e6, 3),
+                    "status": span.get("status", {}).get("code", 0),
+                    "attributes": _attributes(span.get("attributes")),
+                })
+    return spans
+
+
+class StubCollector:
+    """Threaded HTTP server receiving OTLP/HTTP JSON trace exports"""
+
+    def __init__(self,
+                 host: str = "127.0.0.1",
+                 port: int = 0,
+                 latency: float = 0.0,
+                 max_traces: int = 10000,
+                 dump: Optional[str] = None):
+        """
+        Args:
+            host: Interface to bind
+            port: Port to bind (0 picks a free port)
+            latency: Delay before answering each export, to mimic a slow collector
+            max_traces: Traces kept in memory; the oldest are dropped past this
+            dump: JSON-lines file every received span is appended to
+        """
+        self.latency = latency
+        self.max_traces = max_traces
+        self.dump = dump
+        self.requests = 0
+        self.rejected = 0
+        self.span_count = 0
+        self._traces: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("content-length", 0))
+                raw = self.rfile.read(length)
+                if self.path.rstrip("/") != "/v1/traces":
+                    self._send(404, {"error": "not found"})
+                    return
+                if "json" not in self.headers.get("content-type", ""):
+                    # Only the JSON encoding of OTLP/HTTP is understood here
+                    stub.rejected += 1
+                    self._send(415, {"error": "send application/json"})
+                    return
+                try:
+                    spans = flatten(json.loads(raw))
+                except (ValueError, KeyError, TypeError):
+                    stub.rejected += 1
+                    self._send(400, {"error": "malformed OTLP JSON"})
+                    return
+                time.sleep(stub.latency)
+                stub._store(spans)
+                self._send(200, {"partialSuccess": {}})
+
+            def do_GET(self):
+                path = self.path.split("?")[0].rstrip("/")
+                if path == "/traces":
+                    self._send(200, {"traces": stub.summary()})
+                elif path.startswith("/traces/"):
+                    spans = stub.trace(path.rsplit("/", 1)[1])
+                    self._send(200 if spans else 404, {"spans": spans})
+                else:
+                    self._send(404, {"error": "not found"})
+
+            def _send(self, code: int, body: Dict[str, Any]):
+                data = json.dumps(body).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://{host}:{self.httpd.server_address[1]}"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def _store(self, spans: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self.requests += 1
+            self.span_count += len(spans)
+            for span in spans:
+                self._traces.setdefault(span["trace_id"], []).append(span)
+                self._traces.move_to_end(span["trace_id"])
+            while len(self._traces) > self.max_traces:
+                self._traces.popitem(last=False)
+        if self.dump:
+            with open(self.dump, "a") as f:
+                for span in spans:
+                    f.write(json.dumps(span) + "\n")
+
+    def trace(self, trace_id: str) -> List[Dict[str, Any]]:
+        """Spans of one trace, in start order"""
+        with self._lock:
+            return sorted(self._traces.get(trace_id, []), key=lambda s: s["start_ns"])
+
+    def spans(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [span for spans in self._traces.values() for span in spans]
+
+    def summary(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            traces = list(self._traces.items())
+        rows = []
+        for trace_id, spans in traces:
+            ids = {span["span_id"] for span in spans}
+            roots = [span for span in spans if span["parent_id"] not in ids]
+            root = min(roots or spans, key=lambda s: s["start_ns"])
+            rows.append({
+                "trace_id": trace_id,
+                "spans": len(spans),
+                "services": sorted({span["service"] for span in spans if span["service"]}),
+                "root": root["name"],
+                "duration_ms": root["duration_ms"],
+            })
+        return rows
+
+    def env(self) -> Dict[str, str]:
+        """Environment that points the MCP servers' exporter at this collector"""
+        return {"OTEL_EXPORTER_OTLP_ENDPOINT": self.url}
+
+    def stats(self) -> Dict[str, Any]:
+        return {"requests": self.requests, "spans": self.span_count, "traces": len(self._traces),
+                "rejected": self.rejected}
+
+    def start(self) -> "StubCollector":
+        self._thread.start()
+        return self
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> "StubCollector":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4318)
+    parser.add_argument("--latency", type=float, default=0.0, help="Delay before answering each export")
+    parser.add_argument("--dump", default=None, help="Append received spans to this JSON-lines file")
+    args = parser.parse_args()
+
+    stub = StubCollector(args.host, args.port, args.latency, dump=args.dump)
+    print(f"🔭 Stub OTLP collector listening on {stub.url}/v1/traces (traces at {stub.url}/traces)")
+    try:
+        stub.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
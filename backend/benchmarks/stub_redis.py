@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for a Redis server, for tests and benchmarks.
+
+Speaks RESP and implements the commands shared_state.RedisBackend uses:
+PING, AUTH, SELECT, GET, SET (EX/PX/NX/XX), MGET, MSET, DEL, EXISTS, INCR,
+INCRBY, PEXPIRE, PTTL, SCAN, DBSIZE and FLUSHDB, with key expiry. Every
+reply batch can be delayed by ``latency`` seconds to mimic a network round
+trip, which shows what pipelining saves.
+
+Point the servers at it with SHARED_STATE_URL=redis://127.0.0.1:<port>/0.
+
+Usage:
+    python benchmarks/stub_redis.py [--port 6380] [--latency 0.0005]
+"""
+import time
+import fnmatch
+import argparse
+import threading
+import socketserver
+from typing import Dict, Any, List, Optional, Tuple
+
+
+class _Error(Exception):
+    pass
+
+
+def _encode(reply: Any) -> bytes:
+    if isinstance(reply, _Error):
+        return b"-ERR %s\r\n" % str(reply).encode()
+    if reply is None:
+        return b"$-1\r\n"
+    if isinstance(reply, bool):
+        return b":%d\r\n" % int(reply)
+    if isinstance(reply, int):
+        return b":%d\r\n" % reply
+    if isinstance(reply, str):
+        return b"+%s\r\n" % reply.encode()
+    if isinstance(reply, bytes):
+        return b"$%d\r\n%s\r\n" % (len(reply), reply)
+    return b"*%d\r\n" % len(reply) + b"".join(_encode(item) for item in reply)
+
+
+def _parse(buffer: bytes, start: int) -> Optional[Tuple[List[bytes], int]]:
+    """One command array from buffer[start:], or None if it is incomplete"""
+    end = buffer.find(b"\r\n", start)
+    if end < 0:
+        return None
+    if buffer[start:start + 1] != b"*":
+        # Inline command (e.g. typed into telnet)
+        return buffer[start:end].split(), end + 2
+    count, position, args = int(buffer[start + 1:end]), end + 2, []
+    for _ in range(count):
+        end = buffer.find(b"\r\n", position)
+        if end < 0:
+            return None
+        length = int(buffer[position + 1:end])
+        position = end + 2
+        if len(buffer) < position + length + 2:
+            return None
+        args.append(buffer[position:position + length])
+        position += length + 2
+    return args, position
+
+
+class StubRedis:
+    """Threaded TCP server holding keys in a dict"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                 password: Optional[str] = None):
+        """
+        Args:
+            host: Interface to bind
+            port: Port to bind (0 picks a free port)
+            latency: Delay before each batch of replies, in seconds
+            password: Require AUTH with this password
+        """
+        self.latency = latency
+        self.password = password
+        self.data: Dict[bytes, Tuple[bytes, Optional[float]]] = {}
+        self.commands = 0
+        self.round_trips = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                with stub._lock:
+                    stub.connections += 1
+                authed = stub.password is None
+                buffer = b""
+                while True:
+                    try:
+                        chunk = self.request.recv(65536)
+                    except OSError:
+                        return
+                    if not chunk:
+                        return
+                    buffer += chunk
+                    replies, position = [], 0
+                    while True:
+                        parsed = _parse(buffer, position)
+                        if parsed is None:
+                            break
+                        args, position = parsed
+                        if not args:
+                            continue
+                        name = args[0].upper()
+                        if name == b"AUTH":
+                            authed = args[-1].decode() == stub.password
+                            replies.append("OK" if authed else _Error("invalid password"))
+                        elif name == b"QUIT":
+                            self.request.sendall(b"".join(_encode(r) for r in replies) + b"+OK\r\n")
+                            return
+                        elif not authed:
+                            replies.append(_Error("NOAUTH Authentication required"))
+                        else:
+                            replies.append(stub._execute(name, args[1:]))
+                    buffer = buffer[position:]
+                    if replies:
+                        if stub.latency:
+                            time.sleep(stub.latency)
+                        with stub._lock:
+                            stub.round_trips += 1
+                        self.request.sendall(b"".join(_encode(reply) for reply in replies))
+
+        class Server(socketserver.ThreadingTCPServer):
+            daemon_threads = True
+            allow_reuse_address = True
+
+        self.server = Server((host, port), Handler)
+        self.url = f"redis://{host}:{self.server.server_address[1]}/0"
+
+    def _live(self, key: bytes, now: float) -> Optional[bytes]:
+        entry = self.data.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= now:
+            del self.data[key]
+            return None
+        return entry[0]
+
+    def _execute(self, name: bytes, args: List[bytes]) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            self.commands += 1
+            try:
+                if name == b"PING":
+                    return args[0] if args else "PONG"
+                if name == b"SELECT":
+                    return "OK"
+                if name == b"GET":
+                    return self._live(args[0], now)
+                if name == b"MGET":
+                    return [self._live(key, now) for key in args]
+                if name == b"SET":
+                    key, value, options = args[0], args[1], [a.upper() for a in args[2:]]
+                    exists = self._live(key, now) is not None
+                    if (b"NX" in options and exists) or (b"XX" in options and not exists):
+                        return None
+                    expires_at = None
+                    for unit, scale in ((b"EX", 1.0), (b"PX", 0.001)):
+                        if unit in options:
+                            expires_at = now + int(args[2 + options.index(unit) + 1]) * scale
+                    self.data[key] = (value, expires_at)
+                    return "OK"
+                if name == b"MSET":
+                    if len(args) % 2:
+                        raise _Error("wrong number of arguments for 'mset' command")
+                    for i in range(0, len(args), 2):
+                        self.data[args[i]] = (args[i + 1], None)
+                    return "OK"
+                if name == b"DEL":
+                    return sum(self._live(key, now) is not None and self.data.pop(key) is not None for key in args)
+                if name == b"EXISTS":
+                    return sum(self._live(key, now) is not None for key in args)
+                if name in (b"INCR", b"INCRBY"):
+                    key = args[0]
+                    amount = int(args[1]) if name == b"INCRBY" else 1
+                    current = self._live(key, now)
+                    try:
+                        value = (int(current) if current is not None else 0) + amount
+                    except ValueError:
+                        raise _Error("value is not an integer or out of range")
+                    self.data[key] = (str(value).encode(), self.data[key][1] if current is not None else None)
+                    return value
+                if name == b"PEXPIRE":
+                    if self._live(args[0], now) is None:
+                        return 0
+                    self.data[args[0]] = (self.data[args[0]][0], now + int(args[1]) / 1000)
+                    return 1
+                if name == b"PTTL":
+                    if self._live(args[0], now) is None:
+                        return -2
+                    expires_at = self.data[args[0]][1]
+                    return -1 if expires_at is None else int((expires_at - now) * 1000)
+                if name == b"SCAN":
+                    # One pass over everything: cursor 0 in, cursor 0 out
+                    options = [a.upper() for a in args]
+                    pattern = args[options.index(b"MATCH") + 1].decode() if b"MATCH" in options else "*"
+                    keys = [k for k in list(self.data) if self._live(k, now) is not None
+                            and fnmatch.fnmatchcase(k.decode(errors="replace"), pattern)]
+                    return [b"0", keys]
+                if name == b"DBSIZE":
+                    return sum(self._live(k, now) is not None for k in list(self.data))
+                if name == b"FLUSHDB":
+                    self.data.clear()
+                    return "OK"
+                raise _Error(f"unknown command '{name.decode(errors='replace')}'")
+            except (IndexError, ValueError):
+                return _Error(f"syntax error in '{name.decode(errors='replace')}'")
+            except _Error as e:
+                return e
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"keys": len(self.data), "commands": self.commands,
+                    "round_trips": self.round_trips, "connections": self.connections}
+
+    def start(self) -> "StubRedis":
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "StubRedis":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6380)
+    parser.add_argument("--latency", type=float, default=0.0, help="Delay per reply batch in seconds")
+    parser.add_argument("--password", default=None)
+    args = parser.parse_args()
+
+    stub = StubRedis(args.host, args.port, args.latency, args.password)
+    print(f"🗄️  Stub Redis listening on {stub.url} (latency {args.latency}s per round trip)")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Bulk lead deduplication for EstateWise
+
+Clusters every lead in the lead store (LEAD_STORE_PATH) by normalized
+email, phone and MinHash/LSH similarity of name and street address (see
+mcp-servers/leadgen/tools/lead_dedup.py), then marks each duplicate with
+``duplicate_of``, the id of the oldest lead in its cluster. Signatures are
+computed in parallel worker processes.
+
+Usage:
+    python jobs/dedup_leads.py
+    python jobs/dedup_leads.py --store leads.jsonl --workers 8 --dry-run
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+BACKEND = Path(__file__).parent.parent
+sys.path.append(str(BACKEND / "shared" / "utils"))
+sys.path.append(str(BACKEND / "mcp-servers" / "leadgen"))
+
+from record_store import RecordStore
+from tools.lead_dedup import cluster_leads
+
+
+def dedup_leads(store_path: str, workers: Optional[int] = None, dry_run: bool = False) -> Dict[str, Any]:
+    """Cluster the lead store and mark duplicates; returns a report"""
+    started = time.perf_counter()
+    store = RecordStore(store_path, key="lead_id")
+    leads = sorted(store, key=lambda lead: lead.get("created_at") or "")
+    loaded = time.perf_counter()
+
+    duplicates = cluster_leads(leads, workers=workers)
+    clustered = time.perf_counter()
+
+    changed = [
+        {"lead_id": lead_id, "duplicate_of": canonical, "deduped_at": datetime.now().isoformat()}
+        for lead_id, canonical in duplicates.items()
+        if store.get(lead_id).get("duplicate_of") != canonical
+    ]
+    if not dry_run:
+        store.put_many(changed)
+    return {
+        "leads": len(leads),
+        "duplicates": len(duplicates),
+        "clusters": len(set(duplicates.values())),
+        "updated": 0 if dry_run else len(changed),
+        "load_s": round(loaded - started, 2),
+        "cluster_s": round(clustered - loaded, 2),
+        "leads_per_s": round(len(leads) / max(clustered - loaded, 1e-9)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mark duplicate leads in the lead store")
+    parser.add_argument("--store", default=os.getenv("LEAD_STORE_PATH"), help="Lead store path (default: LEAD_STORE_PATH)")
+    parser.add_argument("--workers", type=int, default=None, help="Signature worker processes (default: one per CPU)")
+    parser.add_argument("--dry-run", action="store_true", help="Report clusters without writing")
+    args = parser.parse_args()
+    if not args.store:
+        parser.error("no store path given")
+    print(json.dumps(dedup_leads(args.store, args.workers, args.dry_run), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Nightly batch LLM jobs for EstateWise
+
+    leads   re-qualify leads in the lead store (LEAD_STORE_PATH)
+    offers  re-analyze stale comparisons in the comparison store
+            (COMPARISON_STORE_PATH)
+
+Requests go through a provider Batch API (see shared/utils/batch_runner.py)
+and results are written back to the same store. Re-running with the same
+--job-dir resumes an interrupted job instead of starting over.
+
+Usage:
+    python jobs/llm_batch.py leads --provider openai
+    python jobs/llm_batch.py offers --stale-days 7 --job-dir batch-jobs/offers-2025-01-31
+"""
+import os
+import sys
+import json
+import asyncio
+import argparse
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Any, Iterable, List, Optional
+
+BACKEND = Path(__file__).parent.parent
+sys.path.append(str(BACKEND / "shared" / "utils"))
+sys.path.append(str(BACKEND / "mcp-servers" / "leadgen"))
+sys.path.append(str(BACKEND / "mcp-servers" / "clientside" / "tools"))
+
+from batch_runner import BatchRunner, BatchSpec, provider_from_env
+from record_store import RecordStore
+import llm_router
+
+
+def _stale(record: Dict[str, Any], field: str, max_age_days: float) -> bool:
+    stamp = record.get(field)
+    if not stamp:
+        return True
+    return datetime.fromisoformat(stamp) < datetime.now() - timedelta(days=max_age_days)
+
+
+def lead_spec(provider_name: str) -> BatchSpec:
+    """Score each lead hot/warm/cold with the same prompt as qualify_lead"""
+    from tools.lead_tools import LeadGenTools
+
+    def inquiry(lead: Dict[str, Any]) -> str:
+        return lead.get("inquiry") or lead.get("notes") or ""
+
+    def build(lead: Dict[str, Any]):
+        messages = LeadGenTools.lead_score_messages(
+            lead.get("client_name") or lead.get("name", ""),
+            lead.get("client_email") or lead.get("email", ""),
+            inquiry(lead),
+        )
+        return [(messages, None)]
+
+    def reduce(lead: Dict[str, Any], texts: List[Optional[str]]) -> Optional[Dict[str, Any]]:
+        try:
+            if texts[0] is None:
+                raise ValueError("LLM request failed")
+            result = LeadGenTools.parse_lead_score(llm_router, texts[0])
+        except ValueError:
+            # Failed or expired: keep an earlier score, and leave the lead stale
+            # so the next run asks again
+            if lead.get("score"):
+                return None
+            result = LeadGenTools.keyword_score(inquiry(lead))
+            return {
+                "lead_id": lead["lead_id"],
+                "score": result["score"],
+                "explanation": result["explanation"],
+                "qualified_by": "keywords",
+            }
+        return {
+            "lead_id": lead["lead_id"],
+            "score": result["score"],
+            "explanation": result["explanation"],
+            "qualified_at": datetime.now().isoformat(),
+            "qualified_by": f"batch:{provider_name}",
+        }
+
+    return BatchSpec("lead_scores", "lead_id", build, reduce)
+
+
+def offer_spec(provider_name: str) -> BatchSpec:
+    """Analyze each comparison with the same prompts as compare_offers"""
+    from offer_utils import (
+        OFFER_ANALYSIS_SYSTEM_PROMPT, build_offer_prompts, rank_offers, reduce_offer_analyses,
+    )
+
+    def build(comparison: Dict[str, Any]):
+        ranked = rank_offers(comparison["offers"])
+        prompts = build_offer_prompts(ranked, market=comparison.get("market"))["prompts"]
+        return [([{"role": "user", "content": p}], OFFER_ANALYSIS_SYSTEM_PROMPT) for p in prompts]
+
+    def reduce(comparison: Dict[str, Any], texts: List[Optional[str]]) -> Optional[Dict[str, Any]]:
+        failed = any(t is None for t in texts)
+        if failed and comparison.get("summary"):
+            # Keep the earlier analysis and leave the comparison stale for the next run
+            return None
+        analyses = [llm_router.extract_json(t) if t is not None else {} for t in texts]
+        analysis = reduce_offer_analyses(rank_offers(comparison["offers"]), analyses)
+        record = {
+            "comparison_id": comparison["comparison_id"],
+            "summary": analysis["summary"],
+            "pros_cons_table": analysis.get("pros_cons_table", []),
+            "analyzed_by": f"batch:{provider_name}",
+        }
+        if not failed:
+            record["analyzed_at"] = datetime.now().isoformat()
+        return record
+
+    return BatchSpec("offer_analyses", "comparison_id", build, reduce)
+
+
+def select_leads(store: RecordStore, max_age_days: float) -> Iterable[Dict[str, Any]]:
+    """Open, non-duplicate leads that were never qualified or were qualified too long ago"""
+    for lead in store:
+        if lead.get("duplicate_of"):
+            continue
+        if lead.get("status", "new") not in ("closed", "lost") and _stale(lead, "qualified_at", max_age_days):
+            yield lead
+
+
+def select_comparisons(store: RecordStore, max_age_days: float) -> Iterable[Dict[str, Any]]:
+    for comparison in store:
+        if comparison.get("offers") and _stale(comparison, "analyzed_at", max_age_days):
+            yield comparison
+
+
+async def run_job(kind: str,
+                  store_path: str,
+                  job_dir: str,
+                  provider=None,
+                  max_age_days: float = 1.0,
+                  poll_interval: float = 30.0) -> Dict[str, Any]:
+    """Run (or resume) one nightly job and return its report"""
+    provider = provider or provider_from_env()
+    if kind == "leads":
+        store = RecordStore(store_path, key="lead_id")
+        spec, select = lead_spec(provider.name), select_leads
+    elif kind == "offers":
+        store = RecordStore(store_path, key="comparison_id")
+        spec, select = offer_spec(provider.name), select_comparisons
+    else:
+        raise ValueError(f"Unknown job kind: {kind}")
+
+    runner = BatchRunner(job_dir, spec, provider, store, poll_interval=poll_interval)
+    # Items are only selected on the first run; a resumed job reuses its manifest
+    items = () if os.path.exists(runner.manifest_path) else select(store, max_age_days)
+    return await runner.run(items)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a nightly batch LLM job")
+    parser.add_argument("kind", choices=["leads", "offers"])
+    parser.add_argument("--store", default=None, help="Record store path (default: LEAD_STORE_PATH / COMPARISON_STORE_PATH)")
+    parser.add_argument("--job-dir", default=None, help="Job directory; reuse it to resume (default: batch-jobs/<kind>-<date>)")
+    parser.add_argument("--provider", default=None, help="openai, claude or local (default: LLM_BATCH_PROVIDER or openai)")
+    parser.add_argument("--stale-days", type=float, default=1.0, help="Re-run items older than this")
+    parser.add_argument("--poll", type=float, default=30.0, help="Seconds between status checks")
+    args = parser.parse_args()
+
+    store = args.store or os.getenv("LEAD_STORE_PATH" if args.kind == "leads" else "COMPARISON_STORE_PATH")
+    if not store:
+        parser.error("no store path given")
+    job_dir = args.job_dir or str(BACKEND / "batch-jobs" / f"{args.kind}-{datetime.now():%Y-%m-%d}")
+
+    report = asyncio.run(run_job(
+        args.kind, store, job_dir, provider_from_env(args.provider), args.stale_days, args.poll,
+    ))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,43 +4,192 @@ ClientSide MCP Server - Handles client-facing tasks and communications
 """
 import os
 import sys
+import json
 from pathlib import Path
 import asyncio
 
 # Add shared utils to path
-sys.path.append(str(Path(__file__).parent.parent / "shared" / "utils"))
+sys.path.append(str(Path(__file__).parent.parent.parent / "shared" / "utils"))
 
-from fastmcp import FastMCP
-from tools.client_tools import ClientTools
+from startup import Startup
+from health import Health, cache_check, storage_probe
+import deadline
+from admission import AdmissionControl, DeadlineMiddleware, ToolLimit
+from profiling import Profiler
+import trace_context
+from tracing import TracingMiddleware
+import call_log
+from call_logging import CallLogMiddleware
+from search_index import get_search_index
+from shared_state import shared_state_metrics
+from fastmcp import FastMCP, Context
 
 # Initialize FastMCP server
 server = FastMCP("ClientSideMCP")
+startup = Startup("ClientSideMCP")
+health = Health(startup)
 
-# Create client tools instance
-client_tools = ClientTools()
+# The client tools are imported and built in the background once the port is
+# open (or on first call, whichever comes first)
+def _client_tools():
+    from tools.client_tools import ClientTools
+    return ClientTools()
+
+client_tools = startup.resource("client_tools", _client_tools)
+startup.warm("property_data", lambda: client_tools.get().warm_up(), required=True)
+
+def _llm_router():
+    from llm_router import get_router
+    get_router()
+
+# Without an API key the tools fall back to rule-based answers, so this is optional
+startup.warm("llm_router", _llm_router)
+
+def _embedder():
+    # Loads EMBEDDING_MODEL (if set) and embeds the buyer-letter prototypes
+    from embedding_index import letter_sentiments
+    letter_sentiments(["warm up"])
+
+startup.warm("embedder", _embedder)
+
+def _disclosures():
+    # Renders the static disclosure sections so the first packet only renders its own pages
+    disclosures = client_tools.get().disclosures
+    health.add_metrics("disclosures", disclosures.snapshot)
+    return disclosures.warm()
+
+startup.warm("disclosures", _disclosures)
+
+# Readiness checks: tool logs are written next to main.py
+health.add_check("storage", storage_probe(str(Path(__file__).parent)), required=True)
+
+def _caches():
+    status = cache_check(client_tools=client_tools)()
+    if client_tools.loaded:
+        status.update(client_tools.get().cache_status())
+    return status
+
+health.add_check("caches", _caches, ttl=1.0)
+if os.getenv("PROPERTY_TABLE_PATH"):
+    health.add_check("property_table", storage_probe(os.environ["PROPERTY_TABLE_PATH"], write=False), required=True)
+
+# Each tool call is a span in the caller's trace (W3C traceparent from the
+# request _meta or HTTP header), exported to OTEL_EXPORTER_OTLP_ENDPOINT.
+# Outermost middleware, so the span also covers deadline and admission waits.
+trace_context.configure(service_name="clientside-mcp")
+server.add_middleware(TracingMiddleware())
+health.add_metrics("tracing", trace_context.metrics_snapshot)
+
+# Every tool call is appended to logs.txt (or CALL_LOG_PATH) as a structured
+# record that benchmarks/replay_calls.py can replay or shadow to a candidate
+# build. Inside tracing, so records carry the call's trace id.
+call_records = call_log.open_call_log("clientside", str(Path(__file__).parent / "logs.txt"))
+server.add_middleware(CallLogMiddleware(call_records))
+if call_records is not None:
+    health.add_metrics("call_log", call_records.snapshot)
+
+# Every tool call runs under a request deadline that LLM calls honour; it is
+# cancelled when the client disconnects or gives up.
+server.add_middleware(DeadlineMiddleware({"compare_offers": 30.0, "compare_offer_portfolio": 120.0,
+                                         "estimate_values": 30.0}))
+
+# Per-phase timings and slow-call traces for every tool call, and profiling
+# switched on per tool from /admin/profiling. Outside admission, so queue
+# waits show up as the queued phase.
+profiler = Profiler()
+profiler.register(server)
+health.add_metrics("profiling", profiler.snapshot)
+health.add_metrics("upstream", deadline.metrics_snapshot)
+
+# Admission control: LLM-backed and batch tools get fewer slots and cost more
+# of each client's quota. Queue waits count against the request deadline.
+admission = AdmissionControl({
+    "compare_offers": ToolLimit(concurrency=8, queue=32, max_wait=10.0, cost=5.0),
+    "compare_offer_portfolio": ToolLimit(concurrency=2, queue=8, max_wait=15.0, cost=20.0),
+    "estimate_values": ToolLimit(concurrency=4, queue=16, max_wait=15.0, cost=5.0),
+    "simulate_offer_rankings": ToolLimit(concurrency=4, queue=16, max_wait=10.0, cost=2.0),
+})
+server.add_middleware(admission)
+health.add_metrics("admission", admission.snapshot)
+
+# Full-text search (SEARCH_INDEX_PATH shares one index between the servers)
+startup.warm("search_index", get_search_index, required=True)
+health.add_metrics("search", lambda: get_search_index().snapshot())
+
+# Caches shared with the other servers (SHARED_STATE_URL)
+health.add_metrics("shared_state", shared_state_metrics)
 
 # Register tools using the @tool decorator
 @server.tool
 def ping():
     """Test connection to ClientSide MCP server"""
-    return client_tools.ping()
+    return client_tools.get().ping()
 
 @server.tool
 def generate_comps(address: str):
     """Generate comparable properties for a given address"""
-    return client_tools.generate_comps(address)
+    return client_tools.get().generate_comps(address)
+
+@server.tool
+def estimate_value(address: str = None, property: dict = None):
+    """Estimate a property's value from nearest comps with hedonic adjustments and a confidence interval"""
+    return client_tools.get().estimate_value(address, property)
+
+@server.tool
+def estimate_values(properties: list):
+    """Estimate values for a batch of properties (addresses or property dicts) in one pass"""
+    return client_tools.get().estimate_values(properties)
+
+@server.tool
+def send_disclosure(client_email: str, disclosure_type: str, transaction_id: str = None, message: str = None,
+                    fields: dict = None):
+    """Send disclosure document to client; agency, lead_paint, natural_hazard and full types get a PDF packet (fields: property_address, year_built, client_names, seller_names, agent_name, brokerage)"""
+    return client_tools.get().send_disclosure(client_email, disclosure_type, transaction_id, message, fields)
+
+@server.tool
+async def compare_offers(offers: list, property_address: str = None, zip_code: str = None,
+                         property_type: str = None, square_feet: float = None):
+    """Compare and rank multiple offers for a property with GPT analysis and pros/cons table; identifying the property (address or zip code) adds its market $/sqft, days on market and sale-to-list to the analysis"""
+    return await client_tools.get().compare_offers(offers, property_address, zip_code, property_type, square_feet)
+
+@server.tool
+async def compare_offer_portfolio(properties: list, max_concurrency: int = None, ctx: Context = None):
+    """Compare offers on many properties at once (each item: offers, optional property_id and compare_offers property fields); offers are ranked in one pass, LLM analyses run concurrently, and each property's result is sent as a progress notification as it completes"""
+    async def report(done: int, total: int, result: dict):
+        data = result.get("data", {})
+        top = (data.get("ranked_offers") or [{}])[0]
+        await ctx.report_progress(done, total, json.dumps({
+            "property_id": result["property_id"],
+            "status": result["status"],
+            "comparison_id": data.get("comparison_id"),
+            "top_offer": {"price": top.get("price"), "score": top.get("score")} if top else None,
+            "summary": data.get("summary"),
+        }, default=str))
+
+    return await client_tools.get().compare_offer_portfolio(properties, max_concurrency, report if ctx else None)
+
+@server.tool
+def market_stats(zip_code: str, property_type: str = None):
+    """Rolling median/quartiles of price per sqft, days on market and sale-to-list ratio for a zip code (and property type)"""
+    return client_tools.get().market_stats(zip_code, property_type)
+
+@server.tool
+def record_sales(sales: list):
+    """Record closed sales (zip_code, property_type, price, square_feet, list_price, days_on_market or list_date, sold_date) into the market stats and valuation model"""
+    return client_tools.get().record_sales(sales)
 
 @server.tool
-def send_disclosure(client_email: str, disclosure_type: str, transaction_id: str = None, message: str = None):
-    """Send disclosure document to client"""
-    return client_tools.send_disclosure(client_email, disclosure_type, transaction_id, message)
+def simulate_offer_rankings(offers: list, samples: int = 10000, grid_step: float = None, weights: list = None,
+                            concentration: float = None, seed: int = None):
+    """What-if analysis: rank offers under many price/contingencies/closing/sentiment weightings (random sample, grid or explicit) and report how often each offer wins and where the winner changes"""
+    return client_tools.get().simulate_offer_rankings(offers, samples, grid_step, weights, concentration, seed)
 
 @server.tool
-async def compare_offers(offers: list):
-    """Compare and rank multiple offers for a property with GPT analysis and pros/cons table"""
-    return await client_tools.compare_offers(offers)
+def search(query: str, kinds: list = None, limit: int = 10):
+    """Full-text search over disclosures (and other servers' leads and contracts when the index is shared), BM25-ranked with prefix matching"""
+    return get_search_index().search(query, kinds, limit)
 
 if __name__ == "__main__":
     port = int(os.getenv("CLIENTSIDE_MCP_PORT", 3003))
     print(f"👥 Starting ClientSide MCP Server on port {port}")
-    asyncio.run(server.run_http_async(port=port)) 
\ No newline at end of file
+    asyncio.run(health.serve(server, port)) 
\ No newline at end of file
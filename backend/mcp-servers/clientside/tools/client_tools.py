@@ -1,25 +1,111 @@
 """
 Client-facing tools for EstateWise MCP server
 """
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Callable, Awaitable
 from datetime import datetime
+import os
 import json
+import uuid
+import asyncio
+import threading
+import importlib
 
 # Import offer utilities from sibling module. Use absolute import so the file can
 # be executed directly in tests without a package context.
 try:
-    from .offer_utils import rank_offers, generate_gpt_analysis, create_pros_cons_table
+    from .offer_utils import (
+        rank_offers, rank_offer_groups, generate_gpt_analysis, create_pros_cons_table, offer_features, RANK_WEIGHTS,
+    )
 except ImportError:
     # Fallback for when running as standalone script
     import sys
     from pathlib import Path
     sys.path.append(str(Path(__file__).parent))
-    from offer_utils import rank_offers, generate_gpt_analysis, create_pros_cons_table
+    from offer_utils import (
+        rank_offers, rank_offer_groups, generate_gpt_analysis, create_pros_cons_table, offer_features, RANK_WEIGHTS,
+    )
+
+# offer_utils puts shared utils on the path
+from call_phases import phase
+
+
+def _shared_table():
+    """The shared PropertyTable, or None when unconfigured or NumPy is missing.
+
+    property_table, comps_utils and valuation pull in NumPy, so they are
+    imported on first use rather than when the server starts.
+    """
+    try:
+        from property_table import open_shared_table
+    except ImportError:
+        return None
+    return open_shared_table()
+
+
+def _comparison_store():
+    """RecordStore of offer comparisons (COMPARISON_STORE_PATH), or None when unset"""
+    path = os.getenv("COMPARISON_STORE_PATH")
+    if not path:
+        return None
+    from record_store import RecordStore
+    return RecordStore(path, key="comparison_id")
+
+
+def _search_index():
+    from search_index import get_search_index
+    return get_search_index()
+
+
+def _artifact_store():
+    from artifact_store import open_artifact_store
+    return open_artifact_store()
+
+
+def artifact_url(digest: str) -> str:
+    from artifact_store import artifact_url
+    return artifact_url(digest)
+
+
+def _sibling(name: str):
+    """Import a sibling tools module (package or standalone layout)"""
+    return importlib.import_module(f"{__package__}.{name}" if __package__ else name)
+
+
+def _item_address(item: Any) -> Optional[str]:
+    """Address of a valuation item (an address string or a property dict)"""
+    if isinstance(item, str):
+        return item
+    return item.get("address") if isinstance(item, dict) else None
+
+
+# Upper bound on weight vectors per simulate_offer_rankings call
+MAX_SIMULATION_SAMPLES = 1_000_000
+# Upper bound on properties per compare_offer_portfolio call
+MAX_PORTFOLIO_PROPERTIES = 500
 
 
 class ClientTools:
     """Tools for client-facing tasks and communications"""
     
+    def __init__(self):
+        self._valuation_model = None
+        self._valuation_lock = threading.Lock()
+        self._market_stats = None
+        self._market_lock = threading.Lock()
+        # Comparisons are kept so the nightly batch job can re-analyze stale ones
+        self._comparisons = _comparison_store()
+        self._artifacts = None
+        # Static disclosure sections are rendered once and reused for every packet
+        self.disclosures = _sibling("disclosure_packets").DisclosureAssembler()
+    
+    @property
+    def artifacts(self):
+        """Artifact store for disclosure packets, or None"""
+        if self._artifacts is None:
+            store = _artifact_store()
+            self._artifacts = False if store is None else store
+        return None if self._artifacts is False else self._artifacts
+    
     def ping(self) -> Dict[str, Any]:
         """Test connection to ClientSide MCP server"""
         return {
@@ -36,6 +122,21 @@ class ClientTools:
         Args:
             address: Address to find comps for
         """
+        # Use the shared, memory-mapped property table when one is configured
+        table = _shared_table()
+        if table is not None:
+            subject = table.find(address)
+            if subject is not None:
+                comps = _sibling("comps_utils").nearest_comps(table, subject)
+                market = self._market().stats(subject.zip_code, subject.property_type)
+                median = market["price_per_sqft"]["median"] if market and market["price_per_sqft"] else None
+                for comp in comps:
+                    if comp["price"] and comp["sqft"]:
+                        comp["price_per_sqft"] = round(comp["price"] / comp["sqft"], 2)
+                        if median:
+                            comp["vs_market_pct"] = round((comp["price_per_sqft"] / median - 1) * 100, 1)
+                return comps
+
         # Mock comparable properties data
         comps = [
             {"address": "123 Oak St", "price": 950000, "sqft": 1800},
@@ -45,23 +146,165 @@ class ClientTools:
         
         return comps
     
+    def _valuation(self):
+        """Valuation model over the shared property table, built on first use"""
+        if self._valuation_model is None:
+            table = _shared_table()
+            if table is None:
+                return None
+            with self._valuation_lock:
+                if self._valuation_model is None:
+                    self._valuation_model = _sibling("valuation").ValuationModel(table)
+        return self._valuation_model
+    
+    def _market(self):
+        """Rolling market stats, seeded from the shared property table on first use"""
+        if self._market_stats is None:
+            with self._market_lock:
+                if self._market_stats is None:
+                    market = _sibling("market_stats").MarketStats()
+                    table = _shared_table()
+                    if table is not None:
+                        market.load_table(table)
+                    self._market_stats = market
+        return self._market_stats
+    
+    def warm_up(self) -> Dict[str, Any]:
+        """Load the property table, valuation model and market stats ahead of the first request"""
+        model = self._valuation()
+        market = self._market()
+        return {"property_table_rows": len(model.table) if model else 0, "market_keys": market.snapshot()["keys"]}
+    
+    def cache_status(self) -> Dict[str, Any]:
+        """Warmness of the property table, valuation and market stats caches"""
+        model = self._valuation_model
+        return {
+            "valuation_model": model is not None,
+            "market_stats": self._market_stats is not None,
+            "property_table_rows": len(model.table) if model else None,
+            **(model.cache_info() if model else {}),
+        }
+    
+    def _valuation_subjects(self, model, items: List[Any]) -> List[Optional[Dict[str, Any]]]:
+        """Resolve addresses and property dicts into valuation subjects"""
+        addresses = [_item_address(item) for item in items]
+        lookup = [a for a, item in zip(addresses, items) if a and (isinstance(item, str) or "zip_code" not in item)]
+        positions = dict(zip(lookup, model.table.find_many(lookup))) if lookup else {}
+        
+        subjects = []
+        for address, item in zip(addresses, items):
+            if isinstance(item, dict) and "zip_code" in item:
+                subjects.append(dict(item))
+            elif positions.get(address, -1) >= 0:
+                row = model.table[int(positions[address])]
+                subject = row.to_dict()
+                subject["row_id"] = row.row_id
+                if isinstance(item, dict):
+                    subject.update({k: v for k, v in item.items() if v is not None})
+                subjects.append(subject)
+            else:
+                subjects.append(None)
+        return subjects
+    
+    def estimate_value(self,
+                       address: Optional[str] = None,
+                       property: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Estimate a property's value from nearest comps with hedonic adjustments
+        
+        Args:
+            address: Address of a property in the sales table
+            property: Property fields (zip_code, square_feet, bedrooms,
+                bathrooms, year_built); overrides table values for address
+        """
+        model = self._valuation()
+        if model is None:
+            return {"status": "error", "message": "No sales data configured (set PROPERTY_TABLE_PATH)"}
+        if not address and not property:
+            return {"status": "error", "message": "Provide an address or property"}
+        if property is not None and not isinstance(property, dict):
+            return {"status": "error", "message": "property must be a dict of property fields"}
+        
+        item = dict(property or {})
+        if address:
+            item.setdefault("address", address)
+        subject = self._valuation_subjects(model, [item])[0]
+        if subject is None:
+            return {"status": "error", "message": f"Property not found: {address}"}
+        
+        result = model.estimate_many([subject], include_comps=True)[0]
+        if result["status"] == "success":
+            result["message"] = f"Estimated value ${result['estimated_value']:,.0f}"
+        return result
+    
+    def estimate_values(self, properties: List[Any]) -> Dict[str, Any]:
+        """
+        Estimate values for a batch of properties in one vectorized pass
+        
+        Args:
+            properties: Addresses and/or property dicts, as for estimate_value
+        """
+        model = self._valuation()
+        if model is None:
+            return {"status": "error", "message": "No sales data configured (set PROPERTY_TABLE_PATH)"}
+        
+        started = datetime.now()
+        subjects = self._valuation_subjects(model, properties)
+        found = [s for s in subjects if s is not None]
+        estimates = iter(model.estimate_many(found))
+        results = []
+        for item, subject in zip(properties, subjects):
+            if subject is None:
+                message = "Property not found" if isinstance(item, (str, dict)) else \
+                    "Each property must be an address or a dict of property fields"
+                results.append({"address": _item_address(item), "status": "error", "message": message})
+            else:
+                results.append(next(estimates))
+        
+        valued = sum(1 for r in results if r["status"] == "success")
+        elapsed_ms = (datetime.now() - started).total_seconds() * 1000
+        return {
+            "status": "success",
+            "message": f"Valued {valued} of {len(properties)} properties",
+            "valued": valued,
+            "failed": len(properties) - valued,
+            "elapsed_ms": round(elapsed_ms, 1),
+            "results": results,
+        }
+    
     def send_disclosure(self, 
                        client_email: str,
                        disclosure_type: str,
                        transaction_id: Optional[str] = None,
-                       message: Optional[str] = None) -> Dict[str, Any]:
+                       message: Optional[str] = None,
+                       fields: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Send disclosure document to client
         
         Args:
             client_email: Client's email address
-            disclosure_type: Type of disclosure (agency, property, etc.)
+            disclosure_type: Type of disclosure (agency, lead_paint, natural_hazard, full, etc.)
             transaction_id: Associated transaction ID (optional)
             message: Custom message to include (optional)
+            fields: Packet fields (property_address, year_built, client_names, seller_names,
+                agent_name, brokerage) (optional)
         """
-        disclosure_id = f"disclosure_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        disclosure_id = f"disclosure_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
         
-        # TODO: Generate disclosure document
+        # Types with a template get a packet PDF; stored and linked when ARTIFACT_STORE_DIR is set
+        packet = None
+        if _sibling("disclosure_packets").normalize_type(disclosure_type):
+            built = self.disclosures.assemble(disclosure_type, {
+                "client_names": [client_email], **(fields or {}),
+                "disclosure_id": disclosure_id, "transaction_id": transaction_id, "message": message,
+            })
+            packet = {"packet_type": built["packet_type"], "sections": built["sections"],
+                      "pages": built["pages"], "size_bytes": len(built["pdf"])}
+            store = self.artifacts
+            if store is not None:
+                stored = store.put_bytes(built["pdf"], "application/pdf")
+                store.link(disclosure_id, stored["digest"])
+                packet.update(digest=stored["digest"], download_url=artifact_url(stored["digest"]))
         # TODO: Send via email
         # TODO: Track delivery
         
@@ -71,9 +314,15 @@ class ClientTools:
             "disclosure_type": disclosure_type,
             "transaction_id": transaction_id,
             "message": message,
+            "packet": packet,
             "sent_at": datetime.now().isoformat(),
             "status": "sent"
         }
+        body = "\n".join(v for v in (message, client_email, transaction_id) if v)
+        _search_index().index(
+            f"disclosure:{disclosure_id}", "disclosure", f"{disclosure_type} disclosure", body,
+            {"disclosure_id": disclosure_id, "client_email": client_email, "transaction_id": transaction_id},
+        )
         
         return {
             "status": "success",
@@ -82,33 +331,132 @@ class ClientTools:
             "data": disclosure_data
         }
     
-    async def compare_offers(self, offers: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Compare and analyze multiple offers for a property with GPT summary and pros/cons table."""
-        comparison_id = f"comparison_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-
-        # Rank offers using existing algorithm
-        ranked_offers = rank_offers(offers)
-
-        if not ranked_offers:
-            return {
-                "status": "error",
-                "message": "No offers provided for comparison",
-                "data": {
-                    "comparison_id": comparison_id,
-                    "total_offers": 0,
-                    "ranked_offers": [],
-                    "summary": "No offers provided.",
-                    "pros_cons_table": [],
-                    "generated_at": datetime.now().isoformat(),
-                }
-            }
+    def simulate_offer_rankings(self,
+                                offers: List[Dict[str, Any]],
+                                samples: int = 10000,
+                                grid_step: Optional[float] = None,
+                                weights: Optional[List[Any]] = None,
+                                concentration: Optional[float] = None,
+                                seed: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Rank offers under many scoring weightings at once and report how stable the ranking is
+        
+        Weights are for price, contingencies, closing and sentiment (the
+        order of RANK_WEIGHTS) and are normalized to sum to 1.
+        
+        Args:
+            offers: Offers as for compare_offers
+            samples: Random weight vectors to try (uniform over all weightings)
+            grid_step: Try every weighting in steps of this size instead (e.g. 0.05)
+            weights: Try exactly these weightings (dicts by feature name, or lists)
+            concentration: Sample around the current weights instead; higher is tighter
+            seed: Random seed for reproducible samples
+        """
+        if not offers:
+            return {"status": "error", "message": "No offers provided for simulation"}
+        simulator = _sibling("offer_simulator")
+        names = list(RANK_WEIGHTS)
+        base = [RANK_WEIGHTS[name] for name in names]
+        started = datetime.now()
+        try:
+            if weights:
+                rows = [[float(w.get(name, 0)) for name in names] if isinstance(w, dict) else [float(v) for v in w]
+                        for w in weights]
+                if any(len(row) != len(names) for row in rows):
+                    raise ValueError(f"Each weighting needs {len(names)} weights ({', '.join(names)})")
+                matrix, mode = simulator.normalize_weights(rows), "explicit"
+            elif grid_step:
+                # Sized before it is built, so a tiny step is refused without allocating it
+                matrix = simulator.weight_grid(len(names), float(grid_step), max_rows=MAX_SIMULATION_SAMPLES)
+                mode = "grid"
+            else:
+                if not 1 <= int(samples) <= MAX_SIMULATION_SAMPLES:
+                    raise ValueError(f"samples must be between 1 and {MAX_SIMULATION_SAMPLES}")
+                matrix = simulator.sample_weights(len(names), int(samples), seed, around=base, concentration=concentration)
+                mode = "around_current" if concentration else "random"
+            if len(matrix) > MAX_SIMULATION_SAMPLES:
+                raise ValueError(f"{len(matrix)} weightings exceeds the limit of {MAX_SIMULATION_SAMPLES}")
+            features = [[f[name] for name in names] for f in offer_features(offers)]
+        except (ValueError, TypeError, KeyError) as e:
+            return {"status": "error", "message": str(e)}
+        
+        with phase("ranking"):
+            result = simulator.simulate_rankings(features, matrix, names, base)
+        for stats in result["offers"]:
+            offer = offers[stats["offer"]]
+            stats["offer_id"] = offer.get("offer_id") or offer.get("buyer_name") or f"offer_{stats['offer'] + 1}"
+            stats["price"] = offer.get("price", 0)
+        winner = result["offers"][result["baseline"]["winner"]]
+        elapsed_ms = (datetime.now() - started).total_seconds() * 1000
+        return {
+            "status": "success",
+            "message": (
+                f"{winner['offer_id']} ranks first under {winner['win_share']:.0%} "
+                f"of {result['samples']:,} weightings"
+            ),
+            "mode": mode,
+            "elapsed_ms": round(elapsed_ms, 1),
+            **result,
+        }
+    
+    def market_stats(self, zip_code: str, property_type: Optional[str] = None) -> Dict[str, Any]:
+        """Rolling median $/sqft, days on market and sale-to-list ratio for a zip code"""
+        stats = self._market().stats(zip_code, property_type)
+        if stats is None:
+            return {"status": "error", "message": f"No sales in zip {zip_code} in the market window"}
+        return {"status": "success", "data": stats}
+    
+    def record_sales(self, sales: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Add closed sales to the market stats and the valuation model"""
+        recorded = self._market().add_sales(sales)
+        model = self._valuation()
+        valued = model.add_sales(sales) if model is not None else 0
+        return {
+            "status": "success",
+            "recorded": recorded,
+            "valuation_sales": valued,
+            "skipped": len(sales) - recorded,
+            "market": self._market().snapshot(),
+        }
+    
+    def market_context(self,
+                       property_address: Optional[str] = None,
+                       zip_code: Optional[str] = None,
+                       property_type: Optional[str] = None,
+                       square_feet: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Market stats for the property an offer set is for, with its square footage.
 
-        # Generate GPT analysis (async)
+        Zip code, type and size not given are taken from the property table
+        row for property_address when there is one.
+        """
+        if property_address and not (zip_code and property_type and square_feet):
+            table = _shared_table()
+            subject = table.find(property_address) if table is not None else None
+            if subject is not None:
+                zip_code = zip_code or subject.zip_code
+                property_type = property_type or subject.property_type
+                square_feet = square_feet or subject.square_feet
+        if not zip_code:
+            return None
+        stats = self._market().stats(zip_code, property_type)
+        if stats is None:
+            return None
+        return {**stats, "subject_square_feet": square_feet}
+    
+    async def _analyze_offers(self,
+                              comparison_id: str,
+                              offers: List[Dict[str, Any]],
+                              ranked_offers: List[Dict[str, Any]],
+                              market: Optional[Dict[str, Any]] = None,
+                              limit: Optional[asyncio.Semaphore] = None) -> Dict[str, Any]:
+        """LLM analysis of ranked offers (rule-based if it fails), recorded for the batch job"""
         try:
-            gpt_analysis = await generate_gpt_analysis(offers, ranked_offers)
+            gpt_analysis = await generate_gpt_analysis(offers, ranked_offers, market=market, limit=limit)
             summary = gpt_analysis.get("summary", "")
             pros_cons_table = gpt_analysis.get("pros_cons_table", [])
+            prompt_stats = gpt_analysis.get("prompt_stats")
         except Exception as e:
+            prompt_stats = None
             # Fallback to basic analysis if GPT fails
             top = ranked_offers[0]
             contingencies_desc = (
@@ -128,12 +476,157 @@ class ClientTools:
             "ranked_offers": ranked_offers,
             "summary": summary,
             "pros_cons_table": pros_cons_table,
+            "market": market,
+            "prompt_stats": prompt_stats,
             "generated_at": datetime.now().isoformat(),
         }
+        if self._comparisons is not None:
+            self._comparisons.put({
+                "comparison_id": comparison_id,
+                "offers": offers,
+                "market": market,
+                "summary": summary,
+                "pros_cons_table": pros_cons_table,
+                "analyzed_at": comparison_data["generated_at"],
+            })
+        return comparison_data
+    
+    @staticmethod
+    def _no_offers(comparison_id: str) -> Dict[str, Any]:
+        return {
+            "status": "error",
+            "message": "No offers provided for comparison",
+            "data": {
+                "comparison_id": comparison_id,
+                "total_offers": 0,
+                "ranked_offers": [],
+                "summary": "No offers provided.",
+                "pros_cons_table": [],
+                "generated_at": datetime.now().isoformat(),
+            }
+        }
+    
+    async def compare_offers(self,
+                             offers: List[Dict[str, Any]],
+                             property_address: Optional[str] = None,
+                             zip_code: Optional[str] = None,
+                             property_type: Optional[str] = None,
+                             square_feet: Optional[float] = None) -> Dict[str, Any]:
+        """Compare and analyze multiple offers for a property with GPT summary and pros/cons table.
 
+        Identifying the property (address, or zip code with optional type and
+        size) adds its rolling market figures to the analysis prompt.
+        """
+        comparison_id = f"comparison_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        market = self.market_context(property_address, zip_code, property_type, square_feet)
+
+        # Rank offers using existing algorithm
+        ranked_offers = rank_offers(offers)
+
+        if not ranked_offers:
+            return self._no_offers(comparison_id)
+
+        comparison_data = await self._analyze_offers(comparison_id, offers, ranked_offers, market)
         return {
             "status": "success",
             "comparison_id": comparison_id,
             "message": f"Compared {len(offers)} offers with GPT analysis",
             "data": comparison_data,
         }
+    
+    async def compare_offer_portfolio(self,
+                                      properties: List[Dict[str, Any]],
+                                      max_concurrency: Optional[int] = None,
+                                      on_result: Optional[Callable[[int, int, Dict[str, Any]], Awaitable[None]]] = None
+                                      ) -> Dict[str, Any]:
+        """Compare the offers on many properties in one call.
+
+        Each item holds one property's ``offers``, an optional ``property_id``
+        and optionally the compare_offers property fields (property_address,
+        zip_code, property_type, square_feet). Every offer set is ranked in one
+        vectorized pass. The LLM analyses then run concurrently, at most
+        max_concurrency requests at a time across the portfolio
+        (PORTFOLIO_MAX_CONCURRENCY, default 8, also the cap on a requested
+        value). on_result(done, total, result) is awaited as each property
+        finishes; results come back in completion order. A property whose
+        offers cannot be ranked or analyzed gets an error result of its own.
+        """
+        if len(properties) > MAX_PORTFOLIO_PROPERTIES:
+            return {
+                "status": "error",
+                "message": f"At most {MAX_PORTFOLIO_PROPERTIES} properties per portfolio (got {len(properties)})",
+            }
+        started = datetime.now()
+        portfolio_id = f"portfolio_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+        items = [item if isinstance(item, dict) else {} for item in properties]
+        groups = [list(item.get("offers") or []) for item in items]
+
+        # One ranking pass (and one buyer-letter embedding batch) for every property
+        ranking_errors: Dict[int, Exception] = {}
+        try:
+            ranked_groups = rank_offer_groups(groups)
+        except Exception:
+            # A malformed offer (say, an unparseable close_date) fails only its own property
+            ranked_groups = []
+            for i, group in enumerate(groups):
+                try:
+                    ranked_groups.append(rank_offer_groups([group])[0])
+                except Exception as e:
+                    ranking_errors[i] = e
+                    ranked_groups.append([])
+        ranking_ms = (datetime.now() - started).total_seconds() * 1000
+        ceiling = int(os.getenv("PORTFOLIO_MAX_CONCURRENCY", "8"))
+        max_concurrency = max(1, min(ceiling if max_concurrency is None else max_concurrency, ceiling))
+        limit = asyncio.Semaphore(max_concurrency)
+
+        async def compare(i: int) -> Dict[str, Any]:
+            item = items[i]
+            property_id = item.get("property_id") or item.get("property_address") or f"property_{i + 1}"
+            comparison_id = f"{portfolio_id.replace('portfolio', 'comparison', 1)}_{i + 1}"
+            if i in ranking_errors:
+                e = ranking_errors[i]
+                return {"property_id": property_id, "status": "error", "comparison_id": comparison_id,
+                        "message": f"Could not rank offers: {type(e).__name__}: {e}"}
+            if not ranked_groups[i]:
+                return {"property_id": property_id, "comparison_id": comparison_id, **self._no_offers(comparison_id)}
+            try:
+                market = self.market_context(item.get("property_address"), item.get("zip_code"),
+                                             item.get("property_type"), item.get("square_feet"))
+                data = await self._analyze_offers(comparison_id, groups[i], ranked_groups[i], market, limit)
+            except Exception as e:
+                return {"property_id": property_id, "status": "error", "comparison_id": comparison_id,
+                        "message": f"Comparison failed: {type(e).__name__}: {e}"}
+            return {
+                "property_id": property_id,
+                "status": "success",
+                "comparison_id": comparison_id,
+                "message": f"Compared {len(groups[i])} offers with GPT analysis",
+                "elapsed_ms": round((datetime.now() - started).total_seconds() * 1000, 1),
+                "data": data,
+            }
+
+        tasks = [asyncio.create_task(compare(i)) for i in range(len(items))]
+        results = []
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                result = await next_done
+                results.append(result)
+                if on_result is not None:
+                    await on_result(len(results), len(tasks), result)
+        finally:
+            # A cancelled portfolio (deadline, client gone) stops its remaining analyses
+            for task in tasks:
+                task.cancel()
+
+        succeeded = sum(result["status"] == "success" for result in results)
+        return {
+            "status": "success",
+            "portfolio_id": portfolio_id,
+            "message": f"Compared offers on {succeeded} of {len(items)} properties",
+            "total_properties": len(items),
+            "total_offers": sum(len(group) for group in groups),
+            "max_concurrency": max_concurrency,
+            "ranking_ms": round(ranking_ms, 1),
+            "elapsed_ms": round((datetime.now() - started).total_seconds() * 1000, 1),
+            "results": results,
+        }
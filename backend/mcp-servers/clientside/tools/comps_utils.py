@@ -0,0 +1,50 @@
+"""
+Comparable-property selection over a shared PropertyTable
+"""
+from typing import List, Dict, Any
+
+import numpy as np
+
+
+def nearest_comps(table, subject, limit: int = 3, sqft_tolerance: float = 0.25) -> List[Dict[str, Any]]:
+    """Find the closest comps to subject in the same zip code.
+
+    Candidates must have a price, be within one bedroom and within
+    sqft_tolerance of the subject's square footage (when known); they are
+    ranked by relative size difference, then bedroom difference.
+    """
+    pool = table.filter(zip_codes=[subject.zip_code], min_price=0)
+    if subject.property_type:
+        pool = pool.filter(property_types=[subject.property_type])
+    if subject.bedrooms is not None:
+        pool = pool.filter(min_beds=subject.bedrooms - 1, max_beds=subject.bedrooms + 1)
+
+    sqft = pool.column("square_feet").astype(np.float64)
+    beds = pool.column("bedrooms").astype(np.float64)
+    keep = pool.row_ids() != subject.row_id
+    distance = np.zeros(len(pool))
+
+    if subject.square_feet:
+        size_diff = np.abs(sqft - subject.square_feet) / subject.square_feet
+        keep &= (sqft > 0) & (size_diff <= sqft_tolerance)
+        distance += size_diff
+    if subject.bedrooms is not None:
+        distance += 0.1 * np.abs(beds - subject.bedrooms)
+
+    candidates = np.flatnonzero(keep)
+    if len(candidates) > limit:
+        nearest = np.argpartition(distance[candidates], limit)[:limit]
+        candidates = candidates[nearest]
+    candidates = candidates[np.argsort(distance[candidates], kind="stable")]
+
+    comps = []
+    for i in candidates:
+        row = pool[int(i)]
+        comps.append({
+            "address": row.address,
+            "price": row.price,
+            "sqft": row.square_feet,
+            "bedrooms": row.bedrooms,
+            "bathrooms": row.bathrooms,
+        })
+    return comps
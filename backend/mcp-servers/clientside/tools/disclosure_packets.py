@@ -0,0 +1,350 @@
+"""
+Disclosure packet assembly
+
+A disclosure packet is mostly boilerplate: the agency, lead-based paint and
+natural hazard sections read the same for every deal. Only the cover page
+(property, clients, agent, date) and the acknowledgment/signature page change.
+
+Each static section is rendered to compressed PDF page streams once per
+template version and cached. Assembling a packet renders just the two
+dynamic pages and concatenates them with the cached section pages, numbering
+objects and writing the cross-reference table as it goes. Bumping a
+section's ``version`` renders it again on next use.
+"""
+import time
+import zlib
+import textwrap
+import threading
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+PAGE_WIDTH, PAGE_HEIGHT = 612, 792
+MARGIN = 72
+LEADING = 14
+# Characters per line at 10 pt Helvetica across the text width
+WRAP_WIDTH = 92
+LINES_PER_PAGE = (PAGE_HEIGHT - 2 * MARGIN) // LEADING
+
+SECTIONS: Dict[str, Dict[str, Any]] = {
+    "agency": {
+        "form": "AG",
+        "version": 3,
+        "title": "Disclosure Regarding Real Estate Agency Relationships",
+        "paragraphs": [
+            "When you enter into a discussion with a real estate agent regarding a real estate transaction, "
+            "you should from the outset understand what type of agency relationship or representation you "
+            "wish to have with the agent in the transaction.",
+            "SELLER'S AGENT. A seller's agent under a listing agreement with the seller acts as the agent "
+            "for the seller only. A seller's agent has the following affirmative obligations: to the seller, "
+            "a fiduciary duty of utmost care, integrity, honesty and loyalty in dealings with the seller; to "
+            "the buyer and the seller, diligent exercise of reasonable skill and care in performance of the "
+            "agent's duties, a duty of honest and fair dealing and good faith, and a duty to disclose all "
+            "facts known to the agent materially affecting the value or desirability of the property that "
+            "are not known to, or within the diligent attention and observation of, the parties.",
+            "BUYER'S AGENT. A buyer's agent can, with a buyer's consent, agree to act as agent for the buyer "
+            "only. In these situations the agent is not the seller's agent, even if by agreement the agent "
+            "may receive compensation for services rendered, either in full or in part from the seller. An "
+            "agent acting only for a buyer has the same affirmative obligations to the buyer, and to both "
+            "parties, as a seller's agent has to the seller.",
+            "AGENT REPRESENTING BOTH SELLER AND BUYER. A real estate agent, either acting directly or through "
+            "one or more associate licensees, can legally be the agent of both the seller and the buyer in a "
+            "transaction, but only with the knowledge and consent of both the seller and the buyer. In a dual "
+            "agency situation the agent has a fiduciary duty of utmost care, integrity, honesty and loyalty "
+            "in the dealings with either the seller or the buyer. Without the express permission of the "
+            "respective party, a dual agent may not disclose to one party that the other party is willing to "
+            "accept or pay a price different from the listed or offered price.",
+            "The above duties of the agent in a real estate transaction do not relieve a seller or buyer from "
+            "the responsibility to protect his or her own interests. You should carefully read all agreements "
+            "to assure that they adequately express your understanding of the transaction. A real estate agent "
+            "is a person qualified to advise about real estate. If legal or tax advice is desired, consult a "
+            "competent professional.",
+            "Throughout your real property transaction you may receive more than one disclosure form, depending "
+            "upon the number of agents assisting in the transaction. You should read its contents each time it "
+            "is presented to you, considering the relationship between you and the real estate agent in your "
+            "specific transaction.",
+        ],
+    },
+    "lead_paint": {
+        "form": "LP",
+        "version": 2,
+        "title": "Disclosure of Information on Lead-Based Paint and Lead-Based Paint Hazards",
+        "paragraphs": [
+            "LEAD WARNING STATEMENT. Every purchaser of any interest in residential real property on which a "
+            "residential dwelling was built prior to 1978 is notified that such property may present exposure "
+            "to lead from lead-based paint that may place young children at risk of developing lead poisoning. "
+            "Lead poisoning in young children may produce permanent neurological damage, including learning "
+            "disabilities, reduced intelligence quotient, behavioral problems and impaired memory. Lead "
+            "poisoning also poses a particular risk to pregnant women.",
+            "The seller of any interest in residential real property is required to provide the buyer with any "
+            "information on lead-based paint hazards from risk assessments or inspections in the seller's "
+            "possession and notify the buyer of any known lead-based paint hazards. A risk assessment or "
+            "inspection for possible lead-based paint hazards is recommended prior to purchase.",
+            "SELLER'S DISCLOSURE. The seller states whether lead-based paint and/or lead-based paint hazards "
+            "are known to be present in the housing, and lists the records and reports available to the seller "
+            "pertaining to lead-based paint and/or lead-based paint hazards in the housing.",
+            "PURCHASER'S ACKNOWLEDGMENT. The purchaser has received copies of all information listed above and "
+            "has received the pamphlet Protect Your Family from Lead in Your Home. The purchaser has either "
+            "received a 10-day opportunity (or mutually agreed upon period) to conduct a risk assessment or "
+            "inspection for the presence of lead-based paint and/or lead-based paint hazards, or waived the "
+            "opportunity to conduct such a risk assessment or inspection.",
+            "AGENT'S ACKNOWLEDGMENT. The agent has informed the seller of the seller's obligations under "
+            "42 U.S.C. 4852d and is aware of his or her responsibility to ensure compliance.",
+            "CERTIFICATION OF ACCURACY. The parties have reviewed the information above and certify, to the best "
+            "of their knowledge, that the information they have provided is true and accurate.",
+        ],
+    },
+    "natural_hazard": {
+        "form": "NH",
+        "version": 4,
+        "title": "Natural Hazard Disclosure Statement",
+        "paragraphs": [
+            "This statement applies to the property described on the cover page. The transferor and the "
+            "transferor's agent disclose the following information with the knowledge that even though this "
+            "is not a warranty, prospective transferees may rely on this information in deciding whether and "
+            "on what terms to purchase the subject property.",
+            "SPECIAL FLOOD HAZARD AREA. Whether the property lies in an area designated by the Federal "
+            "Emergency Management Agency as a special flood hazard area (any zone beginning with the letter A "
+            "or V). Lenders may require flood insurance for properties in these areas.",
+            "AREA OF POTENTIAL FLOODING. Whether the property lies in an area shown on a dam failure inundation "
+            "map, or in an area of potential flooding designated by the state or local agency.",
+            "VERY HIGH FIRE HAZARD SEVERITY ZONE. Whether the property lies in a zone designated by the fire "
+            "authority. The owner of property in such a zone may be subject to maintenance requirements, "
+            "including clearance of brush and vegetation around structures.",
+            "WILDLAND AREA THAT MAY CONTAIN SUBSTANTIAL FOREST FIRE RISKS AND HAZARDS. Whether the property "
+            "lies in a state responsibility area, where the state may not provide fire protection services to "
+            "buildings unless it has entered into a cooperative agreement with a local agency.",
+            "EARTHQUAKE FAULT ZONE AND SEISMIC HAZARD ZONE. Whether the property lies within a mapped fault zone "
+            "or a seismic hazard zone subject to liquefaction or landslides.",
+            "THESE HAZARDS MAY LIMIT YOUR ABILITY TO DEVELOP THE REAL PROPERTY, TO OBTAIN INSURANCE, OR TO "
+            "RECEIVE ASSISTANCE AFTER A DISASTER. The maps on which these disclosures are based estimate where "
+            "natural hazards exist. They are not definitive indicators of whether or not a property will be "
+            "affected by a natural disaster. Transferees and transferors may wish to obtain professional "
+            "advice regarding those hazards and other hazards that may affect the property.",
+        ],
+    },
+}
+
+# Sections per packet type, in order
+PACKETS: Dict[str, List[str]] = {
+    "agency": ["agency"],
+    "lead_paint": ["lead_paint"],
+    "natural_hazard": ["natural_hazard"],
+    "full": ["agency", "lead_paint", "natural_hazard"],
+}
+
+_ALIASES = {"lead": "lead_paint", "lead_based_paint": "lead_paint", "hazard": "natural_hazard",
+            "nhd": "natural_hazard", "all": "full", "packet": "full"}
+
+
+def normalize_type(disclosure_type: str) -> Optional[str]:
+    """Packet type for a disclosure type ("Lead paint" -> "lead_paint"), or None if there is no template"""
+    key = "_".join(str(disclosure_type or "").lower().replace("-", " ").split())
+    key = _ALIASES.get(key, key)
+    return key if key in PACKETS else None
+
+
+def _escape(text: str) -> bytes:
+    """PDF string literal body in WinAnsi encoding"""
+    raw = text.encode("cp1252", errors="replace")
+    return raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+def _layout(blocks: Sequence[Tuple[str, str]]) -> List[List[Tuple[str, str]]]:
+    """Wrap (style, text) blocks into pages of (style, line); style is title, heading, text or blank"""
+    lines: List[Tuple[str, str]] = []
+    for style, text in blocks:
+        if style in ("title", "heading"):
+            lines.append((style, text))
+        elif style == "blank":
+            lines.append(("blank", ""))
+        else:
+            lines.extend(("text", line) for line in textwrap.wrap(text, WRAP_WIDTH) or [""])
+    return [lines[i:i + LINES_PER_PAGE] for i in range(0, len(lines), LINES_PER_PAGE)] or [[]]
+
+
+_FONTS = {"title": (b"F2", 14), "heading": (b"F2", 11), "text": (b"F1", 10), "blank": (b"F1", 10)}
+
+
+def _page_stream(lines: Sequence[Tuple[str, str]], footer: str = "") -> bytes:
+    """Content stream drawing lines top-down, with an optional footer"""
+    out = [b"BT\n%d TL\n%d %d Td\n" % (LEADING, MARGIN, PAGE_HEIGHT - MARGIN)]
+    font = None
+    for style, text in lines:
+        if _FONTS[style] != font:
+            font = _FONTS[style]
+            out.append(b"/%s %d Tf\n" % font)
+        out.append(b"(%s) Tj T*\n" % _escape(text))
+    out.append(b"ET\n")
+    if footer:
+        out.append(b"BT\n/F1 8 Tf\n%d %d Td\n(%s) Tj\nET\n" % (MARGIN, MARGIN // 2, _escape(footer)))
+    return b"".join(out)
+
+
+def _stream_body(content: bytes, compress: bool) -> bytes:
+    """Stream object body (everything after "N 0 obj")"""
+    if compress:
+        content = zlib.compress(content, 9)
+        head = b"<< /Length %d /Filter /FlateDecode >>" % len(content)
+    else:
+        head = b"<< /Length %d >>" % len(content)
+    return head + b"\nstream\n" + content + b"\nendstream\nendobj\n"
+
+
+_HEADER = b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n"
+_FONT_OBJECTS = (
+    b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>\nendobj\n",
+    b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>\nendobj\n",
+)
+# 1 catalog, 2 page tree, 3 resources, 4-5 fonts, 6 info; pages start at 7
+_FIRST_PAGE = 7
+
+
+def _field(fields: Dict[str, Any], key: str) -> str:
+    value = fields.get(key)
+    if isinstance(value, (list, tuple)):
+        value = ", ".join(str(v) for v in value)
+    return str(value) if value not in (None, "") else "____________________"
+
+
+class DisclosureAssembler:
+    """Builds disclosure packet PDFs from cached static sections and per-packet pages"""
+
+    def __init__(self, sections: Optional[Dict[str, Dict[str, Any]]] = None,
+                 packets: Optional[Dict[str, List[str]]] = None):
+        self.sections = sections if sections is not None else SECTIONS
+        self.packets = packets if packets is not None else PACKETS
+        # (section id, version) -> compressed page stream bodies
+        self._cache: Dict[Tuple[str, int], List[bytes]] = {}
+        self._lock = threading.Lock()
+        self.stats = {"packets": 0, "cache_hits": 0, "renders": 0, "assemble_s": 0.0}
+
+    def _section_pages(self, section_id: str) -> List[bytes]:
+        template = self.sections[section_id]
+        key = (section_id, template["version"])
+        pages = self._cache.get(key)
+        if pages is not None:
+            self.stats["cache_hits"] += 1
+            return pages
+        with self._lock:
+            pages = self._cache.get(key)
+            if pages is None:
+                blocks = [("title", template["title"]), ("blank", "")]
+                for paragraph in template["paragraphs"]:
+                    blocks += [("text", paragraph), ("blank", "")]
+                form = f"Form {template.get('form', section_id.upper())} v{template['version']}"
+                laid_out = _layout(blocks)
+                pages = [_stream_body(_page_stream(lines, f"{form}  -  page {i + 1} of {len(laid_out)}"), True)
+                         for i, lines in enumerate(laid_out)]
+                # Drop versions this one replaces
+                for stale in [k for k in self._cache if k[0] == section_id]:
+                    del self._cache[stale]
+                self._cache[key] = pages
+                self.stats["renders"] += 1
+        return pages
+
+    def warm(self) -> Dict[str, Any]:
+        """Render every section ahead of the first packet"""
+        for section_id in self.sections:
+            self._section_pages(section_id)
+        return {"sections": len(self._cache)}
+
+    def _cover(self, packet_type: str, section_ids: List[str], fields: Dict[str, Any]) -> List[bytes]:
+        blocks = [("title", "Disclosure Packet"), ("blank", "")]
+        for label, key in (("Disclosure ID", "disclosure_id"), ("Transaction", "transaction_id"),
+                           ("Property", "property_address"), ("Year built", "year_built"),
+                           ("Buyer(s)", "client_names"), ("Seller(s)", "seller_names"),
+                           ("Agent", "agent_name"), ("Brokerage", "brokerage"), ("Date", "date")):
+            blocks.append(("text", f"{label}: {_field(fields, key)}"))
+        year = fields.get("year_built")
+        if isinstance(year, int) and year < 1978 and "lead_paint" in section_ids:
+            blocks += [("blank", ""), ("text", "Housing built before 1978: the lead-based paint disclosure "
+                                               "and 10-day inspection opportunity apply.")]
+        blocks += [("blank", ""), ("heading", "Contents"), ("blank", "")]
+        blocks += [("text", f"{i + 1}. {self.sections[s]['title']}") for i, s in enumerate(section_ids)]
+        if fields.get("message"):
+            blocks += [("blank", ""), ("heading", "Message from your agent"), ("text", str(fields["message"]))]
+        return [_page_stream(lines, f"{packet_type} packet") for lines in _layout(blocks)]
+
+    def _signatures(self, section_ids: List[str], fields: Dict[str, Any]) -> List[bytes]:
+        blocks = [("title", "Acknowledgment of Receipt"), ("blank", ""),
+                  ("text", "The undersigned acknowledge receiving and reading the following disclosures:"),
+                  ("blank", "")]
+        for s in section_ids:
+            template = self.sections[s]
+            blocks.append(("text", f"- {template['title']} (Form {template.get('form', s.upper())} "
+                                   f"v{template['version']})"))
+        names = fields.get("client_names") or ["Buyer"]
+        if isinstance(names, str):
+            names = [names]
+        for name in list(names) + [fields.get("agent_name") or "Agent"]:
+            blocks += [("blank", ""), ("blank", ""),
+                       ("text", "_____________________________________      Date ______________"),
+                       ("text", str(name))]
+        return [_page_stream(lines, _field(fields, "disclosure_id")) for lines in _layout(blocks)]
+
+    def assemble(self, disclosure_type: str, fields: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Build a packet PDF
+
+        Args:
+            disclosure_type: Packet type (see PACKETS; "lead paint" and the like are accepted)
+            fields: Per-packet values: disclosure_id, transaction_id, property_address, year_built,
+                client_names, seller_names, agent_name, brokerage, date, message
+
+        Returns:
+            pdf bytes, packet_type, sections and page count
+        """
+        started = time.perf_counter()
+        packet_type = normalize_type(disclosure_type)
+        if packet_type is None:
+            raise ValueError(f"No disclosure template for '{disclosure_type}' (known: {', '.join(self.packets)})")
+        fields = dict(fields or {})
+        fields.setdefault("date", datetime.now().strftime("%B %d, %Y"))
+        section_ids = self.packets[packet_type]
+
+        # Dynamic pages are small, so they are left uncompressed
+        pages = [_stream_body(page, False) for page in self._cover(packet_type, section_ids, fields)]
+        for section_id in section_ids:
+            pages.extend(self._section_pages(section_id))
+        pages += [_stream_body(page, False) for page in self._signatures(section_ids, fields)]
+
+        title = self.sections[section_ids[0]]["title"] if len(section_ids) == 1 else "Disclosure Packet"
+        kids = b" ".join(b"%d 0 R" % (_FIRST_PAGE + 2 * i) for i in range(len(pages)))
+        objects = [
+            b"<< /Type /Catalog /Pages 2 0 R >>\nendobj\n",
+            b"<< /Type /Pages /Kids [%s] /Count %d >>\nendobj\n" % (kids, len(pages)),
+            b"<< /Font << /F1 4 0 R /F2 5 0 R >> >>\nendobj\n",
+            *_FONT_OBJECTS,
+            b"<< /Title (%s) /Producer (EstateWise) /CreationDate (D:%s) >>\nendobj\n"
+            % (_escape(title), datetime.now().strftime("%Y%m%d%H%M%S").encode()),
+        ]
+        for i, body in enumerate(pages):
+            objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Resources 3 0 R "
+                           b"/Contents %d 0 R >>\nendobj\n" % (PAGE_WIDTH, PAGE_HEIGHT, _FIRST_PAGE + 2 * i + 1))
+            objects.append(body)
+
+        parts, offsets, position = [_HEADER], [], len(_HEADER)
+        for number, body in enumerate(objects, start=1):
+            head = b"%d 0 obj\n" % number
+            offsets.append(position)
+            parts += (head, body)
+            position += len(head) + len(body)
+        parts.append(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        parts.append(b"".join(b"%010d 00000 n \n" % offset for offset in offsets))
+        parts.append(b"trailer\n<< /Size %d /Root 1 0 R /Info 6 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+                     % (len(objects) + 1, position))
+        pdf = b"".join(parts)
+
+        self.stats["packets"] += 1
+        self.stats["assemble_s"] += time.perf_counter() - started
+        return {"pdf": pdf, "packet_type": packet_type, "sections": section_ids, "pages": len(pages)}
+
+    def snapshot(self) -> Dict[str, Any]:
+        packets = self.stats["packets"]
+        return {
+            "cached_sections": len(self._cache),
+            "packets": packets,
+            "renders": self.stats["renders"],
+            "cache_hits": self.stats["cache_hits"],
+            "avg_assemble_ms": round(self.stats["assemble_s"] / packets * 1000, 3) if packets else None,
+        }
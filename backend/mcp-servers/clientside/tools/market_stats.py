@@ -0,0 +1,404 @@
+"""
+Rolling market statistics per zip code and property type
+
+Keeps the sales of the last ``window_days`` for every (zip, property type)
+and for every zip across all types, as histograms of three metrics:
+
+    price_per_sqft   sale price / square feet         1% log-spaced bins, $10 to $10,000
+    days_on_market   listing to accepted offer, days  one bin per day, 365+ in the last
+    sale_to_list     sale price / final list price    0.001-wide bins, 0.5 to 1.5
+
+Recording a sale is one counter increment per metric for its two keys plus
+an append to the week it sold in. Weeks leave the window whole, subtracting
+their sales from the counters, so every sale is added once and removed once:
+O(1) amortized per sale. Median and quartiles are read off the histograms to
+within half a bin (about ±0.5% for $/sqft, exact days, ±0.0005 for the
+ratio); means are exact. A key's summary is computed on the first query
+after it changes and cached, so repeated queries are dictionary lookups.
+"""
+import os
+import math
+import threading
+from array import array
+from datetime import date, datetime
+from typing import Dict, Any, List, Optional, Iterable, Tuple
+
+METRICS = ("price_per_sqft", "days_on_market", "sale_to_list")
+# Sales a (zip, property type) needs before its own figures are reported;
+# below that the zip across all types answers
+DEFAULT_MIN_SALES = 10
+
+
+class _LogBins:
+    """Bins centred on lo * (1 + step)^i"""
+
+    def __init__(self, lo: float, hi: float, step: float):
+        self.lo = lo
+        self.log_step = math.log1p(step)
+        self.last = int(round(math.log(hi / lo) / self.log_step))
+
+    def index(self, value: float) -> int:
+        if value <= self.lo:
+            return 0
+        return min(int(round(math.log(value / self.lo) / self.log_step)), self.last)
+
+    def indices(self, values):
+        import numpy as np
+        scaled = np.log(np.maximum(values, self.lo) / self.lo) / self.log_step
+        return np.minimum(np.rint(scaled), self.last).astype(np.int64)
+
+    def value(self, index: int) -> float:
+        return self.lo * math.exp(index * self.log_step)
+
+
+class _LinearBins:
+    """Bins centred on lo + i * width"""
+
+    def __init__(self, lo: float, hi: float, width: float):
+        self.lo = lo
+        self.width = width
+        self.last = int(round((hi - lo) / width))
+
+    def index(self, value: float) -> int:
+        return min(max(int(round((value - self.lo) / self.width)), 0), self.last)
+
+    def value(self, index: int) -> float:
+        return self.lo + index * self.width
+
+
+BINS = (_LogBins(10.0, 10_000.0, 0.01), _LinearBins(0.0, 365.0, 1.0), _LinearBins(0.5, 1.5, 0.001))
+DECIMALS = (2, 1, 4)
+
+
+def _quantiles(counts: Dict[int, int], n: int, bins, qs: Tuple[float, ...]) -> List[float]:
+    """Linearly interpolated quantiles of a sparse histogram (numpy's default method)"""
+    targets = []
+    for q in qs:
+        rank = q * (n - 1)
+        low = int(rank)
+        targets.append((low, min(low + 1, n - 1), rank - low))
+    wanted = sorted({r for low, high, _ in targets for r in (low, high)})
+    values = {}
+    seen = 0
+    position = 0
+    for index in sorted(counts):
+        seen += counts[index]
+        while position < len(wanted) and wanted[position] < seen:
+            values[wanted[position]] = bins.value(index)
+            position += 1
+        if position == len(wanted):
+            break
+    return [values[low] + (values[high] - values[low]) * weight for low, high, weight in targets]
+
+
+class _Market:
+    """Rolling histograms for one key"""
+
+    __slots__ = ("counts", "n", "sums", "sales", "periods", "summary")
+
+    def __init__(self):
+        self.counts: List[Dict[int, int]] = [{} for _ in METRICS]
+        self.n = [0] * len(METRICS)
+        self.sums = [0.0] * len(METRICS)
+        self.sales = 0
+        # period -> [values per metric..., sale count]; kept to subtract on expiry
+        self.periods: Dict[int, list] = {}
+        self.summary: Optional[Dict[str, Any]] = None
+
+    def _period(self, period: int) -> list:
+        entry = self.periods.get(period)
+        if entry is None:
+            entry = self.periods[period] = [array("d") for _ in METRICS] + [0]
+        return entry
+
+    def add(self, period: int, values: Tuple[Optional[float], ...], bins: Tuple[Optional[int], ...]) -> None:
+        entry = self._period(period)
+        entry[-1] += 1
+        self.sales += 1
+        for m, value in enumerate(values):
+            if value is not None:
+                counts = self.counts[m]
+                counts[bins[m]] = counts.get(bins[m], 0) + 1
+                self.n[m] += 1
+                self.sums[m] += value
+                entry[m].append(value)
+        self.summary = None
+
+    def add_many(self, period: int, metric: int, values, bins) -> None:
+        """Bulk-add one metric for many sales (NumPy arrays of values and bin indices)"""
+        import numpy as np
+        entry = self._period(period)
+        entry[-1] += len(values)
+        self.sales += len(values)
+        counts = self.counts[metric]
+        for index, count in zip(*np.unique(bins, return_counts=True)):
+            counts[int(index)] = counts.get(int(index), 0) + int(count)
+        self.n[metric] += len(values)
+        self.sums[metric] += float(values.sum())
+        entry[metric].frombytes(np.ascontiguousarray(values, dtype=np.float64).tobytes())
+        self.summary = None
+
+    def expire(self, cutoff: int) -> None:
+        """Subtract the sales of periods before cutoff"""
+        for period in [p for p in self.periods if p < cutoff]:
+            entry = self.periods.pop(period)
+            self.sales -= entry[-1]
+            for m, values in enumerate(entry[:-1]):
+                counts, bins = self.counts[m], BINS[m]
+                for value in values:
+                    index = bins.index(value)
+                    left = counts[index] - 1
+                    if left:
+                        counts[index] = left
+                    else:
+                        del counts[index]
+                self.n[m] -= len(values)
+                # Reset rather than accumulate float error once a metric empties
+                self.sums[m] = self.sums[m] - sum(values) if self.n[m] else 0.0
+            self.summary = None
+
+    def summarize(self) -> Dict[str, Any]:
+        if self.summary is None:
+            summary: Dict[str, Any] = {"sales": self.sales}
+            for m, name in enumerate(METRICS):
+                n = self.n[m]
+                if not n:
+                    summary[name] = None
+                    continue
+                p25, median, p75 = _quantiles(self.counts[m], n, BINS[m], (0.25, 0.5, 0.75))
+                digits = DECIMALS[m]
+                summary[name] = {
+                    "median": round(median, digits),
+                    "p25": round(p25, digits),
+                    "p75": round(p75, digits),
+                    "mean": round(self.sums[m] / n, digits),
+                    "sales": n,
+                }
+            self.summary = summary
+        return self.summary
+
+
+def _number(value: Any) -> Optional[float]:
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if math.isfinite(value) else None
+
+
+def _sale_day(value: Any) -> Optional[date]:
+    if value is None or isinstance(value, date):
+        return value.date() if isinstance(value, datetime) else value
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
+
+
+class MarketStats:
+    """Rolling $/sqft, days-on-market and sale-to-list aggregates per zip and property type"""
+
+    def __init__(self,
+                 window_days: Optional[int] = None,
+                 period_days: int = 7,
+                 min_sales: Optional[int] = None,
+                 clock=date.today):
+        """
+        Args:
+            window_days: Days of sales kept (MARKET_STATS_WINDOW_DAYS, default 180),
+                rounded up to whole periods
+            period_days: Granularity at which sales leave the window
+            min_sales: Sales a (zip, type) needs before it answers on its own
+                (MARKET_STATS_MIN_SALES, default 10)
+            clock: Returns today's date; sales default to it and the window ends at it
+        """
+        if window_days is None:
+            window_days = int(os.getenv("MARKET_STATS_WINDOW_DAYS", "180"))
+        if min_sales is None:
+            min_sales = int(os.getenv("MARKET_STATS_MIN_SALES", str(DEFAULT_MIN_SALES)))
+        self.period_days = period_days
+        self.window_periods = max(1, -(-window_days // period_days))
+        self.min_sales = min_sales
+        self.clock = clock
+        self._markets: Dict[tuple, _Market] = {}
+        # Newest period seen; the window never moves backwards for late sales
+        self._latest = 0
+        self._today = clock()
+        # Per key, the cutoff it was last expired to
+        self._expired: Dict[tuple, int] = {}
+        self._lock = threading.Lock()
+        self.recorded = 0
+        self.stale = 0
+        self.rejected = 0
+        self.future = 0
+
+    @property
+    def window_days(self) -> int:
+        return self.window_periods * self.period_days
+
+    def _cutoff(self) -> int:
+        self._today = self.clock()
+        self._latest = max(self._latest, self._today.toordinal() // self.period_days)
+        return self._latest - self.window_periods + 1
+
+    def _market(self, key: tuple, cutoff: int) -> Optional[_Market]:
+        market = self._markets.get(key)
+        if market is not None and self._expired.get(key, cutoff) < cutoff:
+            market.expire(cutoff)
+        self._expired[key] = cutoff
+        return market
+
+    @staticmethod
+    def _keys(zip_code: Any, property_type: Any) -> List[tuple]:
+        zip_code = str(zip_code).strip()
+        keys = [(zip_code, None)]
+        if property_type:
+            keys.append((zip_code, str(property_type).strip().lower()))
+        return keys
+
+    # ---------------------------------------------------------------- updates
+
+    def add_sale(self, sale: Any) -> bool:
+        """Record one sale; returns False if it is unusable, older than the window or
+        dated after today (a future date would move the window past every real sale).
+
+        ``sale`` is a dict or Property-like object with ``zip_code`` and any of
+        ``price`` with ``square_feet``, ``list_price`` and ``days_on_market``
+        (or ``list_date``); ``property_type`` and ``sold_date`` are optional
+        (sold today when absent).
+        """
+        get = sale.get if isinstance(sale, dict) else (lambda name: getattr(sale, name, None))
+        zip_code = get("zip_code")
+        price = _number(get("price"))
+        sqft = _number(get("square_feet"))
+        list_price = _number(get("list_price"))
+        dom = _number(get("days_on_market"))
+        sold = _sale_day(get("sold_date"))
+        if sold is None:
+            sold = self.clock()
+        if dom is None:
+            listed = _sale_day(get("list_date"))
+            dom = float((sold - listed).days) if listed else None
+
+        values = (
+            price / sqft if price and price > 0 and sqft and sqft > 0 else None,
+            dom if dom is not None and dom >= 0 else None,
+            price / list_price if price and price > 0 and list_price and list_price > 0 else None,
+        )
+        if not zip_code or all(v is None for v in values):
+            self.rejected += 1
+            return False
+        bins = tuple(None if v is None else BINS[m].index(v) for m, v in enumerate(values))
+        period = sold.toordinal() // self.period_days
+
+        with self._lock:
+            cutoff = self._cutoff()
+            if sold > self._today:
+                self.future += 1
+                return False
+            if period < cutoff:
+                self.stale += 1
+                return False
+            for key in self._keys(zip_code, get("property_type")):
+                market = self._market(key, cutoff)
+                if market is None:
+                    market = self._markets[key] = _Market()
+                market.add(period, values, bins)
+            self.recorded += 1
+        return True
+
+    def add_sales(self, sales: Iterable[Any]) -> int:
+        """Record many sales; returns how many were inside the window and usable"""
+        return sum(self.add_sale(sale) for sale in sales)
+
+    def load_table(self, table, sold_on: Optional[date] = None) -> int:
+        """Seed $/sqft from every priced PropertyTable row, dated sold_on (today).
+
+        The table carries sale price and square footage only, so days on market
+        and sale-to-list come from sales recorded afterwards. Call once per table.
+        """
+        import numpy as np
+        prices = table.column("price").astype(np.float64)
+        sqft = table.column("square_feet").astype(np.float64)
+        zips = table.column("zip_code").astype(np.int64)
+        types = table.column("property_type").astype(np.int64)
+        keep = np.isfinite(prices) & (prices > 0) & (sqft > 0) & (zips >= 0)
+        ppsf = prices[keep] / sqft[keep]
+        bins = BINS[0].indices(ppsf)
+        zips, types = zips[keep], types[keep]
+        zip_names = table.categories("zip_code")
+        type_names = [str(t).strip().lower() for t in table.categories("property_type")]
+        sold_on = sold_on or self.clock()
+        period = sold_on.toordinal() // self.period_days
+
+        # One stable sort groups rows by zip and, within a zip, by type
+        group = zips * (len(type_names) + 1) + (types + 1)
+        order = np.argsort(group, kind="stable")
+        group, zips, types, ppsf, bins = group[order], zips[order], types[order], ppsf[order], bins[order]
+
+        with self._lock:
+            cutoff = self._cutoff()
+            if sold_on > self._today:
+                self.future += len(ppsf)
+                return 0
+            if period < cutoff:
+                self.stale += len(ppsf)
+                return 0
+            for keys, starts in ((zips, None), (group, types)):
+                edges = np.flatnonzero(np.diff(keys)) + 1
+                for start, end in zip(np.r_[0, edges], np.r_[edges, len(keys)]):
+                    if start == end:
+                        continue
+                    if starts is None:
+                        key = (zip_names[zips[start]], None)
+                    elif types[start] < 0:
+                        continue
+                    else:
+                        key = (zip_names[zips[start]], type_names[types[start]])
+                    market = self._market(key, cutoff)
+                    if market is None:
+                        market = self._markets[key] = _Market()
+                    market.add_many(period, 0, ppsf[start:end], bins[start:end])
+            self.recorded += len(ppsf)
+        return len(ppsf)
+
+    # ---------------------------------------------------------------- queries
+
+    def stats(self, zip_code: Any, property_type: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Rolling figures for a zip (and property type), or None without sales.
+
+        When the property type has fewer than ``min_sales`` sales in the window
+        the zip across all types answers instead; ``scope`` says which did.
+        """
+        keys = self._keys(zip_code, property_type)
+        with self._lock:
+            cutoff = self._cutoff()
+            for key in reversed(keys):
+                market = self._market(key, cutoff)
+                if market is None or not market.sales:
+                    continue
+                if key[1] is not None and market.sales < self.min_sales:
+                    continue
+                summary = market.summarize()
+                break
+            else:
+                return None
+        return {
+            "zip_code": keys[0][0],
+            "property_type": keys[-1][1],
+            "scope": "zip" if key[1] is None else "zip_and_type",
+            "window_days": self.window_days,
+            "as_of": self._today.isoformat(),
+            **summary,
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Counters for health metrics"""
+        return {
+            "keys": len(self._markets),
+            "recorded": self.recorded,
+            "stale": self.stale,
+            "rejected": self.rejected,
+            "future": self.future,
+            "window_days": self.window_days,
+        }
@@ -0,0 +1,169 @@
+"""
+What-if analysis of offer rankings under different scoring weights
+
+Offer scores are a weighted sum of a few normalized features, so the scores
+for many weight vectors are one matrix product: (weights x features) times
+(features x offers). Every weight vector is ranked in the same pass, and the
+results are summarised as rank-stability statistics: how often each offer
+comes first, its average rank, the weight region where it wins, and the
+points along each single-weight sweep where the winner changes.
+"""
+import math
+from typing import Dict, Any, List, Optional, Sequence
+
+import numpy as np
+
+# Points per single-weight sweep in the sensitivity analysis
+SWEEP_POINTS = 201
+# Weight vectors ranked per block, to bound the scores/ranks memory
+BLOCK_SIZE = 65536
+
+
+def _grid_parts(step: float) -> int:
+    parts = int(round(1 / step)) if step > 0 else 0
+    if parts < 1 or abs(parts * step - 1) > 1e-9:
+        raise ValueError("grid_step must divide 1 evenly (e.g. 0.05 or 0.1)")
+    return parts
+
+
+def grid_size(dimensions: int, step: float) -> int:
+    """Number of weight vectors weight_grid would build, without building them"""
+    # Stars and bars: place dimensions - 1 boundaries among parts units
+    parts = _grid_parts(step)
+    return math.comb(parts + dimensions - 1, dimensions - 1)
+
+
+def weight_grid(dimensions: int, step: float, max_rows: Optional[int] = None) -> np.ndarray:
+    """Every weight vector on the simplex whose components are multiples of step
+
+    Raises ValueError before allocating anything if the grid would have more
+    than max_rows rows.
+    """
+    parts = _grid_parts(step)
+    size = grid_size(dimensions, step)
+    if max_rows is not None and size > max_rows:
+        raise ValueError(f"grid_step {step} gives {size:,} weightings, over the limit of {max_rows:,}")
+    # Built one component at a time: each row is repeated once per value the
+    # next component can take given what is left of the parts
+    grid = np.zeros((1, 0), dtype=np.int64)
+    left = np.full(1, parts, dtype=np.int64)
+    for _ in range(dimensions - 1):
+        counts = left + 1
+        starts = np.repeat(np.cumsum(counts) - counts, counts)
+        values = np.arange(counts.sum(), dtype=np.int64) - starts
+        grid = np.column_stack([np.repeat(grid, counts, axis=0), values])
+        left = np.repeat(left, counts) - values
+    grid = np.column_stack([grid, left])
+    return grid.astype(np.float64) / parts
+
+
+def sample_weights(dimensions: int, count: int, seed: Optional[int] = None,
+                   around: Optional[Sequence[float]] = None, concentration: Optional[float] = None) -> np.ndarray:
+    """Random weight vectors: uniform on the simplex, or Dirichlet-concentrated around a weighting"""
+    rng = np.random.default_rng(seed)
+    alpha = np.ones(dimensions) if around is None or not concentration else \
+        np.asarray(around, dtype=np.float64) * concentration + 1e-3
+    return rng.dirichlet(alpha, size=count)
+
+
+def normalize_weights(rows: Sequence[Sequence[float]]) -> np.ndarray:
+    """Scale each weighting to sum to 1"""
+    weights = np.asarray(rows, dtype=np.float64)
+    if (weights < 0).any() or (weights.sum(axis=1) <= 0).any():
+        raise ValueError("Weights must be non-negative and not all zero")
+    return weights / weights.sum(axis=1, keepdims=True)
+
+
+def _sweep(features: np.ndarray, base: np.ndarray, dim: int) -> Dict[str, Any]:
+    """Move one weight from 0 to 1, scaling the others in proportion to the base weights"""
+    t = np.linspace(0.0, 1.0, SWEEP_POINTS)
+    rest = np.delete(base, dim)
+    rest = rest / rest.sum() if rest.sum() > 0 else np.full(len(rest), 1 / len(rest))
+    weights = np.insert(np.outer(1 - t, rest), dim, t, axis=1)
+    winners = np.argmax(weights @ features.T, axis=1)
+    changes = np.flatnonzero(winners[1:] != winners[:-1]) + 1
+    return {
+        "base_weight": round(float(base[dim]), 4),
+        "winner_at_zero": int(winners[0]),
+        "changes": [
+            {"weight": round(float(t[i]), 4), "from": int(winners[i - 1]), "to": int(winners[i])} for i in changes
+        ],
+    }
+
+
+def simulate_rankings(features: np.ndarray, weights: np.ndarray, names: Sequence[str],
+                      base: Sequence[float]) -> Dict[str, Any]:
+    """
+    Rank offers under every weight vector and summarise rank stability
+
+    Args:
+        features: (offers, features) normalized feature matrix, higher is better
+        weights: (samples, features) weight vectors
+        names: Feature names, in column order
+        base: The weights currently used to rank offers
+    Returns:
+        dict with 'baseline' (winner and how often it stays first), per-offer
+        'offers' statistics and a per-feature 'sensitivity' sweep
+    """
+    features = np.asarray(features, dtype=np.float64)
+    weights = np.asarray(weights, dtype=np.float64)
+    base = np.asarray(base, dtype=np.float64)
+    n_offers, n_samples = len(features), len(weights)
+
+    wins = np.zeros(n_offers, dtype=np.int64)
+    top3 = np.zeros(n_offers, dtype=np.int64)
+    rank_sum = np.zeros(n_offers)
+    rank_sq = np.zeros(n_offers)
+    region_min = np.full((n_offers, len(names)), np.inf)
+    region_max = np.full((n_offers, len(names)), -np.inf)
+    region_sum = np.zeros((n_offers, len(names)))
+    columns = np.arange(n_offers)
+    for start in range(0, n_samples, BLOCK_SIZE):
+        block = weights[start:start + BLOCK_SIZE]
+        scores = block @ features.T
+        # Stable, so ties go to the earlier offer, as in rank_offers
+        order = np.argsort(-scores, axis=1, kind="stable")
+        ranks = np.empty_like(order)
+        np.put_along_axis(ranks, order, columns[None, :], axis=1)
+        winners = order[:, 0]
+        wins += np.bincount(winners, minlength=n_offers)
+        top3 += (ranks < 3).sum(axis=0)
+        rank_sum += ranks.sum(axis=0)
+        rank_sq += (ranks.astype(np.float64) ** 2).sum(axis=0)
+        np.minimum.at(region_min, winners, block)
+        np.maximum.at(region_max, winners, block)
+        np.add.at(region_sum, winners, block)
+
+    baseline_winner = int(np.argmax(features @ base))
+    mean_rank = rank_sum / n_samples
+    offers: List[Dict[str, Any]] = []
+    for i in range(n_offers):
+        stats: Dict[str, Any] = {
+            "offer": i,
+            "win_share": round(float(wins[i] / n_samples), 4),
+            "top3_share": round(float(top3[i] / n_samples), 4),
+            "mean_rank": round(float(mean_rank[i] + 1), 3),
+            "rank_std": round(float(np.sqrt(max(rank_sq[i] / n_samples - mean_rank[i] ** 2, 0.0))), 3),
+        }
+        if wins[i]:
+            # Bounding box and centre of the weight vectors under which this offer wins
+            stats["wins_when"] = {
+                name: {
+                    "min": round(float(region_min[i, d]), 4),
+                    "mean": round(float(region_sum[i, d] / wins[i]), 4),
+                    "max": round(float(region_max[i, d]), 4),
+                }
+                for d, name in enumerate(names)
+            }
+        offers.append(stats)
+
+    return {
+        "samples": n_samples,
+        "baseline": {
+            "weights": {name: float(w) for name, w in zip(names, base)},
+            "winner": baseline_winner,
+            "winner_share": round(float(wins[baseline_winner] / n_samples), 4),
+        },
+        "offers": offers,
+        "sensitivity": {name: _sweep(features, base, d) for d, name in enumerate(names)},
+    }
@@ -1,146 +1,493 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import asyncio
+import json
+import os
 import sys
 from pathlib import Path
 
-# Add shared utils to path for OpenAI client
-sys.path.append(str(Path(__file__).parent.parent.parent / "shared" / "utils"))
+# Add shared utils to path for the LLM router
+sys.path.append(str(Path(__file__).parent.parent.parent.parent / "shared" / "utils"))
 
 try:
-    from openai_client import OpenAIClient
+    from prompt_budget import count_tokens, summarize_to_tokens, get_prompt_metrics
+    from call_phases import phase
+    from trace_context import span
 except ImportError:
-    OpenAIClient = None
+    # Fallback for when shared utils are not available: rough token counts
+    # (about four characters per token), no metrics, phases or spans
+    def count_tokens(text: str) -> int:
+        return len(text) // 4 + 1
+
+    def summarize_to_tokens(text: str, max_tokens: int) -> str:
+        return text[:max_tokens * 4]
+
+    class _NoMetrics:
+        def record(self, prompt_tokens, compacted=False, chunks=1):
+            pass
+
+    def get_prompt_metrics(name: str):
+        return _NoMetrics()
+
+    class span:
+        def __init__(self, name, attributes=None, kind="internal"):
+            pass
+        def __enter__(self):
+            return self
+        def __exit__(self, *exc):
+            pass
+        def set(self, key, value):
+            pass
+        def record_error(self, error):
+            pass
+
+    class phase(span):
+        pass
+
+try:
+    from llm_router import get_router
+except ImportError:
+    get_router = None
+
+
+def letter_sentiments(letters: List[Optional[str]]) -> List[float]:
+    """Buyer-letter sentiments in [0, 1], embedded in one batch (NumPy is imported on first use)."""
+    from embedding_index import letter_sentiments as embed_sentiments
+    return embed_sentiments(letters)
 
 
 def sentiment_score(text: str) -> float:
-    """Very naive sentiment score based on positive keywords."""
-    if not text:
-        return 0.5
-    positive_words = ["love", "care", "great", "wonderful", "amazing"]
-    text_l = text.lower()
-    for word in positive_words:
-        if word in text_l:
-            return 1.0
-    return 0.5
+    """Buyer-letter sentiment in [0, 1] from the local embedding model (0.5 when empty)."""
+    return letter_sentiments([text])[0]
 
 
-def rank_offers(offers: List[Dict]) -> List[Dict]:
-    """Rank offers using weighted scoring."""
-    if not offers:
-        return []
+# Weights of the normalized offer features in the 0-100 offer score
+RANK_WEIGHTS = {"price": 0.5, "contingencies": 0.3, "closing": 0.15, "sentiment": 0.05}
+
 
+def offer_features(offers: List[Dict]) -> List[Dict[str, float]]:
+    """Per-offer features scaled to [0, 1] (higher is better) that RANK_WEIGHTS apply to."""
     max_price = max(o.get("price", 0) for o in offers) or 1
     max_cont = max(len(o.get("contingencies", [])) for o in offers)
     dates = [datetime.fromisoformat(o["close_date"]) for o in offers if o.get("close_date")]
-    min_date = min(dates)
-    max_date = max(dates)
-    date_range = (max_date - min_date).days or 1
-
-    ranked = []
-    for offer in offers:
-        price_norm = offer.get("price", 0) / max_price
-        cont_norm = 1 - (len(offer.get("contingencies", [])) / (max_cont or 1))
+    min_date = min(dates) if dates else None
+    max_date = max(dates) if dates else None
+    date_range = ((max_date - min_date).days if dates else 0) or 1
+    # Embed all buyer letters in one batch
+    sentiments = letter_sentiments([o.get("buyer_letter") for o in offers])
+
+    features = []
+    for offer, sentiment in zip(offers, sentiments):
         close_dt = datetime.fromisoformat(offer["close_date"]) if offer.get("close_date") else max_date
-        closing_norm = 1 - ((close_dt - min_date).days / date_range)
-        sentiment = sentiment_score(offer.get("buyer_letter", ""))
-
-        score = (
-            price_norm * 0.5
-            + cont_norm * 0.3
-            + closing_norm * 0.15
-            + sentiment * 0.05
-        ) * 100
+        features.append({
+            "price": offer.get("price", 0) / max_price,
+            "contingencies": 1 - (len(offer.get("contingencies", [])) / (max_cont or 1)),
+            "closing": 1 - ((close_dt - min_date).days / date_range) if close_dt else 0.0,
+            "sentiment": sentiment,
+        })
+    return features
+
+
+def rank_offers(offers: List[Dict]) -> List[Dict]:
+    """Rank offers using weighted scoring."""
+    if not offers:
+        return []
+
+    with phase("ranking"), span("rank_offers", {"offers.count": len(offers)}):
+        ranked = []
+        for offer, features in zip(offers, offer_features(offers)):
+            score = (
+                features["price"] * RANK_WEIGHTS["price"]
+                + features["contingencies"] * RANK_WEIGHTS["contingencies"]
+                + features["closing"] * RANK_WEIGHTS["closing"]
+                + features["sentiment"] * RANK_WEIGHTS["sentiment"]
+            ) * 100
 
-        ranked_offer = dict(offer)
-        ranked_offer["score"] = round(score, 1)
-        ranked.append(ranked_offer)
+            ranked_offer = dict(offer)
+            ranked_offer["score"] = round(score, 1)
+            ranked.append(ranked_offer)
 
-    ranked.sort(key=lambda x: x["score"], reverse=True)
+        ranked.sort(key=lambda x: x["score"], reverse=True)
     return ranked
 
 
-async def generate_gpt_analysis(offers: List[Dict], ranked_offers: List[Dict]) -> Dict[str, Any]:
-    """Generate GPT analysis of offers with summary and pros/cons table."""
-    if not OpenAIClient:
+def rank_offer_groups(groups: List[List[Dict]]) -> List[List[Dict]]:
+    """Rank many independent offer sets (one per property) in one vectorized pass.
+
+    Every group is ranked exactly as rank_offers would rank it alone:
+    features are normalized within the group, but all buyer letters are
+    embedded in one batch and all scores computed in one set of array
+    operations instead of a Python loop per offer and a batch per group.
+    """
+    import numpy as np
+
+    offers = [offer for group in groups for offer in group]
+    if not offers:
+        return [[] for _ in groups]
+
+    with phase("ranking"), span("rank_offer_groups", {"offers.count": len(offers), "groups.count": len(groups)}):
+        sizes = np.array([len(group) for group in groups])
+        group_of = np.repeat(np.arange(len(groups)), sizes)
+        starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])[sizes > 0]
+
+        def per_group(reduce, values):
+            """Group-wise reduction broadcast back to each offer (groups are contiguous)"""
+            out = np.zeros(len(groups))
+            out[sizes > 0] = reduce.reduceat(values, starts)
+            return out[group_of]
+
+        prices = np.array([o.get("price", 0) for o in offers], dtype=np.float64)
+        counts = np.array([len(o.get("contingencies", [])) for o in offers], dtype=np.float64)
+        # Close dates as seconds, so whole days floor exactly like timedelta.days
+        epoch = datetime(1970, 1, 1)
+
+        def seconds(value: str) -> float:
+            close = datetime.fromisoformat(value)
+            return close.timestamp() if close.tzinfo else (close - epoch).total_seconds()
+
+        closes = np.array([seconds(o["close_date"]) if o.get("close_date") else np.nan for o in offers])
+        sentiments = np.array(letter_sentiments([o.get("buyer_letter") for o in offers]))
+
+        max_price = per_group(np.maximum, prices)
+        max_price[max_price == 0] = 1
+        max_count = per_group(np.maximum, counts)
+        max_count[max_count == 0] = 1
+        with np.errstate(invalid="ignore"):
+            min_date = per_group(np.fmin, closes)
+            max_date = per_group(np.fmax, closes)
+            date_range = np.floor((max_date - min_date) / 86400)
+            date_range[~(date_range > 0)] = 1
+            close = np.where(np.isnan(closes), max_date, closes)
+            closing = np.where(np.isnan(max_date), 0.0, 1 - np.floor((close - min_date) / 86400) / date_range)
+
+        scores = (
+            prices / max_price * RANK_WEIGHTS["price"]
+            + (1 - counts / max_count) * RANK_WEIGHTS["contingencies"]
+            + closing * RANK_WEIGHTS["closing"]
+            + sentiments * RANK_WEIGHTS["sentiment"]
+        ) * 100
+        rounded = [round(float(score), 1) for score in scores]
+        # Group, then score descending, then input order (rank_offers' stable sort)
+        order = np.lexsort((np.arange(len(offers)), -np.array(rounded), group_of))
+
+        ranked: List[List[Dict]] = [[] for _ in groups]
+        for i in order:
+            offer = dict(offers[i])
+            offer["score"] = rounded[i]
+            ranked[group_of[i]].append(offer)
+        return ranked
+
+
+OFFER_ANALYSIS_SYSTEM_PROMPT = """You are a real estate expert analyzing multiple offers for a property.
+Provide a concise summary of which offer is strongest and why, plus a detailed pros/cons table for each offer.
+
+Focus on:
+- Price strength relative to market
+- Financing terms and reliability
+- Closing timeline
+- Contingencies and risk factors
+- Buyer qualifications and earnest money
+- Overall offer attractiveness for the seller
+
+Offers are given one JSON object per line; missing fields are unknown.
+A "Market:" line, when present, gives the rolling figures for the property's zip code;
+price_per_sqft and vs_market_pct (percent above or below the market median $/sqft)
+let you judge price strength against it.
+
+Format your response as JSON with:
+{
+    "summary": "2-3 sentence summary of the strongest offer",
+    "pros_cons_table": [
+        {
+            "rank": 1,
+            "price": "$X",
+            "pros": ["pro1", "pro2", "pro3"],
+            "cons": ["con1", "con2"],
+            "overall_assessment": "Brief assessment"
+        }
+    ]
+}"""
+
+OFFER_REDUCE_SYSTEM_PROMPT = """You are a real estate expert. A comparison of many offers for one property
+was too large for one request, so each part was analyzed separately.
+From the part summaries and the top offers across all parts, write one summary
+of which offer is strongest overall and why.
+
+Respond as JSON: {"summary": "2-3 sentence summary of the strongest offer"}"""
+
+# Token budget for the user prompt of a single analysis call
+OFFER_PROMPT_MAX_TOKENS = int(os.getenv("OFFER_PROMPT_MAX_TOKENS", 6000))
+# Buyer letters are never shortened below this many tokens
+MIN_LETTER_TOKENS = 24
+# Upper bound on concurrent chunk analyses when a comparison is split
+MAX_CONCURRENT_CHUNKS = 4
+# Top-ranked offers shown to the reduce step of a split analysis
+REDUCE_TOP_OFFERS = 3
+
+
+def _compact_offer(rank: int, offer: Dict, market: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Offer fields relevant to the analysis, with empty values dropped."""
+    price_per_sqft = vs_market_pct = None
+    sqft = (market or {}).get("subject_square_feet")
+    if sqft and offer.get("price"):
+        price_per_sqft = round(offer["price"] / sqft, 2)
+        median = ((market or {}).get("price_per_sqft") or {}).get("median")
+        if median:
+            vs_market_pct = round((price_per_sqft / median - 1) * 100, 1)
+    compact = {
+        "rank": rank,
+        "price": offer.get("price", 0),
+        "price_per_sqft": price_per_sqft,
+        "vs_market_pct": vs_market_pct,
+        "score": offer.get("score", 0),
+        "close_date": offer.get("close_date"),
+        "financing": offer.get("financing"),
+        "earnest_money": offer.get("earnest_money"),
+        "contingencies": offer.get("contingencies"),
+        "buyer_letter": offer.get("buyer_letter"),
+    }
+    return {k: v for k, v in compact.items() if v not in (None, "", [], {})}
+
+
+def _serialize_offer(offer: Dict[str, Any]) -> str:
+    return json.dumps(offer, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def market_line(market: Optional[Dict[str, Any]]) -> Optional[str]:
+    """One prompt line of rolling market figures (see market_stats.py), or None"""
+    if not market:
+        return None
+    scope = f"zip {market['zip_code']}"
+    if market.get("scope") == "zip_and_type":
+        scope += f" {market['property_type']}"
+    parts = [f"{scope}, {market['sales']} sales in the last {market['window_days']} days"]
+    labels = (("price_per_sqft", "$/sqft", "{:.2f}"), ("days_on_market", "days on market", "{:.0f}"),
+              ("sale_to_list", "sale-to-list", "{:.3f}"))
+    for name, label, fmt in labels:
+        stats = market.get(name)
+        if stats:
+            parts.append(f"{label} median {fmt.format(stats['median'])} "
+                         f"(p25 {fmt.format(stats['p25'])}, p75 {fmt.format(stats['p75'])})")
+    return "Market: " + "; ".join(parts)
+
+
+def _user_prompt(lines: List[str], total_offers: int, market: Optional[str] = None) -> str:
+    header = f"Analyze these {len(lines)} offers for a property"
+    if len(lines) < total_offers:
+        header += f" (part of {total_offers} offers; ranks are global)"
+    return (
+        f"{header}:\n"
+        + (f"{market}\n" if market else "")
+        + "\n".join(lines)
+        + "\nProvide a summary of which offer is strongest and a pros/cons table for each offer."
+    )
+
+
+def build_offer_prompts(ranked_offers: List[Dict],
+                        max_tokens: Optional[int] = None,
+                        market: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Build token-budgeted user prompts for an offer analysis.
+
+    Offers are serialized as compact JSON lines. If the prompt exceeds
+    max_tokens, buyer letters are summarized to an equal share of the
+    remaining budget; if it still does not fit, offers are split into
+    chunks that each fit the budget. With market context (a
+    MarketStats.stats result plus ``subject_square_feet``) every chunk
+    gets the Market line and offers get their $/sqft against it.
+
+    Returns:
+        dict with 'prompts' (one per chunk), 'prompt_tokens' and
+        'letters_compacted'
+    """
+    if max_tokens is None:
+        max_tokens = OFFER_PROMPT_MAX_TOKENS
+    compact = [_compact_offer(i + 1, offer, market) for i, offer in enumerate(ranked_offers)]
+    lines = [_serialize_offer(o) for o in compact]
+    context = market_line(market)
+    overhead = count_tokens(_user_prompt([], len(lines), context))
+    letters_compacted = 0
+
+    if overhead + sum(count_tokens(line) for line in lines) > max_tokens:
+        fixed = sum(
+            count_tokens(_serialize_offer({k: v for k, v in o.items() if k != "buyer_letter"}))
+            for o in compact
+        )
+        letter_budget = max(MIN_LETTER_TOKENS, (max_tokens - overhead - fixed) // max(len(compact), 1))
+        for offer in compact:
+            letter = offer.get("buyer_letter")
+            if letter and count_tokens(letter) > letter_budget:
+                offer["buyer_letter"] = summarize_to_tokens(letter, letter_budget)
+                letters_compacted += 1
+        lines = [_serialize_offer(o) for o in compact]
+
+    # Greedily pack offers into chunks that fit the budget
+    chunks: List[List[str]] = [[]]
+    used = overhead
+    for line in lines:
+        tokens = count_tokens(line)
+        if chunks[-1] and used + tokens > max_tokens:
+            chunks.append([])
+            used = overhead
+        chunks[-1].append(line)
+        used += tokens
+
+    prompts = [_user_prompt(chunk, len(lines), context) for chunk in chunks]
+    return {
+        "prompts": prompts,
+        "prompt_tokens": sum(count_tokens(p) for p in prompts),
+        "letters_compacted": letters_compacted,
+    }
+
+
+def _top_offer_summary(ranked_offers: List[Dict]) -> str:
+    """Summary naming the top-ranked offer, for when no LLM summary is available."""
+    top = ranked_offers[0] if ranked_offers else {}
+    return (f"GPT analysis generated for {len(ranked_offers)} offers. "
+            f"Top offer: ${top.get('price', 0):,} with score {top.get('score', 0)}")
+
+
+def build_reduce_prompt(ranked_offers: List[Dict],
+                        analyses: List[Dict[str, Any]],
+                        market: Optional[Dict[str, Any]] = None) -> str:
+    """User prompt for the reduce step of a split analysis.
+
+    Lists each part's summary with the ranks it covered, and the top
+    REDUCE_TOP_OFFERS offers across all parts (without buyer letters), so
+    the final summary is written with every part in view.
+    """
+    lines = [f"{len(ranked_offers)} offers were analyzed in {len(analyses)} parts."]
+    for i, analysis in enumerate(analyses, 1):
+        ranks = [row["rank"] for row in (analysis or {}).get("pros_cons_table", [])
+                 if isinstance(row.get("rank"), int)]
+        covered = f" (offers ranked {min(ranks)}-{max(ranks)})" if ranks else ""
+        summary = (analysis or {}).get("summary") or "no analysis"
+        lines.append(f"Part {i}{covered}: {summary}")
+    context = market_line(market)
+    if context:
+        lines.append(context)
+    lines.append("Top offers by score across all parts:")
+    for i, offer in enumerate(ranked_offers[:REDUCE_TOP_OFFERS]):
+        compact = _compact_offer(i + 1, offer, market)
+        compact.pop("buyer_letter", None)
+        lines.append(_serialize_offer(compact))
+    return "\n".join(lines)
+
+
+def _merge_chunk_analyses(ranked_offers: List[Dict],
+                          analyses: List[Dict[str, Any]],
+                          summary: Optional[str] = None) -> Dict[str, Any]:
+    """Reduce per-chunk analyses: tables merged by rank, one summary over all chunks.
+
+    ``summary`` comes from the reduce call; without it the summary names the
+    top-ranked offer, since no single chunk saw every offer.
+    """
+    table = []
+    for analysis in analyses:
+        table.extend(analysis.get("pros_cons_table", []))
+    table.sort(key=lambda row: row.get("rank", 0) if isinstance(row.get("rank"), int) else 0)
+    return {
+        "summary": summary or _top_offer_summary(ranked_offers),
+        "pros_cons_table": table,
+    }
+
+
+def reduce_offer_analyses(ranked_offers: List[Dict],
+                          analyses: List[Dict[str, Any]],
+                          summary: Optional[str] = None) -> Dict[str, Any]:
+    """Combine per-chunk analyses (empty dicts for failed chunks) into one result.
+
+    ``summary`` is the reduce step's summary for a split analysis.
+    """
+    if len(analyses) == 1:
+        analysis = analyses[0]
+    else:
+        analysis = _merge_chunk_analyses(ranked_offers, [a for a in analyses if a], summary)
+
+    # Fallback if JSON extraction fails
+    if not analysis or not analysis.get("summary"):
+        analysis = {
+            "summary": _top_offer_summary(ranked_offers),
+            "pros_cons_table": analysis.get("pros_cons_table", []) if analysis else []
+        }
+    return analysis
+
+
+async def generate_gpt_analysis(offers: List[Dict],
+                                ranked_offers: List[Dict],
+                                market: Optional[Dict[str, Any]] = None,
+                                limit: Optional[asyncio.Semaphore] = None) -> Dict[str, Any]:
+    """Generate GPT analysis of offers with summary and pros/cons table.
+
+    ``limit`` bounds concurrent LLM requests; pass one semaphore to share
+    the bound across many analyses (portfolio mode).
+    """
+    if not get_router:
         return {
-            "summary": "GPT analysis not available - OpenAI client not configured",
+            "summary": "GPT analysis not available - LLM client not configured",
             "pros_cons_table": []
         }
     
-    try:
-        client = OpenAIClient()
+    with span("generate_gpt_analysis", {"offers.count": len(ranked_offers)}) as analysis_span:
+        try:
+            client = get_router()
         
-        # Prepare offers data for GPT
-        offers_data = []
-        for i, offer in enumerate(ranked_offers):
-            offer_info = {
-                "rank": i + 1,
-                "price": offer.get("price", 0),
-                "close_date": offer.get("close_date", "Unknown"),
-                "contingencies": offer.get("contingencies", []),
-                "buyer_letter": offer.get("buyer_letter", ""),
-                "score": offer.get("score", 0),
-                "financing": offer.get("financing", "Unknown"),
-                "earnest_money": offer.get("earnest_money", 0)
+            built = build_offer_prompts(ranked_offers, market=market)
+            prompts = built["prompts"]
+            system_tokens = count_tokens(OFFER_ANALYSIS_SYSTEM_PROMPT)
+            prompt_stats = {
+                "prompt_tokens": built["prompt_tokens"] + system_tokens * len(prompts),
+                "chunks": len(prompts),
+                "letters_compacted": built["letters_compacted"],
             }
-            offers_data.append(offer_info)
+            analysis_span.set("llm.chunks", len(prompts))
         
-        system_prompt = """You are a real estate expert analyzing multiple offers for a property. 
-        Provide a concise summary of which offer is strongest and why, plus a detailed pros/cons table for each offer.
+            semaphore = limit or asyncio.Semaphore(MAX_CONCURRENT_CHUNKS)
         
-        Focus on:
-        - Price strength relative to market
-        - Financing terms and reliability
-        - Closing timeline
-        - Contingencies and risk factors
-        - Buyer qualifications and earnest money
-        - Overall offer attractiveness for the seller
+            async def analyze(user_prompt: str) -> Dict[str, Any]:
+                async with semaphore:
+                    response = await client.chat(
+                        messages=[{"role": "user", "content": user_prompt}],
+                        system=OFFER_ANALYSIS_SYSTEM_PROMPT
+                    )
+                # Extract JSON from response
+                return client.extract_json(response)
         
-        Format your response as JSON with:
-        {
-            "summary": "2-3 sentence summary of the strongest offer",
-            "pros_cons_table": [
-                {
-                    "rank": 1,
-                    "price": "$X",
-                    "pros": ["pro1", "pro2", "pro3"],
-                    "cons": ["con1", "con2"],
-                    "overall_assessment": "Brief assessment"
-                }
-            ]
-        }"""
+            # Map: analyze each chunk concurrently; reduce: merge tables by rank
+            # and summarize across the chunks' summaries
+            analyses = await asyncio.gather(*(analyze(p) for p in prompts))
+            summary = None
+            if len(prompts) > 1:
+                reduce_prompt = build_reduce_prompt(ranked_offers, analyses, market)
+                prompt_stats["prompt_tokens"] += count_tokens(reduce_prompt) + count_tokens(OFFER_REDUCE_SYSTEM_PROMPT)
+                try:
+                    async with semaphore:
+                        response = await client.chat(
+                            messages=[{"role": "user", "content": reduce_prompt}],
+                            system=OFFER_REDUCE_SYSTEM_PROMPT
+                        )
+                    summary = (client.extract_json(response) or {}).get("summary")
+                except Exception as e:
+                    # The merged tables still stand; the summary falls back to the top offer
+                    analysis_span.set("llm.reduce_error", str(e))
+            # Recorded once the reduce prompt is counted, so totals cover every call
+            get_prompt_metrics("generate_gpt_analysis").record(
+                prompt_stats["prompt_tokens"],
+                compacted=built["letters_compacted"] > 0,
+                chunks=len(prompts),
+            )
+            analysis_span.set("llm.prompt_tokens", prompt_stats["prompt_tokens"])
+            analysis = reduce_offer_analyses(ranked_offers, analyses, summary)
+            analysis["prompt_stats"] = prompt_stats
+            return analysis
         
-        user_prompt = f"""Analyze these {len(offers_data)} offers for a property:
-        
-        {offers_data}
-        
-        Provide a summary of which offer is strongest and a pros/cons table for each offer."""
-        
-        response = await client.chat(
-            messages=[{"role": "user", "content": user_prompt}],
-            system=system_prompt
-        )
-        
-        # Extract JSON from response
-        analysis = client.extract_json(response)
-        
-        # Fallback if JSON extraction fails
-        if not analysis:
-            analysis = {
-                "summary": f"GPT analysis generated for {len(offers_data)} offers. Top offer: ${ranked_offers[0].get('price', 0):,} with score {ranked_offers[0].get('score', 0)}",
+        except Exception as e:
+            analysis_span.record_error(e)
+            return {
+                "summary": f"Error generating GPT analysis: {str(e)}",
                 "pros_cons_table": []
             }
-        
-        return analysis
-        
-    except Exception as e:
-        return {
-            "summary": f"Error generating GPT analysis: {str(e)}",
-            "pros_cons_table": []
-        }
 
 
 def create_pros_cons_table(offers: List[Dict]) -> List[Dict[str, Any]]:
@@ -0,0 +1,371 @@
+"""
+Automated valuation (AVM) over a PropertyTable of recent sales
+
+Values a property from its nearest same-zip comps, adjusting each comp's
+sale price with hedonic coefficients for square footage, bedrooms,
+bathrooms and age. Coefficients are fitted per zip code by least squares
+from running sufficient statistics, so loading new sales only updates the
+affected zips and refits them lazily.
+"""
+import threading
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Sequence
+
+import numpy as np
+
+# Feature order for comps distance and hedonic adjustments
+FEATURES = ("square_feet", "bedrooms", "bathrooms", "age")
+# Per-feature scale used for comps distance (one "unit" of dissimilarity)
+FEATURE_SCALE = np.array([500.0, 1.0, 1.0, 15.0])
+# Two-sided z-score for the reported interval. It is a prediction interval
+# for the subject's own value (comp dispersion plus the estimate's standard
+# error), not the narrower interval for the mean of the comps.
+CONFIDENCE_LEVEL = 0.9
+Z_SCORE = 1.645
+# Comps nearest in square footage that are scored per subject; zips with
+# fewer sales are searched exhaustively
+CANDIDATE_WINDOW = 512
+# Upper bound on subjects x candidates distance cells computed at once
+MAX_BLOCK_CELLS = 4_000_000
+
+
+class _SufficientStats:
+    """Running X'X / X'y for a least-squares fit on [1, features]"""
+
+    __slots__ = ("xtx", "xty", "n")
+
+    def __init__(self):
+        self.xtx = np.zeros((len(FEATURES) + 1, len(FEATURES) + 1))
+        self.xty = np.zeros(len(FEATURES) + 1)
+        self.n = 0
+
+    def add(self, features: np.ndarray, prices: np.ndarray) -> None:
+        design = np.column_stack([np.ones(len(features)), features])
+        self.xtx += design.T @ design
+        self.xty += design.T @ prices
+        self.n += len(features)
+
+    def solve(self) -> Optional[np.ndarray]:
+        if self.n <= len(FEATURES) + 1:
+            return None
+        # Light ridge penalty on the slopes keeps near-collinear zips stable
+        ridge = np.eye(len(FEATURES) + 1) * 1e-6 * np.trace(self.xtx) / self.xtx.shape[0]
+        ridge[0, 0] = 0.0
+        try:
+            return np.linalg.solve(self.xtx + ridge, self.xty)
+        except np.linalg.LinAlgError:
+            return None
+
+
+class _ZipPartition:
+    """Comparable sales for one zip code, kept sorted by square footage"""
+
+    __slots__ = ("features", "prices", "row_ids", "addresses", "stats", "coefficients")
+
+    def __init__(self):
+        self.features = np.empty((0, len(FEATURES)))
+        self.prices = np.empty(0)
+        self.row_ids = np.empty(0, dtype=np.int64)
+        self.addresses = np.empty(0, dtype=object)
+        self.stats = _SufficientStats()
+        self.coefficients: Optional[np.ndarray] = None
+
+
+class ValuationModel:
+    """Hedonic comps-based valuation with per-zip cached coefficients"""
+
+    def __init__(self, table, comps: int = 6, min_fit_sales: int = 30, current_year: Optional[int] = None):
+        """
+        Args:
+            table: PropertyTable of sold properties (price = sale price)
+            comps: Number of nearest comps used per valuation
+            min_fit_sales: Sales a zip needs before its own coefficients are
+                used instead of the pooled (all-zip) coefficients
+            current_year: Year used to turn year_built into age
+        """
+        self.table = table
+        self.comps = comps
+        self.min_fit_sales = min_fit_sales
+        self.current_year = current_year or datetime.now().year
+        self._partitions: Dict[str, _ZipPartition] = {}
+        self._pooled = _SufficientStats()
+        self._pooled_coefficients: Optional[np.ndarray] = None
+        self._pooled_dirty = True
+        self._seen_zips: set = set()
+        self._next_row_id = len(table)
+        # Partitions are built lazily from tool threads; builds and loads are serialized
+        self._lock = threading.RLock()
+
+        features, prices, _ = self._extract(table)
+        self._pooled.add(features, prices)
+
+    def _extract(self, table):
+        """Feature matrix, prices and row ids of rows usable as comps"""
+        sqft = table.column("square_feet").astype(np.float64)
+        beds = table.column("bedrooms").astype(np.float64)
+        baths = table.column("bathrooms").astype(np.float64)
+        year = table.column("year_built").astype(np.float64)
+        prices = table.column("price").astype(np.float64)
+        age = np.where(year > 0, self.current_year - year, np.nan)
+
+        usable = (prices > 0) & (sqft > 0) & (beds >= 0) & ~np.isnan(baths)
+        # Unknown age: use the median age of the rows that have one
+        known_age = age[usable & ~np.isnan(age)]
+        age = np.where(np.isnan(age), np.median(known_age) if len(known_age) else 0.0, age)
+
+        features = np.column_stack([sqft, beds, baths, age])[usable]
+        return features, prices[usable], table.row_ids()[usable]
+
+    def _partition(self, zip_code: str) -> Optional[_ZipPartition]:
+        partition = self._partitions.get(zip_code)
+        if partition is not None or zip_code in self._seen_zips:
+            return partition
+        with self._lock:
+            partition = self._partitions.get(zip_code)
+            if partition is None and zip_code not in self._seen_zips:
+                view = self.table.filter(zip_codes=[zip_code])
+                if len(view):
+                    partition = _ZipPartition()
+                    features, prices, row_ids = self._extract(view)
+                    self._append(partition, features, prices, row_ids, None)
+                    self._partitions[zip_code] = partition
+                self._seen_zips.add(zip_code)
+        return partition
+
+    def _append(self, partition: _ZipPartition, features, prices, row_ids, addresses) -> None:
+        partition.stats.add(features, prices)
+        partition.coefficients = None
+        if addresses is None:
+            addresses = [None] * len(row_ids)
+        new_addresses = np.empty(len(addresses), dtype=object)
+        new_addresses[:] = addresses
+
+        merged = np.concatenate([partition.features, features])
+        order = np.argsort(merged[:, 0], kind="stable")
+        partition.features = merged[order]
+        partition.prices = np.concatenate([partition.prices, prices])[order]
+        partition.row_ids = np.concatenate([partition.row_ids, row_ids])[order]
+        partition.addresses = np.concatenate([partition.addresses, new_addresses])[order]
+
+    def add_sales(self, sales: Sequence[Any]) -> int:
+        """Load new sales (Property records or dicts with a sale price).
+
+        Only the zips touched by the new sales are refitted, on next use.
+        Returns the number of sales accepted.
+        """
+        by_zip: Dict[str, list] = {}
+        for sale in sales:
+            get = sale.get if isinstance(sale, dict) else lambda k, s=sale: getattr(s, k, None)
+            try:
+                values = [_number(get(name), name) for name in ("square_feet", "bedrooms", "bathrooms", "price")]
+            except ValueError:
+                continue
+            if get("zip_code") is None or any(v is None for v in values):
+                continue
+            *features, price = values
+            features.append(self._age(get("year_built")))
+            by_zip.setdefault(str(get("zip_code")), []).append((features, price, get("address")))
+
+        accepted = 0
+        with self._lock:
+            for zip_code, rows in by_zip.items():
+                partition = self._partition(zip_code)
+                if partition is None:
+                    partition = self._partitions[zip_code] = _ZipPartition()
+                # Unknown age: the zip's median age, as for rows of the table
+                known_ages = [r[0][3] for r in rows if r[0][3] is not None]
+                known_ages.extend(partition.features[:, 3])
+                median_age = float(np.median(known_ages)) if known_ages else 0.0
+                for row in rows:
+                    if row[0][3] is None:
+                        row[0][3] = median_age
+                features = np.array([r[0] for r in rows], dtype=np.float64)
+                prices = np.array([r[1] for r in rows], dtype=np.float64)
+                row_ids = np.arange(self._next_row_id, self._next_row_id + len(rows))
+                self._next_row_id += len(rows)
+                self._append(partition, features, prices, row_ids, [r[2] for r in rows])
+                self._pooled.add(features, prices)
+                accepted += len(rows)
+            self._pooled_dirty = True
+        return accepted
+
+    def cache_info(self) -> Dict[str, int]:
+        """How many zip partitions are loaded and have fitted coefficients"""
+        return {
+            "zips_loaded": len(self._partitions),
+            "zips_fitted": sum(1 for p in self._partitions.values() if p.coefficients is not None),
+        }
+
+    def coefficients(self, zip_code: str) -> Optional[np.ndarray]:
+        """Hedonic coefficients [intercept, per sqft, per bed, per bath, per year of age]"""
+        if self._pooled_dirty:
+            self._pooled_coefficients = self._pooled.solve()
+            self._pooled_dirty = False
+        partition = self._partition(zip_code)
+        if partition is None or partition.stats.n < self.min_fit_sales:
+            return self._pooled_coefficients
+        if partition.coefficients is None:
+            partition.coefficients = partition.stats.solve()
+        if partition.coefficients is None:
+            return self._pooled_coefficients
+        return partition.coefficients
+
+    def _age(self, year_built: Any) -> Optional[float]:
+        """Age from year_built, which may be a string (CSV/JSON input); None when unknown"""
+        try:
+            year = float(year_built)
+        except (TypeError, ValueError):
+            return None
+        # Like the table path, a zero or missing year means unknown
+        return self.current_year - year if year > 0 else None
+
+    def _subject_values(self, subject: Dict[str, Any]) -> List[Optional[float]]:
+        """Subject features with None where unknown; raises ValueError for a value that is not a number"""
+        return [
+            _number(subject.get("square_feet"), "square_feet"),
+            _number(subject.get("bedrooms"), "bedrooms"),
+            _number(subject.get("bathrooms"), "bathrooms"),
+            self._age(subject.get("year_built")),
+        ]
+
+    @staticmethod
+    def _subject_features(values: List[Optional[float]], medians: np.ndarray) -> np.ndarray:
+        """Subject feature vector, imputing missing values from the zip medians"""
+        return np.array([medians[i] if v is None else v for i, v in enumerate(values)])
+
+    def estimate_many(self, subjects: Sequence[Dict[str, Any]], include_comps: bool = False) -> List[Dict[str, Any]]:
+        """Value many properties at once.
+
+        Subjects are dicts with Property fields; an optional ``row_id`` keeps
+        a subject that is itself in the table from being its own comp.
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(subjects)
+        values: List[Optional[List[Optional[float]]]] = [None] * len(subjects)
+        by_zip: Dict[str, List[int]] = {}
+        for i, subject in enumerate(subjects):
+            if not isinstance(subject, dict):
+                results[i] = _error({}, "Each property must be a dict of property fields")
+                continue
+            zip_code = subject.get("zip_code")
+            if zip_code is None:
+                results[i] = _error(subject, "zip_code is required for valuation")
+                continue
+            try:
+                values[i] = self._subject_values(subject)
+            except ValueError as e:
+                results[i] = _error(subject, str(e))
+                continue
+            by_zip.setdefault(str(zip_code), []).append(i)
+
+        for zip_code, indices in by_zip.items():
+            partition = self._partition(zip_code)
+            beta = self.coefficients(zip_code)
+            if partition is None or len(partition.prices) < 2 or beta is None:
+                for i in indices:
+                    results[i] = _error(subjects[i], f"Not enough sales in zip {zip_code} to value")
+                continue
+
+            k = min(self.comps, len(partition.prices) - 1)
+            medians = np.median(partition.features, axis=0)
+            subject_x = np.array([self._subject_features(values[i], medians) for i in indices])
+            subject_ids = np.array([subjects[i].get("row_id", -1) for i in indices], dtype=np.int64)
+            comps_scaled = partition.features / FEATURE_SCALE
+            # Partitions are sorted by square footage, so each subject only
+            # scores the window of comps closest to it in size
+            window = min(CANDIDATE_WINDOW, len(partition.prices))
+            lo = np.searchsorted(partition.features[:, 0], subject_x[:, 0]) - window // 2
+            lo = np.clip(lo, 0, len(partition.prices) - window)
+            offsets = np.arange(window)
+            block = max(1, MAX_BLOCK_CELLS // window)
+
+            for start in range(0, len(indices), block):
+                xs = subject_x[start:start + block]
+                candidates = lo[start:start + block, None] + offsets[None, :]
+
+                diff = comps_scaled[candidates] - (xs / FEATURE_SCALE)[:, None, :]
+                dist = np.einsum("ijk,ijk->ij", diff, diff)
+                dist[partition.row_ids[candidates] == subject_ids[start:start + block, None]] = np.inf
+
+                picked = np.argpartition(dist, k - 1, axis=1)[:, :k]
+                near_dist = np.sqrt(np.take_along_axis(dist, picked, axis=1))
+                nearest = np.take_along_axis(candidates, picked, axis=1)
+
+                # Adjust each comp's price to the subject's features
+                deltas = xs[:, None, :] - partition.features[nearest]
+                adjusted = partition.prices[nearest] + deltas @ beta[1:]
+
+                weights = 1.0 / (near_dist + 0.1)
+                weights /= weights.sum(axis=1, keepdims=True)
+                estimate = (weights * adjusted).sum(axis=1)
+                spread = np.sqrt((weights * (adjusted - estimate[:, None]) ** 2).sum(axis=1))
+                # Prediction interval: a single home varies around the comps'
+                # estimate by their spread, plus the estimate's own error
+                margin = Z_SCORE * spread * np.sqrt(1.0 + 1.0 / k)
+
+                for j, i in enumerate(indices[start:start + block]):
+                    result = {
+                        "address": subjects[i].get("address"),
+                        "zip_code": zip_code,
+                        "estimated_value": round(float(estimate[j]), -2),
+                        "confidence_interval": {
+                            "low": round(float(estimate[j] - margin[j]), -2),
+                            "high": round(float(estimate[j] + margin[j]), -2),
+                            "level": CONFIDENCE_LEVEL,
+                        },
+                        "confidence": _confidence_label(margin[j] / estimate[j] if estimate[j] > 0 else 1.0),
+                        "price_per_sqft": round(float(estimate[j] / xs[j, 0]), 2) if xs[j, 0] > 0 else None,
+                        "comps_used": int(k),
+                        "status": "success",
+                    }
+                    if include_comps:
+                        order = np.argsort(near_dist[j])
+                        result["comps"] = [
+                            {
+                                "address": self._address(partition, int(nearest[j, c])),
+                                "sale_price": float(partition.prices[nearest[j, c]]),
+                                "adjusted_price": round(float(adjusted[j, c]), -2),
+                                "square_feet": int(partition.features[nearest[j, c], 0]),
+                                "bedrooms": int(partition.features[nearest[j, c], 1]),
+                                "bathrooms": float(partition.features[nearest[j, c], 2]),
+                            }
+                            for c in order
+                        ]
+                        result["adjustments"] = dict(zip(
+                            ("per_sqft", "per_bedroom", "per_bathroom", "per_year_of_age"),
+                            (round(float(b), 2) for b in beta[1:]),
+                        ))
+                    results[i] = result
+        return results
+
+    def _address(self, partition: _ZipPartition, index: int) -> Optional[str]:
+        address = partition.addresses[index]
+        if address is None and partition.row_ids[index] < len(self.table):
+            address = self.table[int(partition.row_ids[index])].address
+        return address
+
+
+def _confidence_label(relative_margin: float) -> str:
+    if relative_margin <= 0.05:
+        return "high"
+    if relative_margin <= 0.10:
+        return "medium"
+    return "low"
+
+
+def _number(value: Any, name: str) -> Optional[float]:
+    """A numeric field given as a number or numeric string; None when missing"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, bool):
+        raise ValueError(f"{name} must be a number, got {value!r}")
+    try:
+        number = float(value.replace(",", "") if isinstance(value, str) else value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a number, got {value!r}")
+    if not np.isfinite(number) or number < 0:
+        raise ValueError(f"{name} must be a non-negative number, got {value!r}")
+    return number
+
+
+def _error(subject: Dict[str, Any], message: str) -> Dict[str, Any]:
+    return {"address": subject.get("address"), "status": "error", "message": message}
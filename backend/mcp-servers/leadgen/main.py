@@ -8,39 +8,166 @@ import asyncio
 from pathlib import Path
 
 # Add shared utils to path
-sys.path.append(str(Path(__file__).parent.parent / "shared" / "utils"))
+sys.path.append(str(Path(__file__).parent.parent.parent / "shared" / "utils"))
 
+from startup import Startup
+from health import Health, cache_check, storage_probe
+import deadline
+from admission import AdmissionControl, DeadlineMiddleware, ToolLimit
+from profiling import Profiler
+import trace_context
+from tracing import TracingMiddleware
+import call_log
+from call_logging import CallLogMiddleware
+from search_index import get_search_index
+from shared_state import shared_state_metrics
 from fastmcp import FastMCP
-from tools.lead_tools import LeadGenTools
 
 # Initialize FastMCP server
 server = FastMCP("LeadGenMCP")
+startup = Startup("LeadGenMCP")
+health = Health(startup)
 
-# Create lead tools instance
-lead_tools = LeadGenTools()
+# The lead tools are imported and built in the background once the port is
+# open (or on first call, whichever comes first)
+def _lead_tools():
+    from tools.lead_tools import LeadGenTools
+    return LeadGenTools()
+
+lead_tools = startup.resource("lead_tools", _lead_tools)
+
+def _llm_router():
+    from llm_router import get_router
+    get_router()
+
+# Without an API key the tools fall back to rule-based answers, so this is optional
+startup.warm("llm_router", _llm_router)
+
+def _lead_dedup():
+    # Index existing leads so generate_lead can spot duplicates at insert
+    lead_tools.get().dedup
+
+if os.getenv("LEAD_STORE_PATH"):
+    startup.warm("lead_dedup", _lead_dedup, required=True)
+
+def _follow_up_scheduler():
+    # Reloads the schedule from its snapshot and journal, then dispatches
+    # due follow-ups in the background
+    scheduler = lead_tools.get().scheduler
+    if scheduler is not None:
+        scheduler.start()
+        health.add_metrics("follow_ups", scheduler.snapshot)
+
+if os.getenv("FOLLOWUP_STATE_DIR"):
+    startup.warm("follow_up_scheduler", _follow_up_scheduler, required=True)
+
+# Readiness checks: tool logs are written next to main.py
+health.add_check("storage", storage_probe(str(Path(__file__).parent)), required=True)
+health.add_check("caches", cache_check(lead_tools=lead_tools))
+
+# Each tool call is a span in the caller's trace (W3C traceparent from the
+# request _meta or HTTP header), exported to OTEL_EXPORTER_OTLP_ENDPOINT.
+# Outermost middleware, so the span also covers deadline and admission waits.
+trace_context.configure(service_name="leadgen-mcp")
+server.add_middleware(TracingMiddleware())
+health.add_metrics("tracing", trace_context.metrics_snapshot)
+
+# Every tool call is appended to logs.txt (or CALL_LOG_PATH) as a structured
+# record that benchmarks/replay_calls.py can replay or shadow to a candidate
+# build. Inside tracing, so records carry the call's trace id.
+call_records = call_log.open_call_log("leadgen", str(Path(__file__).parent / "logs.txt"))
+server.add_middleware(CallLogMiddleware(call_records))
+if call_records is not None:
+    health.add_metrics("call_log", call_records.snapshot)
+
+# Every tool call runs under a request deadline that LLM calls honour; it is
+# cancelled when the client disconnects or gives up.
+server.add_middleware(DeadlineMiddleware({"qualify_lead": 15.0}))
+
+# Per-phase timings and slow-call traces for every tool call, and profiling
+# switched on per tool from /admin/profiling. Outside admission, so queue
+# waits show up as the queued phase.
+profiler = Profiler()
+profiler.register(server)
+health.add_metrics("profiling", profiler.snapshot)
+health.add_metrics("upstream", deadline.metrics_snapshot)
+
+# Admission control: LLM-backed tools get fewer slots and cost more of each
+# client's quota. Queue waits count against the request deadline.
+admission = AdmissionControl({
+    "qualify_lead": ToolLimit(concurrency=8, queue=32, max_wait=10.0, cost=3.0),
+})
+server.add_middleware(admission)
+health.add_metrics("admission", admission.snapshot)
+
+# Full-text search (SEARCH_INDEX_PATH shares one index between the servers);
+# leads already in the lead store are indexed on first start
+startup.warm("search_index", lambda: lead_tools.get().index_leads(), required=True)
+health.add_metrics("search", lambda: get_search_index().snapshot())
+
+# Caches shared with the other servers (SHARED_STATE_URL)
+health.add_metrics("shared_state", shared_state_metrics)
+
+# Local embeddings of past inquiries (EMBEDDING_INDEX_PATH keeps them on disk,
+# memory-mapped); powers similar_leads and qualify_lead's offline fallback
+def _embedding_index():
+    index = lead_tools.get().embeddings
+    health.add_metrics("embeddings", index.snapshot)
+
+startup.warm("embedding_index", _embedding_index, required=True)
 
 # Register tools using the @tool decorator
 @server.tool
 def ping():
     """Test connection to LeadGen MCP server"""
-    return lead_tools.ping()
+    return lead_tools.get().ping()
 
 @server.tool
 def generate_lead(property_address: str, client_name: str, client_email: str, client_phone: str = None, notes: str = None):
-    """Generate a new lead from property and client information"""
-    return lead_tools.generate_lead(property_address, client_name, client_email, client_phone, notes)
+    """Generate a new lead from property and client information (repeat inquiries merge into the existing lead)"""
+    return lead_tools.get().generate_lead(property_address, client_name, client_email, client_phone, notes)
+
+@server.tool
+def find_duplicate_lead(client_name: str, client_email: str = None, client_phone: str = None, property_address: str = None):
+    """Find an existing lead matching these client details, without creating one"""
+    return lead_tools.get().find_duplicate(client_name, client_email, client_phone, property_address)
 
 @server.tool
 def follow_up(lead_id: str, message: str, follow_up_type: str = "email"):
     """Send follow-up message to a lead"""
-    return lead_tools.follow_up(lead_id, message, follow_up_type)
+    return lead_tools.get().follow_up(lead_id, message, follow_up_type)
+
+@server.tool
+def schedule_follow_ups(lead_id: str, cadence: str = "warm", start_in_hours: float = None):
+    """Enroll a lead in a drip follow-up cadence (hot, warm or cold)"""
+    return lead_tools.get().schedule_follow_ups(lead_id, cadence, start_in_hours)
+
+@server.tool
+def cancel_follow_ups(lead_id: str):
+    """Take a lead off its drip follow-up cadence"""
+    return lead_tools.get().cancel_follow_ups(lead_id)
+
+@server.tool
+def follow_up_status(lead_id: str):
+    """Show a lead's next scheduled follow-up"""
+    return lead_tools.get().follow_up_status(lead_id)
 
 @server.tool
 def qualify_lead(name: str, email: str, inquiry: str):
     """Qualify a real estate lead as hot, warm, or cold"""
-    return lead_tools.qualify_lead(name, email, inquiry)
+    return lead_tools.get().qualify_lead(name, email, inquiry)
+
+@server.tool
+def similar_leads(text: str, k: int = 5):
+    """Find past leads and inquiries similar to a text, with their outcomes and a hot/warm/cold intent estimate"""
+    return lead_tools.get().similar_leads(text, k)
+
+@server.tool
+def search(query: str, kinds: list = None, limit: int = 10):
+    """Full-text search over leads and inquiries (and other servers' contracts and disclosures when the index is shared), BM25-ranked with prefix matching"""
+    return get_search_index().search(query, kinds, limit)
 
 if __name__ == "__main__":
     port = int(os.getenv("LEADGEN_MCP_PORT", 3001))
     print(f"🚀 Starting LeadGen MCP Server on port {port}")
-    asyncio.run(server.run_http_async(port=port)) 
\ No newline at end of file
+    asyncio.run(health.serve(server, port)) 
\ No newline at end of file
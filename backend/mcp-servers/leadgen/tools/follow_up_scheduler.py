@@ -0,0 +1,390 @@
+"""
+Drip follow-up scheduler for the LeadGen MCP server
+
+Leads enrolled in a cadence (``CADENCES``) get their next follow-up at a
+fixed delay after the previous one. Pending follow-ups are kept in a min-heap
+keyed by due time. Each lead has one live entry: rescheduling or cancelling
+leaves the old heap entry behind, and it is skipped when popped. Scheduling
+and dispatching are therefore O(log n) per follow-up, however many leads are
+enrolled.
+
+State lives in ``state_dir``. It is a snapshot of the live entries, plus an
+append-only journal of changes since that snapshot. A restart reads those two
+files and heapifies them. It never scans the lead table. The journal is
+folded into a new snapshot once it grows well beyond the live set.
+
+Due follow-ups are dispatched in batches. Each carries an idempotency key
+(``lead_id:cadence:enrollment:step``, where the enrollment number tells a
+re-enrolled lead's steps from the ones it had before). Keys of completed sends
+are remembered for ``retention_days``, so a follow-up is never sent twice by
+this scheduler. The sender receives the key too, so a delivery provider can
+deduplicate a send that was in flight when the process died.
+"""
+import os
+import json
+import time
+import heapq
+import threading
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+DAY = 86400.0
+
+# (days after the previous touch, channel) for each step of a drip cadence
+CADENCES: Dict[str, List[Tuple[float, str]]] = {
+    "hot": [(1 / 24, "call"), (1, "email"), (3, "call"), (7, "email")],
+    "warm": [(1, "email"), (3, "email"), (7, "call"), (14, "email"), (30, "email")],
+    "cold": [(7, "email"), (30, "email"), (90, "email")],
+}
+
+# Fold the journal into a snapshot once it has this many lines more than the live set
+COMPACT_SLACK = 50000
+
+
+class DueFollowUp:
+    """A follow-up claimed for dispatch"""
+
+    __slots__ = ("lead_id", "cadence", "step", "due_at", "channel", "enrollment", "key", "seq")
+
+    def __init__(self, lead_id: str, cadence: str, step: int, due_at: float, channel: str, enrollment: int = 0,
+                 seq: int = 0):
+        self.lead_id = lead_id
+        self.cadence = cadence
+        self.step = step
+        self.due_at = due_at
+        self.channel = channel
+        self.enrollment = enrollment
+        # Heap sequence number it was claimed under, to put it back if dispatch fails
+        self.seq = seq
+        # Schedules journaled before enrollments were numbered keep their old keys
+        self.key = f"{lead_id}:{cadence}:{enrollment}:{step}" if enrollment else f"{lead_id}:{cadence}:{step}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "lead_id": self.lead_id,
+            "cadence": self.cadence,
+            "step": self.step,
+            "due_at": self.due_at,
+            "channel": self.channel,
+            "enrollment": self.enrollment,
+            "idempotency_key": self.key,
+        }
+
+
+class FollowUpScheduler:
+    """Persistent heap of next-contact times with batched dispatch"""
+
+    def __init__(self,
+                 state_dir: str,
+                 send: Optional[Callable[[List[DueFollowUp]], List[Dict[str, Any]]]] = None,
+                 batch_size: int = 500,
+                 interval: float = 1.0,
+                 retention_days: float = 30.0,
+                 clock: Callable[[], float] = time.time):
+        """
+        Args:
+            state_dir: Directory for the snapshot and journal
+            send: Delivers a batch; returns one outcome per follow-up, a dict
+                with ``status`` of "sent", "skip" (drop this step and move on),
+                "stop" (leave the cadence) or "later" (retry at ``due_at``)
+            batch_size: Follow-ups claimed per dispatch
+            interval: Seconds the background loop sleeps when nothing is due
+            retention_days: How long idempotency keys of sent follow-ups are kept
+            clock: Wall-clock source (tests)
+        """
+        self.state_dir = state_dir
+        self.send = send
+        self.batch_size = batch_size
+        self.interval = interval
+        self.retention = retention_days * DAY
+        self.clock = clock
+
+        self._heap: List[Tuple[float, int, str]] = []
+        self._live: Dict[str, Tuple[float, int, str, int, int]] = {}  # lead -> (due, seq, cadence, step, enrollment)
+        self._sent: Dict[str, float] = {}
+        self._seq = 0
+        self._journal_lines = 0
+        self._journal = None
+        self._lock = threading.RLock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.stats = {"dispatched": 0, "sent": 0, "duplicates_skipped": 0, "failed": 0, "batches": 0}
+        self.load_ms: Optional[float] = None
+
+    # -- persistence -------------------------------------------------------
+
+    @property
+    def _snapshot_path(self) -> str:
+        return os.path.join(self.state_dir, "snapshot.jsonl")
+
+    @property
+    def _journal_path(self) -> str:
+        return os.path.join(self.state_dir, "journal.jsonl")
+
+    def load(self) -> "FollowUpScheduler":
+        """Rebuild the heap from the snapshot and journal"""
+        started = time.perf_counter()
+        os.makedirs(self.state_dir, exist_ok=True)
+        with self._lock:
+            for path in (self._snapshot_path, self._journal_path):
+                if not os.path.exists(path):
+                    continue
+                with open(path, encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            self._replay(json.loads(line))
+                        except ValueError:
+                            # Torn write from a crash
+                            continue
+                        if path == self._journal_path:
+                            self._journal_lines += 1
+            self._heap = [(due, seq, lead) for lead, (due, seq, *_) in self._live.items()]
+            heapq.heapify(self._heap)
+            self._journal = open(self._journal_path, "a", encoding="utf-8")
+            if self._journal_lines:
+                self._journal.write("\n")  # in case the last line was torn
+        self.load_ms = round((time.perf_counter() - started) * 1000, 1)
+        return self
+
+    def _replay(self, record: Dict[str, Any]) -> None:
+        op = record["op"]
+        if op == "schedule":
+            self._seq = max(self._seq, record["seq"])
+            self._live[record["lead"]] = (record["due"], record["seq"], record["cadence"], record["step"],
+                                          record.get("enr", 0))
+        elif op == "cancel":
+            self._live.pop(record["lead"], None)
+        elif op == "sent":
+            self._sent[record["key"]] = record["at"]
+
+    def _write(self, records: List[Dict[str, Any]]) -> None:
+        if not records:
+            return
+        self._journal.write("".join(json.dumps(r, separators=(",", ":")) + "\n" for r in records))
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+        self._journal_lines += len(records)
+        if self._journal_lines > len(self._live) + COMPACT_SLACK:
+            self.compact()
+
+    def compact(self) -> None:
+        """Write the live entries and recent idempotency keys as a new snapshot and empty the journal"""
+        with self._lock:
+            horizon = self.clock() - self.retention
+            self._sent = {k: at for k, at in self._sent.items() if at >= horizon}
+            tmp = f"{self._snapshot_path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                for lead, (due, seq, cadence, step, enrollment) in self._live.items():
+                    f.write(json.dumps({"op": "schedule", "lead": lead, "due": due, "seq": seq,
+                                        "cadence": cadence, "step": step, "enr": enrollment},
+                                       separators=(",", ":")) + "\n")
+                for key, at in self._sent.items():
+                    f.write(json.dumps({"op": "sent", "key": key, "at": at}, separators=(",", ":")) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self._snapshot_path)
+            self._journal.close()
+            self._journal = open(self._journal_path, "w", encoding="utf-8")
+            self._journal_lines = 0
+            # Drop heap entries left behind by reschedules and cancels
+            self._heap = [(due, seq, lead) for lead, (due, seq, *_) in self._live.items()]
+            heapq.heapify(self._heap)
+
+    def close(self) -> None:
+        self.stop()
+        with self._lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+
+    # -- scheduling --------------------------------------------------------
+
+    def _schedule(self, lead_id: str, cadence: str, step: int, due_at: float,
+                  enrollment: Optional[int] = None) -> Dict[str, Any]:
+        # A new enrollment is numbered by the sequence number of its first step
+        self._seq += 1
+        enrollment = self._seq if enrollment is None else enrollment
+        self._live[lead_id] = (due_at, self._seq, cadence, step, enrollment)
+        heapq.heappush(self._heap, (due_at, self._seq, lead_id))
+        return {"op": "schedule", "lead": lead_id, "due": due_at, "seq": self._seq, "cadence": cadence,
+                "step": step, "enr": enrollment}
+
+    def enroll_many(self, leads: List[Tuple[str, str]], start_at: Optional[float] = None) -> int:
+        """Put leads on step 0 of a cadence, replacing any cadence they are on.
+
+        Args:
+            leads: (lead_id, cadence) pairs
+            start_at: When the first touch is due (default: the cadence's first delay from now)
+        """
+        records = []
+        with self._lock:
+            now = self.clock()
+            for lead_id, cadence in leads:
+                if cadence not in CADENCES:
+                    raise ValueError(f"Unknown cadence: {cadence}")
+                due = start_at if start_at is not None else now + CADENCES[cadence][0][0] * DAY
+                records.append(self._schedule(lead_id, cadence, 0, due))
+            self._write(records)
+        return len(records)
+
+    def enroll(self, lead_id: str, cadence: str, start_at: Optional[float] = None) -> Dict[str, Any]:
+        self.enroll_many([(lead_id, cadence)], start_at)
+        return self.status(lead_id)
+
+    def cancel(self, lead_id: str) -> bool:
+        with self._lock:
+            if lead_id not in self._live:
+                return False
+            del self._live[lead_id]
+            self._write([{"op": "cancel", "lead": lead_id}])
+        return True
+
+    def status(self, lead_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._live.get(lead_id)
+        if entry is None:
+            return None
+        due, _, cadence, step, _ = entry
+        return {
+            "lead_id": lead_id,
+            "cadence": cadence,
+            "step": step,
+            "steps": len(CADENCES[cadence]),
+            "channel": CADENCES[cadence][step][1],
+            "due_at": due,
+        }
+
+    def __len__(self) -> int:
+        return len(self._live)
+
+    # -- dispatch ----------------------------------------------------------
+
+    def claim_due(self, now: Optional[float] = None, limit: Optional[int] = None) -> List[DueFollowUp]:
+        """Pop up to ``limit`` follow-ups due by ``now``, oldest first"""
+        now = self.clock() if now is None else now
+        limit = limit or self.batch_size
+        due: List[DueFollowUp] = []
+        with self._lock:
+            while self._heap and len(due) < limit and self._heap[0][0] <= now:
+                due_at, seq, lead_id = heapq.heappop(self._heap)
+                entry = self._live.get(lead_id)
+                if entry is None or entry[1] != seq:
+                    continue  # rescheduled or cancelled since this entry was pushed
+                _, _, cadence, step, enrollment = entry
+                due.append(DueFollowUp(lead_id, cadence, step, due_at, CADENCES[cadence][step][1], enrollment, seq))
+        return due
+
+    def release(self, batch: List[DueFollowUp]) -> int:
+        """Put claimed follow-ups that were never completed back on the heap"""
+        released = 0
+        with self._lock:
+            for item in batch:
+                live = self._live.get(item.lead_id)
+                # complete() gives every entry it handles a new seq (or drops it)
+                if live is not None and live[1] == item.seq:
+                    heapq.heappush(self._heap, (live[0], live[1], item.lead_id))
+                    released += 1
+        return released
+
+    def complete(self, batch: List[DueFollowUp], outcomes: List[Dict[str, Any]]) -> None:
+        """Record a dispatched batch and schedule each lead's next step, in one journal write.
+
+        Items the sender returned no outcome for are treated as failed and retried.
+        """
+        outcomes = list(outcomes)
+        if len(outcomes) < len(batch):
+            outcomes += [{"status": "failed"}] * (len(batch) - len(outcomes))
+        records = []
+        with self._lock:
+            now = self.clock()
+            for item, outcome in zip(batch, outcomes):
+                live = self._live.get(item.lead_id)
+                if live is None or live[2:] != (item.cadence, item.step, item.enrollment):
+                    continue  # cancelled or re-enrolled while the batch was out
+                status = outcome.get("status")
+                if status == "later":
+                    records.append(self._schedule(item.lead_id, item.cadence, item.step, outcome["due_at"],
+                                                  item.enrollment))
+                    continue
+                if status == "sent":
+                    self._sent[item.key] = now
+                    records.append({"op": "sent", "key": item.key, "at": now})
+                    self.stats["sent"] += 1
+                elif status == "failed":
+                    self.stats["failed"] += 1
+                    records.append(self._schedule(item.lead_id, item.cadence, item.step, now + 300, item.enrollment))
+                    continue
+                steps = CADENCES[item.cadence]
+                if status != "stop" and item.step + 1 < len(steps):
+                    records.append(self._schedule(
+                        item.lead_id, item.cadence, item.step + 1, now + steps[item.step + 1][0] * DAY,
+                        item.enrollment,
+                    ))
+                else:
+                    del self._live[item.lead_id]
+                    records.append({"op": "cancel", "lead": item.lead_id})
+            self._write(records)
+
+    def dispatch_due(self, now: Optional[float] = None) -> int:
+        """Claim one batch of due follow-ups, send it and record the outcomes"""
+        batch = self.claim_due(now)
+        if not batch:
+            return 0
+        try:
+            fresh, duplicates = [], []
+            for item in batch:
+                (duplicates if item.key in self._sent else fresh).append(item)
+            # Already sent before a crash: just advance the cadence
+            self.complete(duplicates, [{"status": "skip"}] * len(duplicates))
+            self.stats["duplicates_skipped"] += len(duplicates)
+
+            try:
+                outcomes = self.send(fresh) if fresh else []
+            except Exception:
+                outcomes = [{"status": "failed"}] * len(fresh)
+            self.complete(fresh, outcomes)
+        except BaseException:
+            # Claimed entries are off the heap; without this they would wait for a restart
+            self.release(batch)
+            raise
+        self.stats["dispatched"] += len(batch)
+        self.stats["batches"] += 1
+        return len(batch)
+
+    # -- background loop ---------------------------------------------------
+
+    def start(self) -> None:
+        """Dispatch due follow-ups on a background thread until stop()"""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="follow-up-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                dispatched = self.dispatch_due()
+            except Exception:
+                dispatched = 0
+            # Drain a backlog without pausing; otherwise poll at the interval
+            if dispatched < self.batch_size:
+                self._stop.wait(self.interval)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            next_due = self._heap[0][0] if self._heap else None
+            return {
+                "scheduled": len(self._live),
+                "heap_entries": len(self._heap),
+                "next_due_in_s": round(next_due - self.clock(), 1) if next_due is not None else None,
+                "journal_lines": self._journal_lines,
+                "idempotency_keys": len(self._sent),
+                "load_ms": self.load_ms,
+                "running": self._thread is not None,
+                **self.stats,
+            }
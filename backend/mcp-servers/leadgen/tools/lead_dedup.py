@@ -0,0 +1,389 @@
+"""
+Lead deduplication for the LeadGen MCP server
+
+The same buyer often arrives from several portals with a slightly different
+name, email or phone number. Each lead is matched two ways:
+
+- exact contact keys: the normalized email (case, Gmail dots and ``+tags``
+  removed) or the last ten digits of the phone number, about the same street
+  address
+- near-duplicates: MinHash signatures of the character 3-grams of the
+  normalized client name, bucketed by LSH band and the property's house
+  number. Only leads sharing a bucket with the new one are compared, so a
+  lookup costs the same however many leads are indexed. A candidate must be
+  similar on both the name and the street-address signature, and its name
+  must then pass an exact 3-gram Jaccard check: typo variants of one name
+  ("Jame Smith") score 0.5-0.55 and different people ("Mary"/"Mark Smith")
+  about 0.45, closer than MinHash can tell apart. A candidate whose email or
+  phone differs from the new lead's is someone else, however similar the
+  name. City and zip are left out, since portals include them inconsistently.
+
+``LeadDedupIndex`` answers one lead at a time (about 0.1 ms). The
+bulk pass, ``cluster_leads``, computes signatures for a whole table in
+parallel worker processes and groups band keys with NumPy sorts rather than
+dictionaries.
+"""
+import os
+import re
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+NUM_PERM = 64
+# 32 bands of 2 rows: names at 0.5 Jaccard become candidates >99.9% of the
+# time. Buckets are also keyed by house number, so they stay small.
+BANDS = 32
+NAME_THRESHOLD = 0.5  # exact Jaccard of name 3-grams needed to call a candidate a duplicate
+ADDRESS_THRESHOLD = 0.5  # estimated Jaccard of street addresses needed as well
+# Candidates whose estimated name similarity is this far under the threshold skip the exact check
+NAME_ESTIMATE_SLACK = 0.2
+
+_PRIME = np.uint64((1 << 61) - 1)
+_rng = np.random.RandomState(20240611)
+_A = _rng.randint(1, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+_B = _rng.randint(0, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+_EMPTY = np.full(NUM_PERM, 0xFFFFFFFF, dtype=np.uint32)
+
+_ADDRESS_WORDS = {
+    "street": "st", "avenue": "ave", "road": "rd", "boulevard": "blvd", "drive": "dr",
+    "lane": "ln", "court": "ct", "place": "pl", "terrace": "ter", "highway": "hwy",
+    "parkway": "pkwy", "circle": "cir", "north": "n", "south": "s", "east": "e",
+    "west": "w", "apartment": "apt", "suite": "ste", "unit": "apt", "#": "apt",
+}
+_GMAIL = ("gmail.com", "googlemail.com")
+_NON_WORD = re.compile(r"[^a-z0-9# ]+")
+
+
+def normalize_email(email: Optional[str]) -> Optional[str]:
+    """Lowercased address with ``+tags`` dropped (and dots, for Gmail)"""
+    if not email or "@" not in email:
+        return None
+    local, domain = email.strip().lower().rsplit("@", 1)
+    local = local.split("+", 1)[0]
+    if domain in _GMAIL:
+        local, domain = local.replace(".", ""), "gmail.com"
+    return f"{local}@{domain}" if local else None
+
+
+def normalize_phone(phone: Optional[str]) -> Optional[str]:
+    """Last ten digits, so +1 (555) 010-2030 and 555.010.2030 agree"""
+    digits = re.sub(r"\D", "", phone or "")
+    return digits[-10:] if len(digits) >= 7 else None
+
+
+def normalize_name(name: Optional[str]) -> str:
+    return " ".join(_NON_WORD.sub(" ", (name or "").lower()).split())
+
+
+def normalize_address(address: Optional[str]) -> str:
+    """Street line of an address (before the first comma), lowercased, with street words abbreviated"""
+    street = (address or "").split(",", 1)[0]
+    words = _NON_WORD.sub(" ", street.lower().replace("#", " # ")).split()
+    return " ".join(_ADDRESS_WORDS.get(w, w) for w in words)
+
+
+def house_number(address: str) -> str:
+    """First number in a normalized address; leads about different numbers never match on text"""
+    match = re.search(r"\d+", address)
+    return match.group() if match else ""
+
+
+def _grams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def name_similarity(a: str, b: str) -> float:
+    """Exact Jaccard similarity of the character 3-grams of two normalized names"""
+    a, b = _grams(a), _grams(b)
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+def contact_conflict(email_a: Optional[str], phone_a: Optional[str],
+                     email_b: Optional[str], phone_b: Optional[str]) -> bool:
+    """Whether two leads give different normalized emails or different phones"""
+    return bool((email_a and email_b and email_a != email_b) or (phone_a and phone_b and phone_a != phone_b))
+
+
+def _lead_name(lead: Dict[str, Any]) -> str:
+    return normalize_name(lead.get("client_name") or lead.get("name"))
+
+
+def _lead_contacts(lead: Dict[str, Any]):
+    return (normalize_email(lead.get("client_email") or lead.get("email")),
+            normalize_phone(lead.get("client_phone") or lead.get("phone")))
+
+
+def signature(text: str) -> np.ndarray:
+    """MinHash signature (NUM_PERM uint32 values) of the character 3-grams of ``text``"""
+    if len(text) < 3:
+        return _EMPTY
+    hashes = np.fromiter({zlib.crc32(gram.encode()) for gram in _grams(text)}, dtype=np.uint64)
+    permuted = (_A[:, None] * hashes[None, :] % _PRIME + _B[:, None]) % _PRIME
+    return (permuted.min(axis=1) & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+
+
+def lead_signature(lead: Dict[str, Any]) -> np.ndarray:
+    """Name signature followed by address signature (2 * NUM_PERM values)"""
+    return np.concatenate([signature(_lead_name(lead)), signature(normalize_address(lead.get("property_address")))])
+
+
+def lead_signatures(leads: Sequence[Dict[str, Any]]) -> np.ndarray:
+    out = np.empty((len(leads), 2 * NUM_PERM), dtype=np.uint32)
+    for i, lead in enumerate(leads):
+        out[i] = lead_signature(lead)
+    return out
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two signatures"""
+    return float(np.count_nonzero(a == b)) / len(a)
+
+
+def _is_empty(sig: np.ndarray) -> bool:
+    return bool((sig == _EMPTY).all())
+
+
+def _band_keys(name_sig: np.ndarray, number: str) -> List[bytes]:
+    rows = NUM_PERM // BANDS
+    prefix = f"{number}|".encode()
+    return [prefix + name_sig[i * rows:(i + 1) * rows].tobytes() for i in range(BANDS)]
+
+
+class LeadDedupIndex:
+    """In-memory dedup index answering "is this lead already known?" at insert time"""
+
+    def __init__(self, name_threshold: float = NAME_THRESHOLD, address_threshold: float = ADDRESS_THRESHOLD):
+        self.name_threshold = name_threshold
+        self.address_threshold = address_threshold
+        self._ids: List[str] = []
+        self._addresses: List[str] = []
+        self._names: List[str] = []
+        # Every email and phone seen for each lead, across all its rows
+        self._lead_contacts: Dict[str, tuple] = {}
+        self._sigs = np.empty((1024, 2 * NUM_PERM), dtype=np.uint32)
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(BANDS)]
+        self._contacts: Dict[str, List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @staticmethod
+    def _contact_keys(lead: Dict[str, Any]) -> List[str]:
+        keys = []
+        email, phone = _lead_contacts(lead)
+        if email:
+            keys.append(f"e:{email}")
+        if phone:
+            keys.append(f"p:{phone}")
+        return keys
+
+    def _scores(self, name: str, sig: np.ndarray, row: int) -> Dict[str, float]:
+        return {
+            "name_similarity": round(name_similarity(name, self._names[row]), 3),
+            "address_similarity": round(similarity(sig[NUM_PERM:], self._sigs[row][NUM_PERM:]), 3),
+        }
+
+    def _conflicts(self, email: Optional[str], phone: Optional[str], lead_id: str) -> bool:
+        emails, phones = self._lead_contacts.get(lead_id, ((), ()))
+        return bool((email and emails and email not in emails) or (phone and phones and phone not in phones))
+
+    def match(self, lead: Dict[str, Any], sig: Optional[np.ndarray] = None) -> Optional[Dict[str, Any]]:
+        """
+        Best existing match for a lead, or None
+
+        Returns:
+            dict with ``lead_id``, ``reason`` ("email", "phone" or "name_address")
+            and name and estimated address similarity
+        """
+        sig = lead_signature(lead) if sig is None else sig
+        name = _lead_name(lead)
+        address = normalize_address(lead.get("property_address"))
+        # Same contact details about the same street address (or with none given)
+        for key in self._contact_keys(lead):
+            for row in self._contacts.get(key, ()):
+                if not address or not self._addresses[row] or address == self._addresses[row]:
+                    return {
+                        "lead_id": self._ids[row],
+                        "reason": "email" if key[0] == "e" else "phone",
+                        **self._scores(name, sig, row),
+                    }
+        name_sig, address_sig = sig[:NUM_PERM], sig[NUM_PERM:]
+        if _is_empty(name_sig) or _is_empty(address_sig):
+            return None
+        candidates = set()
+        for band, key in enumerate(_band_keys(name_sig, house_number(address))):
+            candidates.update(self._buckets[band].get(key, ()))
+        email, phone = _lead_contacts(lead)
+        best = None
+        for row in candidates:
+            other = self._sigs[row]
+            if (similarity(name_sig, other[:NUM_PERM]) < self.name_threshold - NAME_ESTIMATE_SLACK
+                    or similarity(address_sig, other[NUM_PERM:]) < self.address_threshold):
+                continue
+            if self._conflicts(email, phone, self._ids[row]):
+                continue
+            name_score = name_similarity(name, self._names[row])
+            if name_score >= self.name_threshold and (best is None or name_score > best[1]):
+                best = (row, name_score)
+        if best is None:
+            return None
+        return {"lead_id": self._ids[best[0]], "reason": "name_address", **self._scores(name, sig, best[0])}
+
+    def add(self, lead: Dict[str, Any], lead_id: Optional[str] = None, sig: Optional[np.ndarray] = None) -> None:
+        """
+        Index a lead. ``lead_id`` may name an existing lead, so a duplicate's
+        spelling also matches later arrivals.
+        """
+        sig = lead_signature(lead) if sig is None else sig
+        row = len(self._ids)
+        if row == len(self._sigs):
+            self._sigs = np.concatenate([self._sigs, np.empty_like(self._sigs)])
+        self._sigs[row] = sig
+        address = normalize_address(lead.get("property_address"))
+        self._ids.append(lead_id or lead["lead_id"])
+        self._addresses.append(address)
+        self._names.append(_lead_name(lead))
+        emails, phones = self._lead_contacts.setdefault(self._ids[-1], (set(), set()))
+        email, phone = _lead_contacts(lead)
+        if email:
+            emails.add(email)
+        if phone:
+            phones.add(phone)
+        for key in self._contact_keys(lead):
+            self._contacts.setdefault(key, []).append(row)
+        if not _is_empty(sig[:NUM_PERM]):
+            for band, key in enumerate(_band_keys(sig[:NUM_PERM], house_number(address))):
+                self._buckets[band].setdefault(key, []).append(row)
+
+    def check_and_add(self, lead: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Match a new lead, indexing it under the matched lead or as a new one"""
+        sig = lead_signature(lead)
+        found = self.match(lead, sig)
+        self.add(lead, found["lead_id"] if found else None, sig)
+        return found
+
+    def add_many(self, leads: Iterable[Dict[str, Any]], workers: Optional[int] = None) -> int:
+        """Index existing leads, computing their signatures in parallel"""
+        leads = list(leads)
+        for lead, sig in zip(leads, parallel_signatures(leads, workers)):
+            self.add(lead, lead.get("duplicate_of") or lead["lead_id"], sig)
+        return len(leads)
+
+
+def parallel_signatures(leads: Sequence[Dict[str, Any]],
+                        workers: Optional[int] = None,
+                        min_chunk: int = 2000) -> np.ndarray:
+    """Signatures for many leads, split across worker processes"""
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(leads) <= min_chunk:
+        return lead_signatures(leads)
+    chunk = max(min_chunk, -(-len(leads) // (workers * 4)))
+    parts = [leads[i:i + chunk] for i in range(0, len(leads), chunk)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return np.concatenate(list(pool.map(lead_signatures, parts)))
+
+
+class _UnionFind:
+    def __init__(self, n: int):
+        self.parent = np.arange(n)
+
+    def find(self, x: int) -> int:
+        parent = self.parent
+        root = x
+        while parent[root] != root:
+            root = parent[root]
+        while parent[x] != root:
+            parent[x], x = root, parent[x]
+        return root
+
+    def union(self, a: int, b: int) -> None:
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            # Keep the earliest lead as the cluster root
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+
+def _groups(keys: np.ndarray) -> Iterable[np.ndarray]:
+    """Row indices sharing each key, for keys held by more than one row"""
+    order = np.argsort(keys, kind="stable")
+    ordered = keys[order]
+    starts = np.flatnonzero(np.r_[True, ordered[1:] != ordered[:-1]])
+    ends = np.r_[starts[1:], len(ordered)]
+    for start, end in zip(starts, ends):
+        if end - start > 1:
+            yield order[start:end]
+
+
+def _hash_rows(block: np.ndarray, seed: np.ndarray) -> np.ndarray:
+    """63-bit key per row of a band (FNV-style mixing of a per-row seed and its uint32 values)"""
+    h = (np.uint64(0xCBF29CE484222325) ^ seed) * np.uint64(0x100000001B3)
+    for col in range(block.shape[1]):
+        h = (h ^ block[:, col].astype(np.uint64)) * np.uint64(0x100000001B3)
+    return h >> np.uint64(1)
+
+
+def cluster_leads(leads: Sequence[Dict[str, Any]],
+                  workers: Optional[int] = None,
+                  name_threshold: float = NAME_THRESHOLD,
+                  address_threshold: float = ADDRESS_THRESHOLD) -> Dict[str, str]:
+    """
+    Group an existing table of leads into duplicate clusters
+
+    Args:
+        leads: Lead records, oldest first
+        workers: Processes used for signatures (default: one per CPU)
+        name_threshold: Jaccard of name 3-grams needed to join a cluster
+        address_threshold: Estimated Jaccard of street addresses needed to join a cluster
+
+    Returns:
+        lead_id -> id of the oldest lead in its cluster, for leads that are duplicates
+    """
+    n = len(leads)
+    sigs = parallel_signatures(leads, workers)
+    names, addrs = sigs[:, :NUM_PERM], sigs[:, NUM_PERM:]
+    # Leads missing a name or address get a unique key each, so they never group
+    loners = (names == _EMPTY).all(axis=1) | (addrs == _EMPTY).all(axis=1)
+    addresses = [normalize_address(lead.get("property_address")) for lead in leads]
+    names_text = [_lead_name(lead) for lead in leads]
+    contacts = [_lead_contacts(lead) for lead in leads]
+    numbers = np.array([zlib.crc32(house_number(a).encode()) for a in addresses], dtype=np.uint64)
+    clusters = _UnionFind(n)
+
+    # Near-duplicates: rows sharing a name band and house number, checked
+    # against the group's first row (signatures first, then exact names and contacts)
+    rows = NUM_PERM // BANDS
+    unique = np.arange(n, dtype=np.uint64) | np.uint64(1 << 63)
+    with np.errstate(over="ignore"):
+        for band in range(BANDS):
+            keys = np.where(loners, unique, _hash_rows(names[:, band * rows:(band + 1) * rows], numbers))
+            for group in _groups(keys):
+                anchor, rest = group[0], group[1:]
+                similar = (
+                    ((names[rest] == names[anchor]).sum(axis=1) >= (name_threshold - NAME_ESTIMATE_SLACK) * NUM_PERM)
+                    & ((addrs[rest] == addrs[anchor]).sum(axis=1) >= address_threshold * NUM_PERM)
+                )
+                anchor = int(anchor)
+                for row in rest[similar]:
+                    row = int(row)
+                    if (not contact_conflict(*contacts[anchor], *contacts[row])
+                            and name_similarity(names_text[anchor], names_text[row]) >= name_threshold):
+                        clusters.union(anchor, row)
+
+    # Same normalized email or phone about the same street address
+    for field, normalize in (("email", normalize_email), ("phone", normalize_phone)):
+        seen: Dict[tuple, int] = {}
+        for i, lead in enumerate(leads):
+            contact = normalize(lead.get(f"client_{field}") or lead.get(field))
+            if contact:
+                first = seen.setdefault((contact, addresses[i]), i)
+                if first != i:
+                    clusters.union(first, i)
+
+    result = {}
+    for i in range(n):
+        root = clusters.find(i)
+        if root != i:
+            result[leads[i]["lead_id"]] = leads[root]["lead_id"]
+    return result
@@ -4,30 +4,172 @@ Lead generation tools for EstateWise MCP server
 from typing import Dict, Any, Optional
 from datetime import datetime
 import json
+import uuid
+import hashlib
 import asyncio
+import threading
+import httpx
 # Import shared utilities with proper path
 import sys
 import os
-sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'shared', 'utils'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..', 'shared', 'utils'))
 try:
-    from openai_client import OpenAIClient
+    from llm_router import get_router
     from tool_logger import log_tool_call
+    from trace_context import span
 except ImportError:
     # Fallback for when shared utils are not available
-    class OpenAIClient:
-        async def chat(self, messages):
+    class _MockLLMClient:
+        async def chat(self, messages, system=None):
             return "Mock response"
         def extract_json(self, text):
             return {"score": "warm", "explanation": "Mock response"}
+
+    def get_router():
+        return _MockLLMClient()
     
     def log_tool_call(func):
         return func
 
+    class span:
+        def __init__(self, name, attributes=None, kind="internal"):
+            pass
+        def __enter__(self):
+            return self
+        def __exit__(self, *exc):
+            pass
+        def set(self, key, value):
+            pass
+
+
+
+def _lead_store():
+    """RecordStore of leads (LEAD_STORE_PATH), or None when unset"""
+    path = os.getenv("LEAD_STORE_PATH")
+    if not path:
+        return None
+    from record_store import RecordStore
+    return RecordStore(path, key="lead_id")
+
+
+def _follow_up_scheduler(send):
+    """Drip follow-up scheduler persisted in FOLLOWUP_STATE_DIR, or None when unset"""
+    state_dir = os.getenv("FOLLOWUP_STATE_DIR")
+    if not state_dir:
+        return None
+    from .follow_up_scheduler import FollowUpScheduler
+    return FollowUpScheduler(
+        state_dir,
+        send,
+        batch_size=int(os.getenv("FOLLOWUP_BATCH_SIZE", 500)),
+    ).load()
+
+
+def _search_index():
+    from search_index import get_search_index
+    return get_search_index()
+
+
+def _embedding_index():
+    """Inquiry embedding index, memory-mapped from EMBEDDING_INDEX_PATH when saved there.
+
+    An index saved by a different embedder (another EMBEDDING_MODEL) is
+    replaced by an empty one, which is re-embedded from the lead store.
+    """
+    from embedding_index import EmbeddingIndex, get_embedder
+    embedder = get_embedder()
+    path = os.getenv("EMBEDDING_INDEX_PATH")
+    if path and os.path.exists(os.path.join(path, "CURRENT")):
+        index = EmbeddingIndex.load(path)
+        if index.matches(embedder):
+            return index
+    return EmbeddingIndex(embedder.dim, path=path or None)
+
+
+def _lead_document(lead: Dict[str, Any]) -> tuple:
+    """Search index entry for a lead: name as title; address, contact details and notes as body"""
+    body = "\n".join(str(v) for v in (
+        lead.get("property_address"), lead.get("client_email"), lead.get("client_phone"), lead.get("notes"),
+    ) if v)
+    meta = {k: lead.get(k) for k in ("lead_id", "property_address", "status") if lead.get(k)}
+    return (f"lead:{lead['lead_id']}", "lead", lead.get("client_name") or "", body, meta)
+
+
+def _inquiry_document(name: str, email: Optional[str], inquiry: str, **meta) -> tuple:
+    digest = hashlib.sha1(f"{email}|{inquiry}".encode()).hexdigest()[:16]
+    return (f"inquiry:{digest}", "inquiry", name or "", "\n".join(v for v in (inquiry, email) if v),
+            {"email": email, **meta})
+
+
+def _timestamp(value: Optional[str]) -> Optional[float]:
+    return datetime.fromisoformat(value).timestamp() if value else None
+
+
+# Past inquiries less similar than this do not vote on a new inquiry's intent
+NEIGHBOUR_MIN_SIMILARITY = 0.35
+
+# Drip messages by channel; {name} and {address} come from the lead
+FOLLOW_UP_TEMPLATES = {
+    "email": "Hi {name}, just checking in about {address}. Any questions I can answer?",
+    "call": "Call {name} about {address}.",
+    "text": "Hi {name}, any thoughts on {address}?",
+}
 
 
 class LeadGenTools:
     """Tools for lead generation and follow-up automation"""
     
+    def __init__(self):
+        # Leads are kept so the nightly batch job can re-qualify the backlog
+        self._leads = _lead_store()
+        self._dedup = None
+        self._dedup_lock = threading.Lock()
+        self.scheduler = _follow_up_scheduler(self.send_follow_ups)
+        self._embeddings = None
+        self._embeddings_lock = threading.Lock()
+    
+    @property
+    def dedup(self):
+        """Near-duplicate index over known leads (built from the lead store on first use)"""
+        if self._dedup is None:
+            with self._dedup_lock:
+                if self._dedup is None:
+                    from .lead_dedup import LeadDedupIndex
+                    index = LeadDedupIndex()
+                    if self._leads is not None:
+                        index.add_many(self._leads)
+                    self._dedup = index
+        return self._dedup
+
+    @property
+    def embeddings(self):
+        """Embedding index of past inquiries (loaded, or embedded from the lead store, on first use)"""
+        if self._embeddings is None:
+            with self._embeddings_lock:
+                if self._embeddings is None:
+                    index = _embedding_index()
+                    if not len(index) and self._leads is not None:
+                        leads = [lead for lead in self._leads if lead.get("notes")]
+                        index.add_texts(
+                            [f"lead:{lead['lead_id']}" for lead in leads],
+                            [lead["notes"] for lead in leads],
+                            [{"lead_id": lead["lead_id"]} for lead in leads],
+                        )
+                        index.build()
+                        if index.path:
+                            index.save()
+                    self._embeddings = index
+        return self._embeddings
+
+    def _remember(self, doc_id: str, text: str, **meta) -> None:
+        """Add an inquiry to the embedding index, saving every EMBEDDING_SAVE_EVERY additions"""
+        index = self.embeddings
+        index.add_texts([doc_id], [text], [meta])
+        if index.path and index.unsaved >= int(os.getenv("EMBEDDING_SAVE_EVERY", 100)):
+            with self._embeddings_lock:
+                if index.unsaved:
+                    index.save()
+
     @log_tool_call
     def ping(self) -> Dict[str, Any]:
         """Test connection to LeadGen MCP server"""
@@ -47,6 +189,9 @@ class LeadGenTools:
         """
         Generate a new lead from property and client information
         
+        A lead matching an existing one (same normalized email or phone, or a
+        near-identical name at the same address) is merged into that lead.
+        
         Args:
             property_address: Full property address
             client_name: Client's full name
@@ -54,7 +199,7 @@ class LeadGenTools:
             client_phone: Client's phone number (optional)
             notes: Additional notes about the lead (optional)
         """
-        lead_id = f"lead_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        lead_id = f"lead_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
         
         lead_data = {
             "lead_id": lead_id,
@@ -69,17 +214,94 @@ class LeadGenTools:
             "follow_up_count": 0
         }
         
-        # TODO: Save to database
+        dedup = self.dedup
+        with self._dedup_lock:
+            match = dedup.check_and_add(lead_data)
+        if match is not None:
+            return self._merge_duplicate(lead_data, match)
+        
+        if self._leads is not None:
+            self._leads.put(lead_data)
+        _search_index().index(*_lead_document(lead_data))
+        if notes:
+            self._remember(f"lead:{lead_id}", notes, lead_id=lead_id)
         # TODO: Send welcome email
         # TODO: Add to CRM
         
-        return {
+        result = {
             "status": "success",
             "lead_id": lead_id,
             "message": f"Lead generated successfully for {client_name}",
             "data": lead_data
         }
+        if self.scheduler is not None:
+            # Start a drip cadence matched to how eager the inquiry sounds
+            cadence = self.keyword_score(notes)["score"]
+            result["follow_ups"] = self.scheduler.enroll(lead_id, cadence)
+        return result
     
+    def _merge_duplicate(self, lead_data: Dict[str, Any], match: Dict[str, Any]) -> Dict[str, Any]:
+        """Fold a repeat inquiry into the lead it duplicates instead of creating a new one"""
+        existing_id = match["lead_id"]
+        existing = (self._leads.get(existing_id) if self._leads is not None else None) or {"lead_id": existing_id}
+        update = {
+            "lead_id": existing_id,
+            "inquiry_count": (existing.get("inquiry_count") or 1) + 1,
+            "last_inquiry_at": lead_data["created_at"],
+        }
+        # Keep contact details the earlier inquiry did not have
+        for field in ("client_email", "client_phone", "property_address", "notes"):
+            if lead_data.get(field) and not existing.get(field):
+                update[field] = lead_data[field]
+        if self._leads is not None:
+            self._leads.put(update)
+        if existing.get("client_name"):
+            _search_index().index(*_lead_document({**existing, **update}))
+        # The repeat inquiry stays searchable under the lead it was merged into
+        if lead_data.get("notes"):
+            document = _inquiry_document(
+                lead_data["client_name"], lead_data.get("client_email"), lead_data["notes"], lead_id=existing_id,
+            )
+            _search_index().index(*document)
+            self._remember(document[0], lead_data["notes"], lead_id=existing_id)
+        return {
+            "status": "success",
+            "lead_id": existing_id,
+            "duplicate": True,
+            "match": match,
+            "message": f"{lead_data['client_name']} matches existing lead {existing_id}",
+            "data": {**existing, **update},
+        }
+
+    def find_duplicate(self,
+                       client_name: str,
+                       client_email: Optional[str] = None,
+                       client_phone: Optional[str] = None,
+                       property_address: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Look up an existing lead matching these details without creating one
+
+        Args:
+            client_name: Client's full name
+            client_email: Client's email address (optional)
+            client_phone: Client's phone number (optional)
+            property_address: Full property address (optional)
+        """
+        match = self.dedup.match({
+            "client_name": client_name,
+            "client_email": client_email,
+            "client_phone": client_phone,
+            "property_address": property_address,
+        })
+        return {"status": "success", "duplicate": match is not None, "match": match}
+
+    def index_leads(self) -> int:
+        """Index the lead store for search, unless the (persistent) index already has it"""
+        index = _search_index()
+        if self._leads is None or index.count("lead"):
+            return 0
+        return index.index_many(_lead_document(lead) for lead in self._leads)
+
     def follow_up(self, 
                  lead_id: str,
                  message: str,
@@ -92,17 +314,19 @@ class LeadGenTools:
             message: Follow-up message content
             follow_up_type: Type of follow-up (email, call, text)
         """
-        # TODO: Validate lead exists
-        # TODO: Send actual message
-        # TODO: Update follow-up count
-        
-        follow_up_data = {
-            "lead_id": lead_id,
-            "message": message,
-            "type": follow_up_type,
-            "sent_at": datetime.now().isoformat(),
-            "status": "sent"
-        }
+        if self._leads is not None and self._leads.get(lead_id) is None:
+            return {"status": "error", "message": f"Lead not found: {lead_id}"}
+        follow_up_data = self._deliver(lead_id, message, follow_up_type)
+        if follow_up_data["status"] != "sent":
+            return {"status": "error", "message": follow_up_data["error"], "data": follow_up_data}
+        if self._leads is not None:
+            # A manual touch pushes the lead's next scheduled follow-up back
+            lead = self._leads.get(lead_id)
+            self._leads.put({
+                "lead_id": lead_id,
+                "follow_up_count": (lead.get("follow_up_count") or 0) + 1,
+                "last_contact": follow_up_data["sent_at"],
+            })
         
         return {
             "status": "success",
@@ -110,23 +334,155 @@ class LeadGenTools:
             "data": follow_up_data
         } 
 
-    async def _gpt_score(self, name: str, email: str, inquiry: str) -> dict:
-        """Use OpenAI to score the lead, or raise if not available."""
+    def _deliver(self,
+                 lead_id: str,
+                 message: str,
+                 follow_up_type: str,
+                 idempotency_key: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Send one message to a lead; the send path of follow_up and scheduled follow-ups
+
+        The message is POSTed as JSON to FOLLOWUP_WEBHOOK_URL (the email/SMS/
+        dialer integration), with the idempotency key also sent as the
+        ``Idempotency-Key`` header. Any 2xx answer counts as delivered.
+        
+        Args:
+            lead_id: Unique identifier for the lead
+            message: Message content
+            follow_up_type: Channel (email, call, text)
+            idempotency_key: Sends with the same key are delivered at most once
+        Returns:
+            The follow-up record; its ``status`` is "sent" once delivered, else
+            "failed" or "not_configured" with an ``error``
+        """
+        follow_up_data = {
+            "lead_id": lead_id,
+            "message": message,
+            "type": follow_up_type,
+            "idempotency_key": idempotency_key or str(uuid.uuid4()),
+        }
+        url = os.getenv("FOLLOWUP_WEBHOOK_URL")
+        if not url:
+            return {**follow_up_data, "status": "not_configured",
+                    "error": "Follow-up delivery is not configured (set FOLLOWUP_WEBHOOK_URL)"}
+        try:
+            response = httpx.post(
+                url, json=follow_up_data, headers={"Idempotency-Key": follow_up_data["idempotency_key"]},
+                timeout=float(os.getenv("FOLLOWUP_WEBHOOK_TIMEOUT_S", 10)),
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            return {**follow_up_data, "status": "failed", "error": f"Follow-up delivery failed: {e}"}
+        return {**follow_up_data, "sent_at": datetime.now().isoformat(), "status": "sent"}
+
+    def send_follow_ups(self, batch: list) -> list:
+        """
+        Send a batch of scheduled follow-ups (called by the scheduler)
+
+        Leads that are closed, lost or gone leave their cadence. A lead
+        contacted since the step was scheduled gets the step pushed back to
+        the same delay after that contact. Each message goes through the same
+        send path as follow_up, keyed by the item's idempotency key, and only
+        a delivered one counts as sent. Lead records are updated in one write
+        for the whole batch.
+        """
+        from .follow_up_scheduler import CADENCES, DAY
+        now = datetime.now()
+        outcomes, updates = [], []
+        for item in batch:
+            lead = self._leads.get(item.lead_id) if self._leads is not None else {}
+            if lead is None or lead.get("status") in ("closed", "lost") or lead.get("duplicate_of"):
+                outcomes.append({"status": "stop"})
+                continue
+            last_contact = _timestamp(lead.get("last_contact"))
+            delay = CADENCES[item.cadence][item.step][0] * DAY
+            if last_contact is not None and last_contact + delay > now.timestamp():
+                outcomes.append({"status": "later", "due_at": last_contact + delay})
+                continue
+            message = FOLLOW_UP_TEMPLATES[item.channel].format(
+                name=lead.get("client_name") or "there",
+                address=lead.get("property_address") or "the property",
+            )
+            delivery = self._deliver(item.lead_id, message, item.channel, idempotency_key=item.key)
+            if delivery.get("status") != "sent":
+                outcomes.append({"status": "failed"})
+                continue
+            outcomes.append({"status": "sent", "message": message})
+            if self._leads is not None:
+                updates.append({
+                    "lead_id": item.lead_id,
+                    "follow_up_count": (lead.get("follow_up_count") or 0) + 1,
+                    "last_contact": now.isoformat(),
+                })
+        if updates:
+            self._leads.put_many(updates)
+        return outcomes
+
+    def schedule_follow_ups(self,
+                            lead_id: str,
+                            cadence: str = "warm",
+                            start_in_hours: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Enroll a lead in a drip follow-up cadence, replacing its current one
+
+        Args:
+            lead_id: Unique identifier for the lead
+            cadence: hot, warm or cold
+            start_in_hours: Delay before the first touch (default: the cadence's own)
+        """
+        if self.scheduler is None:
+            return {"status": "error", "message": "Follow-up scheduling is not configured (set FOLLOWUP_STATE_DIR)"}
+        if self._leads is not None and self._leads.get(lead_id) is None:
+            return {"status": "error", "message": f"Lead not found: {lead_id}"}
+        try:
+            start_at = None if start_in_hours is None else datetime.now().timestamp() + start_in_hours * 3600
+            schedule = self.scheduler.enroll(lead_id, cadence, start_at)
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}
+        return {"status": "success", "data": schedule}
+
+    def cancel_follow_ups(self, lead_id: str) -> Dict[str, Any]:
+        """Take a lead off its drip cadence"""
+        if self.scheduler is None:
+            return {"status": "error", "message": "Follow-up scheduling is not configured (set FOLLOWUP_STATE_DIR)"}
+        cancelled = self.scheduler.cancel(lead_id)
+        return {"status": "success", "lead_id": lead_id, "cancelled": cancelled}
+
+    def follow_up_status(self, lead_id: str) -> Dict[str, Any]:
+        """Next scheduled follow-up for a lead"""
+        if self.scheduler is None:
+            return {"status": "error", "message": "Follow-up scheduling is not configured (set FOLLOWUP_STATE_DIR)"}
+        return {"status": "success", "lead_id": lead_id, "next": self.scheduler.status(lead_id)}
+
+    @staticmethod
+    def lead_score_messages(name: str, email: str, inquiry: str) -> list:
+        """Chat messages asking the LLM to score a lead (also used by batch jobs)"""
         prompt = (
             f"Given this real estate inquiry, rate the lead as hot/warm/cold and explain why.\n"
             f"Name: {name}\nEmail: {email}\nInquiry: {inquiry}\n"
             "Respond in JSON: {\"score\": \"hot|warm|cold\", \"explanation\": string}"
         )
-        client = OpenAIClient()
-        messages = [
+        return [
             {"role": "user", "content": prompt}
         ]
-        text = await client.chat(messages)
+
+    @staticmethod
+    def parse_lead_score(client, text: str) -> dict:
+        """Validate an LLM lead score, raising ValueError if it is unusable"""
         result = client.extract_json(text)
         if not result or "score" not in result or "explanation" not in result:
-            raise ValueError("OpenAI did not return a valid response")
+            raise ValueError("LLM did not return a valid response")
         return result
 
+    async def _gpt_score(self, name: str, email: str, inquiry: str) -> dict:
+        """Use the LLM router to score the lead, or raise if not available."""
+        with span("_gpt_score") as score_span:
+            client = get_router()
+            text = await client.chat(self.lead_score_messages(name, email, inquiry))
+            result = self.parse_lead_score(client, text)
+            score_span.set("lead.score", result.get("score"))
+            return result
+
     def qualify_lead(self, name: str, email: str, inquiry: str) -> dict:
         """
         Qualify a real estate lead as hot, warm, or cold using OpenAI or fallback logic.
@@ -140,12 +496,87 @@ class LeadGenTools:
         # Try OpenAI first
         try:
             result = asyncio.run(self._gpt_score(name, email, inquiry))
-            return result
         except Exception:
-            pass  # Fallback to keyword logic
+            # Fallback to keyword logic, then to similar past inquiries
+            result = self.keyword_score(inquiry)
+            if result["score"] == "cold":
+                result = self.local_score(inquiry, fallback=result)
+
+        document = _inquiry_document(name, email, inquiry, score=result.get("score"))
+        _search_index().index(*document)
+        if inquiry:
+            match = self.dedup.match({"client_name": name, "client_email": email}) if self._leads is not None else None
+            meta = {"email": email, "score": result.get("score")}
+            if match is not None:
+                meta["lead_id"] = match["lead_id"]
+            self._remember(document[0], inquiry, **meta)
+        return result
+
+    def similar_leads(self, text: str, k: int = 5) -> Dict[str, Any]:
+        """
+        Past leads and inquiries most similar to a text, with their outcomes
+
+        Args:
+            text: Inquiry or note text
+            k: Number of neighbours to return
+        Returns:
+            dict with 'results' (nearest first), 'outcomes' (neighbour counts
+            by lead status) and 'intent' (hot/warm/cold probabilities)
+        """
+        from embedding_index import inquiry_intents
+        if not text or not text.strip():
+            return {"status": "error", "message": "text is required"}
+        k = max(1, min(int(k), 50))
+        hits = self.embeddings.search_text(text, k)
+        outcomes: Dict[str, int] = {}
+        for hit in hits:
+            lead = self._leads.get(hit["lead_id"]) if self._leads is not None and hit.get("lead_id") else None
+            if lead:
+                hit["lead_status"] = lead.get("status")
+                hit["client_name"] = lead.get("client_name")
+                hit["property_address"] = lead.get("property_address")
+                outcomes[lead.get("status") or "unknown"] = outcomes.get(lead.get("status") or "unknown", 0) + 1
+        return {
+            "status": "success",
+            "results": hits,
+            "outcomes": outcomes,
+            "intent": self._intent(hits, inquiry_intents([text])[0]),
+        }
+
+    @staticmethod
+    def _intent(hits: list, prototypes: Dict[str, float]) -> Dict[str, float]:
+        """Blend prototype intent with the scores of close past inquiries (closed leads count as hot)"""
+        votes = {"hot": 0.0, "warm": 0.0, "cold": 0.0}
+        weight = 0.0
+        for hit in hits:
+            label = "hot" if hit.get("lead_status") == "closed" else hit.get("score")
+            if label in votes and hit["similarity"] >= NEIGHBOUR_MIN_SIMILARITY:
+                votes[label] += hit["similarity"]
+                weight += hit["similarity"]
+        if not weight:
+            return prototypes
+        return {label: round(0.5 * prototypes[label] + 0.5 * votes[label] / weight, 4) for label in votes}
+
+    def local_score(self, inquiry: str, fallback: Optional[dict] = None) -> dict:
+        """Score an inquiry with the local embedding model and similar past inquiries (no LLM call)"""
+        if not inquiry or not inquiry.strip():
+            return fallback or self.keyword_score(inquiry)
+        similar = self.similar_leads(inquiry, k=10)
+        intent = similar["intent"]
+        label = max(intent, key=intent.get)
+        if intent[label] < 0.5:
+            return fallback or self.keyword_score(inquiry)
+        close = sum(1 for hit in similar["results"] if hit["similarity"] >= NEIGHBOUR_MIN_SIMILARITY)
+        return {
+            "score": label,
+            "explanation": f"Inquiry reads like {label} leads (local model; {close} similar past inquiries).",
+            "intent": intent,
+        }
 
-        # Fallback: simple keyword-based scoring
-        inquiry_lower = inquiry.lower()
+    @staticmethod
+    def keyword_score(inquiry: str) -> dict:
+        """Fallback: simple keyword-based scoring"""
+        inquiry_lower = (inquiry or "").lower()
         if any(word in inquiry_lower for word in ["buy now", "urgent", "cash offer", "ready to purchase", "asap"]):
             score = "hot"
             explanation = "Inquiry contains urgent buying signals."
@@ -8,50 +8,174 @@ import asyncio
 from pathlib import Path
 
 # Add shared utils to path
-sys.path.append(str(Path(__file__).parent.parent / "shared" / "utils"))
+sys.path.append(str(Path(__file__).parent.parent.parent / "shared" / "utils"))
 
+from startup import Startup
+from health import Health, cache_check, storage_probe
+from admission import AdmissionControl, DeadlineMiddleware, ToolLimit
+from profiling import Profiler
+import trace_context
+from tracing import TracingMiddleware
+import call_log
+from call_logging import CallLogMiddleware
+from search_index import get_search_index
+from shared_state import shared_state_metrics
 from fastmcp import FastMCP
-from tools.document_tools import DocumentTools
-from tools.track_contract_status import track_contract_status
+from tools import track_contract_status as contract_status
 
 # Initialize FastMCP server
 server = FastMCP("PaperworkMCP")
+startup = Startup("PaperworkMCP")
+health = Health(startup)
 
-# Create document tools instance
-doc_tools = DocumentTools()
+# The document tools are imported and built in the background once the port is
+# open (or on first call, whichever comes first)
+def _doc_tools():
+    from tools.document_tools import DocumentTools
+    return DocumentTools()
+
+doc_tools = startup.resource("doc_tools", _doc_tools)
+
+def _transactions():
+    # Replays the transaction pipeline from its snapshot and write-ahead log
+    engine = doc_tools.get().transactions
+    if engine is not None:
+        health.add_metrics("transactions", engine.snapshot)
+
+if os.getenv("TRANSACTION_STATE_DIR"):
+    startup.warm("transactions", _transactions, required=True)
+
+def _artifacts():
+    # Serves stored documents with sendfile on their own port
+    store = doc_tools.get().artifacts
+    if store is not None:
+        from artifact_store import ArtifactServer
+        artifact_server = ArtifactServer(
+            store, os.getenv("ARTIFACT_HOST", "127.0.0.1"), int(os.getenv("ARTIFACT_PORT", 3012))
+        ).start()
+        health.add_metrics("artifacts", lambda: {**store.snapshot(), **artifact_server.snapshot()})
+
+if os.getenv("ARTIFACT_STORE_DIR"):
+    startup.warm("artifacts", _artifacts, required=True)
+
+# Readiness checks: tool logs are written next to main.py
+health.add_check("storage", storage_probe(str(Path(__file__).parent)), required=True)
+health.add_check("caches", cache_check(doc_tools=doc_tools))
+
+# Each tool call is a span in the caller's trace (W3C traceparent from the
+# request _meta or HTTP header), exported to OTEL_EXPORTER_OTLP_ENDPOINT.
+# Outermost middleware, so the span also covers deadline and admission waits.
+trace_context.configure(service_name="paperwork-mcp")
+server.add_middleware(TracingMiddleware())
+health.add_metrics("tracing", trace_context.metrics_snapshot)
+
+# Every tool call is appended to logs.txt (or CALL_LOG_PATH) as a structured
+# record that benchmarks/replay_calls.py can replay or shadow to a candidate
+# build. Inside tracing, so records carry the call's trace id.
+call_records = call_log.open_call_log("paperwork", str(Path(__file__).parent / "logs.txt"))
+server.add_middleware(CallLogMiddleware(call_records))
+if call_records is not None:
+    health.add_metrics("call_log", call_records.snapshot)
+
+# Every tool call runs under a request deadline that LLM calls honour; it is
+# cancelled when the client disconnects or gives up.
+server.add_middleware(DeadlineMiddleware())
+
+# Per-phase timings and slow-call traces for every tool call, and profiling
+# switched on per tool from /admin/profiling. Outside admission, so queue
+# waits show up as the queued phase.
+profiler = Profiler()
+profiler.register(server)
+health.add_metrics("profiling", profiler.snapshot)
+
+# Admission control; queue waits count against the request deadline
+admission = AdmissionControl({
+    "fill_contract": ToolLimit(concurrency=8, queue=32, max_wait=10.0, cost=2.0),
+    "store_document": ToolLimit(concurrency=4, queue=16, max_wait=10.0, cost=2.0),
+})
+server.add_middleware(admission)
+health.add_metrics("admission", admission.snapshot)
+
+# Full-text search (SEARCH_INDEX_PATH shares one index between the servers)
+startup.warm("search_index", get_search_index, required=True)
+health.add_metrics("search", lambda: get_search_index().snapshot())
+
+# Caches shared with the other servers (SHARED_STATE_URL)
+health.add_metrics("shared_state", shared_state_metrics)
 
 # Register tools using the @tool decorator
 @server.tool
 def ping():
     """Test connection to Paperwork MCP server"""
-    return doc_tools.ping()
+    return doc_tools.get().ping()
 
 @server.tool
 def fill_contract(contract_type: str, transaction_data: dict, template_path: str = None):
     """Fill out a contract with transaction data"""
-    return doc_tools.fill_contract(contract_type, transaction_data, template_path)
+    return doc_tools.get().fill_contract(contract_type, transaction_data, template_path)
 
 @server.tool
 def track_document(document_id: str, status: str, notes: str = None):
     """Track document status and progress"""
-    return doc_tools.track_document(document_id, status, notes)
+    return doc_tools.get().track_document(document_id, status, notes)
 
 @server.tool
 def send_document(document_id: str, recipient_email: str, message: str = None, delivery_method: str = "email"):
     """Send document to recipient"""
-    return doc_tools.send_document(document_id, recipient_email, message, delivery_method)
+    return doc_tools.get().send_document(document_id, recipient_email, message, delivery_method)
 
 @server.tool
 def draft_contract(address: str, buyer_name: str, offer_price: float):
     """Draft a friendly, natural language contract for a property purchase"""
-    return doc_tools.draft_contract(address, buyer_name, offer_price)
+    return doc_tools.get().draft_contract(address, buyer_name, offer_price)
 
 @server.tool
 def track_contract_status(property_id: str):
     """Check the lifecycle status of a contract for a given property_id."""
-    return track_contract_status(property_id)
+    return contract_status.track_contract_status(property_id)
+
+@server.tool
+def store_document(document_id: str, content_base64: str = None, file_name: str = None, content_type: str = None):
+    """Store a document's file (base64 content, or a file in the artifact inbox) and get its download URL"""
+    return doc_tools.get().store_document(document_id, content_base64, file_name, content_type)
+
+@server.tool
+def get_document(document_id: str):
+    """Get the stored file of a document: size, content type and download URL (supports range requests)"""
+    return doc_tools.get().get_document(document_id)
+
+@server.tool
+def open_transaction(transaction: dict):
+    """Start tracking a transaction (property, clients, status, agent_id, close_date) in the pipeline"""
+    return doc_tools.get().open_transaction(transaction)
+
+@server.tool
+def advance_transaction(transaction_id: str, status: str, expected_version: int = None):
+    """Move a transaction to pending, active, closed or cancelled; only allowed transitions are accepted"""
+    return doc_tools.get().advance_transaction(transaction_id, status, expected_version)
+
+@server.tool
+def link_transaction(transaction_id: str, lead_id: str = None, contract_id: str = None, disclosure_id: str = None):
+    """Link a lead, contract or disclosure to a transaction"""
+    return doc_tools.get().link_transaction(transaction_id, lead_id, contract_id, disclosure_id)
+
+@server.tool
+def get_transaction(transaction_id: str):
+    """Look up a transaction with its status, links and version"""
+    return doc_tools.get().get_transaction(transaction_id)
+
+@server.tool
+def query_transactions(status: list = None, agent_id: str = None, closing_within_days: int = None,
+                       closing_from: str = None, closing_to: str = None, limit: int = 50):
+    """Query the transaction pipeline by status, agent and close date (e.g. active deals closing in 14 days)"""
+    return doc_tools.get().query_transactions(status, agent_id, closing_within_days, closing_from, closing_to, limit)
+
+@server.tool
+def search(query: str, kinds: list = None, limit: int = 10):
+    """Full-text search over contracts (and other servers' leads and disclosures when the index is shared), BM25-ranked with prefix matching"""
+    return get_search_index().search(query, kinds, limit)
 
 if __name__ == "__main__":
     port = int(os.getenv("PAPERWORK_MCP_PORT", 3002))
     print(f"📄 Starting Paperwork MCP Server on port {port}")
-    asyncio.run(server.run_http_async(port=port)) 
\ No newline at end of file
+    asyncio.run(health.serve(server, port)) 
\ No newline at end of file
@@ -3,12 +3,86 @@ Document management tools for EstateWise MCP server
 """
 from typing import Dict, Any, Optional, List
 from datetime import datetime
+import os
 import json
+import uuid
+import base64
+import binascii
+import mimetypes
+import importlib
+import threading
+
+
+def _search_index():
+    from search_index import get_search_index
+    return get_search_index()
+
+
+def _contract_document(contract: Dict[str, Any]) -> tuple:
+    """Search index entry for a filled contract: its type as title, the transaction data as body"""
+    from search_index import flatten
+    data = contract["transaction_data"]
+    address = data.get("property_address") or data.get("address")
+    meta = {"contract_id": contract["contract_id"], "contract_type": contract["contract_type"]}
+    if address:
+        meta["property_address"] = address
+    return (f"contract:{contract['contract_id']}", "contract",
+            f"{contract['contract_type']} contract", flatten(data), meta)
+
+
+def _sibling(name: str):
+    """Import a sibling tools module (package or standalone layout)"""
+    return importlib.import_module(f"{__package__}.{name}" if __package__ else name)
+
+
+def _transaction_engine():
+    """Transaction pipeline persisted in TRANSACTION_STATE_DIR, or None when unset"""
+    state_dir = os.getenv("TRANSACTION_STATE_DIR")
+    if not state_dir:
+        return None
+    return _sibling("transaction_engine").TransactionEngine(state_dir).load()
+
+
+def _artifact_store():
+    from artifact_store import open_artifact_store
+    return open_artifact_store()
+
+
+def artifact_url(digest: str) -> str:
+    from artifact_store import artifact_url
+    return artifact_url(digest)
+
+
+_NO_PIPELINE = {"status": "error", "message": "Transaction pipeline not configured (set TRANSACTION_STATE_DIR)"}
+_NO_ARTIFACTS = {"status": "error", "message": "Artifact store not configured (set ARTIFACT_STORE_DIR)"}
 
 
 class DocumentTools:
     """Tools for contract and escrow document management"""
     
+    def __init__(self):
+        self._transactions = None
+        self._transactions_lock = threading.Lock()
+        self._artifacts = None
+    
+    @property
+    def transactions(self):
+        """Transaction pipeline (replayed from its write-ahead log on first use), or None"""
+        if self._transactions is None:
+            with self._transactions_lock:
+                if self._transactions is None:
+                    engine = _transaction_engine()
+                    self._transactions = False if engine is None else engine
+        return None if self._transactions is False else self._transactions
+    
+    @property
+    def artifacts(self):
+        """Artifact store for contract PDFs and disclosure packets, or None"""
+        if self._artifacts is None:
+            store = _artifact_store()
+            self._artifacts = False if store is None else store
+        return None if self._artifacts is False else self._artifacts
+    
     def ping(self) -> Dict[str, Any]:
         """Test connection to Paperwork MCP server"""
         return {
@@ -23,14 +97,14 @@ class DocumentTools:
                      transaction_data: Dict[str, Any],
                      template_path: Optional[str] = None) -> Dict[str, Any]:
         """
-        Fill out a contract with transaction data
+        Fill out a contract with transaction data (indexed for search)
         
         Args:
             contract_type: Type of contract (purchase, listing, etc.)
             transaction_data: Data to fill in the contract
             template_path: Path to contract template (optional)
         """
-        contract_id = f"contract_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        contract_id = f"contract_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
         
         # TODO: Load template
         # TODO: Fill in data
@@ -45,6 +119,11 @@ class DocumentTools:
             "filled_fields": list(transaction_data.keys()),
             "template_used": template_path or "default"
         }
+        _search_index().index(*_contract_document(contract_data))
+        # Contracts filled for a known deal are linked to it
+        transaction_id = transaction_data.get("transaction_id")
+        if transaction_id and self.transactions is not None and transaction_id in self.transactions:
+            self.transactions.link(transaction_id, contract_id=contract_id)
         
         return {
             "status": "success",
@@ -111,6 +190,13 @@ class DocumentTools:
             "status": "sent"
         }
         
+        # Stored documents go out as a download link rather than an attachment
+        digest = self.artifacts.resolve(document_id) if self.artifacts is not None else None
+        if digest is not None:
+            meta = self.artifacts.stat(digest)
+            delivery_data.update(download_url=artifact_url(digest), size=meta["size"],
+                                 content_type=meta["content_type"])
+        
         # TODO: Send actual document
         # TODO: Track delivery status
         # TODO: Update document status
@@ -138,4 +224,175 @@ class DocumentTools:
         return {
             "status": "success",
             "contract_text": contract_text
-        } 
\ No newline at end of file
+        }
+    
+    def open_transaction(self, transaction: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Start tracking a transaction in the pipeline
+        
+        Args:
+            transaction: Transaction fields (schema_validators.Transaction);
+                transaction_id is generated when missing
+        """
+        if self.transactions is None:
+            return dict(_NO_PIPELINE)
+        data = dict(transaction or {})
+        data.setdefault("transaction_id", f"txn_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}")
+        try:
+            record = self.transactions.open(data)
+        except ValueError as e:
+            errors = getattr(e, "errors", None)
+            return {"status": "error", "message": str(e), **({"errors": errors} if errors else {})}
+        return {"status": "success", "transaction_id": record["transaction_id"], "data": record}
+    
+    def advance_transaction(self,
+                            transaction_id: str,
+                            status: str,
+                            expected_version: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Move a transaction to a new status (pending, active, closed, cancelled)
+        
+        Args:
+            transaction_id: Transaction to move
+            status: New status; must be allowed from the current one
+            expected_version: Version the caller last read (refused if it has changed)
+        """
+        if self.transactions is None:
+            return dict(_NO_PIPELINE)
+        try:
+            record = self.transactions.advance(transaction_id, status, expected_version)
+        except KeyError:
+            return {"status": "error", "message": f"Transaction not found: {transaction_id}"}
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}
+        return {
+            "status": "success",
+            "message": f"{transaction_id} moved from {record['previous_status']} to {status}",
+            "data": record,
+        }
+    
+    def link_transaction(self,
+                         transaction_id: str,
+                         lead_id: Optional[str] = None,
+                         contract_id: Optional[str] = None,
+                         disclosure_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Link a lead, contract or disclosure to a transaction
+        
+        Args:
+            transaction_id: Transaction to link to
+            lead_id: LeadGen lead behind the deal (optional)
+            contract_id: Paperwork contract for the deal (optional)
+            disclosure_id: ClientSide disclosure sent for the deal (optional)
+        """
+        if self.transactions is None:
+            return dict(_NO_PIPELINE)
+        if not (lead_id or contract_id or disclosure_id):
+            return {"status": "error", "message": "Provide a lead_id, contract_id or disclosure_id"}
+        try:
+            record = self.transactions.link(transaction_id, lead_id, contract_id, disclosure_id)
+        except KeyError:
+            return {"status": "error", "message": f"Transaction not found: {transaction_id}"}
+        return {"status": "success", "data": record}
+    
+    def get_transaction(self, transaction_id: str) -> Dict[str, Any]:
+        """Look up a transaction with its links and version"""
+        if self.transactions is None:
+            return dict(_NO_PIPELINE)
+        record = self.transactions.get(transaction_id)
+        if record is None:
+            return {"status": "error", "message": f"Transaction not found: {transaction_id}"}
+        return {"status": "success", "data": record}
+    
+    def query_transactions(self,
+                           status: Optional[Any] = None,
+                           agent_id: Optional[str] = None,
+                           closing_within_days: Optional[int] = None,
+                           closing_from: Optional[str] = None,
+                           closing_to: Optional[str] = None,
+                           limit: int = 50) -> Dict[str, Any]:
+        """
+        Pipeline query, ordered by close date
+        
+        Args:
+            status: Status or list of statuses (default: all)
+            agent_id: Only this agent's transactions (optional)
+            closing_within_days: Closing between today and this many days from now
+            closing_from: First close date (ISO date), instead of closing_within_days
+            closing_to: Last close date (ISO date)
+            limit: Maximum transactions returned (total counts all matches)
+        """
+        if self.transactions is None:
+            return dict(_NO_PIPELINE)
+        started = datetime.now()
+        limit = max(1, min(int(limit), 500))
+        try:
+            if closing_within_days is not None:
+                result = self.transactions.closing_within(
+                    closing_within_days, status=status or ("active",), agent_id=agent_id, limit=limit,
+                )
+            else:
+                result = self.transactions.query(status, agent_id, closing_from, closing_to, limit)
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}
+        elapsed_ms = (datetime.now() - started).total_seconds() * 1000
+        return {
+            "status": "success",
+            "total": result["total"],
+            "returned": len(result["transactions"]),
+            "elapsed_ms": round(elapsed_ms, 2),
+            "transactions": result["transactions"],
+        }
+    
+    def store_document(self,
+                       document_id: str,
+                       content_base64: Optional[str] = None,
+                       file_name: Optional[str] = None,
+                       content_type: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Store a document's file (contract PDF, disclosure packet) for download
+        
+        Args:
+            document_id: Document the file belongs to; storing again replaces it
+            content_base64: File content, base64-encoded
+            file_name: Instead of content, a file in the store's inbox/ directory
+                (where PDF rendering drops its output); streamed, not read into memory
+            content_type: MIME type (guessed from file_name when omitted)
+        """
+        if self.artifacts is None:
+            return dict(_NO_ARTIFACTS)
+        if (content_base64 is None) == (file_name is None):
+            return {"status": "error", "message": "Provide either content_base64 or file_name"}
+        content_type = content_type or mimetypes.guess_type(file_name or "")[0] or "application/octet-stream"
+        if file_name is not None:
+            inbox = os.path.join(self.artifacts.root, "inbox")
+            path = os.path.realpath(os.path.join(inbox, file_name))
+            if os.path.dirname(path) != os.path.realpath(inbox) or not os.path.isfile(path):
+                return {"status": "error", "message": f"No such file in the artifact inbox: {file_name}"}
+            stored = self.artifacts.put_file(path, content_type)
+        else:
+            try:
+                content = base64.b64decode(content_base64, validate=True)
+            except (binascii.Error, ValueError):
+                return {"status": "error", "message": "content_base64 is not valid base64"}
+            stored = self.artifacts.put_bytes(content, content_type)
+        self.artifacts.link(document_id, stored["digest"])
+        return {
+            "status": "success",
+            "document_id": document_id,
+            "message": f"Stored {stored['size']:,} bytes" + (" (identical file already stored)" if stored["deduplicated"] else ""),
+            "data": {**stored, "download_url": artifact_url(stored["digest"])},
+        }
+    
+    def get_document(self, document_id: str) -> Dict[str, Any]:
+        """Stored file of a document: digest, size, content type and download URL"""
+        if self.artifacts is None:
+            return dict(_NO_ARTIFACTS)
+        digest = self.artifacts.resolve(document_id)
+        if digest is None:
+            return {"status": "error", "message": f"No stored file for document {document_id}"}
+        return {
+            "status": "success",
+            "document_id": document_id,
+            "data": {**self.artifacts.stat(digest), "download_url": artifact_url(digest)},
+        }
@@ -1,5 +1,4 @@
 import random
-from fastmcp import tool
 
 STATUSES = ["drafted", "sent", "pending", "signed"]
 
@@ -8,10 +7,6 @@ def deterministic_status(property_id: str) -> str:
     idx = abs(hash(property_id)) % len(STATUSES)
     return STATUSES[idx]
 
-@tool(
-    name="track_contract_status",
-    description="Check the lifecycle status of a contract for a given property_id."
-)
 def track_contract_status(property_id: str) -> dict:
     """
     Returns the current status of a contract for the given property_id.
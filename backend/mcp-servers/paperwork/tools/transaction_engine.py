@@ -0,0 +1,494 @@
+"""
+Transaction pipeline for the Paperwork MCP server
+
+Moves schema_validators.Transaction records through their lifecycle
+(``TRANSITIONS``) and links them to the lead, contracts and disclosures that
+belong to the deal. Transitions are validated and versioned: a caller can pass
+the version it last read, and the move is refused if someone else moved the
+deal in the meantime.
+
+Only what the pipeline queries need is held in memory: status, agent, close
+day and version per transaction, plus secondary indexes of them:
+
+- status -> close day -> transaction ids, with the days kept sorted, so a
+  range of close dates is a bisect plus the buckets in range
+- agent -> transaction ids
+
+"Active deals closing in the next 14 days" touches only those 15 buckets,
+however many transactions there are. Full records stay on disk and are read
+by offset when a query returns them.
+
+State lives in ``state_dir`` as a snapshot plus a write-ahead journal, the
+same layout as the LeadGen follow-up scheduler. Every change is appended and
+fsynced before it is applied. A restart replays both files. The journal is
+folded into a new snapshot once it grows well beyond the number of
+transactions.
+"""
+import os
+import json
+import time
+import threading
+from bisect import bisect_left, bisect_right, insort
+from dataclasses import fields
+from datetime import date, datetime
+from typing import Dict, Any, Iterable, List, Optional, Sequence
+
+from schema_validators import Property, Client, Transaction, validate_many, validate_transaction
+from trace_context import traced
+
+# Allowed status changes; closed is final
+TRANSITIONS: Dict[str, tuple] = {
+    "pending": ("active", "cancelled"),
+    "active": ("closed", "cancelled", "pending"),
+    "cancelled": ("pending",),
+    "closed": (),
+}
+STATUSES = tuple(TRANSITIONS)
+LINK_FIELDS = ("lead_id", "contract_ids", "disclosure_ids")
+
+PROPERTY_FIELDS = tuple(f.name for f in fields(Property))
+CLIENT_FIELDS = tuple(f.name for f in fields(Client))
+
+# Fold the journal into a snapshot once it has this many lines more than there are transactions
+COMPACT_SLACK = 100000
+# Undated transactions sort after every close day
+_UNDATED = 1 << 30
+
+
+class TransitionError(ValueError):
+    """Raised for a status change TRANSITIONS does not allow, or a stale expected version"""
+
+
+def _day(value: Any) -> int:
+    """Proleptic ordinal of a date, datetime or ISO string (_UNDATED for None)"""
+    if value is None or value == "":
+        return _UNDATED
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        value = value.date()
+    return value.toordinal()
+
+
+def _iso(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+
+def _to_record(txn: Transaction) -> Dict[str, Any]:
+    """JSON-ready dict of a Transaction (what the journal stores)"""
+    return {
+        "transaction_id": txn.transaction_id,
+        "property": {name: getattr(txn.property, name) for name in PROPERTY_FIELDS},
+        "clients": [{name: getattr(client, name) for name in CLIENT_FIELDS} for client in txn.clients],
+        "status": txn.status,
+        "created_at": _iso(txn.created_at),
+        "updated_at": _iso(txn.updated_at),
+        "agent_id": txn.agent_id,
+        "close_date": _iso(txn.close_date),
+        "lead_id": txn.lead_id,
+        "contract_ids": list(txn.contract_ids),
+        "disclosure_ids": list(txn.disclosure_ids),
+    }
+
+
+class _Entry:
+    """In-memory index fields of a transaction and where its full record is"""
+
+    __slots__ = ("status", "agent_id", "close_day", "version", "updated_at", "overlay", "source", "offset")
+
+    def __init__(self, status: str, agent_id: Optional[str], close_day: int, version: int,
+                 updated_at: str, source: int, offset: int):
+        self.status = status
+        self.agent_id = agent_id
+        self.close_day = close_day
+        self.version = version
+        self.updated_at = updated_at
+        # Fields changed since the record at offset was written (links, close_date)
+        self.overlay: Optional[Dict[str, Any]] = None
+        self.source = source
+        self.offset = offset
+
+
+class TransactionEngine:
+    """Validated status transitions with status/agent/close-date indexes and a write-ahead log"""
+
+    SNAPSHOT, JOURNAL = 0, 1
+
+    def __init__(self, state_dir: str, clock=datetime.now):
+        """
+        Args:
+            state_dir: Directory for the snapshot and journal
+            clock: Source of the current datetime (tests)
+        """
+        self.state_dir = state_dir
+        self.clock = clock
+        self._entries: Dict[str, _Entry] = {}
+        self._by_agent: Dict[str, set] = {}
+        # status -> close day -> ids, and each status's sorted close days
+        self._by_day: Dict[str, Dict[int, set]] = {status: {} for status in STATUSES}
+        self._days: Dict[str, List[int]] = {status: [] for status in STATUSES}
+        self._journal = None
+        self._readers: List[Any] = [None, None]
+        self._journal_lines = 0
+        self._lock = threading.RLock()
+        self.stats = {"opened": 0, "transitions": 0, "rejected": 0, "links": 0, "queries": 0}
+        self.load_ms: Optional[float] = None
+
+    # -- persistence -------------------------------------------------------
+
+    @property
+    def _paths(self) -> tuple:
+        return os.path.join(self.state_dir, "snapshot.jsonl"), os.path.join(self.state_dir, "journal.jsonl")
+
+    def load(self) -> "TransactionEngine":
+        """Rebuild the indexes from the snapshot and journal"""
+        started = time.perf_counter()
+        os.makedirs(self.state_dir, exist_ok=True)
+        with self._lock:
+            for source, path in enumerate(self._paths):
+                if not os.path.exists(path):
+                    continue
+                with open(path, "rb") as f:
+                    offset = 0
+                    for line in f:
+                        try:
+                            self._replay(json.loads(line), source, offset)
+                        except ValueError:
+                            # Torn write from a crash
+                            pass
+                        else:
+                            if source == self.JOURNAL:
+                                self._journal_lines += 1
+                        offset += len(line)
+            self._open_files(truncate=False)
+        self.load_ms = round((time.perf_counter() - started) * 1000, 1)
+        return self
+
+    def _open_files(self, truncate: bool) -> None:
+        snapshot, journal = self._paths
+        self._journal = open(journal, "wb" if truncate else "ab")
+        if self._journal.tell():
+            self._journal.write(b"\n")  # in case the last line was torn
+            self._journal.flush()
+        for reader in self._readers:
+            if reader is not None:
+                reader.close()
+        self._readers = [open(snapshot, "rb") if os.path.exists(snapshot) else None, open(journal, "rb")]
+
+    def _replay(self, op: Dict[str, Any], source: int, offset: int) -> None:
+        kind = op["op"]
+        if kind == "put":
+            record = op["txn"]
+            self._index(record["transaction_id"], record, op.get("v", 1), source, offset)
+        elif kind == "move":
+            entry = self._entries.get(op["id"])
+            if entry is not None:
+                self._apply_move(op["id"], entry, op["to"], op["v"], op["at"], op.get("close_date"))
+        elif kind == "link":
+            entry = self._entries.get(op["id"])
+            if entry is not None:
+                entry.overlay = {**(entry.overlay or {}), **op["links"]}
+                entry.version, entry.updated_at = op["v"], op["at"]
+
+    @traced("transaction_engine.journal_write", {"db.system": "journal"})
+    def _write(self, ops: List[Dict[str, Any]]) -> List[int]:
+        """Append ops to the journal and fsync; returns each op's byte offset"""
+        offsets = []
+        position = self._journal.tell()
+        chunks = []
+        for op in ops:
+            line = (json.dumps(op, separators=(",", ":"), ensure_ascii=False) + "\n").encode()
+            offsets.append(position)
+            position += len(line)
+            chunks.append(line)
+        self._journal.write(b"".join(chunks))
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+        self._journal_lines += len(ops)
+        return offsets
+
+    def _maybe_compact(self) -> None:
+        if self._journal_lines > len(self._entries) + COMPACT_SLACK:
+            self.compact()
+
+    @traced("transaction_engine.compact", {"db.system": "journal"})
+    def compact(self) -> None:
+        """Write every transaction's current record as a new snapshot and empty the journal"""
+        with self._lock:
+            snapshot, _ = self._paths
+            tmp = f"{snapshot}.tmp"
+            offsets = {}
+            with open(tmp, "wb") as f:
+                for transaction_id, entry in self._entries.items():
+                    record = self._read(transaction_id, entry)
+                    offsets[transaction_id] = f.tell()
+                    f.write((json.dumps({"op": "put", "v": entry.version, "txn": record},
+                                       separators=(",", ":"), ensure_ascii=False) + "\n").encode())
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, snapshot)
+            self._journal.close()
+            self._open_files(truncate=True)
+            self._journal_lines = 0
+            for transaction_id, entry in self._entries.items():
+                entry.source, entry.offset, entry.overlay = self.SNAPSHOT, offsets[transaction_id], None
+
+    def close(self) -> None:
+        with self._lock:
+            for handle in (self._journal, *self._readers):
+                if handle is not None:
+                    handle.close()
+            self._journal, self._readers = None, [None, None]
+
+    # -- indexes -----------------------------------------------------------
+
+    def _add_to_day(self, status: str, day: int, transaction_id: str) -> None:
+        buckets = self._by_day[status]
+        bucket = buckets.get(day)
+        if bucket is None:
+            bucket = buckets[day] = set()
+            insort(self._days[status], day)
+        bucket.add(transaction_id)
+
+    def _remove_from_day(self, status: str, day: int, transaction_id: str) -> None:
+        buckets = self._by_day[status]
+        bucket = buckets[day]
+        bucket.discard(transaction_id)
+        if not bucket:
+            del buckets[day]
+            days = self._days[status]
+            del days[bisect_left(days, day)]
+
+    def _index(self, transaction_id: str, record: Dict[str, Any], version: int, source: int, offset: int) -> None:
+        old = self._entries.get(transaction_id)
+        if old is not None:
+            self._remove_from_day(old.status, old.close_day, transaction_id)
+            if old.agent_id is not None:
+                self._by_agent[old.agent_id].discard(transaction_id)
+        entry = _Entry(record["status"], record.get("agent_id"), _day(record.get("close_date")),
+                       version, record.get("updated_at"), source, offset)
+        self._entries[transaction_id] = entry
+        self._add_to_day(entry.status, entry.close_day, transaction_id)
+        if entry.agent_id is not None:
+            self._by_agent.setdefault(entry.agent_id, set()).add(transaction_id)
+
+    def _apply_move(self, transaction_id: str, entry: _Entry, status: str, version: int, at: str,
+                    close_date: Optional[str]) -> None:
+        self._remove_from_day(entry.status, entry.close_day, transaction_id)
+        if close_date is not None:
+            entry.close_day = _day(close_date)
+            entry.overlay = {**(entry.overlay or {}), "close_date": close_date}
+        entry.status, entry.version, entry.updated_at = status, version, at
+        self._add_to_day(status, entry.close_day, transaction_id)
+
+    @traced("transaction_engine.read", {"db.system": "journal"})
+    def _read(self, transaction_id: str, entry: _Entry) -> Dict[str, Any]:
+        reader = self._readers[entry.source]
+        reader.seek(entry.offset)
+        record = json.loads(reader.readline())["txn"]
+        if entry.overlay:
+            record.update(entry.overlay)
+        record["status"] = entry.status
+        record["updated_at"] = entry.updated_at
+        return record
+
+    # -- writes ------------------------------------------------------------
+
+    def open_many(self, transactions: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """Validate and add new transactions in one journal write; invalid or duplicate ones are reported"""
+        result = validate_many(Transaction, transactions)
+        errors = list(result.errors)
+        with self._lock:
+            ops, seen = [], set()
+            for index, txn in enumerate(result.valid):
+                if txn.transaction_id in self._entries or txn.transaction_id in seen:
+                    errors.append({"path": "transaction_id", "message": f"Transaction {txn.transaction_id} already exists"})
+                    continue
+                seen.add(txn.transaction_id)
+                ops.append({"op": "put", "v": 1, "txn": _to_record(txn)})
+            if ops:
+                for op, offset in zip(ops, self._write(ops)):
+                    self._index(op["txn"]["transaction_id"], op["txn"], 1, self.JOURNAL, offset)
+                self.stats["opened"] += len(ops)
+                self._maybe_compact()
+        return {"opened": len(ops), "errors": errors}
+
+    def open(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Validate and add one transaction (raises ValidationError, or ValueError if the id exists)"""
+        txn = validate_transaction(data)
+        with self._lock:
+            if txn.transaction_id in self._entries:
+                raise ValueError(f"Transaction {txn.transaction_id} already exists")
+            record = _to_record(txn)
+            offset = self._write([{"op": "put", "v": 1, "txn": record}])[0]
+            self._index(txn.transaction_id, record, 1, self.JOURNAL, offset)
+            self.stats["opened"] += 1
+            self._maybe_compact()
+        return {**record, "version": 1}
+
+    def advance(self, transaction_id: str, status: str, expected_version: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Move a transaction to a new status
+
+        Closing a deal without a close date records today as its close date.
+
+        Raises:
+            KeyError: Unknown transaction
+            TransitionError: The move is not allowed from the current status,
+                or the transaction is no longer at expected_version
+        """
+        with self._lock:
+            entry = self._entries.get(transaction_id)
+            if entry is None:
+                raise KeyError(transaction_id)
+            if expected_version is not None and expected_version != entry.version:
+                self.stats["rejected"] += 1
+                raise TransitionError(
+                    f"{transaction_id} is at version {entry.version}, not {expected_version}; re-read and retry"
+                )
+            if status not in TRANSITIONS.get(entry.status, ()):
+                self.stats["rejected"] += 1
+                allowed = ", ".join(TRANSITIONS.get(entry.status, ())) or "none (final)"
+                raise TransitionError(f"Cannot move {transaction_id} from {entry.status} to {status} (allowed: {allowed})")
+            now = self.clock()
+            close_date = now.replace(hour=0, minute=0, second=0, microsecond=0).isoformat() \
+                if status == "closed" and entry.close_day == _UNDATED else None
+            op = {"op": "move", "id": transaction_id, "from": entry.status, "to": status,
+                  "v": entry.version + 1, "at": now.isoformat()}
+            if close_date is not None:
+                op["close_date"] = close_date
+            self._write([op])
+            previous = entry.status
+            self._apply_move(transaction_id, entry, status, op["v"], op["at"], close_date)
+            self.stats["transitions"] += 1
+            self._maybe_compact()
+            return {**self._read(transaction_id, entry), "version": entry.version, "previous_status": previous}
+
+    def link(self, transaction_id: str, lead_id: Optional[str] = None,
+             contract_id: Optional[str] = None, disclosure_id: Optional[str] = None) -> Dict[str, Any]:
+        """Attach a lead, contract or disclosure to a transaction (KeyError if unknown)"""
+        with self._lock:
+            entry = self._entries.get(transaction_id)
+            if entry is None:
+                raise KeyError(transaction_id)
+            record = self._read(transaction_id, entry)
+            links: Dict[str, Any] = {}
+            if lead_id and record.get("lead_id") != lead_id:
+                links["lead_id"] = lead_id
+            if contract_id and contract_id not in record["contract_ids"]:
+                links["contract_ids"] = record["contract_ids"] + [contract_id]
+            if disclosure_id and disclosure_id not in record["disclosure_ids"]:
+                links["disclosure_ids"] = record["disclosure_ids"] + [disclosure_id]
+            if links:
+                at = self.clock().isoformat()
+                self._write([{"op": "link", "id": transaction_id, "links": links, "v": entry.version + 1, "at": at}])
+                entry.overlay = {**(entry.overlay or {}), **links}
+                entry.version, entry.updated_at = entry.version + 1, at
+                self.stats["links"] += 1
+                self._maybe_compact()
+                record = self._read(transaction_id, entry)
+            return {**record, "version": entry.version}
+
+    # -- reads -------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, transaction_id: str) -> bool:
+        return transaction_id in self._entries
+
+    def get(self, transaction_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(transaction_id)
+            if entry is None:
+                return None
+            return {**self._read(transaction_id, entry), "version": entry.version}
+
+    def query(self,
+              status: Optional[Sequence[str]] = None,
+              agent_id: Optional[str] = None,
+              closing_from: Optional[Any] = None,
+              closing_to: Optional[Any] = None,
+              limit: int = 50,
+              ids_only: bool = False) -> Dict[str, Any]:
+        """
+        Transactions matching every given filter, ordered by close date (undated last)
+
+        Args:
+            status: A status or list of statuses (default: all)
+            agent_id: Only this agent's transactions
+            closing_from: First close date included (date, datetime or ISO string)
+            closing_to: Last close date included
+            limit: Records returned (``total`` counts every match)
+            ids_only: Return transaction ids instead of full records
+        """
+        statuses = [status] if isinstance(status, str) else list(status or STATUSES)
+        unknown = [s for s in statuses if s not in TRANSITIONS]
+        if unknown:
+            raise ValueError(f"Unknown status: {', '.join(unknown)} (expected one of {', '.join(STATUSES)})")
+        dated = closing_from is not None or closing_to is not None
+        low = _day(closing_from) if closing_from is not None else 0
+        high = _day(closing_to) if closing_to is not None else _UNDATED - 1
+        if not dated:
+            high = _UNDATED
+        limit = max(0, int(limit))
+
+        with self._lock:
+            self.stats["queries"] += 1
+            if agent_id is not None:
+                # An agent's book is small: filter it and sort
+                wanted = set(statuses)
+                matches = sorted(
+                    (entry.close_day, transaction_id)
+                    for transaction_id in self._by_agent.get(agent_id, ())
+                    for entry in (self._entries[transaction_id],)
+                    if entry.status in wanted and low <= entry.close_day <= high
+                )
+                total = len(matches)
+                page = [transaction_id for _, transaction_id in matches[:limit]]
+            else:
+                buckets = []
+                for s in statuses:
+                    days = self._days[s]
+                    for day in days[bisect_left(days, low):bisect_right(days, high)]:
+                        buckets.append((day, self._by_day[s][day]))
+                buckets.sort(key=lambda item: item[0])
+                total = sum(len(ids) for _, ids in buckets)
+                page = []
+                for _, ids in buckets:
+                    if len(page) >= limit:
+                        break
+                    page.extend(sorted(ids)[:limit - len(page)])
+            if ids_only:
+                return {"total": total, "transaction_ids": page}
+            return {
+                "total": total,
+                "transactions": [
+                    {**self._read(transaction_id, self._entries[transaction_id]),
+                     "version": self._entries[transaction_id].version}
+                    for transaction_id in page
+                ],
+            }
+
+    def closing_within(self, days: int, status: Sequence[str] = ("active",), **filters) -> Dict[str, Any]:
+        """Deals closing between today and ``days`` from now (default: active ones)"""
+        today = self.clock().date()
+        return self.query(status=status, closing_from=today,
+                          closing_to=date.fromordinal(today.toordinal() + int(days)), **filters)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            today = self.clock().date().toordinal()
+            days = self._days["active"]
+            closing_soon = sum(
+                len(self._by_day["active"][day]) for day in days[bisect_left(days, today):bisect_right(days, today + 14)]
+            )
+            return {
+                "transactions": len(self._entries),
+                "by_status": {s: sum(len(ids) for ids in self._by_day[s].values()) for s in STATUSES},
+                "active_closing_14d": closing_soon,
+                "agents": len(self._by_agent),
+                "journal_lines": self._journal_lines,
+                "load_ms": self.load_ms,
+                **self.stats,
+            }
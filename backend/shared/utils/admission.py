@@ -0,0 +1,337 @@
+"""
+Admission control for EstateWise MCP tool calls
+
+FastMCP middleware that decides, before a tool runs, whether a call is
+admitted now, queued, or rejected:
+
+- per-client token buckets (tool calls weighted by cost) cap how fast any
+  one client can spend server and LLM capacity;
+- per-tool concurrency limits with bounded FIFO wait queues keep
+  expensive tools from monopolizing the server;
+- queued calls give up when their wait deadline passes, or earlier if the
+  request's own deadline (deadline.py) passes first.
+
+``DeadlineMiddleware`` gives every call that request deadline and cancels
+it when the client goes away.
+
+Rejections are immediate ``429``-style tool errors carrying a retry hint,
+and every decision is counted for the ``/metrics`` endpoint.
+
+Clients are identified by their authenticated MCP client id when the
+server has auth, else by the ``X-Client-Id`` header, else by remote
+address. The header is taken as sent, so any caller can spend another
+client's quota by naming it; set ADMISSION_TRUST_CLIENT_ID=0 wherever
+callers are not trusted (e.g. servers reachable without an auth proxy).
+
+Environment:
+    ADMISSION_CLIENT_RATE       token refill per client per second (20; 0 disables quotas)
+    ADMISSION_CLIENT_BURST      bucket size per client (40)
+    ADMISSION_TRUST_CLIENT_ID   1 = honor the X-Client-Id header (1)
+    TOOL_TIMEOUT_S           default request deadline for a tool call (60)
+"""
+import os
+import time
+import asyncio
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Dict, Any, Callable, Optional
+
+from fastmcp.exceptions import ToolError
+from fastmcp.server.middleware import Middleware
+
+import deadline as request_deadline
+
+# Buckets for this many recently seen clients are kept
+MAX_TRACKED_CLIENTS = 10000
+
+
+@dataclass(frozen=True)
+class ToolLimit:
+    """Admission settings for one tool"""
+    concurrency: int = 16
+    queue: int = 64
+    max_wait: float = 10.0
+    cost: float = 1.0
+
+
+class AdmissionRejected(ToolError):
+    """A tool call refused by admission control (HTTP 429 semantics)"""
+
+    def __init__(self, reason: str, message: str, retry_after: Optional[float] = None):
+        self.reason = reason
+        self.retry_after = retry_after
+        hint = f"; retry after {retry_after:.2f}s" if retry_after is not None else ""
+        super().__init__(f"429 Too Many Requests ({reason}): {message}{hint}")
+
+
+class TokenBucket:
+    """Classic token bucket; refills continuously up to burst"""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, cost: float) -> Optional[float]:
+        """Spend tokens; returns None on success or the seconds until enough refill"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return None
+        return (cost - self.tokens) / self.rate
+
+    def refund(self, cost: float) -> None:
+        """Give back tokens spent on a call that was not admitted"""
+        self.tokens = min(self.burst, self.tokens + cost)
+
+
+class _ToolGate:
+    """Concurrency limit with a bounded FIFO queue of waiting calls"""
+
+    def __init__(self, limit: ToolLimit):
+        self.limit = limit
+        self.active = 0
+        self.waiters: deque = deque()
+        self.counters = {
+            "admitted": 0,
+            "queued": 0,
+            "rejected_queue_full": 0,
+            "rejected_deadline": 0,
+            "rejected_rate_limited": 0,
+        }
+        self.waits: deque = deque(maxlen=500)
+
+    async def acquire(self, deadline: float) -> None:
+        if self.active < self.limit.concurrency and not self.waiters:
+            self.active += 1
+            self.counters["admitted"] += 1
+            self.waits.append(0.0)
+            return
+        if len(self.waiters) >= self.limit.queue:
+            self.counters["rejected_queue_full"] += 1
+            raise AdmissionRejected(
+                "queue_full", f"{self.active} running and {len(self.waiters)} queued", retry_after=self.limit.max_wait / 2
+            )
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        self.counters["queued"] += 1
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=max(0.0, deadline - started))
+        except asyncio.TimeoutError:
+            self._abandon(waiter)
+            self.counters["rejected_deadline"] += 1
+            raise AdmissionRejected("deadline", f"waited {time.monotonic() - started:.2f}s for a slot")
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+        self.counters["admitted"] += 1
+        self.waits.append(time.monotonic() - started)
+
+    def _abandon(self, waiter: asyncio.Future) -> None:
+        if waiter.done():
+            # The slot was handed over just as the wait ended; pass it on
+            self.release()
+        else:
+            waiter.cancel()
+            self.waiters.remove(waiter)
+
+    def release(self) -> None:
+        # Hand the slot straight to the oldest live waiter, so queued calls
+        # cannot be overtaken by new arrivals
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        waits = sorted(self.waits)
+        return {
+            **self.counters,
+            "active": self.active,
+            "waiting": len(self.waiters),
+            "limit": self.limit.concurrency,
+            "queue_limit": self.limit.queue,
+            "wait_p50_ms": round(waits[len(waits) // 2] * 1000, 1) if waits else 0.0,
+            "wait_p99_ms": round(waits[min(len(waits) - 1, int(len(waits) * 0.99))] * 1000, 1) if waits else 0.0,
+        }
+
+
+class AdmissionControl(Middleware):
+    """Per-tool concurrency limits and per-client quotas for FastMCP tool calls"""
+
+    def __init__(self,
+                 limits: Optional[Dict[str, ToolLimit]] = None,
+                 default: Optional[ToolLimit] = None,
+                 client_rate: Optional[float] = None,
+                 client_burst: Optional[float] = None,
+                 key: Optional[Callable[[Any], str]] = None):
+        """
+        Args:
+            limits: Per-tool settings; tools not listed use ``default``
+            default: Settings for unlisted tools
+            client_rate: Tokens per second refilled for each client (0 disables quotas)
+            client_burst: Bucket capacity per client
+            key: Maps a middleware context to the client identity (default client_key)
+        """
+        self.limits = dict(limits or {})
+        self.default = default or ToolLimit()
+        self.client_rate = client_rate if client_rate is not None else float(os.getenv("ADMISSION_CLIENT_RATE", 20))
+        self.client_burst = client_burst if client_burst is not None else float(os.getenv("ADMISSION_CLIENT_BURST", 40))
+        self.key = key or client_key
+        self._gates: Dict[str, _ToolGate] = {}
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self.rejected_by_client: Dict[str, int] = {}
+
+    def _gate(self, tool: str) -> _ToolGate:
+        gate = self._gates.get(tool)
+        if gate is None:
+            gate = self._gates[tool] = _ToolGate(self.limits.get(tool, self.default))
+        return gate
+
+    def _bucket(self, client: str) -> TokenBucket:
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = self._buckets[client] = TokenBucket(self.client_rate, self.client_burst)
+            if len(self._buckets) > MAX_TRACKED_CLIENTS:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client)
+        return bucket
+
+    def check_quota(self, client: str, tool: str) -> float:
+        """Charge a call to the client's bucket, raising AdmissionRejected when it is empty.
+
+        Returns:
+            The tokens charged, for refund() if the call is then not admitted
+        """
+        if self.client_rate <= 0:
+            return 0.0
+        gate = self._gate(tool)
+        cost = min(gate.limit.cost, self.client_burst)
+        retry_after = self._bucket(client).take(cost)
+        if retry_after is not None:
+            gate.counters["rejected_rate_limited"] += 1
+            self.rejected_by_client[client] = self.rejected_by_client.get(client, 0) + 1
+            raise AdmissionRejected("rate_limited", f"client {client} is over its quota", retry_after=retry_after)
+        return cost
+
+    def refund(self, client: str, cost: float) -> None:
+        """Return a charge for a call that was refused after check_quota"""
+        if cost and client in self._buckets:
+            self._buckets[client].refund(cost)
+
+    async def on_call_tool(self, context, call_next):
+        tool = context.message.name
+        client = self.key(context)
+        charged = self.check_quota(client, tool)
+
+        gate = self._gate(tool)
+        wait_until = time.monotonic() + gate.limit.max_wait
+        current = request_deadline.current()
+        if current is not None and current.expires_at is not None:
+            wait_until = min(wait_until, current.expires_at)
+        try:
+            await gate.acquire(wait_until)
+        except BaseException:
+            # Refused or cancelled before running: the call cost the client nothing
+            self.refund(client, charged)
+            raise
+        try:
+            return await call_next(context)
+        finally:
+            gate.release()
+
+    def snapshot(self) -> Dict[str, Any]:
+        top = sorted(self.rejected_by_client.items(), key=lambda kv: kv[1], reverse=True)[:10]
+        return {
+            "tools": {name: gate.snapshot() for name, gate in self._gates.items()},
+            "clients_tracked": len(self._buckets),
+            "client_rate": self.client_rate,
+            "client_burst": self.client_burst,
+            "top_rejected_clients": dict(top),
+        }
+
+
+class DeadlineMiddleware(Middleware):
+    """Run each tool call under a request deadline that is cancelled if the client goes away"""
+
+    def __init__(self, timeouts: Optional[Dict[str, float]] = None, default: Optional[float] = None):
+        """
+        Args:
+            timeouts: Per-tool deadlines in seconds; tools not listed use ``default``
+            default: Deadline for unlisted tools (TOOL_TIMEOUT_S, 60)
+        """
+        self.timeouts = dict(timeouts or {})
+        self.default = default if default is not None else float(os.getenv("TOOL_TIMEOUT_S", 60))
+
+    async def on_call_tool(self, context, call_next):
+        timeout = self.timeouts.get(context.message.name, self.default)
+        requested = requested_timeout()
+        if requested is not None:
+            timeout = min(timeout, requested)
+
+        with request_deadline.scope(timeout) as deadline:
+            # Sync tools run in a worker thread that only notices cancellation
+            # once it returns, so watch for it here and cancel the deadline
+            # (and with it their upstream calls) straight away
+            task = asyncio.ensure_future(call_next(context))
+            try:
+                return await asyncio.shield(task)
+            except asyncio.CancelledError:
+                deadline.cancel("client_gone")
+                task.cancel()
+                raise
+
+
+def requested_timeout() -> Optional[float]:
+    """Seconds the HTTP client says it will wait (X-Request-Timeout header), if any"""
+    try:
+        from fastmcp.server.dependencies import get_http_request
+        value = get_http_request().headers.get("x-request-timeout")
+    except RuntimeError:
+        return None
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+def client_key(context) -> str:
+    """Identify the caller: authenticated client id, X-Client-Id header, MCP client_id, remote address or session"""
+    from fastmcp.server.dependencies import get_access_token, get_http_request
+
+    token = get_access_token()
+    if token is not None and token.client_id:
+        return token.client_id
+    try:
+        request = get_http_request()
+        header = request.headers.get("x-client-id")
+        if header and os.getenv("ADMISSION_TRUST_CLIENT_ID", "1") != "0":
+            return header
+    except RuntimeError:
+        request = None
+
+    ctx = context.fastmcp_context
+    if ctx is not None:
+        try:
+            if ctx.client_id:
+                return ctx.client_id
+        except Exception:
+            pass
+    if request is not None and request.client is not None:
+        return request.client.host
+    if ctx is not None:
+        try:
+            return ctx.session_id
+        except RuntimeError:
+            pass
+    return "anonymous"
@@ -0,0 +1,383 @@
+"""
+Content-addressed artifact storage for EstateWise MCP servers
+
+Contract PDFs (Paperwork) and disclosure packets (ClientSide) are stored
+once per distinct content, under the SHA-256 of their bytes:
+
+    objects/ab/cdef...        the bytes (read-only once written)
+    objects/ab/cdef....json   content type, size, first stored
+    refs/<document id>        digest a document currently points at
+    tmp/                      writes in progress
+    inbox/                    files dropped off for storing (e.g. rendered PDFs)
+
+Writes stream through a temporary file in fixed-size chunks, hashing as they
+go, so a packet is never held in memory. The file is then renamed into place.
+If the object already exists the temporary file is dropped, so identical
+packets sent for different deals take the space of one.
+
+``ArtifactServer`` serves objects over HTTP on its own port with
+``loop.sendfile``: the kernel copies file pages straight to the socket, and
+concurrent downloads of the same packet share one copy in the page cache.
+Single byte ranges (``Range: bytes=a-b``) are answered with 206, and the
+digest doubles as a strong ETag since objects never change.
+
+Every write is a rename into place, so several server processes can share
+one store directory; Paperwork runs the download server.
+
+Environment:
+    ARTIFACT_STORE_DIR    Store directory (unset: no artifact storage)
+    ARTIFACT_PORT         Port of the download server (3012)
+    ARTIFACT_PUBLIC_URL   Base URL handed out for downloads (http://127.0.0.1:ARTIFACT_PORT)
+"""
+import os
+import re
+import json
+import mmap
+import socket
+import asyncio
+import hashlib
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Any, BinaryIO, Iterable, Iterator, Optional, Tuple, Union
+from urllib.parse import quote
+
+from trace_context import traced
+
+# Bytes read and hashed per write step
+CHUNK_SIZE = 1 << 20
+
+_DIGEST = re.compile(r"^[0-9a-f]{64}$")
+_SPAN = {"db.system": "filesystem"}
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Byte range requested by a Range header, as (start, end) inclusive
+
+    Returns None to serve the whole object: no header, a unit other than
+    bytes, or several ranges (which servers may answer in full). Raises
+    ValueError for a range that lies outside the object (HTTP 416).
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if not first:
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length <= 0:
+                raise ValueError
+            return max(0, size - length), size - 1
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    except ValueError:
+        raise ValueError(f"Malformed range: {header}")
+    if start >= size or end < start:
+        raise ValueError(f"Range {header} not satisfiable for {size} bytes")
+    return start, end
+
+
+class ArtifactStore:
+    """Deduplicating, content-addressed file store"""
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        for name in ("objects", "refs", "tmp", "inbox"):
+            os.makedirs(os.path.join(self.root, name), exist_ok=True)
+        self.stats = {"stored": 0, "deduplicated": 0, "bytes_written": 0, "bytes_deduplicated": 0}
+        self._lock = threading.Lock()
+
+    def path(self, digest: str) -> str:
+        if not _DIGEST.match(digest or ""):
+            raise ValueError(f"Not an artifact digest: {digest!r}")
+        return os.path.join(self.root, "objects", digest[:2], digest[2:])
+
+    # -- writes ------------------------------------------------------------
+
+    @traced("artifact_store.put_stream", _SPAN)
+    def put_stream(self, source: Union[BinaryIO, Iterable[bytes]],
+                   content_type: str = "application/octet-stream") -> Dict[str, Any]:
+        """
+        Store bytes from a binary file object or an iterable of chunks
+
+        Returns:
+            dict with 'digest', 'size', 'content_type' and 'deduplicated'
+            (True when identical content was already stored)
+        """
+        if hasattr(source, "read"):
+            chunks: Iterable[bytes] = iter(lambda: source.read(CHUNK_SIZE), b"")
+        else:
+            chunks = source
+        sha = hashlib.sha256()
+        size = 0
+        fd, tmp = tempfile.mkstemp(dir=os.path.join(self.root, "tmp"))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in chunks:
+                    sha.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+            digest = sha.hexdigest()
+            path = self.path(digest)
+            deduplicated = os.path.exists(path)
+            if not deduplicated:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.chmod(tmp, 0o444)
+                # Two writers of the same content rename identical bytes; either wins
+                os.replace(tmp, path)
+                self._write_meta(digest, {"digest": digest, "size": size, "content_type": content_type,
+                                          "stored_at": datetime.now().isoformat()})
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        with self._lock:
+            if deduplicated:
+                self.stats["deduplicated"] += 1
+                self.stats["bytes_deduplicated"] += size
+            else:
+                self.stats["stored"] += 1
+                self.stats["bytes_written"] += size
+        return {"digest": digest, "size": size, "content_type": self.stat(digest)["content_type"],
+                "deduplicated": deduplicated}
+
+    def put_bytes(self, data: bytes, content_type: str = "application/octet-stream") -> Dict[str, Any]:
+        view = memoryview(data)
+        return self.put_stream((view[i:i + CHUNK_SIZE] for i in range(0, len(view), CHUNK_SIZE)), content_type)
+
+    def put_file(self, path: str, content_type: str = "application/octet-stream") -> Dict[str, Any]:
+        with open(path, "rb") as f:
+            return self.put_stream(f, content_type)
+
+    def _write_meta(self, digest: str, meta: Dict[str, Any]) -> None:
+        target = self.path(digest) + ".json"
+        tmp = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, target)
+
+    # -- names -------------------------------------------------------------
+
+    def _ref_path(self, name: str) -> str:
+        return os.path.join(self.root, "refs", quote(name, safe=""))
+
+    @traced("artifact_store.link", _SPAN)
+    def link(self, name: str, digest: str) -> None:
+        """Point a document id at an artifact (replacing what it pointed at)"""
+        if not os.path.exists(self.path(digest)):
+            raise KeyError(digest)
+        target = self._ref_path(name)
+        tmp = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as f:
+            f.write(digest)
+        os.replace(tmp, target)
+
+    @traced("artifact_store.resolve", _SPAN)
+    def resolve(self, name: str) -> Optional[str]:
+        try:
+            with open(self._ref_path(name)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    # -- reads -------------------------------------------------------------
+
+    def stat(self, digest: str) -> Optional[Dict[str, Any]]:
+        path = self.path(digest)
+        try:
+            with open(path + ".json") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            if not os.path.exists(path):
+                return None
+            # Renamed into place but the metadata write was interrupted
+            return {"digest": digest, "size": os.path.getsize(path), "content_type": "application/octet-stream"}
+
+    def __contains__(self, digest: str) -> bool:
+        return bool(_DIGEST.match(digest or "")) and os.path.exists(self.path(digest))
+
+    @contextmanager
+    def view(self, digest: str, start: int = 0, end: Optional[int] = None) -> Iterator[memoryview]:
+        """Memory-mapped, read-only view of bytes [start, end) without reading them into memory"""
+        with open(self.path(digest), "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                yield memoryview(b"")
+                return
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            view = memoryview(mapped)
+            window = view[start:size if end is None else end]
+            try:
+                yield window
+            finally:
+                window.release()
+                view.release()
+                mapped.close()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"root": self.root, **self.stats}
+
+
+class ArtifactServer:
+    """HTTP/1.1 server for artifacts (GET/HEAD /artifacts/<digest>) using sendfile"""
+
+    def __init__(self, store: ArtifactStore, host: str = "127.0.0.1", port: int = 0):
+        self.store = store
+        self.host = host
+        self.port = port
+        self.stats = {"requests": 0, "range_requests": 0, "not_modified": 0, "not_found": 0,
+                      "bytes_sent": 0, "active": 0}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server: Optional[asyncio.base_events.Server] = None
+        self._ready = threading.Event()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def url(self, digest: str) -> str:
+        return f"{self.base_url}/artifacts/{digest}"
+
+    def start(self) -> "ArtifactServer":
+        """Serve from a background thread with its own event loop"""
+        error = []
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            try:
+                self._server = self._loop.run_until_complete(
+                    asyncio.start_server(self._handle, self.host, self.port, reuse_address=True)
+                )
+                self.port = self._server.sockets[0].getsockname()[1]
+            except OSError as e:
+                error.append(e)
+                self._ready.set()
+                return
+            self._ready.set()
+            self._loop.run_forever()
+
+        threading.Thread(target=run, name="artifact-server", daemon=True).start()
+        self._ready.wait()
+        if error:
+            raise error[0]
+        return self
+
+    def close(self) -> None:
+        if self._loop is None:
+            return
+
+        async def stop():
+            self._server.close()
+            await self._server.wait_closed()
+
+        asyncio.run_coroutine_threadsafe(stop(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        sock = writer.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    return
+                request_line, *header_lines = head.decode("latin-1").split("\r\n")
+                headers = {}
+                for line in header_lines:
+                    if ":" in line:
+                        key, value = line.split(":", 1)
+                        headers[key.strip().lower()] = value.strip()
+                parts = request_line.split()
+                keep_alive = headers.get("connection", "").lower() != "close" and request_line.endswith("1.1")
+                if len(parts) != 3:
+                    await self._respond(writer, 400, keep_alive=False)
+                    return
+                await self._serve(writer, parts[0], parts[1], headers, keep_alive)
+                if not keep_alive:
+                    return
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status: int, headers: Optional[Dict[str, Any]] = None,
+                       body: bytes = b"", keep_alive: bool = True) -> None:
+        reasons = {200: "OK", 206: "Partial Content", 304: "Not Modified", 400: "Bad Request",
+                   404: "Not Found", 405: "Method Not Allowed", 416: "Range Not Satisfiable"}
+        lines = [f"HTTP/1.1 {status} {reasons[status]}"]
+        headers = {"Content-Length": len(body), **(headers or {})}
+        headers["Connection"] = "keep-alive" if keep_alive else "close"
+        lines.extend(f"{key}: {value}" for key, value in headers.items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    async def _serve(self, writer, method: str, target: str, headers: Dict[str, str], keep_alive: bool) -> None:
+        self.stats["requests"] += 1
+        path = target.split("?", 1)[0]
+        if method not in ("GET", "HEAD"):
+            await self._respond(writer, 405, {"Allow": "GET, HEAD"}, keep_alive=keep_alive)
+            return
+        digest = path[len("/artifacts/"):] if path.startswith("/artifacts/") else ""
+        meta = self.store.stat(digest) if digest in self.store else None
+        if meta is None:
+            self.stats["not_found"] += 1
+            await self._respond(writer, 404, {"Content-Type": "text/plain"}, b"Not found", keep_alive)
+            return
+
+        etag = f'"{digest}"'
+        common = {"Content-Type": meta["content_type"], "ETag": etag, "Accept-Ranges": "bytes",
+                  "Cache-Control": "public, max-age=31536000, immutable"}
+        if etag in headers.get("if-none-match", ""):
+            self.stats["not_modified"] += 1
+            await self._respond(writer, 304, {"ETag": etag}, keep_alive=keep_alive)
+            return
+
+        with open(self.store.path(digest), "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            try:
+                # If-Range with another validator means the client's copy is stale: send everything
+                byte_range = parse_range(headers.get("range"), size) \
+                    if headers.get("if-range", etag) == etag else None
+            except ValueError:
+                await self._respond(writer, 416, {**common, "Content-Range": f"bytes */{size}"},
+                                    keep_alive=keep_alive)
+                return
+            if byte_range is None:
+                status, start, count = 200, 0, size
+            else:
+                self.stats["range_requests"] += 1
+                status, start, count = 206, byte_range[0], byte_range[1] - byte_range[0] + 1
+                common["Content-Range"] = f"bytes {byte_range[0]}-{byte_range[1]}/{size}"
+            await self._respond(writer, status, {**common, "Content-Length": count}, keep_alive=keep_alive)
+            if method == "GET" and count:
+                self.stats["active"] += 1
+                try:
+                    # Kernel-side copy from the page cache to the socket
+                    await asyncio.get_running_loop().sendfile(writer.transport, f, start, count)
+                finally:
+                    self.stats["active"] -= 1
+                self.stats["bytes_sent"] += count
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"url": self.base_url, **self.stats}
+
+
+def open_artifact_store() -> Optional[ArtifactStore]:
+    """The store in ARTIFACT_STORE_DIR, or None when unset"""
+    root = os.getenv("ARTIFACT_STORE_DIR")
+    return ArtifactStore(root) if root else None
+
+
+def artifact_url(digest: str) -> str:
+    """Download URL of an artifact on the download server"""
+    base = os.getenv("ARTIFACT_PUBLIC_URL") or f"http://127.0.0.1:{os.getenv('ARTIFACT_PORT', 3012)}"
+    return f"{base.rstrip('/')}/artifacts/{digest}"
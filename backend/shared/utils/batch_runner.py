@@ -0,0 +1,481 @@
+"""
+Batch (offline) LLM job runner for EstateWise
+
+Non-interactive work, such as nightly lead re-qualification or re-analysis of
+stale offer comparisons, goes through a provider Batch API instead of one
+``chat`` call at a time. Batch requests are billed at about half the
+real-time price, and they do not compete with interactive traffic for rate
+limits.
+
+A job turns items into chat requests (``BatchSpec``) and writes them as JSONL
+input files. The runner submits each file to a provider, polls until it
+finishes, downloads the output, reduces the responses per item and writes the
+results to a ``RecordStore``. Each step is recorded in the job's
+``manifest.json`` before moving on. A crashed or interrupted run started
+again with the same job directory picks up where it stopped: it does not
+resubmit batches or re-apply results.
+
+Providers:
+    OpenAIBatchProvider   OpenAI Batch API (/files + /batches)
+    ClaudeBatchProvider   Anthropic Message Batches API
+    LocalBatchProvider    local stand-in that runs requests through ``chat``
+                          (development, tests, or providers without a batch API)
+"""
+import os
+import json
+import time
+import asyncio
+from datetime import datetime
+from typing import Dict, Any, Callable, Iterable, List, Optional, Tuple
+
+import httpx
+
+# Batch requests cost this fraction of the real-time price on both providers
+BATCH_DISCOUNT = 0.5
+# USD per million (input, output) tokens at real-time prices
+PRICES_PER_MTOK = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "claude-3-5-sonnet-20241022": (3.00, 15.00),
+    "claude-3-5-haiku-20241022": (0.80, 4.00),
+}
+# Provider limits are 50,000 requests per batch; stay well below
+MAX_REQUESTS_PER_BATCH = 10000
+
+
+class BatchSpec:
+    """How one kind of job turns items into chat requests and responses into results"""
+
+    def __init__(self,
+                 name: str,
+                 key: str,
+                 build: Callable[[Dict[str, Any]], List[Tuple[list, Optional[str]]]],
+                 reduce: Callable[[Dict[str, Any], List[Optional[str]]], Optional[Dict[str, Any]]]):
+        """
+        Args:
+            name: Job kind, used in reports
+            key: Item field that identifies an item and its stored result
+            build: Returns the (messages, system) requests for one item
+            reduce: Combines an item's response texts (None for failed requests)
+                into the record written to the store; must include ``key``.
+                Returning None leaves the stored record as it was
+        """
+        self.name = name
+        self.key = key
+        self.build = build
+        self.reduce = reduce
+
+
+def _result(custom_id: str, text: Optional[str] = None, error: Optional[str] = None,
+            input_tokens: int = 0, output_tokens: int = 0) -> Dict[str, Any]:
+    """Normalized per-request outcome, whatever the provider"""
+    return {
+        "custom_id": custom_id,
+        "text": text,
+        "error": error,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+    }
+
+
+class OpenAIBatchProvider:
+    """OpenAI Batch API: upload a JSONL file, create a batch, download the output file"""
+
+    name = "openai"
+    discount = BATCH_DISCOUNT
+
+    def __init__(self, client=None):
+        if client is None:
+            from openai_client import OpenAIClient
+            client = OpenAIClient()
+        self.client = client
+        self.model = client.model
+
+    def _http(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(base_url=self.client.base_url, timeout=httpx.Timeout(120.0, connect=5.0))
+
+    def encode(self, custom_id: str, messages: list, system: Optional[str]) -> Dict[str, Any]:
+        return {
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": self.client.request_body(messages, system),
+        }
+
+    async def submit(self, input_path: str) -> str:
+        headers = {"Authorization": self.client.headers()["Authorization"]}
+        async with self._http() as http:
+            with open(input_path, "rb") as f:
+                uploaded = await http.post(
+                    "/files", headers=headers, data={"purpose": "batch"},
+                    files={"file": (os.path.basename(input_path), f, "application/jsonl")},
+                )
+            uploaded.raise_for_status()
+            response = await http.post("/batches", headers=self.client.headers(), json={
+                "input_file_id": uploaded.json()["id"],
+                "endpoint": "/v1/chat/completions",
+                "completion_window": "24h",
+            })
+            response.raise_for_status()
+            return response.json()["id"]
+
+    async def poll(self, batch_id: str, input_path: str) -> Tuple[bool, Dict[str, Any]]:
+        async with self._http() as http:
+            response = await http.get(f"/batches/{batch_id}", headers=self.client.headers())
+            response.raise_for_status()
+            info = response.json()
+        return info["status"] in ("completed", "failed", "expired", "cancelled"), info
+
+    async def results(self, batch_id: str, info: Dict[str, Any]) -> List[Dict[str, Any]]:
+        results = []
+        async with self._http() as http:
+            for field in ("output_file_id", "error_file_id"):
+                if not info.get(field):
+                    continue
+                response = await http.get(f"/files/{info[field]}/content", headers=self.client.headers())
+                response.raise_for_status()
+                for line in response.text.splitlines():
+                    if line.strip():
+                        results.append(self._decode(json.loads(line)))
+        return results
+
+    @staticmethod
+    def _decode(line: Dict[str, Any]) -> Dict[str, Any]:
+        response = line.get("response") or {}
+        body = response.get("body") or {}
+        if line.get("error") or response.get("status_code") != 200:
+            error = line.get("error") or body.get("error") or f"HTTP {response.get('status_code')}"
+            return _result(line["custom_id"], error=json.dumps(error) if not isinstance(error, str) else error)
+        usage = body.get("usage") or {}
+        return _result(
+            line["custom_id"], text=body["choices"][0]["message"]["content"],
+            input_tokens=usage.get("prompt_tokens", 0), output_tokens=usage.get("completion_tokens", 0),
+        )
+
+
+class ClaudeBatchProvider:
+    """Anthropic Message Batches API"""
+
+    name = "claude"
+    discount = BATCH_DISCOUNT
+
+    def __init__(self, client=None):
+        if client is None:
+            from claude_client import ClaudeClient
+            client = ClaudeClient()
+        self.client = client
+        self.model = client.model
+
+    def _http(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(timeout=httpx.Timeout(120.0, connect=5.0))
+
+    def encode(self, custom_id: str, messages: list, system: Optional[str]) -> Dict[str, Any]:
+        return {"custom_id": custom_id, "params": self.client.request_body(messages, system)}
+
+    async def submit(self, input_path: str) -> str:
+        with open(input_path, encoding="utf-8") as f:
+            requests = [json.loads(line) for line in f if line.strip()]
+        async with self._http() as http:
+            response = await http.post(
+                f"{self.client.base_url}/messages/batches", headers=self.client.headers(), json={"requests": requests}
+            )
+            response.raise_for_status()
+            return response.json()["id"]
+
+    async def poll(self, batch_id: str, input_path: str) -> Tuple[bool, Dict[str, Any]]:
+        async with self._http() as http:
+            response = await http.get(f"{self.client.base_url}/messages/batches/{batch_id}", headers=self.client.headers())
+            response.raise_for_status()
+            info = response.json()
+        return info["processing_status"] == "ended", info
+
+    async def results(self, batch_id: str, info: Dict[str, Any]) -> List[Dict[str, Any]]:
+        if not info.get("results_url"):
+            return []
+        async with self._http() as http:
+            response = await http.get(info["results_url"], headers=self.client.headers())
+            response.raise_for_status()
+        return [self._decode(json.loads(line)) for line in response.text.splitlines() if line.strip()]
+
+    @staticmethod
+    def _decode(line: Dict[str, Any]) -> Dict[str, Any]:
+        result = line.get("result") or {}
+        if result.get("type") != "succeeded":
+            error = result.get("error") or result.get("type", "unknown")
+            return _result(line["custom_id"], error=json.dumps(error) if not isinstance(error, str) else error)
+        message = result["message"]
+        usage = message.get("usage") or {}
+        return _result(
+            line["custom_id"], text=message["content"][0]["text"],
+            input_tokens=usage.get("input_tokens", 0), output_tokens=usage.get("output_tokens", 0),
+        )
+
+
+class LocalBatchProvider:
+    """Stand-in batch endpoint that runs requests through a chat client.
+
+    Submitting is free; polling runs the batch with bounded concurrency and
+    appends each response to ``<input>.local.jsonl`` as it arrives, so an
+    interrupted batch resumes without repeating finished requests. Billed at
+    real-time prices.
+    """
+
+    name = "local"
+    discount = 1.0
+
+    def __init__(self, client=None, concurrency: int = 8, model: Optional[str] = None):
+        """
+        Args:
+            client: Object with async ``chat(messages, system)``; defaults to the LLM router
+            concurrency: Requests in flight at once
+            model: Model name used to price the run
+        """
+        if client is None:
+            from llm_router import get_router
+            client = get_router()
+        self.client = client
+        self.concurrency = concurrency
+        self.model = model or os.getenv("OPENAI_MODEL", "gpt-4o")
+
+    def encode(self, custom_id: str, messages: list, system: Optional[str]) -> Dict[str, Any]:
+        return {"custom_id": custom_id, "messages": messages, "system": system}
+
+    async def submit(self, input_path: str) -> str:
+        return f"local-{os.path.basename(input_path)}"
+
+    async def poll(self, batch_id: str, input_path: str) -> Tuple[bool, Dict[str, Any]]:
+        from prompt_budget import count_tokens
+
+        output_path = f"{input_path}.local.jsonl"
+        finished = {r["custom_id"] for r in _read_jsonl(output_path)}
+        with open(input_path, encoding="utf-8") as f:
+            todo = [r for r in map(json.loads, f) if r["custom_id"] not in finished]
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        with open(output_path, "a", encoding="utf-8") as out:
+            if finished:
+                # Start after any torn line left by an interrupted run
+                out.write("\n")
+
+            async def run(request: Dict[str, Any]) -> None:
+                async with semaphore:
+                    try:
+                        text = await self.client.chat(request["messages"], system=request["system"])
+                        prompt = (request["system"] or "") + "".join(m["content"] for m in request["messages"])
+                        result = _result(request["custom_id"], text=text,
+                                         input_tokens=count_tokens(prompt), output_tokens=count_tokens(text))
+                    except Exception as e:
+                        result = _result(request["custom_id"], error=f"{type(e).__name__}: {e}")
+                out.write(json.dumps(result) + "\n")
+                out.flush()
+
+            await asyncio.gather(*(run(r) for r in todo))
+        return True, {"output_path": output_path}
+
+    async def results(self, batch_id: str, info: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return list(_read_jsonl(info["output_path"]))
+
+
+def provider_from_env(name: Optional[str] = None):
+    """Build the provider named by ``name`` or LLM_BATCH_PROVIDER (openai, claude, local)"""
+    name = name or os.getenv("LLM_BATCH_PROVIDER", "openai")
+    factories = {"openai": OpenAIBatchProvider, "claude": ClaudeBatchProvider, "local": LocalBatchProvider}
+    if name not in factories:
+        raise ValueError(f"Unknown batch provider: {name}")
+    return factories[name]()
+
+
+class BatchRunner:
+    """Runs one resumable batch job in its own directory"""
+
+    def __init__(self,
+                 job_dir: str,
+                 spec: BatchSpec,
+                 provider,
+                 store,
+                 poll_interval: float = 30.0,
+                 max_requests_per_batch: int = MAX_REQUESTS_PER_BATCH):
+        """
+        Args:
+            job_dir: Directory holding the manifest, input and output files
+            spec: What to ask the LLM and how to turn answers into records
+            provider: Batch provider (OpenAI, Claude or local stand-in)
+            store: RecordStore the results are written to
+            poll_interval: Seconds between status checks
+            max_requests_per_batch: Requests per submitted batch file
+        """
+        self.job_dir = job_dir
+        self.spec = spec
+        self.provider = provider
+        self.store = store
+        self.poll_interval = poll_interval
+        self.max_requests_per_batch = max_requests_per_batch
+        self.manifest_path = os.path.join(job_dir, "manifest.json")
+        self.manifest: Optional[Dict[str, Any]] = None
+
+    def _save(self) -> None:
+        tmp = f"{self.manifest_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.manifest_path)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.job_dir, name)
+
+    def prepare(self, items: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """Write items and batch input files, unless an earlier run already did"""
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, encoding="utf-8") as f:
+                self.manifest = json.load(f)
+            return self.manifest
+
+        os.makedirs(self.job_dir, exist_ok=True)
+        batches: List[Dict[str, Any]] = []
+        count = 0
+        out = None
+        with open(self._path("items.jsonl"), "w", encoding="utf-8") as items_file:
+            for item in items:
+                requests = self.spec.build(item)
+                # An item's requests stay in one batch so it can be reduced on its own
+                if out is None or batches[-1]["requests"] + len(requests) > self.max_requests_per_batch:
+                    if out is not None:
+                        out.close()
+                    name = f"batch-{len(batches):04d}.jsonl"
+                    batches.append({"input": name, "requests": 0, "items": 0, "state": "prepared"})
+                    out = open(self._path(name), "w", encoding="utf-8")
+                key = str(item[self.spec.key])
+                for i, (messages, system) in enumerate(requests):
+                    out.write(json.dumps(self.provider.encode(f"{key}:{i}", messages, system)) + "\n")
+                batches[-1]["requests"] += len(requests)
+                batches[-1]["items"] += 1
+                items_file.write(json.dumps(
+                    {"batch": len(batches) - 1, "requests": len(requests), "item": item}, default=str
+                ) + "\n")
+                count += 1
+        if out is not None:
+            out.close()
+
+        self.manifest = {
+            "job": self.spec.name,
+            "provider": self.provider.name,
+            "model": self.provider.model,
+            "created_at": datetime.now().isoformat(),
+            "started": time.time(),
+            "finished": None,
+            "items": count,
+            "requests": sum(b["requests"] for b in batches),
+            "batches": batches,
+        }
+        self._save()
+        return self.manifest
+
+    async def run(self, items: Iterable[Dict[str, Any]] = ()) -> Dict[str, Any]:
+        """Prepare (or resume) the job, drive every batch to completion and return the report"""
+        self.prepare(items)
+        for index, batch in enumerate(self.manifest["batches"]):
+            if batch["state"] == "prepared":
+                batch["batch_id"] = await self.provider.submit(self._path(batch["input"]))
+                batch["state"] = "submitted"
+                batch["submitted"] = time.time()
+                self._save()
+            if batch["state"] == "submitted":
+                await self._download(batch)
+            if batch["state"] == "downloaded":
+                self._apply(index, batch)
+
+        if self.manifest["finished"] is None:
+            self.manifest["finished"] = time.time()
+            self._save()
+        return self.report()
+
+    async def _download(self, batch: Dict[str, Any]) -> None:
+        input_path = self._path(batch["input"])
+        while True:
+            done, info = await self.provider.poll(batch["batch_id"], input_path)
+            if done:
+                break
+            await asyncio.sleep(self.poll_interval)
+
+        results = await self.provider.results(batch["batch_id"], info)
+        output = batch["input"].replace(".jsonl", ".out.jsonl")
+        with open(self._path(output), "w", encoding="utf-8") as f:
+            for result in results:
+                f.write(json.dumps(result) + "\n")
+        batch.update({
+            "output": output,
+            "state": "downloaded",
+            "completed": time.time(),
+            "succeeded": sum(1 for r in results if r["text"] is not None),
+            "failed": batch["requests"] - sum(1 for r in results if r["text"] is not None),
+            "input_tokens": sum(r["input_tokens"] for r in results),
+            "output_tokens": sum(r["output_tokens"] for r in results),
+        })
+        self._save()
+
+    def _apply(self, index: int, batch: Dict[str, Any]) -> None:
+        texts: Dict[str, Optional[str]] = {r["custom_id"]: r["text"] for r in _read_jsonl(self._path(batch["output"]))}
+        records, skipped = [], 0
+        for entry in _read_jsonl(self._path("items.jsonl")):
+            if entry["batch"] != index:
+                continue
+            item = entry["item"]
+            key = str(item[self.spec.key])
+            record = self.spec.reduce(item, [texts.get(f"{key}:{i}") for i in range(entry["requests"])])
+            if record is None:
+                skipped += 1
+            else:
+                records.append(record)
+        # Store writes merge by key, so re-applying after a crash here is harmless
+        self.store.put_many(records)
+        batch["state"] = "applied"
+        batch["applied_records"] = len(records)
+        batch["skipped_records"] = skipped
+        self._save()
+
+    def report(self) -> Dict[str, Any]:
+        """Throughput and cost for the job, including a real-time price comparison"""
+        manifest = self.manifest
+        batches = manifest["batches"]
+        input_tokens = sum(b.get("input_tokens", 0) for b in batches)
+        output_tokens = sum(b.get("output_tokens", 0) for b in batches)
+        succeeded = sum(b.get("succeeded", 0) for b in batches)
+        end = manifest["finished"] or time.time()
+        elapsed = max(end - manifest["started"], 1e-9)
+
+        price_in, price_out = PRICES_PER_MTOK.get(manifest["model"], (0.0, 0.0))
+        realtime_cost = (input_tokens * price_in + output_tokens * price_out) / 1e6
+        cost = realtime_cost * self.provider.discount
+        return {
+            "job": manifest["job"],
+            "provider": manifest["provider"],
+            "model": manifest["model"],
+            "items": manifest["items"],
+            "requests": manifest["requests"],
+            "succeeded": succeeded,
+            "failed": sum(b.get("failed", 0) for b in batches),
+            "batches": len(batches),
+            "applied": sum(b.get("applied_records", 0) for b in batches),
+            "skipped": sum(b.get("skipped_records", 0) for b in batches),
+            "elapsed_s": round(elapsed, 2),
+            "requests_per_s": round(succeeded / elapsed, 2),
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "cost_usd": round(cost, 4),
+            "realtime_cost_usd": round(realtime_cost, 4),
+            "savings_usd": round(realtime_cost - cost, 4),
+            "priced": manifest["model"] in PRICES_PER_MTOK,
+        }
+
+
+def _read_jsonl(path: str) -> Iterable[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # Torn line from an interrupted run
+                continue
@@ -0,0 +1,355 @@
+"""
+Structured, replayable tool-call log for EstateWise MCP servers
+
+Every tool call becomes one JSON line, which benchmarks/replay_calls.py
+can read back and send again:
+
+    {"v": 1, "ts": "2026-10-19T15:04:05.123Z", "t": 1792422245.123,
+     "server": "clientside", "tool": "compare_offers", "arguments": {...},
+     "status": "ok", "duration_ms": 412.5, "output_digest": "9f2c...",
+     "trace_id": "...", "span_id": "..."}
+
+``t`` is the start of the call (epoch seconds), which is what replay timing
+uses. Errors carry ``"status": "error"`` and an ``error`` message.
+``output_digest`` hashes the output with volatile fields removed
+(timestamps, generated ids, timings; see ``comparable``). With
+CALL_LOG_OUTPUTS=1 the full output is kept as well, so a replay can be
+diffed against what production returned.
+
+Arguments are not logged in full by default. Values of name, email and
+phone arguments (at any depth) become ``"<redacted:1a2b3c4d>"``, a hash
+of the value so equal values still look equal. Base64 payloads and strings
+longer than CALL_LOG_MAX_ARG_CHARS become ``"<omitted 2400000 chars>"``
+(not hashed: hashing a multi-MB document would cost more than the call
+log saves). ``redacted`` counts the values replaced.
+CALL_LOG_ARGUMENTS=full keeps arguments exactly as sent, for capturing
+replayable traffic on a staging server; ``off`` keeps only their names.
+
+Records are written by a background thread, in batches, so a tool call
+never waits on the disk. Call ``flush`` (or ``flush_call_logs``) before
+reading a log that is still being written.
+
+Calls through MCP are recorded by CallLogMiddleware (call_logging.py);
+functions decorated with ``log_tool_call`` and called directly write the
+same record themselves. This module does not import fastmcp.
+
+Environment:
+    CALL_LOG_PATH      log file; ``{server}`` is replaced by the server name
+                       (default: logs.txt in the server's directory; "off" disables)
+    CALL_LOG_OUTPUTS   1 to keep full outputs in the log (0)
+    CALL_LOG_ARGUMENTS redacted, full or off (redacted)
+    CALL_LOG_MAX_ARG_CHARS  longest string argument kept when redacting (256)
+"""
+import os
+import re
+import json
+import queue
+import atexit
+import hashlib
+import threading
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Dict, Any, Iterator, List, Optional, Iterable, Tuple
+
+from trace_context import current
+
+FORMAT_VERSION = 1
+
+# Output fields that differ between two runs of the same call: timestamps,
+# timings and ids minted per call. They are dropped before outputs are
+# compared or digested.
+VOLATILE_KEYS = re.compile(r"(^|_)(at|ms|id|timestamp)$")
+
+# Set while CallLogMiddleware records the current call, so log_tool_call
+# does not write a second record for it
+_recording: ContextVar[bool] = ContextVar("call_log_recording", default=False)
+
+# Argument names whose values identify a person, and names of binary payloads
+PERSONAL_KEYS = re.compile(r"(^|_)(names?|emails?|phones?)$")
+BINARY_KEYS = re.compile(r"(^|_)(base64|b64|bytes)$")
+ARGUMENT_MODES = ("redacted", "full", "off")
+
+# Records waiting for the writer thread; past this they are dropped and counted
+MAX_PENDING = 10000
+
+
+def _fingerprint(value: Any) -> str:
+    text = value if isinstance(value, str) else json.dumps(value, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode()).hexdigest()[:8]
+
+
+def scrub_arguments(arguments: Dict[str, Any], mode: str = "redacted",
+                    max_chars: int = 256) -> Tuple[Dict[str, Any], int]:
+    """Arguments as they may be logged under mode, and how many values were replaced"""
+    if mode == "full":
+        return arguments, 0
+    if mode == "off":
+        return {key: "<omitted>" for key in arguments}, len(arguments)
+    replaced = 0
+
+    def scrub(value: Any, key: str = "") -> Any:
+        nonlocal replaced
+        if key and PERSONAL_KEYS.search(key) and value not in (None, "", [], {}):
+            replaced += 1
+            return f"<redacted:{_fingerprint(value)}>"
+        if isinstance(value, str) and (len(value) > max_chars or (key and BINARY_KEYS.search(key))):
+            replaced += 1
+            return f"<omitted {len(value)} chars>"
+        if isinstance(value, (bytes, bytearray)):
+            replaced += 1
+            return f"<omitted {len(value)} bytes>"
+        if isinstance(value, dict):
+            return {k: scrub(v, str(k).lower()) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [scrub(v, key) for v in value]
+        return value
+
+    return scrub(arguments), replaced
+
+
+def comparable(value: Any, volatile: re.Pattern = VOLATILE_KEYS) -> Any:
+    """value with volatile keys removed at every level, for comparing outputs"""
+    if isinstance(value, dict):
+        return {k: comparable(v, volatile) for k, v in value.items() if not volatile.search(str(k))}
+    if isinstance(value, (list, tuple)):
+        return [comparable(v, volatile) for v in value]
+    return value
+
+
+def digest(value: Any, volatile: re.Pattern = VOLATILE_KEYS) -> str:
+    """Short hash of an output's comparable form"""
+    canonical = json.dumps(comparable(value, volatile), sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()[:16]
+
+
+def diff_paths(a: Any, b: Any, limit: int = 10, path: str = "$") -> List[str]:
+    """JSON paths where two comparable outputs differ, at most limit of them"""
+    if isinstance(a, dict) and isinstance(b, dict):
+        paths = []
+        for key in sorted(set(a) | set(b), key=str):
+            if len(paths) >= limit:
+                break
+            if key not in a or key not in b:
+                paths.append(f"{path}.{key}")
+            else:
+                paths += diff_paths(a[key], b[key], limit - len(paths), f"{path}.{key}")
+        return paths
+    if isinstance(a, list) and isinstance(b, list):
+        paths = [] if len(a) == len(b) else [f"{path}.length"]
+        for i, (x, y) in enumerate(zip(a, b)):
+            if len(paths) >= limit:
+                break
+            paths += diff_paths(x, y, limit - len(paths), f"{path}[{i}]")
+        return paths
+    return [] if a == b else [path]
+
+
+def make_record(server: Optional[str],
+                tool: str,
+                arguments: Dict[str, Any],
+                started: float,
+                duration: float,
+                output: Any = None,
+                error: Optional[str] = None,
+                keep_output: bool = False,
+                arguments_mode: str = "redacted",
+                max_arg_chars: int = 256) -> Dict[str, Any]:
+    """One call record; started is epoch seconds, duration seconds"""
+    arguments, redacted = scrub_arguments(arguments, arguments_mode, max_arg_chars)
+    record = {
+        "v": FORMAT_VERSION,
+        "ts": datetime.fromtimestamp(started, timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z"),
+        "t": round(started, 6),
+        "server": server,
+        "tool": tool,
+        "arguments": arguments,
+        "status": "error" if error is not None else "ok",
+        "duration_ms": round(duration * 1000, 3),
+    }
+    if redacted:
+        record["redacted"] = redacted
+    if error is not None:
+        record["error"] = error
+    else:
+        record["output_digest"] = digest(output)
+        if keep_output:
+            record["output"] = output
+    span = current()
+    if span is not None:
+        record["trace_id"] = span.trace_id
+        record["span_id"] = span.span_id
+    return record
+
+
+class CallLog:
+    """Append-only JSON-lines log shared by the threads of one server, written off the calling thread"""
+
+    def __init__(self,
+                 path: str,
+                 server: Optional[str] = None,
+                 keep_outputs: Optional[bool] = None,
+                 arguments: Optional[str] = None):
+        self.path = path
+        self.server = server
+        if keep_outputs is None:
+            keep_outputs = os.getenv("CALL_LOG_OUTPUTS", "0") == "1"
+        self.keep_outputs = keep_outputs
+        arguments = arguments or os.getenv("CALL_LOG_ARGUMENTS", "redacted").lower()
+        if arguments not in ARGUMENT_MODES:
+            raise ValueError(f"CALL_LOG_ARGUMENTS must be one of {', '.join(ARGUMENT_MODES)} (got {arguments!r})")
+        self.arguments = arguments
+        self.max_arg_chars = int(os.getenv("CALL_LOG_MAX_ARG_CHARS", "256"))
+        self.written = 0
+        self.failed = 0
+        self.dropped = 0
+        self._file = None
+        self._pending: queue.Queue = queue.Queue(maxsize=MAX_PENDING)
+        self._writer: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def make_record(self, tool: str, arguments: Dict[str, Any], started: float, duration: float,
+                    output: Any = None, error: Optional[str] = None) -> Dict[str, Any]:
+        return make_record(self.server, tool, arguments, started, duration, output, error,
+                           self.keep_outputs, self.arguments, self.max_arg_chars)
+
+    def record(self,
+               tool: str,
+               arguments: Dict[str, Any],
+               started: float,
+               duration: float,
+               output: Any = None,
+               error: Optional[str] = None) -> None:
+        self.write(self.make_record(tool, arguments, started, duration, output, error))
+
+    def write(self, record: Dict[str, Any]) -> None:
+        """Queue one record for the writer thread; never blocks or raises into the tool call"""
+        line = json.dumps(record, ensure_ascii=False, default=repr) + "\n"
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._run, name="call-log-writer", daemon=True)
+                self._writer.start()
+                atexit.register(self.close)
+        try:
+            self._pending.put_nowait(line)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._pending.get()]
+            while len(batch) < 1000:
+                try:
+                    batch.append(self._pending.get_nowait())
+                except queue.Empty:
+                    break
+            lines = [line for line in batch if line is not None]
+            try:
+                if lines:
+                    self._append("".join(lines))
+                    self.written += len(lines)
+            except Exception as e:
+                self.failed += len(lines)
+                print(f"[call_log] Failed to write {self.path}: {e}")
+            finally:
+                for _ in batch:
+                    self._pending.task_done()
+            if len(lines) < len(batch) and self._file is not None:
+                # close() asked for the file to be closed; the next record reopens it
+                self._file.close()
+                self._file = None
+
+    def _append(self, text: str) -> None:
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(text)
+        self._file.flush()
+
+    def flush(self) -> None:
+        """Wait until every queued record is in the file"""
+        self._pending.join()
+
+    def close(self) -> None:
+        """Write what is queued and close the file; a later write reopens it"""
+        if self._writer is not None:
+            self._pending.put(None)
+            self.flush()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"path": self.path, "written": self.written, "failed": self.failed, "dropped": self.dropped,
+                "pending": self._pending.qsize(), "keep_outputs": self.keep_outputs, "arguments": self.arguments}
+
+
+_logs: Dict[str, CallLog] = {}
+_logs_lock = threading.Lock()
+
+
+def open_call_log(server: Optional[str], default_path: str) -> Optional[CallLog]:
+    """The process-wide CallLog for a file (CALL_LOG_PATH or default_path), or None when disabled"""
+    path = os.getenv("CALL_LOG_PATH") or default_path
+    if path.lower() == "off":
+        return None
+    path = os.path.abspath(path.replace("{server}", server or "server"))
+    with _logs_lock:
+        log = _logs.get(path)
+        if log is None:
+            log = _logs[path] = CallLog(path, server)
+        return log
+
+
+def flush_call_logs() -> None:
+    """Flush every CallLog opened with open_call_log"""
+    with _logs_lock:
+        logs = list(_logs.values())
+    for log in logs:
+        log.flush()
+
+
+def recording() -> bool:
+    """Whether CallLogMiddleware is recording the current call"""
+    return _recording.get()
+
+
+def read_calls(path: str, skipped: Optional[Dict[str, int]] = None) -> Iterator[Dict[str, Any]]:
+    """Call records of a log file in file order.
+
+    Lines that are not version-1 records are skipped: free-form lines
+    written before the structured format, exception tracebacks, and
+    truncated last lines. When ``skipped`` is given, they are counted in it.
+    """
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            if not isinstance(record, dict) or record.get("v") != FORMAT_VERSION or "tool" not in record:
+                if skipped is not None:
+                    skipped["unparsed"] = skipped.get("unparsed", 0) + 1
+                continue
+            yield record
+
+
+def select(records: Iterable[Dict[str, Any]],
+           servers: Optional[Iterable[str]] = None,
+           tools: Optional[Iterable[str]] = None,
+           since: Optional[float] = None,
+           until: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+    """Records filtered by server, tool and start time (epoch seconds)"""
+    servers = set(servers) if servers else None
+    tools = set(tools) if tools else None
+    for record in records:
+        if servers is not None and record.get("server") not in servers:
+            continue
+        if tools is not None and record["tool"] not in tools:
+            continue
+        if since is not None and record["t"] < since:
+            continue
+        if until is not None and record["t"] >= until:
+            continue
+        yield record
@@ -0,0 +1,60 @@
+"""
+Call-log middleware for EstateWise MCP servers
+
+Writes one structured record per tool call (see call_log.py for the format)
+with the tool name, the arguments (personal and bulky values redacted
+unless CALL_LOG_ARGUMENTS=full), status, duration and a digest of the
+output. Records are written by the log's background thread. benchmarks/replay_calls.py replays these logs
+against a server, or shadows them to a candidate build.
+
+Added right after TracingMiddleware, so records carry the call's trace id
+and the duration covers deadline and admission waits, as the client saw it.
+"""
+import time
+
+from fastmcp.server.middleware import Middleware
+
+import call_log
+from call_log import CallLog
+
+
+def _output(result):
+    """The JSON-able output of a tool result: structured content, else the content texts"""
+    structured = getattr(result, "structured_content", None)
+    if structured is not None:
+        return structured
+    content = getattr(result, "content", None)
+    if content is None:
+        return result
+    return [getattr(block, "text", None) for block in content]
+
+
+class CallLogMiddleware(Middleware):
+    """Record every tool call in a CallLog; a None log records nothing"""
+
+    def __init__(self, log: CallLog):
+        self.log = log
+
+    async def on_call_tool(self, context, call_next):
+        if self.log is None:
+            return await call_next(context)
+        name = context.message.name
+        arguments = dict(context.message.arguments or {})
+        token = call_log._recording.set(True)
+        started = time.time()
+        began = time.perf_counter()
+        try:
+            result = await call_next(context)
+        except Exception as e:
+            self.log.record(name, arguments, started, time.perf_counter() - began,
+                            error=f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            call_log._recording.reset(token)
+        duration = time.perf_counter() - began
+        output = _output(result)
+        if getattr(result, "is_error", False) or getattr(result, "isError", False):
+            self.log.record(name, arguments, started, duration, error=str(output))
+        else:
+            self.log.record(name, arguments, started, duration, output=output)
+        return result
@@ -0,0 +1,87 @@
+"""
+Phase timing for EstateWise MCP tool calls
+
+The profiler middleware (profiling.py) starts a ``CallTrace`` for each tool
+call. It travels in a contextvar, so code deep inside a tool can time its
+part of the call without the trace being passed around:
+
+    with call_phases.phase("llm_wait"):
+        reply = await provider.chat(messages)
+
+Outside a tool call ``phase`` returns a shared no-op and costs one contextvar
+lookup. Phase names used across the servers are listed in ``PHASES``.
+
+Keep this module's imports light: the LLM router and validators load it.
+"""
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+# queued and serialization are measured by the middleware, other is what is left of the tool body
+PHASES = ("queued", "validation", "ranking", "llm_wait", "serialization", "other")
+
+
+class CallTrace:
+    """Timestamps and phase durations of one tool call"""
+
+    __slots__ = ("tool", "started", "body_started", "body_ended", "phases")
+
+    def __init__(self, tool: str):
+        self.tool = tool
+        self.started = time.perf_counter()
+        self.body_started: Optional[float] = None
+        self.body_ended: Optional[float] = None
+        self.phases: Dict[str, float] = {}
+
+    def add(self, name: str, seconds: float) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+
+_trace: ContextVar[Optional[CallTrace]] = ContextVar("call_trace", default=None)
+
+
+class _Phase:
+    __slots__ = ("trace", "name", "started")
+
+    def __init__(self, trace: CallTrace, name: str):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.trace.add(self.name, time.perf_counter() - self.started)
+
+
+class _NoPhase:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NO_PHASE = _NoPhase()
+
+
+def phase(name: str):
+    """Context manager timing a phase of the current tool call (a no-op outside one)"""
+    trace = _trace.get()
+    return _NO_PHASE if trace is None else _Phase(trace, name)
+
+
+def current() -> Optional[CallTrace]:
+    """The trace of the tool call being served, if any"""
+    return _trace.get()
+
+
+def begin(tool: str):
+    """Start tracing a tool call; returns the trace and a token for ``end``"""
+    trace = CallTrace(tool)
+    return trace, _trace.set(trace)
+
+
+def end(token) -> None:
+    _trace.reset(token)
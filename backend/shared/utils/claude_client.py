@@ -6,26 +6,32 @@ import json
 from typing import Dict, Any, Optional
 import httpx
 
+from deadline import bounded
+from trace_context import inject, span
+
 
 class ClaudeClient:
     """Wrapper for Claude API interactions"""
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None, timeout: Optional[float] = None):
         self.api_key = api_key or os.getenv("CLAUDE_API_KEY")
         self.model = os.getenv("CLAUDE_MODEL", "claude-3-5-sonnet-20241022")
-        self.base_url = "https://api.anthropic.com/v1"
+        self.base_url = base_url or os.getenv("CLAUDE_BASE_URL", "https://api.anthropic.com/v1")
+        # Upper bound for one request; a request deadline (deadline.py) cuts it shorter
+        self.timeout = httpx.Timeout(timeout or float(os.getenv("LLM_TIMEOUT_S", 60)), connect=5.0)
         
         if not self.api_key:
             raise ValueError("Claude API key is required")
     
-    async def chat(self, messages: list, system: Optional[str] = None) -> str:
-        """Send a chat message to Claude"""
-        headers = {
+    def headers(self) -> Dict[str, str]:
+        return {
             "x-api-key": self.api_key,
             "anthropic-version": "2023-06-01",
             "content-type": "application/json"
         }
-        
+    
+    def request_body(self, messages: list, system: Optional[str] = None) -> Dict[str, Any]:
+        """Messages request body (also used for Message Batches params)"""
         data = {
             "model": self.model,
             "max_tokens": 4096,
@@ -33,16 +39,29 @@ class ClaudeClient:
         }
         
         if system:
-            data["system"] = system
-            
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{self.base_url}/messages",
-                headers=headers,
-                json=data
-            )
-            response.raise_for_status()
-            return response.json()["content"][0]["text"]
+            # The system prompt is the prefix shared by every call of a tool;
+            # marking it lets the API serve it from the prompt cache
+            data["system"] = [{"type": "text", "text": system, "cache_control": {"type": "ephemeral"}}]
+        return data
+    
+    async def chat(self, messages: list, system: Optional[str] = None) -> str:
+        """Send a chat message to Claude"""
+        attributes = {"gen_ai.system": "anthropic", "gen_ai.request.model": self.model}
+        with span(f"chat {self.model}", attributes, kind="client") as call:
+            async with httpx.AsyncClient(timeout=self.timeout) as client:
+                response = await bounded(client.post(
+                    f"{self.base_url}/messages",
+                    headers=inject(self.headers()),
+                    json=self.request_body(messages, system)
+                ), "claude")
+                call.set("http.response.status_code", response.status_code)
+                response.raise_for_status()
+                body = response.json()
+                usage = body.get("usage") or {}
+                call.set("gen_ai.usage.input_tokens", usage.get("input_tokens"))
+                call.set("gen_ai.usage.output_tokens", usage.get("output_tokens"))
+                call.set("gen_ai.usage.cache_read_input_tokens", usage.get("cache_read_input_tokens"))
+                return body["content"][0]["text"]
     
     def extract_json(self, text: str) -> Dict[str, Any]:
         """Extract JSON from Claude response"""
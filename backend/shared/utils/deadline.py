@@ -0,0 +1,255 @@
+"""
+Request-scoped deadlines for EstateWise MCP tool calls
+
+The MCP server sets a deadline for each tool call (see
+``admission.DeadlineMiddleware``). It travels in a contextvar, so it
+reaches the LLM clients without being passed through every tool signature.
+That includes sync tools, which run in a worker thread and call
+``asyncio.run``. LLM clients wrap their HTTP request in ``bounded``. It caps
+the request at the time left and cancels it once the deadline passes or the
+client goes away, so the server stops paying for answers nobody will read.
+
+Each upstream records the time spent on calls that were cut short, and an
+estimate of the time that was saved by not waiting for them to finish.
+
+Keep this module's imports light: the LLM clients load it.
+"""
+import time
+import asyncio
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Callable, Optional, List
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request's deadline passed before an upstream call finished"""
+
+
+class RequestCancelled(Exception):
+    """The client went away, so the upstream call was abandoned"""
+
+
+class Deadline:
+    """Expiry time and cancellation signal shared by everything a request does"""
+
+    def __init__(self, expires_at: Optional[float] = None, parent: Optional["Deadline"] = None):
+        """
+        Args:
+            expires_at: ``time.monotonic()`` value at which the request times out
+            parent: Enclosing deadline; its expiry and cancellation also apply
+        """
+        if parent is not None and parent.expires_at is not None:
+            expires_at = parent.expires_at if expires_at is None else min(expires_at, parent.expires_at)
+        self.expires_at = expires_at
+        self.parent = parent
+        self.reason: Optional[str] = None
+        self._callbacks: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.reason is not None or (self.parent is not None and self.parent.cancelled)
+
+    @property
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left, or None when the request has no deadline"""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def cancel(self, reason: str = "client_gone") -> None:
+        """Abandon the request; upstream calls in any thread are cancelled"""
+        with self._lock:
+            if self.reason is not None:
+                return
+            self.reason = reason
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def on_cancel(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """Run callback when this deadline or an enclosing one is cancelled; returns an unregister function"""
+        chain = []
+        deadline = self
+        while deadline is not None:
+            with deadline._lock:
+                deadline._callbacks.append(callback)
+            chain.append(deadline)
+            deadline = deadline.parent
+
+        def remove() -> None:
+            for d in chain:
+                with d._lock:
+                    if callback in d._callbacks:
+                        d._callbacks.remove(callback)
+
+        return remove
+
+
+_current: ContextVar[Optional[Deadline]] = ContextVar("request_deadline", default=None)
+
+
+def current() -> Optional[Deadline]:
+    """The deadline of the request being served, if any"""
+    return _current.get()
+
+
+def remaining() -> Optional[float]:
+    deadline = _current.get()
+    return deadline.remaining() if deadline is not None else None
+
+
+@contextmanager
+def scope(timeout: Optional[float] = None, deadline: Optional[Deadline] = None):
+    """Run a block under a deadline.
+
+    Args:
+        timeout: Seconds from now; nested scopes can only shorten the
+            enclosing deadline, never extend it
+        deadline: Use this Deadline as-is (the middleware passes its own so it
+            can cancel it)
+    """
+    if deadline is None:
+        expires_at = time.monotonic() + timeout if timeout is not None else None
+        deadline = Deadline(expires_at, parent=_current.get())
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+
+class UpstreamMetrics:
+    """Time spent on, and saved by cutting short, calls to one upstream service"""
+
+    def __init__(self, name: str, alpha: float = 0.2):
+        self.name = name
+        self.alpha = alpha
+        self.calls = 0
+        self.completed = 0
+        self.failed = 0
+        self.skipped = 0
+        self.deadline_exceeded = 0
+        self.client_cancelled = 0
+        self.busy_s = 0.0
+        self.cut_short_s = 0.0
+        self.saved_s = 0.0
+        self.typical_s: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def expected(self) -> float:
+        """Typical latency of a completed call (0 until one has completed)"""
+        return self.typical_s or 0.0
+
+    def record(self, outcome: str, elapsed: float) -> None:
+        with self._lock:
+            self.calls += 1
+            self.busy_s += elapsed
+            if outcome == "completed":
+                self.completed += 1
+                self.typical_s = elapsed if self.typical_s is None else (
+                    self.alpha * elapsed + (1 - self.alpha) * self.typical_s
+                )
+                return
+            if outcome == "failed":
+                self.failed += 1
+                return
+            if outcome == "skipped":
+                self.skipped += 1
+            elif outcome == "deadline":
+                self.deadline_exceeded += 1
+            else:
+                self.client_cancelled += 1
+            # The rest of a typical call is time the upstream would have been
+            # billed for an answer nobody was waiting on
+            self.cut_short_s += elapsed
+            self.saved_s += max(0.0, self.expected() - elapsed)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "completed": self.completed,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "deadline_exceeded": self.deadline_exceeded,
+            "client_cancelled": self.client_cancelled,
+            "busy_ms": round(self.busy_s * 1000, 1),
+            "cut_short_ms": round(self.cut_short_s * 1000, 1),
+            "saved_ms": round(self.saved_s * 1000, 1),
+            "typical_ms": round(self.typical_s * 1000, 1) if self.typical_s is not None else None,
+        }
+
+
+_metrics: Dict[str, UpstreamMetrics] = {}
+_metrics_lock = threading.Lock()
+
+
+def upstream_metrics(name: str) -> UpstreamMetrics:
+    metrics = _metrics.get(name)
+    if metrics is None:
+        with _metrics_lock:
+            metrics = _metrics.setdefault(name, UpstreamMetrics(name))
+    return metrics
+
+
+def metrics_snapshot() -> Dict[str, Any]:
+    """Per-upstream counters, for the /metrics endpoint"""
+    return {name: m.snapshot() for name, m in list(_metrics.items())}
+
+
+async def bounded(awaitable, upstream: str):
+    """Await an upstream call within the current request's deadline.
+
+    Raises DeadlineExceeded when the deadline passes first and
+    RequestCancelled when the client goes away. The upstream call is cancelled
+    in both cases, and before it is started if the request is already over.
+    """
+    metrics = upstream_metrics(upstream)
+    deadline = _current.get()
+    started = time.monotonic()
+
+    if deadline is not None and (deadline.cancelled or deadline.expired):
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        metrics.record("skipped", 0.0)
+        if deadline.cancelled:
+            raise RequestCancelled(f"{upstream} call skipped: request {deadline.reason or 'cancelled'}")
+        raise DeadlineExceeded(f"{upstream} call skipped: request deadline already passed")
+
+    task = asyncio.ensure_future(awaitable)
+    remove = None
+    if deadline is not None:
+        # cancel() may be called from the event-loop thread while this runs in
+        # a worker thread's loop (sync tools), so hop threads safely
+        loop = asyncio.get_running_loop()
+        remove = deadline.on_cancel(lambda: loop.call_soon_threadsafe(task.cancel))
+    try:
+        done, _ = await asyncio.wait({task}, timeout=deadline.remaining() if deadline else None)
+    except asyncio.CancelledError:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        metrics.record("deadline" if deadline is not None and deadline.expired else "client_gone",
+                       time.monotonic() - started)
+        raise
+    finally:
+        if remove is not None:
+            remove()
+
+    elapsed = time.monotonic() - started
+    if not done:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        metrics.record("deadline", elapsed)
+        raise DeadlineExceeded(f"{upstream} call cancelled after {elapsed:.2f}s: request deadline passed")
+    if task.cancelled():
+        metrics.record("client_gone", elapsed)
+        raise RequestCancelled(f"{upstream} call cancelled after {elapsed:.2f}s: request {deadline.reason}")
+    if task.exception() is not None:
+        metrics.record("failed", elapsed)
+        raise task.exception()
+    metrics.record("completed", elapsed)
+    return task.result()
@@ -0,0 +1,515 @@
+"""
+Local text embeddings and a quantized nearest-neighbour index
+
+Buyer letters and lead inquiries are embedded on the CPU, with no LLM round
+trip. The default embedder uses signed feature hashing of words and word
+bigrams: it needs no model, and it is deterministic across processes, so
+vectors written by one server can be read by another. Set EMBEDDING_MODEL to
+a sentence-transformers model to use that model instead when the package is
+installed.
+
+An EmbeddingIndex stores vectors as int8 (with one scale per vector) and
+searches them with an inverted file. k-means centroids partition the
+vectors, and a query scans only the ``nprobe`` lists whose centroids are
+nearest. Recently added vectors wait in a small tail that is
+scanned in full. Saved indexes are directories of .npy files that load
+memory-mapped, the same as PropertyTable, so startup does not read the
+vectors.
+
+Sentiment and intent scores compare a text with labelled prototype
+sentences (see LETTER_SENTIMENT and INQUIRY_INTENT).
+
+Environment:
+    EMBEDDING_MODEL        sentence-transformers model name (default: hashed features)
+    EMBEDDING_INDEX_PATH   directory of the LeadGen inquiry index (default: in memory)
+"""
+import os
+import re
+import json
+import zlib
+import shutil
+import threading
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+FORMAT_VERSION = 1
+DIM = 256
+# Bigrams carry word order ("not great") but count less than words
+BIGRAM_WEIGHT = 0.5
+# Below this many vectors a flat scan beats probing centroids
+MIN_TRAIN = 2048
+# Tail vectors are merged into the inverted lists once there are this many
+MERGE_EVERY = 1024
+
+_WORD = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+
+class HashingEmbedder:
+    """Signed feature hashing into ``dim`` buckets, L2-normalized"""
+
+    name = "hashing"
+
+    def __init__(self, dim: int = DIM):
+        self.dim = dim
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = _WORD.findall((text or "").lower())
+            if not words:
+                continue
+            grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+            hashes = np.fromiter((zlib.crc32(g.encode()) for g in grams), dtype=np.uint32, count=len(grams))
+            weights = np.where(hashes & 0x80000000, -1.0, 1.0)
+            weights[len(words):] *= BIGRAM_WEIGHT
+            out[row] = np.bincount(hashes % self.dim, weights=weights, minlength=self.dim)
+        return _normalize(out)
+
+
+class SentenceTransformerEmbedder:
+    """A local sentence-transformers model run on the CPU"""
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.name = model_name
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = self.model.encode([t or "" for t in texts], batch_size=64,
+                                    normalize_embeddings=True, convert_to_numpy=True)
+        return vectors.astype(np.float32)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.divide(vectors, norms, out=vectors, where=norms > 0)
+    return vectors
+
+
+_embedder = None
+_embedder_lock = threading.Lock()
+
+
+def get_embedder():
+    """The process-wide embedder (EMBEDDING_MODEL if it loads, else hashed features)"""
+    global _embedder
+    if _embedder is None:
+        with _embedder_lock:
+            if _embedder is None:
+                model = os.getenv("EMBEDDING_MODEL")
+                embedder = None
+                if model:
+                    try:
+                        embedder = SentenceTransformerEmbedder(model)
+                    except Exception:
+                        embedder = None
+                _embedder = embedder or HashingEmbedder()
+    return _embedder
+
+
+def quantize(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """int8 codes and per-vector scales (vector ~= codes * scale)"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    safe = np.where(scales > 0, scales, 1.0)[:, None]
+    codes = np.clip(np.rint(vectors / safe), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def kmeans(vectors: np.ndarray, k: int, iterations: int = 8, seed: int = 0) -> np.ndarray:
+    """Spherical k-means centroids (unit length) for normalized vectors"""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, vectors)
+        empty = ~sums.any(axis=1)
+        sums[empty] = vectors[rng.choice(len(vectors), size=int(empty.sum()))]
+        centroids = _normalize(sums)
+    return centroids
+
+
+class EmbeddingIndex:
+    """int8 vectors with ids and JSON metadata, searched by inverted file (IVF)"""
+
+    _ARRAYS = ("codes", "scales", "assign", "centroids", "order", "offsets", "records", "record_offsets", "removed")
+
+    def __init__(self, dim: Optional[int] = None, nprobe: int = 16, path: Optional[str] = None):
+        """
+        Args:
+            dim: Vector dimension (default: the process embedder's)
+            nprobe: Inverted lists scanned per query
+            path: Directory save() writes to (and load() read from)
+        """
+        dim = dim or get_embedder().dim
+        self.dim = dim
+        self.nprobe = nprobe
+        self.path = path
+        self.embedder_name: Optional[str] = None
+        self._lock = threading.RLock()
+        # Indexed vectors (memory-mapped after load)
+        self._codes = np.zeros((0, dim), dtype=np.int8)
+        self._scales = np.zeros(0, dtype=np.float32)
+        self._assign = np.zeros(0, dtype=np.int32)
+        self._centroids = np.zeros((0, dim), dtype=np.float32)
+        # Positions grouped by inverted list: list c is order[offsets[c]:offsets[c + 1]]
+        self._order = np.zeros(0, dtype=np.int64)
+        self._offsets = np.zeros(1, dtype=np.int64)
+        # {"id": ..., **meta} as JSON, packed into one buffer with offsets
+        self._records = np.zeros(0, dtype=np.uint8)
+        self._record_offsets = np.zeros(1, dtype=np.int64)
+        self._removed = set()
+        # Added since the last merge: scanned in full
+        self._tail_codes: List[np.ndarray] = []
+        self._tail_scales: List[np.ndarray] = []
+        self._tail_records: List[bytes] = []
+        self._positions: Optional[Dict[str, int]] = None
+        self.unsaved = 0
+        self.queries = 0
+
+    def __len__(self) -> int:
+        return self._size - len(self._removed)
+
+    @property
+    def _size(self) -> int:
+        return len(self._scales) + len(self._tail_records)
+
+    def _record(self, position: int) -> Dict[str, Any]:
+        indexed = len(self._scales)
+        if position >= indexed:
+            return json.loads(self._tail_records[position - indexed])
+        start, end = self._record_offsets[position], self._record_offsets[position + 1]
+        return json.loads(self._records[start:end].tobytes())
+
+    def _id_positions(self) -> Dict[str, int]:
+        # Built on first write so a loaded index does not decode every record at startup
+        if self._positions is None:
+            self._positions = {}
+            for position in range(self._size):
+                if position not in self._removed:
+                    self._positions[self._record(position)["id"]] = position
+        return self._positions
+
+    def add(self, ids: Sequence[str], vectors: np.ndarray, metas: Optional[Sequence[Optional[Dict[str, Any]]]] = None) -> int:
+        """Add or replace vectors by id"""
+        if not len(ids):
+            return 0
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(ids), self.dim)
+        codes, scales = quantize(vectors)
+        metas = metas or [None] * len(ids)
+        with self._lock:
+            positions = self._id_positions()
+            for row, doc_id in enumerate(ids):
+                old = positions.get(doc_id)
+                if old is not None:
+                    self._removed.add(old)
+                positions[doc_id] = self._size + row
+            self._tail_codes.append(codes)
+            self._tail_scales.append(scales)
+            self._tail_records.extend(
+                json.dumps({**(meta or {}), "id": doc_id}, default=str).encode() for doc_id, meta in zip(ids, metas)
+            )
+            self.unsaved += len(ids)
+            if len(self._tail_records) >= MERGE_EVERY:
+                self._merge_tail()
+                if not len(self._centroids) and len(self._scales) >= MIN_TRAIN:
+                    self.build()
+        return len(ids)
+
+    def add_texts(self, ids: Sequence[str], texts: Sequence[str],
+                  metas: Optional[Sequence[Optional[Dict[str, Any]]]] = None, batch_size: int = 512) -> int:
+        """Embed texts in batches and add them"""
+        embedder = get_embedder()
+        if not self.matches(embedder):
+            raise ValueError(f"Index holds {self.dim}-dim {self.embedder_name} vectors; "
+                             f"the embedder is {embedder.name} ({embedder.dim}-dim)")
+        self.embedder_name = embedder.name
+        for start in range(0, len(ids), batch_size):
+            stop = start + batch_size
+            self.add(ids[start:stop], embedder.embed(texts[start:stop]), metas[start:stop] if metas else None)
+        return len(ids)
+
+    def matches(self, embedder) -> bool:
+        """Whether vectors from this embedder are comparable with the ones indexed"""
+        if embedder.dim != self.dim:
+            return False
+        return self.embedder_name is None or not self._size or self.embedder_name == embedder.name
+
+    def remove(self, doc_id: str) -> bool:
+        with self._lock:
+            position = self._id_positions().pop(doc_id, None)
+            if position is None:
+                return False
+            self._removed.add(position)
+            self.unsaved += 1
+            return True
+
+    def _merge_tail(self) -> None:
+        """Append tail vectors to the indexed arrays, assigned to the existing centroids"""
+        if not self._tail_records:
+            return
+        codes = np.concatenate(self._tail_codes)
+        scales = np.concatenate(self._tail_scales)
+        encoded = self._tail_records
+        assign = (np.argmax((codes.astype(np.float32) @ self._centroids.T), axis=1).astype(np.int32)
+                  if len(self._centroids) else np.zeros(len(scales), dtype=np.int32))
+        record_offsets = np.empty(len(encoded), dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=record_offsets)
+        record_offsets += self._record_offsets[-1]
+
+        self._codes = np.concatenate([self._codes, codes])
+        self._scales = np.concatenate([self._scales, scales])
+        self._assign = np.concatenate([self._assign, assign])
+        self._records = np.concatenate([self._records, np.frombuffer(b"".join(encoded), dtype=np.uint8)])
+        self._record_offsets = np.concatenate([self._record_offsets, record_offsets])
+        self._tail_codes, self._tail_scales, self._tail_records = [], [], []
+        self._regroup()
+
+    def _regroup(self) -> None:
+        lists = max(len(self._centroids), 1)
+        self._order = np.argsort(self._assign, kind="stable")
+        self._offsets = np.zeros(lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self._assign, minlength=lists), out=self._offsets[1:])
+
+    def build(self, nlist: Optional[int] = None) -> "EmbeddingIndex":
+        """Train centroids on the current vectors and regroup them (small indexes stay flat)"""
+        with self._lock:
+            self._centroids = np.zeros((0, self.dim), dtype=np.float32)
+            self._assign = np.zeros(len(self._scales), dtype=np.int32)
+            self._merge_tail()
+            if self._removed:
+                self._compact()
+            count = len(self._scales)
+            if count >= MIN_TRAIN:
+                nlist = nlist or int(np.sqrt(count))
+                rng = np.random.default_rng(0)
+                sample = rng.choice(count, size=min(count, 64 * nlist), replace=False)
+                train = _normalize(self._codes[np.sort(sample)].astype(np.float32))
+                self._centroids = kmeans(train, nlist)
+                assign = np.empty(count, dtype=np.int32)
+                for start in range(0, count, 16384):
+                    block = self._codes[start:start + 16384].astype(np.float32)
+                    assign[start:start + 16384] = np.argmax(block @ self._centroids.T, axis=1)
+                self._assign = assign
+            else:
+                self._assign = np.zeros(count, dtype=np.int32)
+            self._regroup()
+            self.unsaved += 1
+        return self
+
+    def _compact(self) -> None:
+        keep = np.setdiff1d(np.arange(len(self._scales)), np.fromiter(self._removed, dtype=np.int64))
+        records = [self._records[self._record_offsets[i]:self._record_offsets[i + 1]].tobytes() for i in keep]
+        self._codes = self._codes[keep]
+        self._scales = self._scales[keep]
+        self._assign = self._assign[keep]
+        self._records = np.frombuffer(b"".join(records), dtype=np.uint8)
+        self._record_offsets = np.zeros(len(records) + 1, dtype=np.int64)
+        np.cumsum([len(r) for r in records], out=self._record_offsets[1:])
+        self._removed = set()
+        self._positions = None
+
+    def _candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        indexed = len(self._scales)
+        if not len(self._centroids):
+            candidates = np.arange(indexed)
+        else:
+            nearest = np.argsort(self._centroids @ query)[::-1][:nprobe]
+            candidates = np.concatenate([self._order[self._offsets[c]:self._offsets[c + 1]] for c in nearest])
+        return np.concatenate([candidates, np.arange(indexed, self._size)])
+
+    def search(self, query: np.ndarray, k: int = 10, nprobe: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Nearest vectors by cosine similarity, as records with a 'similarity'"""
+        query = _normalize(np.asarray(query, dtype=np.float32).reshape(1, self.dim))[0]
+        with self._lock:
+            self.queries += 1
+            candidates = self._candidates(query, nprobe or self.nprobe)
+            if self._removed:
+                candidates = candidates[~np.isin(candidates, np.fromiter(self._removed, dtype=np.int64))]
+            if not len(candidates):
+                return []
+            indexed = len(self._scales)
+            positions = np.sort(candidates[candidates < indexed])
+            codes, scales = self._codes[positions], self._scales[positions]
+            # Unmerged rows come from the filtered candidates too, so replaced or removed ids stay out
+            tail = candidates[candidates >= indexed]
+            if len(tail):
+                codes = np.concatenate([codes, np.concatenate(self._tail_codes)[tail - indexed]])
+                scales = np.concatenate([scales, np.concatenate(self._tail_scales)[tail - indexed]])
+                positions = np.concatenate([positions, tail])
+            scores = (codes.astype(np.float32) @ query) * scales
+            top = np.argpartition(-scores, k)[:k] if len(scores) > k else np.arange(len(scores))
+            top = top[np.argsort(-scores[top], kind="stable")]
+            return [{**self._record(int(positions[i])), "similarity": round(float(scores[i]), 4)} for i in top]
+
+    def search_text(self, text: str, k: int = 10) -> List[Dict[str, Any]]:
+        return self.search(get_embedder().embed([text])[0], k)
+
+    def save(self, path: Optional[str] = None) -> str:
+        """Write a new version of the index and point CURRENT at it"""
+        path = path or self.path
+        with self._lock:
+            self._merge_tail()
+            arrays = {
+                "codes": self._codes, "scales": self._scales, "assign": self._assign,
+                "centroids": self._centroids, "order": self._order, "offsets": self._offsets,
+                "records": self._records, "record_offsets": self._record_offsets,
+                "removed": np.array(sorted(self._removed), dtype=np.int64),
+            }
+            os.makedirs(path, exist_ok=True)
+            previous = _current_version(path)
+            version = f"v{int(previous[1:]) + 1 if previous else 1}"
+            target = os.path.join(path, version)
+            os.makedirs(target, exist_ok=True)
+            for name, array in arrays.items():
+                np.save(os.path.join(target, f"{name}.npy"), np.ascontiguousarray(array))
+            with open(os.path.join(target, "manifest.json"), "w") as f:
+                json.dump({"format_version": FORMAT_VERSION, "dim": self.dim, "count": len(self),
+                           "embedder": self.embedder_name or get_embedder().name}, f)
+            # Readers that already mapped the old version keep their (unlinked) files
+            pointer = os.path.join(path, "CURRENT.tmp")
+            with open(pointer, "w") as f:
+                f.write(version)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(pointer, os.path.join(path, "CURRENT"))
+            if previous:
+                shutil.rmtree(os.path.join(path, previous), ignore_errors=True)
+            self.path = path
+            self.unsaved = 0
+        return target
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True, nprobe: int = 16) -> "EmbeddingIndex":
+        """Open a saved index; with mmap=True the arrays are read-only memory maps"""
+        version = _current_version(path)
+        if version is None:
+            raise FileNotFoundError(f"No embedding index at {path}")
+        directory = os.path.join(path, version)
+        with open(os.path.join(directory, "manifest.json")) as f:
+            manifest = json.load(f)
+        if manifest.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported embedding index format: {manifest.get('format_version')}")
+        index = cls(manifest["dim"], nprobe=nprobe, path=path)
+        index.embedder_name = manifest.get("embedder")
+        mode = "r" if mmap else None
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mode, allow_pickle=False)
+                  for name in cls._ARRAYS}
+        index._codes, index._scales, index._assign = arrays["codes"], arrays["scales"], arrays["assign"]
+        index._centroids = np.asarray(arrays["centroids"])
+        index._order, index._offsets = arrays["order"], arrays["offsets"]
+        index._records, index._record_offsets = arrays["records"], arrays["record_offsets"]
+        index._removed = set(int(p) for p in arrays["removed"])
+        return index
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "vectors": len(self),
+            "lists": len(self._centroids),
+            "tail": len(self._tail_records),
+            "unsaved": self.unsaved,
+            "queries": self.queries,
+            "embedder": self.embedder_name or get_embedder().name,
+            "bytes": int(self._codes.nbytes + self._scales.nbytes + self._records.nbytes),
+            "path": self.path or ":memory:",
+        }
+
+
+def _current_version(path: str) -> Optional[str]:
+    try:
+        with open(os.path.join(path, "CURRENT")) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+# Prototype sentences per label; a text scores by its similarity to each label
+LETTER_SENTIMENT = {
+    "positive": [
+        "We fell in love with your beautiful home the moment we walked in",
+        "This is our dream home and we would cherish it and care for it",
+        "Thank you for taking the time to read our letter, we are so excited and grateful",
+        "We can picture our family making wonderful memories here for years",
+        "The garden is amazing and the kitchen is perfect, we love the neighborhood",
+        "We would be honored and happy to raise our kids in this great house",
+    ],
+    "negative": [
+        "Unfortunately the house needs a lot of work and repairs",
+        "We have concerns about the condition, the roof and the dated kitchen",
+        "The price seems too high and the home is overpriced for the area",
+        "We were disappointed by the inspection issues and problems we found",
+        "This is not our first choice and we are not sure about it",
+        "We are worried about the cost of fixing the foundation and plumbing",
+    ],
+}
+
+INQUIRY_INTENT = {
+    "hot": [
+        "We are ready to buy now and want to make an offer this week",
+        "Cash offer ready, pre-approved and looking to close quickly",
+        "Urgent: need to purchase asap, please schedule a showing today",
+        "We are preapproved with our lender and ready to write an offer",
+        "Relocating next month and must buy a home immediately",
+    ],
+    "warm": [
+        "I'm interested in this property and would like to learn more",
+        "Could you send me more details about the HOA fees and taxes",
+        "We are considering moving and want to see a few homes",
+        "Is the house still available? Interested in visiting the open house",
+        "What is the neighborhood like and how are the schools",
+    ],
+    "cold": [
+        "Just browsing for now, maybe next year",
+        "Just curious about prices in the area, not looking to move",
+        "Not ready to buy, only looking at listings for fun",
+        "Please remove me from your mailing list",
+        "No plans to purchase anytime soon, just checking the market",
+    ],
+}
+
+# Softmax temperature for prototype similarities (cosines are small with hashed features)
+TEMPERATURE = 0.05
+
+
+class PrototypeClassifier:
+    """Label probabilities from cosine similarity to each label's prototype centroid"""
+
+    def __init__(self, prototypes: Dict[str, List[str]], embedder=None):
+        self.embedder = embedder or get_embedder()
+        self.labels = list(prototypes)
+        centroids = np.stack([self.embedder.embed(examples).mean(axis=0) for examples in prototypes.values()])
+        self.centroids = _normalize(centroids)
+
+    def probabilities(self, vectors: np.ndarray) -> np.ndarray:
+        logits = (vectors @ self.centroids.T) / TEMPERATURE
+        logits -= logits.max(axis=1, keepdims=True)
+        weights = np.exp(logits)
+        return weights / weights.sum(axis=1, keepdims=True)
+
+    def classify(self, texts: Sequence[str]) -> List[Dict[str, float]]:
+        probabilities = self.probabilities(self.embedder.embed(texts))
+        return [{label: round(float(p), 4) for label, p in zip(self.labels, row)} for row in probabilities]
+
+
+_classifiers: Dict[str, PrototypeClassifier] = {}
+
+
+def _classifier(name: str, prototypes: Dict[str, List[str]]) -> PrototypeClassifier:
+    classifier = _classifiers.get(name)
+    if classifier is None:
+        classifier = _classifiers[name] = PrototypeClassifier(prototypes)
+    return classifier
+
+
+def letter_sentiments(letters: Sequence[Optional[str]]) -> List[float]:
+    """Buyer-letter sentiment in [0, 1] (0.5 is neutral or empty), embedded as one batch"""
+    probabilities = _classifier("sentiment", LETTER_SENTIMENT).classify([l or "" for l in letters])
+    return [round(p["positive"], 4) if letter else 0.5 for p, letter in zip(probabilities, letters)]
+
+
+def inquiry_intents(inquiries: Sequence[Optional[str]]) -> List[Dict[str, float]]:
+    """hot/warm/cold probabilities for lead inquiries, embedded as one batch"""
+    return _classifier("intent", INQUIRY_INTENT).classify([q or "" for q in inquiries])
@@ -0,0 +1,303 @@
+"""
+Health subsystem for EstateWise MCP servers
+
+Reports liveness and readiness from real server state rather than a
+timestamp: event-loop lag, in-flight tool calls, warm-up progress, LLM
+circuit-breaker state, cache warmness and storage latency. When the server
+is over its load thresholds ``/readyz`` answers 503 so load balancers stop
+routing new traffic to it until it has drained (load shedding).
+
+Thresholds (environment):
+    HEALTH_MAX_LOOP_LAG_MS   event-loop lag that marks the server overloaded (250)
+    HEALTH_MAX_IN_FLIGHT     concurrent tool calls that mark it overloaded (64)
+    HEALTH_MAX_STORAGE_MS    storage probe latency treated as failing (500)
+    HEALTH_REQUIRE_LLM       1 = not ready while every LLM circuit is open (0)
+"""
+import os
+import sys
+import time
+import threading
+import asyncio
+from collections import deque
+from typing import Dict, Any, Callable, Optional, List
+
+from fastmcp.server.middleware import Middleware
+
+# Leave overload only once load falls this far below the thresholds, so the
+# instance does not flap in and out of the pool
+RECOVERY_FRACTION = 0.8
+
+
+class LoopLagMonitor:
+    """Measures event-loop lag by timing a periodic sleep"""
+
+    def __init__(self, interval: float = 0.1, window: int = 50):
+        """
+        Args:
+            interval: Seconds between samples
+            window: Samples kept for the recent max/mean
+        """
+        self.interval = interval
+        self.samples: deque = deque(maxlen=window)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start sampling on the running event loop"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - started - self.interval))
+
+    @property
+    def current_ms(self) -> float:
+        return self.samples[-1] * 1000 if self.samples else 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        samples = list(self.samples)
+        return {
+            "current_ms": round(self.current_ms, 1),
+            "mean_ms": round(sum(samples) / len(samples) * 1000, 1) if samples else 0.0,
+            "max_ms": round(max(samples) * 1000, 1) if samples else 0.0,
+            "samples": len(samples),
+        }
+
+
+class InFlightTracker(Middleware):
+    """FastMCP middleware counting tool calls currently executing"""
+
+    def __init__(self):
+        self.total = 0
+        self.peak = 0
+        self.completed = 0
+        self.by_tool: Dict[str, int] = {}
+
+    async def on_call_tool(self, context, call_next):
+        name = context.message.name
+        self.total += 1
+        self.peak = max(self.peak, self.total)
+        self.by_tool[name] = self.by_tool.get(name, 0) + 1
+        try:
+            return await call_next(context)
+        finally:
+            self.total -= 1
+            self.completed += 1
+            self.by_tool[name] -= 1
+            if not self.by_tool[name]:
+                del self.by_tool[name]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "total": self.total,
+            "peak": self.peak,
+            "completed": self.completed,
+            "by_tool": dict(self.by_tool),
+        }
+
+
+class _Check:
+    __slots__ = ("fn", "ttl", "required", "result", "checked_at", "lock")
+
+    def __init__(self, fn: Callable[[], Dict[str, Any]], ttl: float, required: bool):
+        self.fn = fn
+        self.ttl = ttl
+        self.required = required
+        self.result: Optional[Dict[str, Any]] = None
+        self.checked_at = 0.0
+        # Concurrent /readyz requests share one run of an expired check
+        self.lock = threading.Lock()
+
+
+class Health:
+    """Liveness, readiness and load shedding for one server"""
+
+    def __init__(self,
+                 startup,
+                 max_loop_lag_ms: Optional[float] = None,
+                 max_in_flight: Optional[int] = None):
+        """
+        Args:
+            startup: The server's Startup (warm-up state gates readiness)
+            max_loop_lag_ms: Event-loop lag above which the server sheds load
+            max_in_flight: Concurrent tool calls above which the server sheds load
+        """
+        self.startup = startup
+        self.max_loop_lag_ms = max_loop_lag_ms or float(os.getenv("HEALTH_MAX_LOOP_LAG_MS", 250))
+        self.max_in_flight = max_in_flight or int(os.getenv("HEALTH_MAX_IN_FLIGHT", 64))
+        self.loop_lag = LoopLagMonitor()
+        self.in_flight = InFlightTracker()
+        self.shedding = False
+        self._checks: Dict[str, _Check] = {}
+        self._metrics: Dict[str, Callable[[], Dict[str, Any]]] = {}
+        self.add_check("llm", llm_check, ttl=1.0, required=os.getenv("HEALTH_REQUIRE_LLM") == "1")
+
+    def add_check(self, name: str, fn: Callable[[], Dict[str, Any]], ttl: float = 5.0, required: bool = False) -> None:
+        """Register a dependency check reported by /readyz.
+
+        Args:
+            name: Key in the readiness report
+            fn: Returns a dict; ``"ok": False`` marks the dependency unhealthy
+            ttl: Seconds a result is reused, so probes stay cheap under load
+            required: Whether an unhealthy result makes the server not ready
+        """
+        self._checks[name] = _Check(fn, ttl, required)
+
+    def add_metrics(self, name: str, fn: Callable[[], Dict[str, Any]]) -> None:
+        """Register a metrics source served under its name by /metrics"""
+        self._metrics[name] = fn
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "server": self.startup.name,
+            "event_loop": self.loop_lag.snapshot(),
+            "in_flight": self.in_flight.snapshot(),
+            **{name: fn() for name, fn in self._metrics.items()},
+        }
+
+    def _run_check(self, check: _Check) -> Dict[str, Any]:
+        with check.lock:
+            now = time.monotonic()
+            if check.result is None or now - check.checked_at >= check.ttl:
+                try:
+                    check.result = check.fn()
+                except Exception as e:
+                    check.result = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+                check.checked_at = now
+            return check.result
+
+    def overload_reasons(self) -> List[str]:
+        """Why the server is shedding load (empty when it is not)"""
+        lag = self.loop_lag.current_ms
+        in_flight = self.in_flight.total
+        # Hysteresis: once shedding, stay out until load is well under the limits
+        scale = RECOVERY_FRACTION if self.shedding else 1.0
+        reasons = []
+        if lag > self.max_loop_lag_ms * scale:
+            reasons.append(f"event loop lag {lag:.0f}ms over {self.max_loop_lag_ms * scale:.0f}ms")
+        if in_flight > self.max_in_flight * scale:
+            reasons.append(f"{in_flight} tool calls in flight over {self.max_in_flight * scale:.0f}")
+        self.shedding = bool(reasons)
+        return reasons
+
+    def liveness(self) -> Dict[str, Any]:
+        return {
+            "server": self.startup.name,
+            "live": self.startup.live,
+            "uptime_s": self.startup.status()["uptime_s"],
+            "loop_lag_ms": round(self.loop_lag.current_ms, 1),
+        }
+
+    def readiness(self) -> Dict[str, Any]:
+        """Readiness report; checks may block (storage probes fsync), so call it off the event loop"""
+        startup = self.startup.status()
+        reasons = self.overload_reasons()
+        if not startup["ready"]:
+            reasons.append("warming up")
+
+        checks = {}
+        for name, check in self._checks.items():
+            result = self._run_check(check)
+            checks[name] = result
+            if check.required and result.get("ok") is False:
+                reasons.append(f"{name} unhealthy")
+
+        return {
+            "server": self.startup.name,
+            "ready": not reasons,
+            "reasons": reasons,
+            "shedding": self.shedding,
+            "event_loop": {**self.loop_lag.snapshot(), "threshold_ms": self.max_loop_lag_ms},
+            "in_flight": {**self.in_flight.snapshot(), "threshold": self.max_in_flight},
+            "warmup": startup["warmup"],
+            "checks": checks,
+        }
+
+    def register(self, server) -> None:
+        """Add the in-flight middleware and /livez, /readyz, /metrics routes to a FastMCP server"""
+        from starlette.responses import JSONResponse
+
+        # Outermost, so calls waiting in admission control count as in flight
+        server.middleware.insert(0, self.in_flight)
+
+        @server.custom_route("/livez", methods=["GET"])
+        async def livez(request):
+            return JSONResponse(self.liveness())
+
+        @server.custom_route("/readyz", methods=["GET"])
+        async def readyz(request):
+            # Storage probes write and fsync; a slow disk must not stall tool calls
+            report = await asyncio.to_thread(self.readiness)
+            return JSONResponse(report, status_code=200 if report["ready"] else 503)
+
+        @server.custom_route("/metrics", methods=["GET"])
+        async def metrics(request):
+            return JSONResponse(self.metrics())
+
+    async def serve(self, server, port: int) -> None:
+        """Register probes, start monitoring and warm-up, and run the server over HTTP.
+
+        The fastmcp banner is off unless MCP_SHOW_BANNER=1: it checks PyPI
+        for a newer release, which delays startup by a network round trip.
+        """
+        self.register(server)
+        self.loop_lag.start()
+        self.startup.begin(port)
+        await server.run_http_async(port=port, show_banner=os.getenv("MCP_SHOW_BANNER") == "1")
+
+
+def llm_check() -> Dict[str, Any]:
+    """Circuit-breaker state of the LLM router, if it has been built"""
+    llm_router = sys.modules.get("llm_router")
+    router = llm_router.peek_router() if llm_router else None
+    if router is None:
+        return {"ok": None, "configured": False}
+    circuits = {name: breaker.state for name, breaker in router.breakers.items()}
+    return {
+        "ok": any(state != "open" for state in circuits.values()),
+        "configured": True,
+        "circuits": circuits,
+    }
+
+
+def cache_check(**resources) -> Callable[[], Dict[str, Any]]:
+    """Build a check reporting which Lazy resources have been built"""
+    def check() -> Dict[str, Any]:
+        loaded = {name: lazy.loaded for name, lazy in resources.items()}
+        return {"warm": all(loaded.values()), **loaded}
+
+    return check
+
+
+def storage_probe(path: str, write: bool = True, max_ms: Optional[float] = None) -> Callable[[], Dict[str, Any]]:
+    """Build a check timing a small write/fsync/read (or a stat and read) under path"""
+    limit = max_ms or float(os.getenv("HEALTH_MAX_STORAGE_MS", 500))
+
+    def probe() -> Dict[str, Any]:
+        started = time.perf_counter()
+        if write:
+            target = os.path.join(path, f".health-probe-{os.getpid()}")
+            with open(target, "wb") as f:
+                f.write(b"ok")
+                f.flush()
+                os.fsync(f.fileno())
+            with open(target, "rb") as f:
+                f.read()
+            os.remove(target)
+        else:
+            entries = sorted(os.listdir(path))
+            if entries:
+                with open(os.path.join(path, entries[0]), "rb") as f:
+                    f.read(4096)
+        latency_ms = (time.perf_counter() - started) * 1000
+        return {"ok": latency_ms <= limit, "path": path, "latency_ms": round(latency_ms, 2)}
+
+    return probe
@@ -0,0 +1,373 @@
+"""
+Provider-agnostic LLM router for EstateWise MCP servers
+
+Routes chat requests across the OpenAI and Claude clients with latency-aware
+provider selection, hedged requests, per-provider circuit breakers and
+failover. Exposes the same ``chat``/``extract_json`` interface as the
+individual clients so tools can use it as a drop-in replacement.
+
+With ``LLM_CACHE_TTL_S`` set, responses are cached in the shared state
+backend (shared_state.py), keyed by a hash of the system prompt and
+messages, so a prompt one server has already sent is answered from the
+cache by every server using the same backend.
+"""
+import os
+import json
+import time
+import hashlib
+import asyncio
+import threading
+from collections import deque
+from typing import Dict, Any, Optional, List
+
+from deadline import DeadlineExceeded, RequestCancelled
+from shared_state import StateBackendError, get_shared_state
+from call_phases import phase
+import trace_context
+
+
+class CircuitBreaker:
+    """Per-provider circuit breaker (closed -> open -> half_open -> closed)"""
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow_request(self) -> bool:
+        """Return True if a request may be sent, reserving the half-open trial slot"""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        if self._trial_in_flight or self.consecutive_failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+        self._trial_in_flight = False
+
+    def release(self) -> None:
+        """Give back a half-open trial slot without an outcome (e.g. cancelled hedge)"""
+        self._trial_in_flight = False
+
+
+class ProviderStats:
+    """Rolling latency window and counters for a single provider"""
+
+    def __init__(self, window: int = 200, alpha: float = 0.2):
+        self.latencies: deque = deque(maxlen=window)
+        self.alpha = alpha
+        self.ewma: Optional[float] = None
+        self.requests = 0
+        self.successes = 0
+        self.failures = 0
+        self.cancelled = 0
+        self.hedges_launched = 0
+        self.hedges_won = 0
+
+    def record_latency(self, latency: float) -> None:
+        self.latencies.append(latency)
+        if self.ewma is None:
+            self.ewma = latency
+        else:
+            self.ewma = self.alpha * latency + (1 - self.alpha) * self.ewma
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        idx = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+        return ordered[idx]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "successes": self.successes,
+            "failures": self.failures,
+            "cancelled": self.cancelled,
+            "hedges_launched": self.hedges_launched,
+            "hedges_won": self.hedges_won,
+            "samples": len(self.latencies),
+            "ewma_ms": round(self.ewma * 1000, 1) if self.ewma is not None else None,
+            "p50_ms": _to_ms(self.percentile(50)),
+            "p95_ms": _to_ms(self.percentile(95)),
+            "p99_ms": _to_ms(self.percentile(99)),
+        }
+
+
+def _to_ms(value: Optional[float]) -> Optional[float]:
+    return round(value * 1000, 1) if value is not None else None
+
+
+class LLMRouter:
+    """Route chat requests across LLM providers with hedging and failover"""
+
+    def __init__(self,
+                 providers: Dict[str, Any],
+                 hedge: bool = True,
+                 default_hedge_delay: float = 2.0,
+                 min_hedge_delay: float = 0.05,
+                 min_samples: int = 5,
+                 failure_threshold: int = 3,
+                 reset_timeout: float = 30.0,
+                 cache: Any = None,
+                 cache_ttl: float = 3600.0):
+        """
+        Args:
+            providers: Ordered mapping of provider name to client; the order
+                breaks ties when providers have similar latency
+            hedge: Fire a second provider if the first is slower than its p95
+            default_hedge_delay: Hedge delay (seconds) until enough samples exist
+            min_hedge_delay: Lower bound for the p95-based hedge delay (seconds)
+            min_samples: Latency samples needed before p95 is trusted
+            failure_threshold: Consecutive failures before a circuit opens
+            reset_timeout: Seconds an open circuit waits before a trial request
+            cache: shared_state backend for responses (None disables caching)
+            cache_ttl: Seconds a cached response is served
+        """
+        if not providers:
+            raise ValueError("At least one LLM provider is required")
+
+        self.providers = dict(providers)
+        self.order = list(self.providers)
+        self.hedge = hedge
+        self.default_hedge_delay = default_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.min_samples = min_samples
+        self.breakers = {
+            name: CircuitBreaker(failure_threshold, reset_timeout) for name in self.providers
+        }
+        self.provider_stats = {name: ProviderStats() for name in self.providers}
+        self.cache = cache
+        self.cache_ttl = cache_ttl
+        self.cache_stats = {"hits": 0, "misses": 0, "errors": 0}
+
+    @classmethod
+    def from_env(cls, **kwargs) -> "LLMRouter":
+        """Build a router from every provider with an API key configured.
+
+        ``LLM_PROVIDERS`` sets the preference order (default ``openai,claude``),
+        ``LLM_HEDGE=0`` disables hedged requests and ``LLM_CACHE_TTL_S`` turns
+        on the shared response cache.
+        """
+        from openai_client import OpenAIClient
+        from claude_client import ClaudeClient
+
+        factories = {"openai": OpenAIClient, "claude": ClaudeClient}
+        names = [n.strip() for n in os.getenv("LLM_PROVIDERS", "openai,claude").split(",") if n.strip()]
+
+        providers = {}
+        for name in names:
+            factory = factories.get(name)
+            if factory is None:
+                raise ValueError(f"Unknown LLM provider: {name}")
+            try:
+                providers[name] = factory()
+            except ValueError:
+                # Provider has no API key configured; skip it
+                continue
+
+        if not providers:
+            raise ValueError("No LLM provider API key configured")
+
+        kwargs.setdefault("hedge", os.getenv("LLM_HEDGE", "1") != "0")
+        cache_ttl = float(os.getenv("LLM_CACHE_TTL_S", 0) or 0)
+        if cache_ttl > 0 and "cache" not in kwargs:
+            kwargs.update(cache=get_shared_state(), cache_ttl=cache_ttl)
+        return cls(providers, **kwargs)
+
+    def _ranked(self) -> List[str]:
+        """Providers ordered by expected latency (unmeasured providers first)"""
+        def key(name: str):
+            ewma = self.provider_stats[name].ewma
+            return (ewma if ewma is not None else 0.0, self.order.index(name))
+        return sorted(self.providers, key=key)
+
+    def _hedge_delay(self, name: str) -> float:
+        stats = self.provider_stats[name]
+        if len(stats.latencies) < self.min_samples:
+            return self.default_hedge_delay
+        return max(self.min_hedge_delay, stats.percentile(95))
+
+    async def _call(self, name: str, messages: list, system: Optional[str]) -> str:
+        stats = self.provider_stats[name]
+        breaker = self.breakers[name]
+        stats.requests += 1
+        started = time.monotonic()
+        try:
+            result = await self.providers[name].chat(messages, system=system)
+        except (asyncio.CancelledError, DeadlineExceeded, RequestCancelled):
+            # The caller gave up; that says nothing about the provider's health
+            stats.cancelled += 1
+            breaker.release()
+            raise
+        except Exception:
+            stats.failures += 1
+            breaker.record_failure()
+            raise
+        stats.successes += 1
+        stats.record_latency(time.monotonic() - started)
+        breaker.record_success()
+        return result
+
+    async def chat(self, messages: list, system: Optional[str] = None) -> str:
+        """Send a chat message, hedging and failing over between providers"""
+        # The profiler reports this as the tool call's LLM wait; provider
+        # attempts (hedges, failovers) are child spans of this one
+        with phase("llm_wait"), trace_context.span("llm_router.chat"):
+            return await self._chat(messages, system)
+
+    async def _chat(self, messages: list, system: Optional[str]) -> str:
+        if self.cache is None:
+            return await self._route(messages, system)
+        key = "llm:" + hashlib.sha256(
+            json.dumps([system, messages], sort_keys=True, default=str).encode()
+        ).hexdigest()
+        # Backend calls may block on a socket or file lock; keep them off the event loop
+        cached = await self._cached(asyncio.to_thread(self.cache.get, key))
+        if cached is not None:
+            self.cache_stats["hits"] += 1
+            routed = trace_context.current()
+            if routed is not None:
+                routed.set("llm.cache_hit", True)
+            return cached
+        self.cache_stats["misses"] += 1
+        result = await self._route(messages, system)
+        await self._cached(asyncio.to_thread(self.cache.set, key, result, self.cache_ttl))
+        return result
+
+    async def _cached(self, call) -> Any:
+        """Await a cache call; an unreachable cache is a miss, never a failed request"""
+        try:
+            return await call
+        except (StateBackendError, OSError):
+            self.cache_stats["errors"] += 1
+            return None
+
+    async def _route(self, messages: list, system: Optional[str]) -> str:
+        remaining = self._ranked()
+        pending: Dict[asyncio.Task, str] = {}
+        errors: Dict[str, str] = {}
+        primary: Optional[str] = None
+
+        def launch(hedged: bool = False) -> bool:
+            while remaining:
+                name = remaining.pop(0)
+                if not self.breakers[name].allow_request():
+                    errors.setdefault(name, "circuit open")
+                    continue
+                task = asyncio.ensure_future(self._call(name, messages, system))
+                pending[task] = name
+                if hedged:
+                    self.provider_stats[name].hedges_launched += 1
+                return True
+            return False
+
+        if not launch():
+            raise RuntimeError(f"No LLM provider available: {errors}")
+        primary = next(iter(pending.values()))
+
+        try:
+            while pending:
+                timeout = None
+                if self.hedge and remaining:
+                    timeout = self._hedge_delay(next(iter(pending.values())))
+
+                done, _ = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+
+                if not done:
+                    # Primary is slower than its p95: hedge with the next provider
+                    launch(hedged=True)
+                    continue
+
+                for task in done:
+                    name = pending.pop(task)
+                    if isinstance(task.exception(), (DeadlineExceeded, RequestCancelled)):
+                        # No point failing over once the request itself is over
+                        raise task.exception()
+                    if task.exception() is None:
+                        if name != primary:
+                            self.provider_stats[name].hedges_won += 1
+                        return task.result()
+                    errors[name] = repr(task.exception())
+
+                if not pending:
+                    # Everything in flight failed: fail over to the next provider
+                    launch()
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        raise RuntimeError(f"All LLM providers failed: {errors}")
+
+    def extract_json(self, text: str) -> Dict[str, Any]:
+        """Extract JSON from an LLM response"""
+        return extract_json(text)
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-provider latency stats and circuit-breaker state"""
+        return {
+            name: {
+                **self.provider_stats[name].snapshot(),
+                "circuit": self.breakers[name].state,
+                "hedge_delay_ms": _to_ms(self._hedge_delay(name)),
+            }
+            for name in self.order
+        }
+
+
+def extract_json(text: str) -> Dict[str, Any]:
+    """Extract the outermost JSON object from an LLM response ({} if there is none)"""
+    try:
+        # Find JSON in the response
+        start = text.find('{')
+        end = text.rfind('}') + 1
+        if start != -1 and end != 0:
+            json_str = text[start:end]
+            return json.loads(json_str)
+    except (json.JSONDecodeError, ValueError):
+        pass
+    return {}
+
+
+_router: Optional[LLMRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_router() -> LLMRouter:
+    """Return the process-wide router, building it from the environment on first use"""
+    global _router
+    if _router is None:
+        # Startup warm-up and the first request may race to build it
+        with _router_lock:
+            if _router is None:
+                _router = LLMRouter.from_env()
+    return _router
+
+
+def peek_router() -> Optional[LLMRouter]:
+    """Return the process-wide router if it has been built, without building it"""
+    return _router
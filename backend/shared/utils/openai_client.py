@@ -3,28 +3,35 @@ OpenAI API client wrapper for EstateWise MCP servers
 """
 import os
 import json
+import hashlib
 from typing import Dict, Any, Optional
 import httpx
 
+from deadline import bounded
+from trace_context import inject, span
+
 
 class OpenAIClient:
     """Wrapper for OpenAI API interactions"""
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None, timeout: Optional[float] = None):
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         self.model = os.getenv("OPENAI_MODEL", "gpt-4o")
-        self.base_url = "https://api.openai.com/v1"
+        self.base_url = base_url or os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+        # Upper bound for one request; a request deadline (deadline.py) cuts it shorter
+        self.timeout = httpx.Timeout(timeout or float(os.getenv("LLM_TIMEOUT_S", 60)), connect=5.0)
         
         if not self.api_key:
             raise ValueError("OpenAI API key is required")
     
-    async def chat(self, messages: list, system: Optional[str] = None) -> str:
-        """Send a chat message to OpenAI"""
-        headers = {
+    def headers(self) -> Dict[str, str]:
+        return {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
-        
+    
+    def request_body(self, messages: list, system: Optional[str] = None) -> Dict[str, Any]:
+        """Chat completions request body (also used for Batch API lines)"""
         # Prepare messages list
         api_messages = []
         if system:
@@ -36,15 +43,30 @@ class OpenAIClient:
             "max_tokens": 4096,
             "messages": api_messages
         }
-            
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{self.base_url}/chat/completions",
-                headers=headers,
-                json=data
-            )
-            response.raise_for_status()
-            return response.json()["choices"][0]["message"]["content"]
+        if system:
+            # Prefixes are cached automatically; a key per system prompt routes
+            # every call sharing it to the same cache
+            data["prompt_cache_key"] = hashlib.sha256(system.encode()).hexdigest()[:16]
+        return data
+    
+    async def chat(self, messages: list, system: Optional[str] = None) -> str:
+        """Send a chat message to OpenAI"""
+        attributes = {"gen_ai.system": "openai", "gen_ai.request.model": self.model}
+        with span(f"chat {self.model}", attributes, kind="client") as call:
+            async with httpx.AsyncClient(timeout=self.timeout) as client:
+                response = await bounded(client.post(
+                    f"{self.base_url}/chat/completions",
+                    headers=inject(self.headers()),
+                    json=self.request_body(messages, system)
+                ), "openai")
+                call.set("http.response.status_code", response.status_code)
+                response.raise_for_status()
+                body = response.json()
+                usage = body.get("usage") or {}
+                call.set("gen_ai.usage.input_tokens", usage.get("prompt_tokens"))
+                call.set("gen_ai.usage.output_tokens", usage.get("completion_tokens"))
+                call.set("gen_ai.usage.cache_read_input_tokens", (usage.get("prompt_tokens_details") or {}).get("cached_tokens"))
+                return body["choices"][0]["message"]["content"]
     
     def extract_json(self, text: str) -> Dict[str, Any]:
         """Extract JSON from OpenAI response"""
@@ -0,0 +1,464 @@
+"""
+Runtime profiling for EstateWise MCP tool calls
+
+When a tool gets slow in production, profiling can be switched on for that
+tool and a time window from the admin routes, without a redeploy:
+
+- ``sample`` mode: a background thread samples the stacks of the threads
+  running the tool every few milliseconds (in-process, like py-spy) and
+  returns flamegraph-compatible collapsed stacks (``frame;frame;frame count``).
+- ``cprofile`` mode: a sampled fraction of the tool's calls run under
+  cProfile, and the top functions by cumulative time are returned.
+
+Async tools run on the event-loop thread, so samples taken while one is
+suspended (awaiting an LLM, say) show up as ``(suspended)``. cProfile on an
+async tool also counts whatever else the loop runs during its awaits.
+
+Every call is also timed by phase, and calls slower than PROFILE_SLOW_MS are
+kept with their timings:
+
+    queued          admission wait before the tool body starts
+    validation      schema validation (schema_validators)
+    ranking         offer and search ranking
+    llm_wait        waiting on LLM responses (llm_router)
+    serialization   turning the result into the MCP response
+    other           the rest of the tool body
+
+Code marks a phase with ``call_phases.phase("ranking")`` (see call_phases.py).
+
+Admin routes (loopback clients only, or a Bearer ADMIN_TOKEN when set):
+    GET    /admin/profiling          sessions, slow-call threshold, per-tool phase means
+    POST   /admin/profiling          start {"tool", "mode", "duration_s", "interval_ms", "sample_rate"}
+    GET    /admin/profiling/{id}     results (?format=collapsed for a flamegraph input file)
+    DELETE /admin/profiling/{id}     stop early
+    GET    /admin/slow-calls         slowest recent calls (?tool=&limit=)
+
+Environment:
+    PROFILE_SLOW_MS     calls slower than this are kept with phase timings (1000)
+    PROFILE_SLOW_KEEP   slow calls kept (200)
+    ADMIN_TOKEN         bearer token for the admin routes
+"""
+import os
+import sys
+import hmac
+import time
+import uuid
+import random
+import inspect
+import pstats
+import cProfile
+import functools
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+from fastmcp.server.middleware import Middleware
+
+import call_phases
+from call_phases import CallTrace
+
+MODES = ("sample", "cprofile")
+MAX_DURATION_S = 600
+# Finished sessions kept for reading back
+MAX_SESSIONS = 20
+# Functions listed per cProfile result
+TOP_FUNCTIONS = 40
+
+
+class ProfileSession:
+    """One profiling window for one tool"""
+
+    def __init__(self, tool: str, mode: str, duration_s: float, interval_ms: float, sample_rate: float):
+        self.id = f"prof_{uuid.uuid4().hex[:10]}"
+        self.tool = tool
+        self.mode = mode
+        self.duration_s = duration_s
+        self.interval = interval_ms / 1000
+        self.sample_rate = sample_rate
+        self.started_at = datetime.now().isoformat()
+        self.expires_at = time.monotonic() + duration_s
+        self.stopped = threading.Event()
+        # Threads currently running the tool body -> number of calls on them
+        self.threads: Dict[int, int] = {}
+        self.stacks: Dict[str, int] = {}
+        self.samples = 0
+        self.calls = 0
+        self.profiled_calls = 0
+        self.stats: Optional[pstats.Stats] = None
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> bool:
+        return not self.stopped.is_set() and time.monotonic() < self.expires_at
+
+    def stop(self) -> None:
+        self.stopped.set()
+
+    def add_profile(self, profile: cProfile.Profile) -> None:
+        with self._lock:
+            if self.stats is None:
+                self.stats = pstats.Stats(profile)
+            else:
+                self.stats.add(profile)
+            self.profiled_calls += 1
+
+    def collapsed(self) -> str:
+        """Stacks in the collapsed format read by flamegraph.pl, speedscope and inferno"""
+        with self._lock:
+            items = sorted(self.stacks.items(), key=lambda item: -item[1])
+        return "".join(f"{stack} {count}\n" for stack, count in items)
+
+    def _functions(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            if self.stats is None:
+                return []
+            rows = sorted(self.stats.stats.items(), key=lambda item: -item[1][3])[:TOP_FUNCTIONS]
+        return [
+            {
+                "function": name, "file": os.path.basename(path), "line": line,
+                "calls": calls, "own_ms": round(own * 1000, 3), "cumulative_ms": round(cumulative * 1000, 3),
+            }
+            for (path, line, name), (_, calls, own, cumulative, _) in rows
+        ]
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "tool": self.tool,
+            "mode": self.mode,
+            "status": "running" if self.active else "finished",
+            "started_at": self.started_at,
+            "duration_s": self.duration_s,
+            "calls": self.calls,
+            **({"samples": self.samples, "interval_ms": self.interval * 1000} if self.mode == "sample"
+               else {"profiled_calls": self.profiled_calls, "sample_rate": self.sample_rate}),
+        }
+
+    def result(self, limit: int = 50) -> Dict[str, Any]:
+        if self.mode == "cprofile":
+            return {**self.summary(), "functions": self._functions()}
+        with self._lock:
+            top = sorted(self.stacks.items(), key=lambda item: -item[1])[:limit]
+        return {**self.summary(), "stacks": [{"stack": stack, "count": count} for stack, count in top]}
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+# Code objects of the tool-body wrappers; stack samples are cut there
+_BODY_CODES = set()
+
+
+def _instrument(profiler: "Profiler", name: str, fn):
+    """Wrap a tool function so the start, end and thread of its body are known"""
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def body(*args, **kwargs):
+            state = profiler._enter(name)
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                profiler._exit(name, state)
+    else:
+        @functools.wraps(fn)
+        def body(*args, **kwargs):
+            state = profiler._enter(name)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                profiler._exit(name, state)
+    body._profiled = True
+    _BODY_CODES.add(body.__code__)
+    return body
+
+
+class SessionConflict(RuntimeError):
+    """A profiling session is already running for the tool"""
+
+
+_LOOPBACK = ("127.0.0.1", "::1", "localhost")
+
+
+class Profiler(Middleware):
+    """FastMCP middleware timing tool-call phases, keeping slow calls and running profiling sessions"""
+
+    def __init__(self, slow_ms: Optional[float] = None, keep: Optional[int] = None):
+        """
+        Args:
+            slow_ms: Calls at least this slow are kept with phase timings
+            keep: Slow calls kept (oldest dropped first)
+        """
+        self.slow_ms = slow_ms if slow_ms is not None else float(os.getenv("PROFILE_SLOW_MS", 1000))
+        self.slow_calls: deque = deque(maxlen=keep or int(os.getenv("PROFILE_SLOW_KEEP", 200)))
+        self.sessions: "OrderedDict[str, ProfileSession]" = OrderedDict()
+        # tool -> call count, total seconds and seconds per phase
+        self.totals: Dict[str, Dict[str, float]] = {}
+        self._running: Dict[str, ProfileSession] = {}
+        self._profiling_threads = set()
+        self._wrapped = set()
+        self._server = None
+        self._lock = threading.Lock()
+
+    # Tool calls
+
+    async def _wrap(self, name: str) -> None:
+        """Instrument a tool's function the first time it is called or profiled"""
+        try:
+            tool = await self._server.get_tool(name)
+            fn = getattr(tool, "fn", None)
+            if fn is not None and not getattr(fn, "_profiled", False):
+                tool.fn = _instrument(self, name, fn)
+        except Exception:
+            # Unknown tool, or not a function tool: time the call as a whole
+            pass
+        self._wrapped.add(name)
+
+    async def on_call_tool(self, context, call_next):
+        name = context.message.name
+        if name not in self._wrapped and self._server is not None:
+            await self._wrap(name)
+        trace, token = call_phases.begin(name)
+        failed = True
+        try:
+            result = await call_next(context)
+            failed = False
+            return result
+        finally:
+            call_phases.end(token)
+            self._finish(trace, failed)
+
+    def _enter(self, name: str):
+        trace = call_phases.current()
+        if trace is not None:
+            trace.body_started = time.perf_counter()
+        session = self._running.get(name)
+        if session is None or not session.active:
+            return trace, None, None, None
+        ident = threading.get_ident()
+        with session._lock:
+            session.calls += 1
+            session.threads[ident] = session.threads.get(ident, 0) + 1
+        profile = None
+        if session.mode == "cprofile" and random.random() < session.sample_rate:
+            with self._lock:
+                # One profiler per thread at a time (concurrent async calls share the loop thread)
+                if ident not in self._profiling_threads:
+                    self._profiling_threads.add(ident)
+                    profile = cProfile.Profile()
+            if profile is not None:
+                profile.enable()
+        return trace, session, ident, profile
+
+    def _exit(self, name: str, state) -> None:
+        trace, session, ident, profile = state
+        if profile is not None:
+            profile.disable()
+            with self._lock:
+                self._profiling_threads.discard(ident)
+            session.add_profile(profile)
+        if session is not None:
+            with session._lock:
+                session.threads[ident] -= 1
+                if not session.threads[ident]:
+                    del session.threads[ident]
+        if trace is not None:
+            trace.body_ended = time.perf_counter()
+
+    def _finish(self, trace: CallTrace, failed: bool) -> None:
+        ended = time.perf_counter()
+        total = ended - trace.started
+        body_started = trace.body_started or ended
+        body_ended = trace.body_ended or ended
+        timings = {"queued": body_started - trace.started, **trace.phases}
+        timings["serialization"] = ended - body_ended
+        timings["other"] = max(0.0, body_ended - body_started - sum(trace.phases.values()))
+        with self._lock:
+            totals = self.totals.setdefault(trace.tool, {"calls": 0, "total": 0.0})
+            totals["calls"] += 1
+            totals["total"] += total
+            for name, seconds in timings.items():
+                totals[name] = totals.get(name, 0.0) + seconds
+        if total * 1000 >= self.slow_ms:
+            self.slow_calls.append({
+                "tool": trace.tool,
+                "at": datetime.now().isoformat(timespec="milliseconds"),
+                "status": "error" if failed else "ok",
+                "total_ms": round(total * 1000, 3),
+                "phases_ms": {name: round(seconds * 1000, 3) for name, seconds in timings.items()},
+            })
+
+    # Profiling sessions
+
+    def start(self, tool: str, mode: str = "sample", duration_s: float = 30.0,
+              interval_ms: float = 5.0, sample_rate: float = 0.1) -> ProfileSession:
+        """
+        Profile a tool for a time window
+
+        Args:
+            tool: Tool name
+            mode: "sample" (stack sampling) or "cprofile" (a fraction of calls under cProfile)
+            duration_s: Window length, up to MAX_DURATION_S
+            interval_ms: Sampling interval (sample mode)
+            sample_rate: Fraction of calls profiled (cprofile mode)
+        """
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {', '.join(MODES)}")
+        if not 0 < duration_s <= MAX_DURATION_S:
+            raise ValueError(f"duration_s must be between 0 and {MAX_DURATION_S}")
+        if not 1 <= interval_ms <= 1000:
+            raise ValueError("interval_ms must be between 1 and 1000")
+        if not 0 < sample_rate <= 1:
+            raise ValueError("sample_rate must be in (0, 1]")
+        with self._lock:
+            running = self._running.get(tool)
+            if running is not None and running.active:
+                raise SessionConflict(f"Session {running.id} is already profiling {tool}")
+            session = ProfileSession(tool, mode, duration_s, interval_ms, sample_rate)
+            self._running[tool] = session
+            self.sessions[session.id] = session
+            while len(self.sessions) > MAX_SESSIONS:
+                oldest = next(iter(self.sessions.values()))
+                if oldest.active:
+                    break
+                self.sessions.popitem(last=False)
+        threading.Thread(target=self._run, args=(session,), name=f"profile-{tool}", daemon=True).start()
+        return session
+
+    def stop(self, session_id: str) -> Optional[ProfileSession]:
+        session = self.sessions.get(session_id)
+        if session is not None:
+            session.stop()
+        return session
+
+    def _run(self, session: ProfileSession) -> None:
+        if session.mode == "sample":
+            while not session.stopped.wait(session.interval) and session.active:
+                with session._lock:
+                    idents = list(session.threads)
+                if not idents:
+                    continue
+                frames = sys._current_frames()
+                stacks = [self._collapse(session.tool, frames[i]) for i in idents if i in frames]
+                with session._lock:
+                    for stack in stacks:
+                        session.stacks[stack] = session.stacks.get(stack, 0) + 1
+                    session.samples += 1
+        else:
+            session.stopped.wait(max(0.0, session.expires_at - time.monotonic()))
+        session.stop()
+        with self._lock:
+            if self._running.get(session.tool) is session:
+                del self._running[session.tool]
+
+    @staticmethod
+    def _collapse(tool: str, frame) -> str:
+        labels = []
+        while frame is not None and frame.f_code not in _BODY_CODES:
+            labels.append(_frame_label(frame.f_code))
+            frame = frame.f_back
+        if frame is None:
+            # An async tool's thread is running something else while the tool awaits
+            return f"{tool};(suspended)"
+        return ";".join([tool] + labels[::-1])
+
+    # Reports
+
+    def slowest(self, tool: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        calls = [call for call in list(self.slow_calls) if tool is None or call["tool"] == tool]
+        return sorted(calls, key=lambda call: -call["total_ms"])[:limit]
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            totals = {tool: dict(values) for tool, values in self.totals.items()}
+        tools = {}
+        for tool, values in totals.items():
+            calls = values.pop("calls")
+            tools[tool] = {
+                "calls": calls,
+                "mean_ms": round(values.pop("total") / calls * 1000, 3),
+                "phases_mean_ms": {name: round(seconds / calls * 1000, 3) for name, seconds in values.items()},
+            }
+        return {
+            "slow_ms": self.slow_ms,
+            "slow_calls": len(self.slow_calls),
+            "sessions": [session.summary() for session in self.sessions.values()],
+            "tools": tools,
+        }
+
+    # Admin routes
+
+    @staticmethod
+    def _authorized(request) -> bool:
+        token = os.getenv("ADMIN_TOKEN")
+        if token:
+            return hmac.compare_digest(request.headers.get("authorization", "").encode(), f"Bearer {token}".encode())
+        return request.client is not None and request.client.host in _LOOPBACK
+
+    def register(self, server) -> None:
+        """Add this middleware and the /admin/profiling and /admin/slow-calls routes to a FastMCP server"""
+        from starlette.responses import JSONResponse, PlainTextResponse
+
+        self._server = server
+        server.add_middleware(self)
+
+        def admin(path: str, methods: List[str]):
+            def decorator(handler):
+                @functools.wraps(handler)
+                async def route(request):
+                    if not self._authorized(request):
+                        return JSONResponse({"error": "Admin routes need ADMIN_TOKEN or a loopback client"},
+                                            status_code=403)
+                    return await handler(request)
+                return server.custom_route(path, methods=methods)(route)
+            return decorator
+
+        @admin("/admin/profiling", ["GET"])
+        async def overview(request):
+            return JSONResponse(self.snapshot())
+
+        @admin("/admin/profiling", ["POST"])
+        async def start(request):
+            try:
+                body = await request.json()
+                tool = str(body["tool"])
+                options = {key: float(body[key]) for key in ("duration_s", "interval_ms", "sample_rate") if key in body}
+            except (ValueError, KeyError, TypeError):
+                return JSONResponse({"error": "Body must be JSON with a tool name"}, status_code=400)
+            if await server.get_tool(tool) is None:
+                return JSONResponse({"error": f"Unknown tool: {tool}"}, status_code=404)
+            await self._wrap(tool)
+            try:
+                session = self.start(tool, body.get("mode", "sample"), **options)
+            except SessionConflict as e:
+                return JSONResponse({"error": str(e)}, status_code=409)
+            except ValueError as e:
+                return JSONResponse({"error": str(e)}, status_code=400)
+            return JSONResponse(session.summary(), status_code=201)
+
+        @admin("/admin/profiling/{session_id}", ["GET"])
+        async def result(request):
+            session = self.sessions.get(request.path_params["session_id"])
+            if session is None:
+                return JSONResponse({"error": "Unknown session"}, status_code=404)
+            if request.query_params.get("format") == "collapsed":
+                if session.mode != "sample":
+                    return JSONResponse({"error": "Collapsed stacks come from sample mode"}, status_code=400)
+                return PlainTextResponse(session.collapsed())
+            return JSONResponse(session.result(int(request.query_params.get("limit", 50))))
+
+        @admin("/admin/profiling/{session_id}", ["DELETE"])
+        async def stop(request):
+            session = self.stop(request.path_params["session_id"])
+            if session is None:
+                return JSONResponse({"error": "Unknown session"}, status_code=404)
+            return JSONResponse(session.summary())
+
+        @admin("/admin/slow-calls", ["GET"])
+        async def slow_calls(request):
+            params = request.query_params
+            return JSONResponse({
+                "slow_ms": self.slow_ms,
+                "calls": self.slowest(params.get("tool"), int(params.get("limit", 20))),
+            })
@@ -0,0 +1,147 @@
+"""
+Prompt token budgeting utilities for EstateWise MCP servers
+
+Counts tokens locally (using tiktoken when it is installed, otherwise a
+fast regex approximation), shortens free text to a token budget, and keeps
+per-call prompt-size metrics.
+"""
+import re
+import threading
+from collections import deque
+from typing import Dict, Any, Optional
+
+# tiktoken is optional and slow to import, so it is loaded on first use
+_UNLOADED = object()
+_encoding = _UNLOADED
+_encoding_lock = threading.Lock()
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def _get_encoding():
+    global _encoding
+    if _encoding is _UNLOADED:
+        with _encoding_lock:
+            if _encoding is _UNLOADED:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.get_encoding("cl100k_base")
+                except Exception:
+                    # Fall back to the approximation in count_tokens
+                    _encoding = None
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens in text.
+
+    Without tiktoken, words count as one token per four characters (rounded
+    up) and every punctuation mark counts as one token, which tracks BPE
+    tokenizers closely enough for budgeting.
+    """
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    total = 0
+    for piece in _TOKEN_RE.findall(text):
+        total += (len(piece) + 3) // 4
+    return total
+
+
+def truncate_to_tokens(text: str, max_tokens: int, suffix: str = "…") -> str:
+    """Cut text to at most max_tokens, ending on a word boundary"""
+    if count_tokens(text) <= max_tokens:
+        return text
+    words = text.split()
+    lo, hi = 0, len(words)
+    # Binary search for the longest word prefix that fits
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if count_tokens(" ".join(words[:mid])) + 1 <= max_tokens:
+            lo = mid
+        else:
+            hi = mid - 1
+    return " ".join(words[:lo]) + suffix if lo else ""
+
+
+def summarize_to_tokens(text: str, max_tokens: int) -> str:
+    """Extractive summary: keep whole leading sentences that fit the budget.
+
+    Falls back to word-level truncation when even the first sentence is too
+    long.
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+    kept = []
+    used = 0
+    for sentence in _SENTENCE_RE.split(text.strip()):
+        tokens = count_tokens(sentence)
+        if used + tokens > max_tokens:
+            break
+        kept.append(sentence)
+        used += tokens
+    if kept:
+        return " ".join(kept)
+    return truncate_to_tokens(text, max_tokens)
+
+
+class PromptMetrics:
+    """Thread-safe record of prompt sizes per LLM call"""
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self._recent: deque = deque(maxlen=window)
+        self.calls = 0
+        self.total_tokens = 0
+        self.max_tokens = 0
+        self.compacted_calls = 0
+        self.chunked_calls = 0
+
+    def record(self, prompt_tokens: int, compacted: bool = False, chunks: int = 1) -> None:
+        with self._lock:
+            self.calls += 1
+            self.total_tokens += prompt_tokens
+            self.max_tokens = max(self.max_tokens, prompt_tokens)
+            self._recent.append(prompt_tokens)
+            if compacted:
+                self.compacted_calls += 1
+            if chunks > 1:
+                self.chunked_calls += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            recent = sorted(self._recent)
+            p50: Optional[int] = recent[len(recent) // 2] if recent else None
+            p95: Optional[int] = recent[min(len(recent) - 1, int(len(recent) * 0.95))] if recent else None
+            return {
+                "calls": self.calls,
+                "total_prompt_tokens": self.total_tokens,
+                "avg_prompt_tokens": round(self.total_tokens / self.calls, 1) if self.calls else 0,
+                "p50_prompt_tokens": p50,
+                "p95_prompt_tokens": p95,
+                "max_prompt_tokens": self.max_tokens,
+                "compacted_calls": self.compacted_calls,
+                "chunked_calls": self.chunked_calls,
+            }
+
+
+_metrics: Dict[str, PromptMetrics] = {}
+_metrics_lock = threading.Lock()
+
+
+def get_prompt_metrics(name: str) -> PromptMetrics:
+    """Return the process-wide prompt metrics for a named LLM call site"""
+    with _metrics_lock:
+        if name not in _metrics:
+            _metrics[name] = PromptMetrics()
+        return _metrics[name]
+
+
+def prompt_metrics_snapshot() -> Dict[str, Dict[str, Any]]:
+    """Snapshot of prompt metrics for every call site"""
+    with _metrics_lock:
+        names = list(_metrics)
+    return {name: _metrics[name].snapshot() for name in names}
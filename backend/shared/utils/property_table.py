@@ -0,0 +1,385 @@
+"""
+Columnar property store for bulk analytics over schema_validators.Property
+
+A PropertyTable keeps one typed NumPy array per field instead of one Python
+object per row. City, state, zip code and property type are dictionary
+encoded; addresses and MLS ids live in a single UTF-8 buffer with offsets.
+Tables save to a directory of .npy files that load memory-mapped, so several
+server processes opening the same table share one copy in the page cache.
+Each save writes a new version directory and then switches a CURRENT
+pointer to it, so a table is never rewritten under processes that have it
+mapped.
+"""
+import os
+import json
+import shutil
+import hashlib
+from typing import Dict, Any, List, Optional, Iterable, Sequence, Union
+
+import numpy as np
+
+from schema_validators import Property, validate_property
+
+FORMAT_VERSION = 1
+
+# Numeric columns: dtype and the sentinel stored for a missing value
+NUMERIC_COLUMNS = {
+    "price": (np.float64, np.nan),
+    "bedrooms": (np.int16, -1),
+    "bathrooms": (np.float32, np.nan),
+    "square_feet": (np.int32, -1),
+    "year_built": (np.int16, -1),
+}
+CATEGORICAL_COLUMNS = ("city", "state", "zip_code", "property_type")
+STRING_COLUMNS = ("address", "mls_id")
+PROPERTY_FIELDS = tuple(Property.__dataclass_fields__)
+
+
+def address_key(address: str) -> int:
+    """Stable 63-bit key for a normalized address (case/whitespace-insensitive)"""
+    normalized = " ".join(address.lower().split())
+    digest = hashlib.blake2b(normalized.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little") >> 1
+
+
+class _StringColumn:
+    """Variable-length strings packed into one UTF-8 buffer plus offsets"""
+
+    __slots__ = ("data", "offsets")
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray):
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def build(cls, values: Sequence[Optional[str]]) -> "_StringColumn":
+        encoded = [(v or "").encode() for v in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return cls(data, offsets)
+
+    def get(self, i: int) -> Optional[str]:
+        start, end = self.offsets[i], self.offsets[i + 1]
+        if start == end:
+            return None
+        return self.data[start:end].tobytes().decode()
+
+
+class PropertyRow:
+    """Zero-copy view of one table row with the attributes of a Property"""
+
+    __slots__ = ("_table", "_index")
+
+    def __init__(self, table: "PropertyTable", index: int):
+        self._table = table
+        self._index = index
+
+    @property
+    def row_id(self) -> int:
+        """Position of this row in the underlying (unfiltered) table"""
+        return self._index
+
+    def to_property(self) -> Property:
+        return Property(**{name: getattr(self, name) for name in PROPERTY_FIELDS})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in PROPERTY_FIELDS}
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, (PropertyRow, Property)):
+            return all(getattr(self, n) == getattr(other, n) for n in PROPERTY_FIELDS)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{n}={getattr(self, n)!r}" for n in PROPERTY_FIELDS)
+        return f"PropertyRow({fields})"
+
+
+def _row_getter(name: str):
+    return property(lambda self: self._table._value(name, self._index))
+
+
+for _name in PROPERTY_FIELDS:
+    setattr(PropertyRow, _name, _row_getter(_name))
+
+
+class PropertyTable:
+    """Columnar, array-backed table of properties"""
+
+    def __init__(self,
+                 numeric: Dict[str, np.ndarray],
+                 codes: Dict[str, np.ndarray],
+                 categories: Dict[str, List[str]],
+                 strings: Dict[str, _StringColumn],
+                 address_keys: np.ndarray,
+                 rows: Optional[np.ndarray] = None):
+        self._numeric = numeric
+        self._codes = codes
+        self._categories = categories
+        self._category_index = {
+            name: {value: code for code, value in enumerate(values)}
+            for name, values in categories.items()
+        }
+        self._strings = strings
+        self._address_keys = address_keys
+        # Base row ids selected by a filter; None means every row
+        self._rows = rows
+        # Sorted address keys and their positions, built on first lookup
+        self._address_index: Optional[tuple] = None
+
+    # ------------------------------------------------------------------ build
+
+    @classmethod
+    def from_properties(cls, properties: Iterable[Union[Property, Dict[str, Any]]]) -> "PropertyTable":
+        """Build a table from Property records or dicts (dicts are validated)"""
+        records = [p if isinstance(p, Property) else validate_property(p) for p in properties]
+        n = len(records)
+
+        numeric = {}
+        for name, (dtype, missing) in NUMERIC_COLUMNS.items():
+            values = [getattr(r, name) for r in records]
+            numeric[name] = np.array(
+                [missing if v is None else v for v in values], dtype=dtype
+            ) if n else np.empty(0, dtype=dtype)
+
+        codes, categories = {}, {}
+        for name in CATEGORICAL_COLUMNS:
+            lookup: Dict[str, int] = {}
+            column = np.empty(n, dtype=np.int32)
+            for i, r in enumerate(records):
+                value = getattr(r, name)
+                column[i] = -1 if value is None else lookup.setdefault(value, len(lookup))
+            codes[name] = column
+            categories[name] = list(lookup)
+
+        strings = {name: _StringColumn.build([getattr(r, name) for r in records]) for name in STRING_COLUMNS}
+        address_keys = np.array([address_key(r.address) for r in records], dtype=np.int64)
+        return cls(numeric, codes, categories, strings, address_keys)
+
+    # ---------------------------------------------------------------- access
+
+    def __len__(self) -> int:
+        return len(self._rows) if self._rows is not None else len(self._address_keys)
+
+    def _base(self, i: int) -> int:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("PropertyTable index out of range")
+        return int(self._rows[i]) if self._rows is not None else i
+
+    def __getitem__(self, i: int) -> PropertyRow:
+        return PropertyRow(self, self._base(i))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield PropertyRow(self, self._base(i))
+
+    def _value(self, name: str, base: int) -> Any:
+        if name in self._numeric:
+            value = self._numeric[name][base]
+            dtype, missing = NUMERIC_COLUMNS[name]
+            if np.issubdtype(dtype, np.floating):
+                return None if np.isnan(value) else float(value)
+            return None if value == missing else int(value)
+        if name in self._codes:
+            code = self._codes[name][base]
+            return None if code < 0 else self._categories[name][code]
+        return self._strings[name].get(base)
+
+    def column(self, name: str) -> np.ndarray:
+        """Numeric values (with NaN/-1 for missing) or category codes for a field"""
+        if name in self._numeric:
+            array = self._numeric[name]
+        elif name in self._codes:
+            array = self._codes[name]
+        else:
+            raise KeyError(f"{name} is not a numeric or categorical column")
+        return array if self._rows is None else array[self._rows]
+
+    def categories(self, name: str) -> List[str]:
+        return self._categories[name]
+
+    def decode(self, name: str) -> List[Optional[str]]:
+        """Decoded values of a categorical or string column for the selected rows"""
+        if name in self._codes:
+            values = self._categories[name]
+            return [None if c < 0 else values[c] for c in self.column(name)]
+        column = self._strings[name]
+        return [column.get(self._base(i)) for i in range(len(self))]
+
+    def row_ids(self) -> np.ndarray:
+        """Base row ids of the selected rows (stable across filtered views)"""
+        if self._rows is not None:
+            return self._rows
+        return np.arange(len(self._address_keys), dtype=np.int64)
+
+    @property
+    def nbytes(self) -> int:
+        total = self._address_keys.nbytes
+        total += sum(a.nbytes for a in self._numeric.values())
+        total += sum(a.nbytes for a in self._codes.values())
+        total += sum(s.data.nbytes + s.offsets.nbytes for s in self._strings.values())
+        return total
+
+    # --------------------------------------------------------------- filters
+
+    def _select(self, mask: np.ndarray) -> "PropertyTable":
+        return PropertyTable(
+            self._numeric, self._codes, self._categories, self._strings,
+            self._address_keys, rows=self.row_ids()[mask],
+        )
+
+    def _codes_for(self, name: str, values: Iterable[str]) -> np.ndarray:
+        index = self._category_index[name]
+        return np.array([index[v] for v in values if v in index], dtype=np.int32)
+
+    def filter(self,
+               min_price: Optional[float] = None,
+               max_price: Optional[float] = None,
+               min_beds: Optional[int] = None,
+               max_beds: Optional[int] = None,
+               zip_codes: Optional[Iterable[str]] = None,
+               property_types: Optional[Iterable[str]] = None) -> "PropertyTable":
+        """Vectorized filter returning a view over the matching rows"""
+        mask = np.ones(len(self), dtype=bool)
+        if min_price is not None or max_price is not None:
+            price = self.column("price")
+            if min_price is not None:
+                mask &= price >= min_price
+            if max_price is not None:
+                mask &= price <= max_price
+        if min_beds is not None or max_beds is not None:
+            beds = self.column("bedrooms")
+            mask &= beds >= 0
+            if min_beds is not None:
+                mask &= beds >= min_beds
+            if max_beds is not None:
+                mask &= beds <= max_beds
+        if zip_codes is not None:
+            mask &= np.isin(self.column("zip_code"), self._codes_for("zip_code", zip_codes))
+        if property_types is not None:
+            mask &= np.isin(self.column("property_type"), self._codes_for("property_type", property_types))
+        return self._select(mask)
+
+    def find(self, address: str) -> Optional[PropertyRow]:
+        """Look up a row by address (case/whitespace-insensitive)"""
+        position = int(self.find_many([address])[0])
+        return self[position] if position >= 0 else None
+
+    def find_many(self, addresses: Iterable[str]) -> np.ndarray:
+        """Positions of many addresses in this table, -1 where not found"""
+        if self._address_index is None:
+            keys = self._address_keys if self._rows is None else self._address_keys[self._rows]
+            order = np.argsort(keys, kind="stable")
+            self._address_index = (keys[order], order)
+        sorted_keys, order = self._address_index
+
+        wanted = np.array([address_key(a) for a in addresses], dtype=np.int64)
+        if len(sorted_keys) == 0:
+            return np.full(len(wanted), -1, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(sorted_keys, wanted), len(sorted_keys) - 1)
+        return np.where(sorted_keys[pos] == wanted, order[pos], -1)
+
+    # ----------------------------------------------------------- persistence
+
+    def save(self, path: str) -> None:
+        """Write the table (or the selected rows) as a new version of the directory at path"""
+        table = self if self._rows is None else PropertyTable.from_properties(r.to_property() for r in self)
+        os.makedirs(path, exist_ok=True)
+        previous = _current_version(path)
+        version = f"v{int(previous[1:]) + 1 if previous else 1}"
+        target = os.path.join(path, version)
+        # Left behind by a save that crashed before switching CURRENT
+        shutil.rmtree(target, ignore_errors=True)
+        os.makedirs(target)
+        arrays = {"address_keys": table._address_keys}
+        arrays.update({f"num.{k}": v for k, v in table._numeric.items()})
+        arrays.update({f"cat.{k}": v for k, v in table._codes.items()})
+        for name, column in table._strings.items():
+            arrays[f"str.{name}.data"] = column.data
+            arrays[f"str.{name}.offsets"] = column.offsets
+        for name, array in arrays.items():
+            np.save(os.path.join(target, f"{name}.npy"), np.ascontiguousarray(array))
+        meta = {
+            "format_version": FORMAT_VERSION,
+            "rows": len(table),
+            "categories": table._categories,
+        }
+        with open(os.path.join(target, "meta.json"), "w") as f:
+            json.dump(meta, f)
+        # Readers load whichever version CURRENT names when they open the table
+        pointer = os.path.join(path, "CURRENT.tmp")
+        with open(pointer, "w") as f:
+            f.write(version)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(pointer, os.path.join(path, "CURRENT"))
+        # The previous version stays for readers that read CURRENT just before
+        # the switch; older ones (and a pre-versioning flat layout) are removed.
+        # Processes that mapped them keep their (unlinked) files.
+        for entry in os.listdir(path):
+            full = os.path.join(path, entry)
+            if entry in (version, previous, "CURRENT"):
+                continue
+            if os.path.isdir(full) and entry[:1] == "v" and entry[1:].isdigit():
+                shutil.rmtree(full, ignore_errors=True)
+            elif previous and (entry.endswith(".npy") or entry == "meta.json"):
+                os.remove(full)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "PropertyTable":
+        """Open a saved table; with mmap=True columns are read-only memory maps"""
+        # Tables saved before versioning keep their files directly in path
+        version = _current_version(path)
+        if version is not None:
+            path = os.path.join(path, version)
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        if meta.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported property table format: {meta.get('format_version')}")
+
+        mode = "r" if mmap else None
+
+        def read(name: str) -> np.ndarray:
+            return np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode, allow_pickle=False)
+
+        numeric = {}
+        for name, (dtype, missing) in NUMERIC_COLUMNS.items():
+            if os.path.exists(os.path.join(path, f"num.{name}.npy")):
+                numeric[name] = read(f"num.{name}")
+            else:
+                # Column added after the table was written
+                numeric[name] = np.full(meta["rows"], missing, dtype=dtype)
+        codes = {name: read(f"cat.{name}") for name in CATEGORICAL_COLUMNS}
+        strings = {
+            name: _StringColumn(read(f"str.{name}.data"), read(f"str.{name}.offsets"))
+            for name in STRING_COLUMNS
+        }
+        return cls(numeric, codes, meta["categories"], strings, read("address_keys"))
+
+
+def _current_version(path: str) -> Optional[str]:
+    try:
+        with open(os.path.join(path, "CURRENT")) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+_shared_tables: Dict[str, PropertyTable] = {}
+
+
+def open_shared_table(path: Optional[str] = None) -> Optional[PropertyTable]:
+    """Open the table at path (default ``PROPERTY_TABLE_PATH``) memory-mapped, once per process.
+
+    Returns None if no table is configured.
+    """
+    path = path or os.getenv("PROPERTY_TABLE_PATH")
+    if not path:
+        return None
+    table = _shared_tables.get(path)
+    if table is None:
+        table = _shared_tables[path] = PropertyTable.load(path, mmap=True)
+    return table
@@ -0,0 +1,154 @@
+"""
+Keyed JSON-lines record store for EstateWise leads and offer comparisons
+
+Each write appends a line, and the last line for a key wins. Appends are
+safe for a job that crashes part-way: at worst a torn final line, which is
+skipped on load. ``compact`` rewrites the file with one line per key.
+
+Several processes share one file (the LeadGen server, the nightly batch
+job, dedup). Every read picks up lines appended since the last one, and
+writes hold an exclusive file lock while they merge and append, so one
+process never writes back a stale copy of fields another has changed.
+"""
+import os
+import json
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Iterable, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers in other processes are not excluded
+    fcntl = None
+
+from trace_context import traced
+
+_SPAN = {"db.system": "jsonl"}
+
+
+class RecordStore:
+    """Append-only store of JSON records keyed by one field"""
+
+    def __init__(self, path: str, key: str):
+        """
+        Args:
+            path: JSONL file; created on first write
+            key: Record field that identifies a record (e.g. ``lead_id``)
+        """
+        self.path = path
+        self.key = key
+        self._records: Dict[str, Dict[str, Any]] = {}
+        # Bytes of the file already applied to _records, and which file they came from
+        self._offset = 0
+        self._inode: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _load(self, f=None) -> Dict[str, Dict[str, Any]]:
+        """Apply lines appended since the last read (all of them after a compaction)"""
+        try:
+            stat = os.fstat(f.fileno()) if f is not None else os.stat(self.path)
+        except FileNotFoundError:
+            self._records, self._offset, self._inode = {}, 0, None
+            return self._records
+        if stat.st_ino != self._inode or stat.st_size < self._offset:
+            self._records, self._offset, self._inode = {}, 0, stat.st_ino
+        if stat.st_size == self._offset:
+            return self._records
+
+        if f is None:
+            with open(self.path, "rb") as fresh:
+                fresh.seek(self._offset)
+                data = fresh.read()
+        else:
+            f.seek(self._offset)
+            data = f.read()
+        # A line still being written has no newline yet; pick it up next time
+        complete = data[:data.rfind(b"\n") + 1]
+        for line in complete.splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Torn write from an interrupted run
+                continue
+            self._records[str(record[self.key])] = record
+        self._offset += len(complete)
+        return self._records
+
+    @contextmanager
+    def _locked(self):
+        """Open the file for appending under an exclusive lock shared with other processes"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        while True:
+            f = open(self.path, "ab+")
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                replaced = os.stat(self.path).st_ino != os.fstat(f.fileno()).st_ino
+            except FileNotFoundError:
+                replaced = True
+            if not replaced:
+                break
+            # Compacted by another process while we waited; lock the new file
+            f.close()
+        try:
+            yield f
+        finally:
+            f.close()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._load().get(str(key))
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        with self._lock:
+            return iter(list(self._load().values()))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._load())
+
+    @traced("record_store.put_many", _SPAN)
+    def put_many(self, records: Iterable[Dict[str, Any]], merge: bool = True) -> int:
+        """Write records, merging their fields into the latest stored record with the same key"""
+        records = list(records)
+        if not records:
+            return 0
+        with self._lock, self._locked() as f:
+            current = self._load(f)
+            lines = []
+            for record in records:
+                key = str(record[self.key])
+                if merge and key in current:
+                    record = {**current[key], **record}
+                current[key] = record
+                lines.append(json.dumps(record, ensure_ascii=False, default=str))
+            end = f.seek(0, os.SEEK_END)
+            if end:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    # Start after a torn line rather than extending it
+                    f.write(b"\n")
+            f.write(("\n".join(lines) + "\n").encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+            # current already holds these records, and a torn tail is skipped anyway
+            self._offset = f.tell()
+            return len(lines)
+
+    def put(self, record: Dict[str, Any], merge: bool = True) -> None:
+        self.put_many([record], merge=merge)
+
+    @traced("record_store.compact", _SPAN)
+    def compact(self) -> None:
+        """Rewrite the file with only the latest version of each record"""
+        with self._lock, self._locked() as f:
+            records = self._load(f)
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as out:
+                for record in records.values():
+                    out.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+                out.flush()
+                os.fsync(out.fileno())
+            os.replace(tmp, self.path)
+            self._offset, self._inode = os.path.getsize(self.path), os.stat(self.path).st_ino
+
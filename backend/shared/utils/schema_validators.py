@@ -1,12 +1,20 @@
 """
 Schema validation utilities for EstateWise
+
+Each schema dataclass gets a validator compiled once from its field types.
+Validators coerce compatible input (e.g. "3" -> 3 for an int field), reject
+unknown keys, and report every problem with a dotted path instead of
+stopping at the first one.
 """
-from typing import Dict, Any, List, Optional
-from dataclasses import dataclass
+import typing
+from typing import Dict, Any, List, Optional, Callable, Iterable
+from dataclasses import dataclass, field, fields, is_dataclass, MISSING
 from datetime import datetime
 
+from call_phases import phase
 
-@dataclass
+
+@dataclass(frozen=True, slots=True)
 class Property:
     """Property data schema"""
     address: str
@@ -19,68 +27,315 @@ class Property:
     square_feet: Optional[int] = None
     mls_id: Optional[str] = None
     property_type: Optional[str] = None
+    year_built: Optional[int] = None
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Client:
     """Client data schema"""
     name: str
     email: str
     phone: Optional[str] = None
-    client_type: str = "buyer"  # buyer, seller, both
+    client_type: str = field(default="buyer", metadata={"choices": ("buyer", "seller", "both")})
     notes: Optional[str] = None
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Transaction:
     """Transaction data schema"""
     transaction_id: str
     property: Property
     clients: List[Client]
-    status: str = "pending"  # pending, active, closed, cancelled
-    created_at: datetime = None
-    updated_at: datetime = None
+    status: str = field(default="pending", metadata={"choices": ("pending", "active", "closed", "cancelled")})
+    # Optional: transactions stored before timestamps were filled in have null ones
+    created_at: Optional[datetime] = field(default_factory=datetime.now)
+    updated_at: Optional[datetime] = field(default_factory=datetime.now)
+    agent_id: Optional[str] = None
+    close_date: Optional[datetime] = None
+    # Records on the other servers that belong to this deal
+    lead_id: Optional[str] = None
+    contract_ids: List[str] = field(default_factory=list)
+    disclosure_ids: List[str] = field(default_factory=list)
+
+
+class ValidationError(ValueError):
+    """Raised when data does not match a schema; carries every error found"""
+
+    def __init__(self, errors: List[Dict[str, Any]]):
+        self.errors = errors
+        super().__init__("; ".join(f"{e['path']}: {e['message']}" for e in errors))
+
+
+class _CoercionError(Exception):
+    pass
+
+
+@dataclass
+class BatchResult:
+    """Outcome of validate_many: valid records plus per-record errors"""
+    valid: List[Any]
+    errors: List[Dict[str, Any]]
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+
+def _coerce_str(value: Any) -> str:
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    raise _CoercionError(f"expected string, got {type(value).__name__}")
+
+
+def _coerce_int(value: Any) -> int:
+    if isinstance(value, bool):
+        raise _CoercionError("expected integer, got bool")
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        try:
+            return int(value.strip())
+        except ValueError:
+            pass
+    raise _CoercionError(f"expected integer, got {value!r}")
+
+
+def _coerce_float(value: Any) -> float:
+    if isinstance(value, bool):
+        raise _CoercionError("expected number, got bool")
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value.replace(",", "").strip())
+        except ValueError:
+            pass
+    raise _CoercionError(f"expected number, got {value!r}")
+
+
+def _coerce_datetime(value: Any) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            pass
+    raise _CoercionError(f"expected ISO datetime, got {value!r}")
+
+
+_SCALAR_COERCERS = {
+    str: _coerce_str,
+    int: _coerce_int,
+    float: _coerce_float,
+    datetime: _coerce_datetime,
+}
+
+# A field coercer takes (value, path, errors) and returns the coerced value;
+# nested schemas append their own errors and return None on failure.
+FieldCoercer = Callable[[Any, str, List[Dict[str, Any]]], Any]
+
+
+_MISSING = object()
+
+# Types whose exact instances skip the coercer entirely in compiled code
+_FAST_TYPES = {str: "str", int: "int", float: "float", datetime: "datetime"}
+
+
+class SchemaValidator:
+    """Validator compiled once per schema dataclass.
+
+    The schema's fields are turned into the source of a single specialised
+    function (one straight-line block per field, with an exact-type fast
+    path) so that validating a record costs no per-field dispatch.
+    """
+
+    def __init__(self, schema: type):
+        if not is_dataclass(schema):
+            raise TypeError(f"{schema!r} is not a dataclass schema")
+        self.schema = schema
+        self._build = self._compile()
+
+    def _compile(self) -> Callable[[Any, str, List[Dict[str, Any]]], Any]:
+        hints = typing.get_type_hints(self.schema)
+        namespace: Dict[str, Any] = {
+            "_cls": self.schema,
+            "_MISSING": _MISSING,
+            "_CoercionError": _CoercionError,
+            "datetime": datetime,
+        }
+        lines = [
+            "def _build(data, path, errors):",
+            "    if type(data) is not dict:",
+            "        errors.append({'path': path or '$', 'message': 'expected object, got ' + type(data).__name__})",
+            "        return None",
+            "    prefix = path + '.' if path else ''",
+            "    start = len(errors)",
+            "    seen = 0",
+        ]
+        args = []
+        for i, f in enumerate(fields(self.schema)):
+            tp = hints[f.name]
+            optional = False
+            if typing.get_origin(tp) is typing.Union:
+                members = [a for a in typing.get_args(tp) if a is not type(None)]
+                optional = len(members) < len(typing.get_args(tp))
+                tp = members[0]
+            namespace[f"_c{i}"] = self._compile_type(tp)
+            var = f"f{i}"
+            args.append(var)
+            name = repr(f.name)
+
+            lines.append(f"    v = data.get({name}, _MISSING)")
+            lines.append("    if v is _MISSING:")
+            if f.default is MISSING and f.default_factory is MISSING:
+                lines.append(f"        errors.append({{'path': prefix + {name}, 'message': 'Missing required field'}})")
+                lines.append(f"        {var} = None")
+            elif f.default_factory is not MISSING:
+                namespace[f"_d{i}"] = f.default_factory
+                lines.append(f"        {var} = _d{i}()")
+            else:
+                namespace[f"_d{i}"] = f.default
+                lines.append(f"        {var} = _d{i}")
+            lines.append("    else:")
+            lines.append("        seen += 1")
+            lines.append("        if v is None:")
+            if optional:
+                lines.append(f"            {var} = None")
+            else:
+                lines.append(f"            errors.append({{'path': prefix + {name}, 'message': 'may not be null'}})")
+                lines.append(f"            {var} = _MISSING")
+            fast = _FAST_TYPES.get(tp)
+            if fast:
+                lines.append(f"        elif type(v) is {fast}:")
+                lines.append(f"            {var} = v")
+                if tp is float:
+                    lines.append("        elif type(v) is int:")
+                    lines.append(f"            {var} = float(v)")
+            lines.append("        else:")
+            lines.append("            try:")
+            lines.append(f"                {var} = _c{i}(v, prefix + {name}, errors)")
+            lines.append("            except _CoercionError as e:")
+            lines.append(f"                errors.append({{'path': prefix + {name}, 'message': str(e)}})")
+            choices = f.metadata.get("choices")
+            if choices:
+                namespace[f"_ch{i}"] = frozenset(choices)
+                namespace[f"_chm{i}"] = f"must be one of {sorted(choices)}"
+                lines.append(f"        if {var} is not _MISSING and {var} is not None and {var} not in _ch{i}:")
+                lines.append(f"            errors.append({{'path': prefix + {name}, 'message': _chm{i}}})")
+
+        namespace["_known"] = frozenset(f.name for f in fields(self.schema))
+        lines += [
+            "    if seen != len(data):",
+            "        for key in data.keys() - _known:",
+            "            errors.append({'path': prefix + str(key), 'message': 'Unknown field'})",
+            "    if len(errors) > start:",
+            "        return None",
+        ]
+        if "__slots__" in self.schema.__dict__:
+            # Frozen dataclass __init__ routes every field through
+            # object.__setattr__; writing the slot descriptors directly is
+            # equivalent and markedly faster for bulk loads.
+            namespace["_new"] = object.__new__
+            lines.append("    obj = _new(_cls)")
+            for i, f in enumerate(fields(self.schema)):
+                namespace[f"_s{i}"] = self.schema.__dict__[f.name].__set__
+                lines.append(f"    _s{i}(obj, f{i})")
+            lines.append("    return obj")
+        else:
+            lines.append(f"    return _cls({', '.join(args)})")
+        exec("\n".join(lines), namespace)
+        return namespace["_build"]
+
+    def _compile_type(self, tp: Any) -> FieldCoercer:
+        if typing.get_origin(tp) in (list, List):
+            item = self._compile_type(typing.get_args(tp)[0])
+
+            def coerce_list(value, path, errors):
+                if not isinstance(value, (list, tuple)):
+                    raise _CoercionError(f"expected list, got {type(value).__name__}")
+                result = []
+                for i, v in enumerate(value):
+                    try:
+                        result.append(item(v, f"{path}[{i}]", errors))
+                    except _CoercionError as e:
+                        errors.append({"path": f"{path}[{i}]", "message": str(e)})
+                return result
+            return coerce_list
+
+        if is_dataclass(tp):
+            schema = tp
+
+            def coerce_nested(value, path, errors):
+                if isinstance(value, schema):
+                    return value
+                if not isinstance(value, dict):
+                    raise _CoercionError(f"expected object, got {type(value).__name__}")
+                return get_validator(schema)._build(value, path, errors)
+            return coerce_nested
+
+        scalar = _SCALAR_COERCERS.get(tp)
+        if scalar is None:
+            raise TypeError(f"Unsupported schema field type: {tp!r}")
+        return lambda value, path, errors: scalar(value)
+
+    def validate(self, data: Dict[str, Any]) -> Any:
+        """Validate data and return a schema instance, or raise ValidationError"""
+        errors: List[Dict[str, Any]] = []
+        with phase("validation"):
+            obj = self._build(data, "", errors)
+        if errors:
+            raise ValidationError(errors)
+        return obj
+
+
+_VALIDATORS: Dict[type, SchemaValidator] = {}
+
+
+def get_validator(schema: type) -> SchemaValidator:
+    """Return the compiled validator for a schema, compiling it on first use"""
+    validator = _VALIDATORS.get(schema)
+    if validator is None:
+        validator = _VALIDATORS[schema] = SchemaValidator(schema)
+    return validator
+
+
+def validate_many(schema: type, records: Iterable[Dict[str, Any]]) -> BatchResult:
+    """Validate a batch of records against one schema.
+
+    Invalid records are skipped; their errors carry the record's index.
+    """
+    build = get_validator(schema)._build
+    valid = []
+    errors: List[Dict[str, Any]] = []
+    record_errors: List[Dict[str, Any]] = []
+    append = valid.append
+    with phase("validation"):
+        for index, data in enumerate(records):
+            obj = build(data, "", record_errors)
+            if record_errors:
+                for error in record_errors:
+                    errors.append({"index": index, **error})
+                record_errors.clear()
+            else:
+                append(obj)
+    return BatchResult(valid=valid, errors=errors)
 
 
 def validate_property(data: Dict[str, Any]) -> Property:
     """Validate and create Property object"""
-    required_fields = ["address", "city", "state", "zip_code"]
-    
-    for field in required_fields:
-        if field not in data:
-            raise ValueError(f"Missing required field: {field}")
-    
-    return Property(**data)
+    return get_validator(Property).validate(data)
 
 
 def validate_client(data: Dict[str, Any]) -> Client:
     """Validate and create Client object"""
-    required_fields = ["name", "email"]
-    
-    for field in required_fields:
-        if field not in data:
-            raise ValueError(f"Missing required field: {field}")
-    
-    return Client(**data)
+    return get_validator(Client).validate(data)
 
 
 def validate_transaction(data: Dict[str, Any]) -> Transaction:
     """Validate and create Transaction object"""
-    required_fields = ["transaction_id", "property", "clients"]
-    
-    for field in required_fields:
-        if field not in data:
-            raise ValueError(f"Missing required field: {field}")
-    
-    # Validate nested objects
-    property_obj = validate_property(data["property"])
-    clients = [validate_client(client) for client in data["clients"]]
-    
-    return Transaction(
-        transaction_id=data["transaction_id"],
-        property=property_obj,
-        clients=clients,
-        status=data.get("status", "pending"),
-        created_at=data.get("created_at", datetime.now()),
-        updated_at=data.get("updated_at", datetime.now())
-    ) 
\ No newline at end of file
+    return get_validator(Transaction).validate(data)
@@ -0,0 +1,274 @@
+"""
+Full-text search for EstateWise MCP servers
+
+An embedded SQLite FTS5 index over leads and inquiries (LeadGen), contracts
+(Paperwork) and disclosures (ClientSide). Tools index each record as they
+write it. Queries rank with BM25 (title matches weigh more than body
+matches), and each word also matches as a prefix, so "elm st" finds
+"Elm Street" and "purch oak" finds purchase contracts on Oak.
+
+By default each server process keeps its own in-memory index. Point
+SEARCH_INDEX_PATH at a file to persist it and share it between the servers
+(WAL mode lets one process write while others read).
+
+Environment:
+    SEARCH_INDEX_PATH      SQLite file for the index (default: in memory)
+    SEARCH_P99_TARGET_MS   p99 query latency the metrics are judged against (25)
+"""
+import os
+import re
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from collections import deque
+from typing import Dict, Any, Iterable, List, Optional, Sequence, Tuple
+
+from trace_context import traced
+
+_SPAN = {"db.system": "sqlite"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    doc_id TEXT NOT NULL UNIQUE,
+    kind TEXT NOT NULL,
+    title TEXT NOT NULL DEFAULT '',
+    body TEXT NOT NULL DEFAULT '',
+    meta TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS documents_kind ON documents(kind);
+CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+    title, body,
+    content='documents', content_rowid='id',
+    tokenize='porter unicode61 remove_diacritics 2',
+    prefix='2 3 4'
+);
+CREATE TRIGGER IF NOT EXISTS documents_ai AFTER INSERT ON documents BEGIN
+    INSERT INTO documents_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+END;
+CREATE TRIGGER IF NOT EXISTS documents_ad AFTER DELETE ON documents BEGIN
+    INSERT INTO documents_fts(documents_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+END;
+CREATE TRIGGER IF NOT EXISTS documents_au AFTER UPDATE ON documents BEGIN
+    INSERT INTO documents_fts(documents_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+    INSERT INTO documents_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+END;
+"""
+
+_UPSERT = """
+INSERT INTO documents (doc_id, kind, title, body, meta, updated_at) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT(doc_id) DO UPDATE SET
+    kind = excluded.kind, title = excluded.title, body = excluded.body,
+    meta = excluded.meta, updated_at = excluded.updated_at
+"""
+
+# BM25 column weights: title, body
+_WEIGHTS = (4.0, 1.0)
+
+_TERM = re.compile(r'"([^"]+)"|(\S+)')
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def build_query(text: str, prefix: bool = True, any_term: bool = False) -> Optional[str]:
+    """
+    Turn free text into a safe FTS5 query
+
+    Words are quoted so FTS5 operators in user input are inert. "Quoted
+    phrases" match exactly; other words of two or more letters match as
+    prefixes (after stemming) unless ``prefix`` is off. Terms are ANDed (ORed with ``any_term``).
+    """
+    terms = []
+    for match in _TERM.finditer(text or ""):
+        phrase, word = match.groups()
+        if phrase is not None:
+            words = _WORD.findall(phrase)
+            if words:
+                terms.append('"' + " ".join(words) + '"')
+            continue
+        # One-letter prefixes are not in the prefix index and expand to most of the vocabulary
+        terms.extend(f'"{part}"' + ("*" if prefix and len(part) > 1 else "") for part in _WORD.findall(word))
+    if not terms:
+        return None
+    return (" OR " if any_term else " AND ").join(terms)
+
+
+def flatten(value: Any, prefix: str = "") -> str:
+    """Searchable text for nested record data ("buyer name: Ana" per line)"""
+    if isinstance(value, dict):
+        parts = (flatten(v, f"{prefix}{str(k).replace('_', ' ')}: ") for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        parts = (flatten(v, prefix) for v in value)
+    else:
+        return f"{prefix}{value}" if value not in (None, "") else ""
+    return "\n".join(p for p in parts if p)
+
+
+class SearchIndex:
+    """SQLite FTS5 index of documents (doc_id, kind, title, body, meta)"""
+
+    def __init__(self, path: Optional[str] = None, p99_target_ms: Optional[float] = None, window: int = 2000):
+        """
+        Args:
+            path: SQLite file; None for a private in-memory index
+            p99_target_ms: Latency target reported by snapshot()
+            window: Recent queries kept for the latency percentiles
+        """
+        self.path = path
+        self.p99_target_ms = p99_target_ms if p99_target_ms is not None else float(
+            os.getenv("SEARCH_P99_TARGET_MS", 25)
+        )
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._uri = f"file:{os.path.abspath(path)}"
+        else:
+            self._uri = f"file:search-{uuid.uuid4().hex}?mode=memory&cache=shared"
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._latencies: deque = deque(maxlen=window)
+        self.queries = 0
+        self.writes = 0
+        # Keeps a shared in-memory database alive, and creates the schema
+        self._anchor = self._connect()
+        if path:
+            self._anchor.execute("PRAGMA journal_mode=WAL")
+        self._anchor.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self._uri, uri=True, timeout=5.0, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        """One connection per thread (sync tools run on worker threads)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    @traced("search_index.index_many", _SPAN)
+    def index_many(self, docs: Iterable[Tuple[str, str, str, str, Optional[Dict[str, Any]]]]) -> int:
+        """Add or replace documents in one transaction.
+
+        Args:
+            docs: (doc_id, kind, title, body, meta) tuples
+        """
+        now = time.time()
+        rows = [
+            (doc_id, kind, title or "", body or "", json.dumps(meta, default=str) if meta else None, now)
+            for doc_id, kind, title, body, meta in docs
+        ]
+        if not rows:
+            return 0
+        with self._write_lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(_UPSERT, rows)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        self.writes += len(rows)
+        return len(rows)
+
+    def index(self, doc_id: str, kind: str, title: str, body: str, meta: Optional[Dict[str, Any]] = None) -> None:
+        self.index_many([(doc_id, kind, title, body, meta)])
+
+    @traced("search_index.delete", _SPAN)
+    def delete(self, doc_id: str) -> bool:
+        with self._write_lock:
+            return self._conn.execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,)).rowcount > 0
+
+    def count(self, kind: Optional[str] = None) -> int:
+        if kind is None:
+            return self._conn.execute("SELECT count(*) FROM documents").fetchone()[0]
+        return self._conn.execute("SELECT count(*) FROM documents WHERE kind = ?", (kind,)).fetchone()[0]
+
+    def _run(self, match: str, kinds: Optional[Sequence[str]], limit: int) -> List[Dict[str, Any]]:
+        sql = (
+            "SELECT d.doc_id, d.kind, d.title, d.meta, bm25(documents_fts, ?, ?) AS score, "
+            "snippet(documents_fts, 1, '[', ']', '…', 12) "
+            "FROM documents_fts JOIN documents d ON d.id = documents_fts.rowid "
+            "WHERE documents_fts MATCH ?"
+        )
+        params: List[Any] = [*_WEIGHTS, match]
+        if kinds:
+            sql += f" AND d.kind IN ({','.join('?' * len(kinds))})"
+            params.extend(kinds)
+        sql += " ORDER BY score LIMIT ?"
+        params.append(limit)
+        return [
+            {
+                "doc_id": doc_id,
+                "kind": kind,
+                "title": title,
+                "snippet": snippet,
+                # bm25() is lower-is-better; report higher-is-better
+                "score": round(-score, 3),
+                "meta": json.loads(meta) if meta else {},
+            }
+            for doc_id, kind, title, meta, score, snippet in self._conn.execute(sql, params)
+        ]
+
+    @traced("search_index.search", _SPAN)
+    def search(self, query: str, kinds: Optional[Sequence[str]] = None, limit: int = 10) -> Dict[str, Any]:
+        """
+        Ranked search
+
+        All terms must match; if nothing does, documents matching any term
+        are returned instead (``matched`` says which).
+        """
+        started = time.perf_counter()
+        limit = max(1, min(int(limit), 100))
+        match = build_query(query)
+        results, matched = [], "all"
+        if match is not None:
+            results = self._run(match, kinds, limit)
+            if not results and " AND " in match:
+                results, matched = self._run(build_query(query, any_term=True), kinds, limit), "any"
+        took = time.perf_counter() - started
+        self._latencies.append(took)
+        self.queries += 1
+        return {
+            "status": "success",
+            "query": query,
+            "matched": matched,
+            "results": results,
+            "took_ms": round(took * 1000, 2),
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        latencies = sorted(self._latencies)
+
+        def pct(p: float) -> float:
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 2) if latencies else 0.0
+
+        p99 = pct(0.99)
+        return {
+            "documents": self.count(),
+            "queries": self.queries,
+            "writes": self.writes,
+            "p50_ms": pct(0.5),
+            "p99_ms": p99,
+            "p99_target_ms": self.p99_target_ms,
+            "within_target": p99 <= self.p99_target_ms,
+            "path": self.path or ":memory:",
+        }
+
+
+_index: Optional[SearchIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_search_index() -> SearchIndex:
+    """The process-wide search index (SEARCH_INDEX_PATH, or in memory)"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = SearchIndex(os.getenv("SEARCH_INDEX_PATH") or None)
+    return _index
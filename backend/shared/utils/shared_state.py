@@ -0,0 +1,576 @@
+"""
+Shared cache/state backend for EstateWise MCP servers
+
+Each server runs in its own process, so a cache kept in a dict is private to
+that process. This module puts caches and small shared state (LLM responses,
+counters) behind one key/value interface with three implementations:
+
+- ``MemoryBackend``: a dict in this process (the default; nothing is shared)
+- ``SQLiteBackend``: a SQLite file in WAL mode, shared by every process on
+  the host. Put it on ``/dev/shm`` to keep it in shared memory.
+- ``RedisBackend``: any server speaking the Redis protocol (RESP), shared by
+  every replica. It needs no client library. Batches are pipelined, so
+  ``get_many``/``set_many`` cost one round trip whatever their size.
+
+Values are JSON, so every backend stores the same bytes and a value written
+by one server reads back the same in another. Every write takes an optional
+TTL in seconds.
+
+Environment:
+    SHARED_STATE_URL   memory:// (default), sqlite:///path/to/state.db or
+                       redis://[:password@]host:port/db
+    SHARED_STATE_PREFIX  Key prefix on Redis, so servers can share a Redis (estatewise:)
+"""
+import os
+import json
+import time
+import heapq
+import socket
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Iterable, List, Optional, Sequence
+from urllib.parse import urlsplit, unquote
+
+from trace_context import span
+
+# Keys per statement/command when a batch is split up
+CHUNK = 500
+
+
+class StateBackendError(RuntimeError):
+    """Raised when the backend cannot be reached or rejects a command"""
+
+
+def _encode(value: Any) -> bytes:
+    return json.dumps(value, separators=(",", ":"), default=str).encode()
+
+
+def _decode(raw: bytes) -> Any:
+    return json.loads(raw)
+
+
+def _chunks(items: Sequence, size: int = CHUNK):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class StateBackend:
+    """Key/value store with TTLs and batch operations; subclasses store raw bytes"""
+
+    name = "base"
+
+    def __init__(self):
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "deletes": 0}
+
+    # Subclasses implement these on encoded values
+    def _get_many(self, keys: List[str]) -> Dict[str, bytes]:
+        raise NotImplementedError
+
+    def _set_many(self, items: Dict[str, bytes], ttl: Optional[float]) -> None:
+        raise NotImplementedError
+
+    def _delete_many(self, keys: List[str]) -> int:
+        raise NotImplementedError
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        """Add to an integer counter (created at 0; ttl applies when it is created)"""
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        """Remove every key this backend owns"""
+        raise NotImplementedError
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Values of the keys that exist, in one round trip"""
+        keys = list(dict.fromkeys(keys))
+        with span("shared_state.get_many", {"db.system": self.name, "keys": len(keys)}):
+            found = {key: _decode(raw) for key, raw in self._get_many(keys).items()} if keys else {}
+        self.stats["hits"] += len(found)
+        self.stats["misses"] += len(keys) - len(found)
+        return found
+
+    def set_many(self, items: Dict[str, Any], ttl: Optional[float] = None) -> None:
+        """Write several keys in one round trip, each expiring after ttl seconds (None: never)"""
+        if ttl is not None and ttl <= 0:
+            raise ValueError("ttl must be positive (or None for no expiry)")
+        if items:
+            with span("shared_state.set_many", {"db.system": self.name, "keys": len(items)}):
+                self._set_many({key: _encode(value) for key, value in items.items()}, ttl)
+            self.stats["writes"] += len(items)
+
+    def delete_many(self, keys: Iterable[str]) -> int:
+        keys = list(dict.fromkeys(keys))
+        with span("shared_state.delete_many", {"db.system": self.name, "keys": len(keys)}):
+            deleted = self._delete_many(keys) if keys else 0
+        self.stats["deletes"] += deleted
+        return deleted
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.get_many([key]).get(key, default)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self.set_many({key: value}, ttl)
+
+    def delete(self, key: str) -> bool:
+        return self.delete_many([key]) > 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            "backend": self.name,
+            **self.stats,
+            "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else None,
+        }
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryBackend(StateBackend):
+    """Process-local backend: an LRU dict with per-key expiry"""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = 100_000, clock=time.monotonic):
+        super().__init__()
+        self.max_entries = max_entries
+        self.clock = clock
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        # (expires_at, key) for keys with a TTL; stale entries are skipped when popped
+        self._expiry: List[tuple] = []
+        self._lock = threading.Lock()
+
+    def _live(self, key: str, now: float) -> Optional[bytes]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        raw, expires_at = entry
+        if expires_at is not None and expires_at <= now:
+            del self._data[key]
+            return None
+        return raw
+
+    def _expire(self, now: float) -> None:
+        while self._expiry and self._expiry[0][0] <= now:
+            expires_at, key = heapq.heappop(self._expiry)
+            entry = self._data.get(key)
+            if entry is not None and entry[1] == expires_at:
+                del self._data[key]
+
+    def _get_many(self, keys: List[str]) -> Dict[str, bytes]:
+        now = self.clock()
+        found = {}
+        with self._lock:
+            for key in keys:
+                raw = self._live(key, now)
+                if raw is not None:
+                    self._data.move_to_end(key)
+                    found[key] = raw
+        return found
+
+    def _set_many(self, items: Dict[str, bytes], ttl: Optional[float]) -> None:
+        now = self.clock()
+        expires_at = now + ttl if ttl is not None else None
+        with self._lock:
+            self._expire(now)
+            for key, raw in items.items():
+                self._data[key] = (raw, expires_at)
+                self._data.move_to_end(key)
+                if expires_at is not None:
+                    heapq.heappush(self._expiry, (expires_at, key))
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+            if len(self._expiry) > 2 * self.max_entries:
+                # Rebuild without entries for keys that were overwritten or evicted
+                self._expiry = [(e, k) for k, (_, e) in self._data.items() if e is not None]
+                heapq.heapify(self._expiry)
+
+    def _delete_many(self, keys: List[str]) -> int:
+        now = self.clock()
+        with self._lock:
+            return sum(self._live(key, now) is not None and self._data.pop(key) is not None for key in keys)
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        now = self.clock()
+        with self._lock:
+            raw = self._live(key, now)
+            if raw is None:
+                value, expires_at = amount, (now + ttl if ttl is not None else None)
+                if expires_at is not None:
+                    heapq.heappush(self._expiry, (expires_at, key))
+            else:
+                value, expires_at = int(_decode(raw)) + amount, self._data[key][1]
+            self._data[key] = (_encode(value), expires_at)
+            self._data.move_to_end(key)
+        self.stats["writes"] += 1
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._expiry.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**super().snapshot(), "keys": len(self._data), "max_entries": self.max_entries}
+
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires_at REAL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS kv_expires ON kv(expires_at) WHERE expires_at IS NOT NULL;
+"""
+
+_SQLITE_UPSERT = """
+INSERT INTO kv (key, value, expires_at) VALUES (?, ?, ?)
+ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at
+"""
+
+
+class SQLiteBackend(StateBackend):
+    """Single-host backend: a SQLite file every server process opens (WAL mode)"""
+
+    name = "sqlite"
+
+    def __init__(self, path: str, sweep_every: int = 1000, clock=time.time):
+        """
+        Args:
+            path: SQLite file, shared by the processes that open it
+            sweep_every: Writes between deletions of expired rows
+            clock: Wall clock; expiry times are compared across processes
+        """
+        super().__init__()
+        self.path = os.path.abspath(path)
+        self.sweep_every = sweep_every
+        self.clock = clock
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._local = threading.local()
+        self._writes_since_sweep = 0
+        conn = self._conn
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SQLITE_SCHEMA)
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        """One connection per thread (sync tools run on worker threads)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(
+                self.path, timeout=5.0, check_same_thread=False, isolation_level=None
+            )
+            conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _transaction(self, fn):
+        conn = self._conn
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(conn)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.OperationalError as e:
+            raise StateBackendError(f"SQLite state backend: {e}") from e
+        return result
+
+    def _get_many(self, keys: List[str]) -> Dict[str, bytes]:
+        now = self.clock()
+        found = {}
+        try:
+            for chunk in _chunks(keys):
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM kv WHERE key IN ({','.join('?' * len(chunk))}) "
+                    "AND (expires_at IS NULL OR expires_at > ?)",
+                    (*chunk, now),
+                )
+                found.update(rows)
+        except sqlite3.OperationalError as e:
+            raise StateBackendError(f"SQLite state backend: {e}") from e
+        return found
+
+    def _set_many(self, items: Dict[str, bytes], ttl: Optional[float]) -> None:
+        now = self.clock()
+        expires_at = now + ttl if ttl is not None else None
+        sweep = self._writes_since_sweep + len(items) >= self.sweep_every
+
+        def write(conn):
+            conn.executemany(_SQLITE_UPSERT, [(key, raw, expires_at) for key, raw in items.items()])
+            if sweep:
+                conn.execute("DELETE FROM kv WHERE expires_at <= ?", (now,))
+
+        self._transaction(write)
+        self._writes_since_sweep = 0 if sweep else self._writes_since_sweep + len(items)
+
+    def _delete_many(self, keys: List[str]) -> int:
+        def delete(conn):
+            return sum(
+                conn.execute(f"DELETE FROM kv WHERE key IN ({','.join('?' * len(chunk))})", chunk).rowcount
+                for chunk in _chunks(keys)
+            )
+        return self._transaction(delete)
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        now = self.clock()
+
+        def increment(conn):
+            row = conn.execute(
+                "SELECT value, expires_at FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)", (key, now)
+            ).fetchone()
+            if row is None:
+                value, expires_at = amount, (now + ttl if ttl is not None else None)
+            else:
+                value, expires_at = int(_decode(row[0])) + amount, row[1]
+            conn.execute(_SQLITE_UPSERT, (key, _encode(value), expires_at))
+            return value
+
+        value = self._transaction(increment)
+        self.stats["writes"] += 1
+        return value
+
+    def clear(self) -> None:
+        self._transaction(lambda conn: conn.execute("DELETE FROM kv"))
+
+    def __len__(self) -> int:
+        return self._conn.execute(
+            "SELECT COUNT(*) FROM kv WHERE expires_at IS NULL OR expires_at > ?", (self.clock(),)
+        ).fetchone()[0]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**super().snapshot(), "path": self.path}
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class RedisError(StateBackendError):
+    """Error reply from a Redis-protocol server"""
+
+
+def _command(*args) -> bytes:
+    """RESP encoding of one command"""
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if not isinstance(arg, bytes):
+            arg = str(arg).encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(parts)
+
+
+class _Connection:
+    """One socket to the server; replies are read in the order commands were sent"""
+
+    def __init__(self, host: str, port: int, timeout: float):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile("rb")
+
+    def _reply(self) -> Any:
+        line = self.reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("Connection closed by the state server")
+        kind, body = line[:1], line[1:-2]
+        if kind == b"+":
+            return body.decode()
+        if kind == b"-":
+            return RedisError(body.decode())
+        if kind == b":":
+            return int(body)
+        if kind == b"$":
+            length = int(body)
+            if length < 0:
+                return None
+            data = self.reader.read(length + 2)
+            if len(data) != length + 2:
+                raise ConnectionError("Connection closed by the state server")
+            return data[:-2]
+        if kind == b"*":
+            length = int(body)
+            return None if length < 0 else [self._reply() for _ in range(length)]
+        raise ConnectionError(f"Unexpected reply from the state server: {line[:40]!r}")
+
+    def pipeline(self, commands: List[tuple]) -> List[Any]:
+        """Send every command in one write, then read every reply"""
+        self.sock.sendall(b"".join(_command(*command) for command in commands))
+        return [self._reply() for _ in commands]
+
+    def close(self) -> None:
+        try:
+            self.reader.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class RedisBackend(StateBackend):
+    """Backend on any Redis-protocol server, speaking RESP over pooled sockets"""
+
+    name = "redis"
+
+    def __init__(self, url: str = "redis://127.0.0.1:6379/0", prefix: Optional[str] = None,
+                 timeout: float = 2.0, pool_size: int = 8):
+        """
+        Args:
+            url: redis://[:password@]host:port/db
+            prefix: Prepended to every key (SHARED_STATE_PREFIX, default "estatewise:")
+            timeout: Connect and read timeout in seconds
+            pool_size: Idle connections kept for reuse
+        """
+        super().__init__()
+        parts = urlsplit(url)
+        if parts.scheme != "redis":
+            raise ValueError(f"Unsupported state URL scheme: {parts.scheme}")
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 6379
+        self.password = unquote(parts.password) if parts.password else None
+        self.username = unquote(parts.username) if parts.username else None
+        self.db = int(parts.path.strip("/") or 0)
+        self.prefix = prefix if prefix is not None else os.getenv("SHARED_STATE_PREFIX", "estatewise:")
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.round_trips = 0
+        self._pool: List[_Connection] = []
+        self._pool_lock = threading.Lock()
+
+    def _connect(self) -> _Connection:
+        conn = _Connection(self.host, self.port, self.timeout)
+        setup = []
+        if self.password:
+            setup.append(("AUTH", self.username, self.password) if self.username else ("AUTH", self.password))
+        if self.db:
+            setup.append(("SELECT", self.db))
+        for reply in conn.pipeline(setup) if setup else ():
+            if isinstance(reply, RedisError):
+                conn.close()
+                raise reply
+        return conn
+
+    def pipeline(self, commands: List[tuple]) -> List[Any]:
+        """Run commands in one round trip; error replies are raised after every reply is read"""
+        if not commands:
+            return []
+        with self._pool_lock:
+            conn = self._pool.pop() if self._pool else None
+        try:
+            if conn is None:
+                conn = self._connect()
+            replies = conn.pipeline(commands)
+        except (OSError, ConnectionError) as e:
+            if conn is not None:
+                conn.close()
+            raise StateBackendError(f"Redis state backend at {self.host}:{self.port}: {e}") from e
+        self.round_trips += 1
+        with self._pool_lock:
+            if len(self._pool) < self.pool_size:
+                self._pool.append(conn)
+                conn = None
+        if conn is not None:
+            conn.close()
+        for reply in replies:
+            if isinstance(reply, RedisError):
+                raise reply
+        return replies
+
+    def _get_many(self, keys: List[str]) -> Dict[str, bytes]:
+        replies = self.pipeline([("MGET", *(self.prefix + key for key in chunk)) for chunk in _chunks(keys)])
+        values = [value for reply in replies for value in reply]
+        return {key: raw for key, raw in zip(keys, values) if raw is not None}
+
+    def _set_many(self, items: Dict[str, bytes], ttl: Optional[float]) -> None:
+        if ttl is None:
+            pairs = [(self.prefix + key, raw) for key, raw in items.items()]
+            self.pipeline([("MSET", *(part for pair in chunk for part in pair)) for chunk in _chunks(pairs)])
+        else:
+            ms = max(1, int(ttl * 1000))
+            self.pipeline([("SET", self.prefix + key, raw, "PX", ms) for key, raw in items.items()])
+
+    def _delete_many(self, keys: List[str]) -> int:
+        return sum(self.pipeline([("DEL", *(self.prefix + key for key in chunk)) for chunk in _chunks(keys)]))
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        name = self.prefix + key
+        commands = [("SET", name, 0, "PX", max(1, int(ttl * 1000)), "NX")] if ttl is not None else []
+        value = self.pipeline(commands + [("INCRBY", name, amount)])[-1]
+        self.stats["writes"] += 1
+        return value
+
+    def _scan(self) -> Iterable[bytes]:
+        cursor = b"0"
+        while True:
+            cursor, keys = self.pipeline([("SCAN", cursor, "MATCH", self.prefix.replace("*", r"\*") + "*",
+                                           "COUNT", 1000)])[0]
+            yield from keys
+            if cursor in (b"0", "0"):
+                return
+
+    def clear(self) -> None:
+        """Delete every key under this backend's prefix (not the whole database)"""
+        keys = list(self._scan())
+        if keys:
+            self.pipeline([("DEL", *chunk) for chunk in _chunks(keys)])
+
+    def ping(self) -> float:
+        """Round-trip time in milliseconds"""
+        started = time.perf_counter()
+        self.pipeline([("PING",)])
+        return (time.perf_counter() - started) * 1000
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**super().snapshot(), "server": f"{self.host}:{self.port}/{self.db}", "round_trips": self.round_trips}
+
+    def close(self) -> None:
+        with self._pool_lock:
+            pool, self._pool = self._pool, []
+        for conn in pool:
+            conn.close()
+
+
+def open_backend(url: Optional[str] = None) -> StateBackend:
+    """Backend for a state URL (memory://, sqlite:///path or redis://host:port/db)"""
+    url = url or "memory://"
+    scheme = url.split("://", 1)[0]
+    if scheme == "memory":
+        return MemoryBackend()
+    if scheme == "sqlite":
+        path = url.split("://", 1)[1]
+        if not path:
+            raise ValueError("sqlite:// state URL needs a file path, e.g. sqlite:////dev/shm/estatewise.db")
+        return SQLiteBackend(path)
+    if scheme == "redis":
+        return RedisBackend(url)
+    raise ValueError(f"Unsupported state URL: {url}")
+
+
+_backend: Optional[StateBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_shared_state() -> StateBackend:
+    """The process-wide backend (SHARED_STATE_URL, or in memory)"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = open_backend(os.getenv("SHARED_STATE_URL") or None)
+    return _backend
+
+
+def peek_shared_state() -> Optional[StateBackend]:
+    """The process-wide backend if it has been built, without building it"""
+    return _backend
+
+
+def shared_state_metrics() -> Dict[str, Any]:
+    """Backend counters for /metrics (without connecting if nothing has used it yet)"""
+    backend = peek_shared_state()
+    return backend.snapshot() if backend is not None else {"backend": None}
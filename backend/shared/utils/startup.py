@@ -0,0 +1,155 @@
+"""
+Deferred startup for EstateWise MCP servers
+
+Servers register their expensive resources (tool classes, LLM clients,
+property tables) here instead of building them at import time. Once the
+HTTP port is accepting connections the resources are built on a background
+thread; a request that arrives first builds what it needs on demand.
+Warm-up state feeds the readiness probe served by health.py, so an
+orchestrator routes traffic only once warm-up has finished.
+
+Keep this module's imports light: it is loaded before fastmcp.
+"""
+import time
+import socket
+import threading
+from typing import Dict, Any, Callable, Optional, List
+
+# Monotonic reference taken as early in the process as this module is imported
+PROCESS_STARTED = time.monotonic()
+
+
+class Lazy:
+    """Thread-safe, build-once holder for an expensive resource"""
+
+    def __init__(self, name: str, factory: Callable[[], Any]):
+        self.name = name
+        self._factory = factory
+        self._value = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def get(self) -> Any:
+        """Return the resource, building it on first call.
+
+        A failed build is not cached, so the next caller retries it.
+        """
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._value = self._factory()
+                    self._loaded = True
+        return self._value
+
+
+class _WarmupTask:
+    __slots__ = ("name", "fn", "required", "state", "error", "duration_ms")
+
+    def __init__(self, name: str, fn: Callable[[], Any], required: bool):
+        self.name = name
+        self.fn = fn
+        self.required = required
+        self.state = "pending"
+        self.error: Optional[str] = None
+        self.duration_ms: Optional[float] = None
+
+
+class Startup:
+    """Warm-up tasks and liveness/readiness state for one server"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._tasks: List[_WarmupTask] = []
+        self._port_open_ms: Optional[float] = None
+        self._ready_ms: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def resource(self, name: str, factory: Callable[[], Any], required: bool = True) -> Lazy:
+        """Register a lazily built resource that is also warmed in the background"""
+        lazy = Lazy(name, factory)
+        self.warm(name, lazy.get, required=required)
+        return lazy
+
+    def warm(self, name: str, fn: Callable[[], Any], required: bool = False) -> None:
+        """Register a warm-up step; tasks run in registration order.
+
+        Args:
+            name: Name reported by /readyz
+            fn: Callable run on the warm-up thread
+            required: Whether the server is not ready until this succeeds
+                (optional steps such as LLM clients may fail without blocking)
+        """
+        self._tasks.append(_WarmupTask(name, fn, required))
+
+    @property
+    def live(self) -> bool:
+        return True
+
+    @property
+    def ready(self) -> bool:
+        return all(t.state == "done" for t in self._tasks if t.required) and all(
+            t.state in ("done", "failed") for t in self._tasks
+        )
+
+    def begin(self, port: int, host: str = "127.0.0.1", timeout: float = 60.0) -> None:
+        """Run the warm-up tasks on a background thread once the port accepts connections"""
+        self._thread = threading.Thread(
+            target=self._run, args=(host, port, timeout), name=f"{self.name}-warmup", daemon=True
+        )
+        self._thread.start()
+
+    def run_now(self) -> None:
+        """Run the warm-up tasks synchronously (tests, scripts)"""
+        self._warm_all()
+
+    def _run(self, host: str, port: int, timeout: float) -> None:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection((host, port), timeout=0.5).close()
+                break
+            except OSError:
+                time.sleep(0.01)
+        self._port_open_ms = (time.monotonic() - PROCESS_STARTED) * 1000
+        self._warm_all()
+
+    def _warm_all(self) -> None:
+        for task in self._tasks:
+            task.state = "running"
+            started = time.perf_counter()
+            try:
+                task.fn()
+                task.state = "done"
+            except Exception as e:
+                task.state = "failed"
+                task.error = f"{type(e).__name__}: {e}"
+            task.duration_ms = round((time.perf_counter() - started) * 1000, 1)
+        if self.ready:
+            self._ready_ms = (time.monotonic() - PROCESS_STARTED) * 1000
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "server": self.name,
+            "live": self.live,
+            "ready": self.ready,
+            "uptime_s": round(time.monotonic() - PROCESS_STARTED, 3),
+            "port_open_ms": _round(self._port_open_ms),
+            "ready_ms": _round(self._ready_ms),
+            "warmup": {
+                t.name: {
+                    "state": t.state,
+                    "required": t.required,
+                    "duration_ms": t.duration_ms,
+                    **({"error": t.error} if t.error else {}),
+                }
+                for t in self._tasks
+            },
+        }
+
+
+def _round(ms: Optional[float]) -> Optional[float]:
+    return round(ms, 1) if ms is not None else None
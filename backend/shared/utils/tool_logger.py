@@ -1,14 +1,34 @@
 import os
 import sys
+import time
+import inspect
 import functools
 import datetime
 import traceback
 
+import call_log
+from call_log import open_call_log, scrub_arguments
+from trace_context import log_fields
+
+
+def _bound_arguments(func, args, kwargs) -> dict:
+    """Call arguments by parameter name, without self, as a replay sends them"""
+    try:
+        bound = inspect.signature(func).bind(*args, **kwargs)
+    except TypeError:
+        return {"args": list(args), **kwargs}
+    arguments = dict(bound.arguments)
+    arguments.pop("self", None)
+    return arguments
+
 
 def log_tool_call(func):
     """
     Decorator to log tool calls with UTC timestamp, tool name, and arguments.
-    Logs to console and to logs.txt in the MCP server's root directory.
+    Prints a line to the console and appends a structured call record (see
+    call_log.py) to logs.txt in the MCP server's root directory; both redact
+    arguments the same way. Calls that came through CallLogMiddleware are
+    already recorded there, so only the console line is written for them.
     """
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
@@ -16,15 +36,14 @@ def log_tool_call(func):
         timestamp = datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')
         # Tool name
         tool_name = func.__name__
-        # Format args and kwargs for logging
-        arg_strs = []
-        if args:
-            arg_strs += [repr(a) for a in args]
-        if kwargs:
-            arg_strs += [f"{k}={v!r}" for k, v in kwargs.items()]
-        arg_str = ', '.join(arg_strs)
-        # Log line
-        log_line = f"[{timestamp}] {tool_name}({arg_str})"
+        # Format arguments for logging, with personal and bulky values redacted as in the call log
+        arguments = _bound_arguments(func, args, kwargs)
+        shown, _ = scrub_arguments(arguments, os.getenv("CALL_LOG_ARGUMENTS", "redacted").lower(),
+                                   int(os.getenv("CALL_LOG_MAX_ARG_CHARS", "256")))
+        arg_str = ', '.join(f"{k}={v!r}" for k, v in shown.items())
+        # Log line, with the trace and span ids of the call when it is traced
+        trace_ids = log_fields()
+        log_line = f"[{timestamp}] {tool_name}({arg_str}){trace_ids}"
         # Print to console
         print(log_line)
         # Determine logs.txt path (in the MCP server's directory)
@@ -35,24 +54,24 @@ def log_tool_call(func):
             mcp_dir = os.path.dirname(os.path.dirname(module_file))
             log_path = os.path.join(mcp_dir, 'logs.txt')
         except Exception:
-            log_path = 'logs.txt'  # fallback
-        # Write to logs.txt
-        try:
-            with open(log_path, 'a') as f:
-                f.write(log_line + '\n')
-        except Exception as e:
-            print(f"[log_tool_call] Failed to write log: {e}")
+            mcp_dir, log_path = None, 'logs.txt'  # fallback
+        log = None if call_log.recording() else open_call_log(os.path.basename(mcp_dir or "") or None, log_path)
+        started = time.time()
+        began = time.perf_counter()
         # Call the function, log exceptions if any
         try:
-            return func(*args, **kwargs)
+            result = func(*args, **kwargs)
         except Exception as exc:
             tb = traceback.format_exc()
-            error_line = f"[{timestamp}] {tool_name} EXCEPTION: {exc}\n{tb}"
+            error_line = f"[{timestamp}] {tool_name} EXCEPTION: {exc}{trace_ids}\n{tb}"
             print(error_line)
-            try:
-                with open(log_path, 'a') as f:
-                    f.write(error_line + '\n')
-            except Exception as e:
-                print(f"[log_tool_call] Failed to write exception log: {e}")
+            if log is not None:
+                record = log.make_record(tool_name, arguments, started, time.perf_counter() - began,
+                                         error=f"{type(exc).__name__}: {exc}")
+                record["traceback"] = tb
+                log.write(record)
             raise
-    return wrapper 
\ No newline at end of file
+        if log is not None:
+            log.record(tool_name, arguments, started, time.perf_counter() - began, output=result)
+        return result
+    return wrapper
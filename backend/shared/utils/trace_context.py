@@ -0,0 +1,443 @@
+"""
+Distributed tracing for EstateWise MCP servers (W3C trace context + OTLP)
+
+One dashboard action fans out to several MCP servers and from there to the
+LLM providers. Each hop carries a W3C ``traceparent`` header
+(``00-<trace id>-<span id>-<flags>``), so every span recorded along the way
+shares the trace id of the action that started it.
+
+The tracing middleware (tracing.py) opens a server span for each tool call,
+continuing the caller's trace when one is passed in. The span travels in a
+contextvar. Code inside the call adds child spans without the span being
+passed around:
+
+    with trace_context.span("rank_offers", {"offers.count": len(offers)}):
+        ...
+
+    @trace_context.traced("record_store.put_many", {"db.system": "jsonl"})
+    def put_many(self, records): ...
+
+Outside a traced call ``span`` returns a shared no-op and costs one
+contextvar lookup. ``inject`` adds the current ``traceparent`` to outgoing
+HTTP headers, and ``log_fields`` gives the ids for log lines.
+
+Finished spans that are sampled go to a background exporter. It posts them
+in batches as OTLP/HTTP JSON to ``<endpoint>/v1/traces``, the format any
+OpenTelemetry collector accepts. ``benchmarks/stub_otlp.py`` is a local
+stand-in. With no endpoint configured, spans still carry ids (for log lines
+and propagation) but are not kept.
+
+Environment:
+    OTEL_EXPORTER_OTLP_ENDPOINT  Collector base URL, e.g. http://127.0.0.1:4318 (unset: no export)
+    OTEL_SERVICE_NAME            service.name resource attribute (default: the server's name)
+    TRACE_SAMPLE_RATE            Fraction of new traces that are exported (default 1.0); a
+                                 caller's sampled flag is always honoured
+
+Keep this module's imports light: the LLM clients and storage modules load it.
+"""
+import os
+import json
+import time
+import atexit
+import random
+import inspect
+import functools
+import threading
+from collections import deque
+from contextvars import ContextVar
+from typing import Dict, Any, List, Optional
+
+KINDS = {"internal": 1, "server": 2, "client": 3}
+
+_random = random.Random()
+
+
+def _new_id(bits: int) -> str:
+    value = 0
+    while not value:
+        value = _random.getrandbits(bits)
+    return format(value, "0%dx" % (bits // 4))
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[tuple]:
+    """(trace_id, parent span id, sampled) from a traceparent header, or None if it is unusable"""
+    if not header:
+        return None
+    parts = header.strip().lower().split("-")
+    if len(parts) < 4 or len(parts[0]) != 2 or parts[0] == "ff":
+        return None
+    version, trace_id, span_id, flags = parts[:4]
+    # Version 00 has exactly four fields; later versions may append more
+    if version == "00" and len(parts) != 4:
+        return None
+    if len(trace_id) != 32 or len(span_id) != 16 or len(flags) != 2:
+        return None
+    try:
+        int(version, 16)
+        sampled = int(flags, 16) & 1
+        if not int(trace_id, 16) or not int(span_id, 16):
+            return None
+    except ValueError:
+        return None
+    return trace_id, span_id, bool(sampled)
+
+
+class Span:
+    """One timed operation in a trace"""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "sampled", "tracestate",
+                 "attributes", "start_ns", "end_ns", "error", "events")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], sampled: bool,
+                 kind: str = "internal", attributes: Optional[Dict[str, Any]] = None,
+                 tracestate: Optional[str] = None):
+        self.trace_id = trace_id
+        self.span_id = _new_id(64)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.sampled = sampled
+        self.tracestate = tracestate
+        self.attributes = dict(attributes) if attributes else {}
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.error: Optional[str] = None
+        self.events: List[Dict[str, Any]] = []
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        return (self.end_ns - self.start_ns) / 1e6 if self.end_ns is not None else None
+
+    def set(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def record_error(self, exc: BaseException) -> None:
+        self.error = f"{type(exc).__name__}: {exc}"
+        self.events.append({
+            "name": "exception",
+            "time_ns": time.time_ns(),
+            "attributes": {"exception.type": type(exc).__name__, "exception.message": str(exc)},
+        })
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": KINDS.get(self.kind, 1),
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or self.start_ns),
+            "attributes": _otlp_attributes(self.attributes),
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 0},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.tracestate:
+            span["traceState"] = self.tracestate
+        if self.events:
+            span["events"] = [
+                {"name": e["name"], "timeUnixNano": str(e["time_ns"]), "attributes": _otlp_attributes(e["attributes"])}
+                for e in self.events
+            ]
+        return span
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [_otlp_value(v) for v in value]}}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+
+_current: ContextVar[Optional[Span]] = ContextVar("trace_span", default=None)
+
+
+class _Scope:
+    """Makes a span current for a block, ends it and hands it to the exporter"""
+
+    __slots__ = ("span", "token")
+
+    def __init__(self, span: Span):
+        self.span = span
+
+    def __enter__(self) -> Span:
+        self.token = _current.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        span = self.span
+        span.end_ns = time.time_ns()
+        if exc is not None and span.error is None:
+            span.record_error(exc)
+        _current.reset(self.token)
+        if span.sampled:
+            _finished(span)
+
+
+class _NoSpan:
+    """Stands in for a span outside a traced call"""
+
+    trace_id = span_id = parent_id = traceparent = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def set(self, key: str, value: Any) -> None:
+        pass
+
+    def record_error(self, exc: BaseException) -> None:
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+def current() -> Optional[Span]:
+    """The innermost span of the call being served, if any"""
+    return _current.get()
+
+
+def span(name: str, attributes: Optional[Dict[str, Any]] = None, kind: str = "internal"):
+    """Context manager recording a child of the current span (a no-op outside a traced call)"""
+    parent = _current.get()
+    if parent is None:
+        return _NO_SPAN
+    return _Scope(Span(name, parent.trace_id, parent.span_id, parent.sampled, kind, attributes, parent.tracestate))
+
+
+def traced(name: str, attributes: Optional[Dict[str, Any]] = None):
+    """Decorator recording each call of a function as a child span (storage methods use it)"""
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(name, attributes):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return fn(*args, **kwargs)
+            with span(name, attributes):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def start_trace(name: str, traceparent: Optional[str] = None, tracestate: Optional[str] = None,
+                attributes: Optional[Dict[str, Any]] = None, kind: str = "server"):
+    """Context manager for the root span of this process's part of a trace.
+
+    Continues the trace in ``traceparent`` when it is valid, otherwise starts
+    a new one (sampled at TRACE_SAMPLE_RATE).
+    """
+    parent = parse_traceparent(traceparent)
+    if parent is None:
+        trace_id, parent_id, tracestate = _new_id(128), None, None
+        sampled = _random.random() < _sample_rate()
+    else:
+        trace_id, parent_id, sampled = parent
+    return _Scope(Span(name, trace_id, parent_id, sampled, kind, attributes, tracestate))
+
+
+def _sample_rate() -> float:
+    try:
+        return min(1.0, max(0.0, float(os.getenv("TRACE_SAMPLE_RATE", 1.0))))
+    except ValueError:
+        return 1.0
+
+
+def inject(headers: Dict[str, str]) -> Dict[str, str]:
+    """Add the current span's traceparent (and tracestate) to outgoing HTTP headers"""
+    current_span = _current.get()
+    if current_span is not None:
+        headers["traceparent"] = current_span.traceparent
+        if current_span.tracestate:
+            headers["tracestate"] = current_span.tracestate
+    return headers
+
+
+def log_fields() -> str:
+    """`` trace_id=… span_id=…`` for a log line, or an empty string outside a traced call"""
+    current_span = _current.get()
+    if current_span is None:
+        return ""
+    return f" trace_id={current_span.trace_id} span_id={current_span.span_id}"
+
+
+class OTLPExporter:
+    """Batches finished spans and posts them to a collector as OTLP/HTTP JSON from a background thread"""
+
+    def __init__(self,
+                 endpoint: str,
+                 service_name: str = "estatewise-mcp",
+                 batch_size: int = 512,
+                 interval: float = 1.0,
+                 max_queue: int = 8192,
+                 timeout: float = 5.0):
+        """
+        Args:
+            endpoint: Collector base URL; spans go to ``<endpoint>/v1/traces``
+            service_name: service.name resource attribute
+            batch_size: Spans per request; a full batch is sent straight away
+            interval: Seconds between sends of a partial batch
+            max_queue: Spans held while the collector is slow; newer ones are
+                dropped (and counted) past this, so tracing never backs up the tools
+            timeout: Seconds to wait for the collector
+        """
+        endpoint = endpoint.rstrip("/")
+        self.url = endpoint if endpoint.endswith("/v1/traces") else endpoint + "/v1/traces"
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.stats = {"queued": 0, "exported": 0, "dropped": 0, "failed": 0, "batches": 0}
+        self._queue: deque = deque()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="otlp-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            if len(self._queue) >= self.max_queue:
+                self.stats["dropped"] += 1
+                return
+            self._queue.append(span)
+            self.stats["queued"] += 1
+            self._idle.clear()
+            full = len(self._queue) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def _take(self) -> List[Span]:
+        with self._lock:
+            batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+            if not batch:
+                self._idle.set()
+            return batch
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            batch = self._take()
+            while batch:
+                self._send(batch)
+                batch = self._take()
+            if self._closed:
+                return
+
+    def payload(self, spans: List[Span]) -> Dict[str, Any]:
+        return {"resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes({"service.name": self.service_name})},
+            "scopeSpans": [{"scope": {"name": "estatewise.trace_context"}, "spans": [s.to_otlp() for s in spans]}],
+        }]}
+
+    def _send(self, spans: List[Span]) -> None:
+        import urllib.request  # only once there is something to send; it pulls in ssl
+
+        body = json.dumps(self.payload(spans), separators=(",", ":")).encode()
+        request = urllib.request.Request(self.url, data=body, method="POST",
+                                         headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+        except Exception:
+            # The collector is best-effort: a lost batch must not fail a tool call
+            self.stats["failed"] += len(spans)
+            return
+        self.stats["exported"] += len(spans)
+        self.stats["batches"] += 1
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Send everything queued; returns False if the collector did not keep up within timeout"""
+        self._wake.set()
+        return self._idle.wait(timeout)
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        self._closed = True
+        self.flush(timeout)
+        self._wake.set()
+        self._thread.join(timeout)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"endpoint": self.url, "service": self.service_name, "pending": len(self._queue), **self.stats}
+
+
+_exporter: Optional[OTLPExporter] = None
+_configured = False
+_config_lock = threading.Lock()
+_unexported = 0
+
+
+def configure(exporter: Optional[OTLPExporter] = None, service_name: Optional[str] = None) -> Optional[OTLPExporter]:
+    """Install an exporter, or build one from OTEL_EXPORTER_OTLP_ENDPOINT; returns the one in use.
+
+    Args:
+        exporter: Exporter to use as-is
+        service_name: Name to report when OTEL_SERVICE_NAME is unset (each
+            server passes its own)
+
+    Any previous exporter is flushed and stopped.
+    """
+    global _exporter, _configured
+    with _config_lock:
+        previous = _exporter
+        if exporter is None:
+            endpoint = os.getenv("OTEL_EXPORTER_OTLP_TRACES_ENDPOINT") or os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT")
+            if endpoint:
+                exporter = OTLPExporter(endpoint, os.getenv("OTEL_SERVICE_NAME") or service_name or "estatewise-mcp")
+        _exporter, _configured = exporter, True
+    if previous is not None and previous is not exporter:
+        previous.shutdown()
+    return exporter
+
+
+def exporter() -> Optional[OTLPExporter]:
+    if not _configured:
+        configure()
+    return _exporter
+
+
+def _finished(span: Span) -> None:
+    global _unexported
+    target = _exporter if _configured else exporter()
+    if target is None:
+        _unexported += 1
+        return
+    target.export(span)
+
+
+def metrics_snapshot() -> Dict[str, Any]:
+    """Exporter counters, for the /metrics endpoint"""
+    if _exporter is None:
+        return {"exporter": None, "unexported_spans": _unexported}
+    return {"exporter": _exporter.snapshot()}
+
+
+@atexit.register
+def _flush_at_exit() -> None:
+    if _exporter is not None:
+        _exporter.shutdown(timeout=2.0)
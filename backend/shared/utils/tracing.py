@@ -0,0 +1,60 @@
+"""
+Tracing middleware for EstateWise MCP servers
+
+Opens a server span (``tools/call <tool>``) around every tool call and makes
+it current for the call, so spans opened inside the tool, ``traceparent``
+headers on LLM requests and ``log_tool_call`` lines all carry its trace id.
+See trace_context.py for spans, propagation and export.
+
+The caller's trace is continued from, in order:
+
+- ``_meta.traceparent`` on the MCP request (the MCP convention, which works
+  on every transport)
+- the ``traceparent`` HTTP header (``tracestate`` is passed along too)
+
+With neither, the call starts a new trace. Servers call
+``trace_context.configure(service_name=...)`` at startup to name themselves
+and start the exporter.
+"""
+from fastmcp.server.middleware import Middleware
+
+import trace_context
+
+
+def _meta_traceparent(context) -> tuple:
+    meta = getattr(context.message, "meta", None)
+    if meta is None and context.fastmcp_context is not None:
+        try:
+            meta = context.fastmcp_context.request_context.meta
+        except (AttributeError, RuntimeError, LookupError):
+            meta = None
+    if meta is None:
+        return None, None
+    if not isinstance(meta, dict):
+        meta = meta.model_dump() if hasattr(meta, "model_dump") else vars(meta)
+    return meta.get("traceparent"), meta.get("tracestate")
+
+
+def _header_traceparent() -> tuple:
+    try:
+        from fastmcp.server.dependencies import get_http_request
+        headers = get_http_request().headers
+    except RuntimeError:
+        return None, None
+    return headers.get("traceparent"), headers.get("tracestate")
+
+
+class TracingMiddleware(Middleware):
+    """Run each tool call under a server span that continues the caller's trace"""
+
+    async def on_call_tool(self, context, call_next):
+        name = context.message.name
+        traceparent, tracestate = _meta_traceparent(context)
+        if trace_context.parse_traceparent(traceparent) is None:
+            traceparent, tracestate = _header_traceparent()
+        attributes = {"mcp.method.name": "tools/call", "gen_ai.tool.name": name}
+        with trace_context.start_trace(f"tools/call {name}", traceparent, tracestate, attributes) as span:
+            result = await call_next(context)
+            if getattr(result, "is_error", False) or getattr(result, "isError", False):
+                span.error = "tool returned an error"
+            return result
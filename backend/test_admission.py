@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Test script for admission control (per-tool limits, client quotas, overload)
+"""
+import sys
+import time
+import asyncio
+from pathlib import Path
+
+# Add shared utils to path
+sys.path.append(str(Path(__file__).parent / "shared" / "utils"))
+
+from fastmcp import FastMCP, Client
+from admission import AdmissionControl, AdmissionRejected, ToolLimit, TokenBucket, _ToolGate
+
+
+def overloaded_server(admission: AdmissionControl):
+    server = FastMCP("TestMCP")
+    server.add_middleware(admission)
+    running = {"now": 0, "peak": 0}
+
+    @server.tool
+    async def slow() -> str:
+        running["now"] += 1
+        running["peak"] = max(running["peak"], running["now"])
+        await asyncio.sleep(0.2)
+        running["now"] -= 1
+        return "done"
+
+    @server.tool
+    def fast() -> str:
+        return "done"
+
+    return server, running
+
+
+def test_concurrency_limit_and_queue_full():
+    admission = AdmissionControl({"slow": ToolLimit(concurrency=2, queue=3, max_wait=5.0)}, client_rate=0)
+    server, running = overloaded_server(admission)
+
+    async def scenario():
+        async with Client(server) as client:
+            calls = [client.call_tool("slow", {}, raise_on_error=False) for _ in range(10)]
+            return await asyncio.gather(*calls)
+
+    started = time.perf_counter()
+    results = asyncio.run(scenario())
+    elapsed = time.perf_counter() - started
+    rejected = [r for r in results if r.is_error]
+    stats = admission.snapshot()["tools"]["slow"]
+
+    # 2 run, 3 wait, the other 5 are refused at once
+    assert running["peak"] == 2
+    assert len(rejected) == 5 and all("429" in r.content[0].text for r in rejected)
+    assert stats["admitted"] == 5 and stats["queued"] == 3 and stats["rejected_queue_full"] == 5
+    assert stats["active"] == 0 and stats["waiting"] == 0
+    assert elapsed < 1.5, elapsed
+    print(f"✅ Synthetic overload: 5/10 admitted at concurrency 2, 5 rejected with 429 ({elapsed:.2f}s)")
+
+
+def test_queued_calls_time_out_at_deadline():
+    admission = AdmissionControl({"slow": ToolLimit(concurrency=1, queue=10, max_wait=0.05)}, client_rate=0)
+    server, _ = overloaded_server(admission)
+
+    async def scenario():
+        async with Client(server) as client:
+            calls = [client.call_tool("slow", {}, raise_on_error=False) for _ in range(4)]
+            return await asyncio.gather(*calls)
+
+    results = asyncio.run(scenario())
+    stats = admission.snapshot()["tools"]["slow"]
+    assert sum(not r.is_error for r in results) == 1
+    assert stats["rejected_deadline"] == 3 and stats["waiting"] == 0 and stats["active"] == 0
+    print("✅ Queued calls give up at their wait deadline")
+
+
+def test_fifo_handoff():
+    gate = _ToolGate(ToolLimit(concurrency=1, queue=10, max_wait=5.0))
+    order = []
+
+    async def worker(i):
+        await gate.acquire(time.monotonic() + 5)
+        order.append(i)
+        await asyncio.sleep(0.01)
+        gate.release()
+
+    async def scenario():
+        tasks = []
+        for i in range(5):
+            tasks.append(asyncio.create_task(worker(i)))
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
+    assert order == [0, 1, 2, 3, 4]
+    assert gate.active == 0
+    print("✅ Freed slots go to the oldest waiter")
+
+
+def test_client_token_bucket():
+    bucket = TokenBucket(rate=10, burst=3)
+    assert all(bucket.take(1) is None for _ in range(3))
+    retry_after = bucket.take(1)
+    assert retry_after is not None and 0 < retry_after <= 0.1
+
+    admission = AdmissionControl({"slow": ToolLimit(cost=2.0)}, client_rate=1, client_burst=4)
+    admission.check_quota("alice", "slow")
+    admission.check_quota("alice", "slow")
+    try:
+        admission.check_quota("alice", "slow")
+        assert False, "third expensive call should be rate limited"
+    except AdmissionRejected as e:
+        rejection = e
+    assert rejection.reason == "rate_limited" and 1.0 < rejection.retry_after <= 2.0
+    # Quotas are per client
+    admission.check_quota("bob", "slow")
+    snapshot = admission.snapshot()
+    assert snapshot["top_rejected_clients"] == {"alice": 1}
+    assert snapshot["tools"]["slow"]["rejected_rate_limited"] == 1
+    print(f"✅ Client over quota rejected with retry after {rejection.retry_after:.2f}s")
+
+
+def test_quota_applies_through_middleware():
+    # In-memory sessions have no stable identity, so name the client explicitly
+    admission = AdmissionControl(client_rate=0.01, client_burst=5, key=lambda context: "tester")
+    server, _ = overloaded_server(admission)
+
+    async def scenario():
+        async with Client(server) as client:
+            return [await client.call_tool("fast", {}, raise_on_error=False) for _ in range(8)]
+
+    results = asyncio.run(scenario())
+    assert [r.is_error for r in results] == [False] * 5 + [True] * 3
+    assert "rate_limited" in results[-1].content[0].text
+    print("✅ Burst of 5 served, later calls from the same client refused")
+
+
+def test_refused_calls_do_not_spend_quota():
+    admission = AdmissionControl({"slow": ToolLimit(concurrency=1, queue=0)},
+                                 client_rate=0.001, client_burst=3, key=lambda context: "tester")
+    server, _ = overloaded_server(admission)
+
+    async def scenario():
+        async with Client(server) as client:
+            burst = await asyncio.gather(*[client.call_tool("slow", {}, raise_on_error=False) for _ in range(3)])
+            later = [await client.call_tool("fast", {}, raise_on_error=False) for _ in range(2)]
+            return burst, later
+
+    burst, later = asyncio.run(scenario())
+    assert sum(r.is_error for r in burst) == 2
+    assert all("queue_full" in r.content[0].text for r in burst if r.is_error)
+    # Only the admitted call was charged, so two tokens are left
+    assert not any(r.is_error for r in later)
+    print("✅ Calls refused for a full queue are refunded to the client's quota")
+
+
+def test_client_id_header_can_be_distrusted():
+    import os
+    import httpx
+    from admission import client_key
+
+    seen = []
+    server = FastMCP("TestMCP")
+    server.add_middleware(AdmissionControl(client_rate=0, key=lambda context: seen.append(client_key(context)) or "x"))
+
+    @server.tool
+    def fast() -> str:
+        return "done"
+
+    async def call():
+        from fastmcp.client.transports import StreamableHttpTransport
+        app = server.http_app()
+        async with app.router.lifespan_context(app):
+            transport = StreamableHttpTransport(
+                "http://test/mcp", headers={"X-Client-Id": "alice"},
+                httpx_client_factory=lambda **kw: httpx.AsyncClient(transport=httpx.ASGITransport(app=app), **kw))
+            async with Client(transport) as client:
+                await client.call_tool("fast", {})
+
+    asyncio.run(call())
+    os.environ["ADMISSION_TRUST_CLIENT_ID"] = "0"
+    try:
+        asyncio.run(call())
+    finally:
+        del os.environ["ADMISSION_TRUST_CLIENT_ID"]
+    assert seen[0] == "alice" and seen[1] != "alice", seen
+    print(f"✅ X-Client-Id honored by default, ignored with ADMISSION_TRUST_CLIENT_ID=0 ({seen[1]})")
+
+
+if __name__ == "__main__":
+    test_concurrency_limit_and_queue_full()
+    test_queued_calls_time_out_at_deadline()
+    test_fifo_handoff()
+    test_client_token_bucket()
+    test_quota_applies_through_middleware()
+    test_refused_calls_do_not_spend_quota()
+    test_client_id_header_can_be_distrusted()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Test script for the content-addressed artifact store and its sendfile HTTP server
+"""
+import os
+import sys
+import base64
+import hashlib
+import asyncio
+import tempfile
+from pathlib import Path
+
+import httpx
+
+# Add shared utils and the Paperwork tools to path
+sys.path.append(str(Path(__file__).parent / "shared" / "utils"))
+sys.path.append(str(Path(__file__).parent / "mcp-servers" / "paperwork" / "tools"))
+
+from artifact_store import ArtifactStore, ArtifactServer, parse_range, CHUNK_SIZE
+
+
+def test_streaming_writes_deduplicate_by_content():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ArtifactStore(tmp)
+        packet = os.urandom(3 * CHUNK_SIZE + 123)
+        chunks = (packet[i:i + 65536] for i in range(0, len(packet), 65536))
+        first = store.put_stream(chunks, "application/pdf")
+        assert first["digest"] == hashlib.sha256(packet).hexdigest() and not first["deduplicated"]
+        path = os.path.join(tmp, "packet.pdf")
+        with open(path, "wb") as f:
+            f.write(packet)
+        second = store.put_file(path, "text/plain")
+        # Same bytes: nothing new written, and the first content type stands
+        assert second["deduplicated"] and second["content_type"] == "application/pdf"
+        assert store.snapshot()["bytes_deduplicated"] == len(packet) and os.listdir(os.path.join(tmp, "tmp")) == []
+
+        store.link("disclosure/42", first["digest"])
+        assert store.resolve("disclosure/42") == first["digest"] and store.resolve("other") is None
+        with store.view(first["digest"], CHUNK_SIZE, CHUNK_SIZE + 10) as view:
+            assert bytes(view) == packet[CHUNK_SIZE:CHUNK_SIZE + 10]
+        for bad in ("../../etc/passwd", "ABC"):
+            assert bad not in store
+        try:
+            store.link("x", "0" * 64)
+            assert False, "unknown digest"
+        except KeyError:
+            pass
+    print("✅ Streamed writes are content-addressed and identical packets are stored once")
+
+
+def test_range_parsing():
+    assert parse_range(None, 100) is None and parse_range("items=0-1", 100) is None
+    assert parse_range("bytes=0-9", 100) == (0, 9) and parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99) and parse_range("bytes=-500", 100) == (0, 99)
+    assert parse_range("bytes=50-5000", 100) == (50, 99) and parse_range("bytes=0-1,5-6", 100) is None
+    for header in ("bytes=100-", "bytes=9-3", "bytes=abc", "bytes=-0"):
+        try:
+            parse_range(header, 100)
+            assert False, header
+        except ValueError:
+            pass
+    print("✅ Range headers parse to inclusive byte ranges; unsatisfiable ones are rejected")
+
+
+def test_http_full_range_and_conditional_requests():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ArtifactStore(tmp)
+        packet = os.urandom(2_000_000)
+        digest = store.put_bytes(packet, "application/pdf")["digest"]
+        server = ArtifactServer(store).start()
+        try:
+            with httpx.Client() as client:
+                full = client.get(server.url(digest))
+                assert full.status_code == 200 and full.content == packet
+                assert full.headers["etag"] == f'"{digest}"' and full.headers["accept-ranges"] == "bytes"
+                # Same keep-alive connection
+                part = client.get(server.url(digest), headers={"Range": "bytes=1000-1999"})
+                assert part.status_code == 206 and part.content == packet[1000:2000]
+                assert part.headers["content-range"] == f"bytes 1000-1999/{len(packet)}"
+                stale = client.get(server.url(digest), headers={"Range": "bytes=0-9", "If-Range": '"old"'})
+                assert stale.status_code == 200 and len(stale.content) == len(packet)
+                assert client.get(server.url(digest), headers={"Range": "bytes=5000000-"}).status_code == 416
+                assert client.get(server.url(digest), headers={"If-None-Match": f'"{digest}"'}).status_code == 304
+                assert client.head(server.url(digest)).headers["content-length"] == str(len(packet))
+                assert client.get(server.url("f" * 64)).status_code == 404
+                assert client.get(server.base_url + "/artifacts/..%2f..%2fetc%2fpasswd").status_code == 404
+                assert client.post(server.url(digest)).status_code == 405
+            stats = server.snapshot()
+            assert stats["range_requests"] == 1 and stats["not_modified"] == 1 and stats["active"] == 0
+        finally:
+            server.close()
+    print("✅ Artifacts are served whole, by byte range and conditionally over keep-alive HTTP")
+
+
+def test_concurrent_downloads_and_document_tools():
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["ARTIFACT_STORE_DIR"] = tmp
+        try:
+            from document_tools import DocumentTools
+            tools = DocumentTools()
+            packet = os.urandom(8_000_000)
+            with open(os.path.join(tools.artifacts.root, "inbox", "packet_17.pdf"), "wb") as f:
+                f.write(packet)
+            stored = tools.store_document("disc_17", file_name="packet_17.pdf")
+            assert stored["status"] == "success" and stored["data"]["content_type"] == "application/pdf"
+            again = tools.store_document("disc_18", content_base64=base64.b64encode(packet).decode())
+            assert again["data"]["deduplicated"] and again["data"]["digest"] == stored["data"]["digest"]
+            assert tools.store_document("x", file_name="../../etc/passwd")["status"] == "error"
+            assert tools.store_document("x", content_base64="not base64!")["status"] == "error"
+            assert tools.store_document("x")["status"] == "error"
+
+            sent = tools.send_document("disc_17", "buyer@example.com")["data"]
+            assert sent["size"] == len(packet) and sent["download_url"].endswith(stored["data"]["digest"])
+            assert tools.get_document("disc_18")["data"]["size"] == len(packet)
+            assert tools.get_document("missing")["status"] == "error"
+
+            server = ArtifactServer(tools.artifacts).start()
+
+            async def fetch_all():
+                async with httpx.AsyncClient() as client:
+                    responses = await asyncio.gather(*(client.get(server.url(stored["data"]["digest"]))
+                                                       for _ in range(8)))
+                return [r.content for r in responses]
+
+            try:
+                bodies = asyncio.run(fetch_all())
+            finally:
+                server.close()
+            assert all(body == packet for body in bodies)
+        finally:
+            del os.environ["ARTIFACT_STORE_DIR"]
+    print("✅ store_document deduplicates packets; 8 concurrent downloads return identical bytes")
+
+
+if __name__ == "__main__":
+    test_streaming_writes_deduplicate_by_content()
+    test_range_parsing()
+    test_http_full_range_and_conditional_requests()
+    test_concurrent_downloads_and_document_tools()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Test script for the batch LLM job runner and nightly jobs
+"""
+import sys
+import json
+import asyncio
+import tempfile
+from pathlib import Path
+
+# Add shared utils, benchmarks and jobs to path
+sys.path.append(str(Path(__file__).parent / "shared" / "utils"))
+sys.path.append(str(Path(__file__).parent / "benchmarks"))
+sys.path.append(str(Path(__file__).parent / "jobs"))
+
+from batch_runner import BatchRunner, OpenAIBatchProvider, ClaudeBatchProvider, LocalBatchProvider
+from record_store import RecordStore
+from openai_client import OpenAIClient
+from claude_client import ClaudeClient
+from stub_llm import StubLLM
+from llm_batch import run_job, lead_spec, select_leads
+
+
+def seed_leads(path: str, count: int) -> RecordStore:
+    store = RecordStore(path, key="lead_id")
+    store.put_many({
+        "lead_id": f"lead_{i}",
+        "client_name": f"Buyer {i}",
+        "client_email": f"buyer{i}@example.com",
+        "notes": "Urgent, cash offer ready" if i % 2 else "Interested in details",
+        "status": "closed" if i == 0 else "new",
+    } for i in range(count))
+    return store
+
+
+def seed_comparisons(path: str, count: int) -> RecordStore:
+    store = RecordStore(path, key="comparison_id")
+    store.put_many({
+        "comparison_id": f"comparison_{i}",
+        "offers": [
+            {"price": 900000 + j * 10000, "close_date": f"2025-0{j + 1}-15", "contingencies": ["inspection"] * j}
+            for j in range(3)
+        ],
+        "analyzed_at": "2020-01-01T00:00:00",
+    } for i in range(count))
+    return store
+
+
+def test_record_store_survives_torn_writes():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = f"{tmp}/leads.jsonl"
+        store = RecordStore(path, key="lead_id")
+        store.put({"lead_id": "a", "status": "new"})
+        with open(path, "a") as f:
+            f.write('{"lead_id": "b", "sta')  # crash mid-write
+        reopened = RecordStore(path, key="lead_id")
+        reopened.put({"lead_id": "a", "score": "hot"})
+        final = RecordStore(path, key="lead_id")
+        assert final.get("a") == {"lead_id": "a", "status": "new", "score": "hot"}
+        assert final.get("b") is None and len(final) == 1
+    print("✅ Record store skips torn lines and merges updates by key")
+
+
+def _bump(path: str, worker: int) -> None:
+    store = RecordStore(path, key="lead_id")
+    for i in range(25):
+        store.put({"lead_id": "a", f"w{worker}_{i}": i})
+
+
+def test_record_store_sees_other_writers():
+    import multiprocessing
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = f"{tmp}/leads.jsonl"
+        server = RecordStore(path, key="lead_id")
+        server.put({"lead_id": "a", "status": "new"})
+        assert server.get("a")["status"] == "new"  # the long-running server has it cached
+
+        # The batch job scores the lead behind the server's back...
+        RecordStore(path, key="lead_id").put({"lead_id": "a", "score": "hot", "qualified_at": "2026-01-01"})
+        assert server.get("a")["score"] == "hot"
+        # ...and the server's next write keeps that score
+        server.put({"lead_id": "a", "follow_up_count": 1})
+        assert RecordStore(path, key="lead_id").get("a") == {
+            "lead_id": "a", "status": "new", "score": "hot", "qualified_at": "2026-01-01", "follow_up_count": 1}
+
+        workers = [multiprocessing.Process(target=_bump, args=(path, w)) for w in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        merged = RecordStore(path, key="lead_id").get("a")
+        assert sum(key.startswith("w") for key in merged) == 100 and merged["score"] == "hot"
+        server.compact()
+        assert RecordStore(path, key="lead_id").get("a") == server.get("a") == merged
+    print("✅ Record store merges into what other processes wrote, not a stale cache")
+
+
+def test_openai_batch_requalifies_leads():
+    with tempfile.TemporaryDirectory() as tmp, StubLLM(batch_delay=0.05) as stub:
+        store = seed_leads(f"{tmp}/leads.jsonl", 40)
+        provider = OpenAIBatchProvider(OpenAIClient(api_key="test", base_url=stub.url))
+        report = asyncio.run(run_job("leads", store.path, f"{tmp}/job", provider, poll_interval=0.01))
+
+        leads = RecordStore(store.path, key="lead_id")
+        assert report["items"] == 39 and report["succeeded"] == 39 and report["applied"] == 39
+        assert leads.get("lead_0").get("score") is None  # closed leads are skipped
+        assert leads.get("lead_1")["score"] == "hot" and leads.get("lead_1")["qualified_by"] == "batch:openai"
+        assert leads.get("lead_2")["client_email"] == "buyer2@example.com"  # merged, not replaced
+        assert stub.calls == 39 and len(stub.batches) == 1
+        assert report["cost_usd"] == round(report["realtime_cost_usd"] / 2, 4) and report["input_tokens"] > 0
+    print(f"✅ OpenAI batch re-qualified {report['applied']} leads, "
+          f"${report['cost_usd']} vs ${report['realtime_cost_usd']} real-time")
+
+
+def test_claude_batch_reanalyzes_comparisons():
+    with tempfile.TemporaryDirectory() as tmp, StubLLM() as stub:
+        store = seed_comparisons(f"{tmp}/comparisons.jsonl", 5)
+        provider = ClaudeBatchProvider(ClaudeClient(api_key="test", base_url=stub.url))
+        report = asyncio.run(run_job("offers", store.path, f"{tmp}/job", provider, poll_interval=0.01))
+
+        comparison = RecordStore(store.path, key="comparison_id").get("comparison_3")
+        assert report["applied"] == 5
+        assert comparison["summary"] == "Stub analysis of 3 offers"
+        assert [row["rank"] for row in comparison["pros_cons_table"]] == [1, 2, 3]
+        assert comparison["analyzed_by"] == "batch:claude" and len(comparison["offers"]) == 3
+    print("✅ Claude message batch re-analyzed 5 stale comparisons")
+
+
+def test_resume_after_crash_does_not_resubmit():
+    class CrashingProvider(OpenAIBatchProvider):
+        submits = 0
+        crash = True
+
+        async def submit(self, input_path):
+            CrashingProvider.submits += 1
+            return await super().submit(input_path)
+
+        async def poll(self, batch_id, input_path):
+            if CrashingProvider.crash:
+                raise ConnectionError("process killed")
+            return await super().poll(batch_id, input_path)
+
+    with tempfile.TemporaryDirectory() as tmp, StubLLM() as stub:
+        store = seed_leads(f"{tmp}/leads.jsonl", 10)
+        provider = CrashingProvider(OpenAIClient(api_key="test", base_url=stub.url))
+        try:
+            asyncio.run(run_job("leads", store.path, f"{tmp}/job", provider, poll_interval=0.01))
+            assert False, "first run should crash"
+        except ConnectionError:
+            pass
+        manifest = json.load(open(f"{tmp}/job/manifest.json"))
+        assert manifest["batches"][0]["state"] == "submitted"
+
+        # New leads arriving in between do not change a resumed job
+        store.put({"lead_id": "lead_new", "client_name": "Late", "notes": "asap"})
+        CrashingProvider.crash = False
+        report = asyncio.run(run_job("leads", store.path, f"{tmp}/job", provider, poll_interval=0.01))
+        assert CrashingProvider.submits == 1 and report["applied"] == 9
+        assert RecordStore(store.path, key="lead_id").get("lead_new").get("score") is None
+    print("✅ Resumed job polled the already-submitted batch instead of resubmitting")
+
+
+def test_local_stand_in_resumes_partial_batch_and_falls_back():
+    class FlakyChat:
+        def __init__(self):
+            self.calls = 0
+
+        async def chat(self, messages, system=None):
+            self.calls += 1
+            if self.calls == 4:
+                raise RuntimeError("provider down")
+            return '{"score": "warm", "explanation": "local"}'
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = seed_leads(f"{tmp}/leads.jsonl", 9)
+        chat = FlakyChat()
+        provider = LocalBatchProvider(chat, concurrency=1)
+        # Pretend an earlier run finished three requests before dying
+        job = f"{tmp}/job"
+        runner = BatchRunner(job, lead_spec("local"), provider, store)
+        manifest = runner.prepare(select_leads(store, max_age_days=1.0))
+        with open(f"{job}/{manifest['batches'][0]['input']}.local.jsonl", "w") as f:
+            for i in (1, 2, 3):
+                f.write(json.dumps({"custom_id": f"lead_{i}:0", "text": '{"score": "cold", "explanation": "x"}',
+                                    "error": None, "input_tokens": 1, "output_tokens": 1}) + "\n")
+            f.write('{"custom_id": "lead_4:0", "te')
+
+        report = asyncio.run(run_job("leads", store.path, job, provider, poll_interval=0.01))
+        leads = RecordStore(store.path, key="lead_id")
+        # 8 open leads, 3 already answered; the torn fourth answer is asked again
+        assert chat.calls == 5
+        assert report["succeeded"] == 7 and report["failed"] == 1
+        assert leads.get("lead_2")["score"] == "cold"
+        fallback = [lead for lead in leads if lead.get("qualified_by") == "keywords"]
+        assert len(fallback) == 1 and "qualified_at" not in fallback[0]
+    print("✅ Local stand-in resumed a partial batch; the failed request fell back to keyword scoring")
+
+
+def test_failed_requests_keep_earlier_results_stale():
+    class DownChat:
+        async def chat(self, messages, system=None):
+            raise RuntimeError("provider down")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        leads = seed_leads(f"{tmp}/leads.jsonl", 3)
+        leads.put({"lead_id": "lead_1", "score": "hot", "explanation": "earlier",
+                   "qualified_at": "2020-01-01T00:00:00", "qualified_by": "batch:openai"})
+        report = asyncio.run(run_job("leads", leads.path, f"{tmp}/leads-job", LocalBatchProvider(DownChat()),
+                                     poll_interval=0.01))
+        store = RecordStore(leads.path, key="lead_id")
+        assert report["failed"] == 2 and report["applied"] == 1 and report["skipped"] == 1
+        assert store.get("lead_1")["explanation"] == "earlier"
+        # Never scored before: keyword score, but still stale so the next run retries it
+        assert store.get("lead_2")["qualified_by"] == "keywords" and "qualified_at" not in store.get("lead_2")
+        assert {lead["lead_id"] for lead in select_leads(store, max_age_days=1.0)} == {"lead_1", "lead_2"}
+
+        comparisons = seed_comparisons(f"{tmp}/comparisons.jsonl", 2)
+        comparisons.put({"comparison_id": "comparison_0", "summary": "Earlier analysis",
+                         "pros_cons_table": [{"rank": 1}]})
+        report = asyncio.run(run_job("offers", comparisons.path, f"{tmp}/offers-job", LocalBatchProvider(DownChat()),
+                                     poll_interval=0.01))
+        store = RecordStore(comparisons.path, key="comparison_id")
+        assert report["skipped"] == 1 and report["applied"] == 1
+        assert store.get("comparison_0")["summary"] == "Earlier analysis"
+        assert store.get("comparison_0")["analyzed_at"] == "2020-01-01T00:00:00"
+        assert store.get("comparison_1")["summary"] and store.get("comparison_1")["analyzed_at"] == "2020-01-01T00:00:00"
+    print("✅ Failed batch requests keep earlier scores and analyses, and leave them stale for a retry")
+
+
+if __name__ == "__main__":
+    test_record_store_survives_torn_writes()
+    test_record_store_sees_other_writers()
+    test_openai_batch_requalifies_leads()
+    test_claude_batch_reanalyzes_comparisons()
+    test_resume_after_crash_does_not_resubmit()
+    test_local_stand_in_resumes_partial_batch_and_falls_back()
+    test_failed_requests_keep_earlier_results_stale()
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Test script for the structured call log, replay and shadow-traffic harness
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import tempfile
+from pathlib import Path
+
+import httpx
+
+# Add shared utils, leadgen tools and benchmarks to path
+sys.path.append(str(Path(__file__).parent / "shared" / "utils"))
+sys.path.append(str(Path(__file__).parent / "mcp-servers" / "leadgen"))
+sys.path.append(str(Path(__file__).parent / "benchmarks"))
+
+from fastmcp import FastMCP, Client
+from fastmcp.exceptions import ToolError
+import call_log
+from call_log import CallLog, comparable, digest, diff_paths, read_calls, select
+from call_logging import CallLogMiddleware
+from tool_logger import log_tool_call
+from tracing import TracingMiddleware
+from recorded_llm import RecordedLLM, request_key
+from stub_llm import StubLLM
+from replay_calls import replay
+
+CALLER = "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+
+
+def make_server(log: CallLog, version: int = 1, delay: float = 0.0) -> FastMCP:
+    server = FastMCP(f"Replay{version}")
+    server.add_middleware(TracingMiddleware())
+    server.add_middleware(CallLogMiddleware(log))
+
+    @server.tool
+    async def quote(address: str, beds: int = 3) -> dict:
+        await asyncio.sleep(delay)
+        price = 500000 + beds * 50000
+        if version == 2 and beds >= 4:
+            price += 1000
+        return {"address": address, "price": price, "quote_id": f"q_{time.time_ns()}",
+                "generated_at": time.time()}
+
+    @server.tool
+    def fail(reason: str) -> dict:
+        raise ToolError(reason)
+
+    @server.tool
+    @log_tool_call
+    def ping() -> str:
+        return "pong"
+
+    return server
+
+
+def test_records_are_structured_and_replayable():
+    with tempfile.TemporaryDirectory() as tmp:
+        log = CallLog(f"{tmp}/calls.jsonl", "replay")
+        server = make_server(log)
+
+        async def scenario():
+            async with Client(server) as client:
+                await client.call_tool("quote", {"address": "1 Oak St", "beds": 4}, meta={"traceparent": CALLER})
+                await client.call_tool("fail", {"reason": "no such listing"}, raise_on_error=False)
+                await client.call_tool("ping", {})
+
+        asyncio.run(scenario())
+        log.flush()
+        with open(log.path, "a") as f:
+            f.write("[2026-10-19T10:00:00Z] ping()\nnot json either\n")
+        skipped = {}
+        records = list(read_calls(log.path, skipped))
+
+    # ping goes through both the middleware and log_tool_call, and is still recorded once
+    assert [r["tool"] for r in records] == ["quote", "fail", "ping"] and skipped == {"unparsed": 2}
+    quote, failed, ping = records
+    assert quote["v"] == 1 and quote["server"] == "replay" and quote["status"] == "ok"
+    assert quote["arguments"] == {"address": "1 Oak St", "beds": 4} and quote["ts"].endswith("Z")
+    assert quote["trace_id"] == CALLER.split("-")[1] and quote["duration_ms"] >= 0
+    assert quote["output_digest"] == digest({"address": "1 Oak St", "price": 700000, "quote_id": "other",
+                                            "generated_at": 0})
+    assert "output" not in quote
+    assert failed["status"] == "error" and "no such listing" in failed["error"]
+    assert ping["output_digest"] == digest({"result": "pong"})
+    assert [r["tool"] for r in select(records, tools=["quote", "ping"], since=quote["t"] + 1e-6)] == ["ping"]
+    print(f"✅ Tool calls are logged once each as structured records: {json.dumps(quote)[:90]}...")
+
+
+def test_log_tool_call_writes_records_when_called_directly():
+    from tools.lead_tools import LeadGenTools
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["CALL_LOG_PATH"] = f"{tmp}/calls.jsonl"
+        try:
+            tools = LeadGenTools()
+            tools.ping()
+
+            @log_tool_call
+            def explode(self, lead_id: str, force: bool = False):
+                raise ValueError(f"unknown lead {lead_id}")
+
+            try:
+                explode(tools, "lead_9", force=True)
+            except ValueError:
+                pass
+            call_log.flush_call_logs()
+            ping, error = read_calls(f"{tmp}/calls.jsonl")
+        finally:
+            del os.environ["CALL_LOG_PATH"]
+            call_log._logs.clear()
+
+    assert ping["tool"] == "ping" and ping["server"] == "leadgen" and ping["arguments"] == {}
+    assert ping["output_digest"] == digest(tools.ping())
+    assert error["status"] == "error" and error["arguments"] == {"lead_id": "lead_9", "force": True}
+    assert "ValueError: unknown lead lead_9" in error["error"] and "Traceback" in error["traceback"]
+    print("✅ log_tool_call writes the same record format, with bound arguments and tracebacks")
+
+
+def test_arguments_are_redacted_and_written_off_the_call():
+    document = "JVBERi0xLjQK" * 200000
+    arguments = {"client_email": "ann@example.com", "content_base64": document, "filename": "offer.pdf",
+                 "clients": [{"client_name": "Ann Lee", "phone": "512-555-0100", "beds": 3}], "notes": "x" * 300}
+    with tempfile.TemporaryDirectory() as tmp:
+        log = CallLog(f"{tmp}/calls.jsonl", "replay")
+        started = time.perf_counter()
+        for _ in range(200):
+            log.record("store_document", arguments, time.time(), 0.01, output={"ok": True})
+        queued = time.perf_counter() - started
+        log.flush()
+        records = list(read_calls(log.path))
+        full = CallLog(f"{tmp}/full.jsonl", "replay", arguments="full")
+        full.record("store_document", arguments, time.time(), 0.01, output={"ok": True})
+        full.close()
+        [kept] = read_calls(full.path)
+        size = os.path.getsize(log.path)
+
+    logged = records[0]["arguments"]
+    assert len(records) == 200 and log.snapshot()["written"] == 200 and records[0]["redacted"] == 5
+    assert logged["client_email"].startswith("<redacted:") and "ann@" not in json.dumps(records[0])
+    assert logged["content_base64"] == f"<omitted {len(document)} chars>"
+    assert logged["clients"][0]["client_name"].startswith("<redacted:") and logged["clients"][0]["beds"] == 3
+    assert logged["clients"][0]["phone"].startswith("<redacted:") and logged["notes"].startswith("<omitted 300")
+    assert logged["filename"] == "offer.pdf" and size < 200 * 1000
+    # Equal values redact to the same placeholder
+    assert records[1]["arguments"] == logged
+    assert kept["arguments"] == arguments and "redacted" not in kept
+    print(f"✅ Personal and bulky arguments redacted ({size // 200} bytes per record); "
+          f"200 records queued in {queued * 1000:.1f}ms; CALL_LOG_ARGUMENTS=full keeps them")
+
+
+def test_replay_paces_calls_and_shadow_finds_differences():
+    assert diff_paths({"a": [1, {"b": 2}], "c": 1}, {"a": [1, {"b": 3}], "d": 1}) == ["$.a[1].b", "$.c", "$.d"]
+    assert comparable({"price": 1, "quote_id": "x", "nested": [{"created_at": 1, "ms": 2}]}) == \
+        {"price": 1, "nested": [{}]}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        production = CallLog(f"{tmp}/prod.jsonl", "replay")
+
+        async def record():
+            async with Client(make_server(production)) as client:
+                for beds in range(1, 7):
+                    await client.call_tool("quote", {"address": f"{beds} Elm St", "beds": beds})
+                    await asyncio.sleep(0.1)
+
+        asyncio.run(record())
+        production.flush()
+        records = list(read_calls(production.path))
+        span = records[-1]["t"] - records[0]["t"]
+
+        baseline = make_server(CallLog(f"{tmp}/baseline.jsonl"), version=1, delay=0.01)
+        candidate = make_server(CallLog(f"{tmp}/candidate.jsonl"), version=2, delay=0.05)
+        report = asyncio.run(replay(records, baseline, candidate, speed=2.0, concurrency=4))
+        fast = asyncio.run(replay(records, baseline, speed=0))
+
+    # Paced at twice the recorded speed, and as fast as possible with speed 0
+    assert span / 2 - 0.05 <= report["wall_s"] <= span / 2 + 0.25, (span, report["wall_s"])
+    assert fast["wall_s"] < span / 4 and report["lag_ms"]["max"] < 50
+    outputs = report["outputs"]
+    assert outputs["match_recorded"] == {"baseline": 6, "candidate": 3}
+    assert outputs["mismatched"] == 3 and outputs["status_changes"] == 0
+    assert {m["arguments"]["beds"] for m in outputs["mismatches"]} == {4, 5, 6}
+    assert all(m["paths"] == ["$.price"] for m in outputs["mismatches"])
+    base, cand = (report["targets"][name]["tools"]["quote"]["latency_ms"]["p50"] for name in ("baseline", "candidate"))
+    assert base < cand and cand >= 50 and report["recorded"]["quote"]["requests"] == 6
+    print(f"✅ Replay at 2x took {report['wall_s']:.2f}s for {span:.2f}s of traffic; shadow found "
+          f"{outputs['mismatched']} changed outputs, p50 {base:.0f}ms -> {cand:.0f}ms")
+
+
+def test_recorded_llm_replays_provider_answers():
+    claude_body = {"model": "claude", "system": [{"type": "text", "text": "You rank offers"}],
+                   "messages": [{"role": "user", "content": "Rank these offers"}], "max_tokens": 100}
+    openai_body = {"model": "gpt", "messages": [{"role": "system", "content": "You rank offers"},
+                                                {"role": "user", "content": "Rank these offers"}]}
+    assert request_key(claude_body) == request_key(openai_body)
+
+    with tempfile.TemporaryDirectory() as tmp, StubLLM() as provider:
+        path = f"{tmp}/responses.jsonl"
+        with RecordedLLM(path, record=True, upstreams={"claude": provider.url, "openai": provider.url}) as proxy:
+            recorded = httpx.post(f"{proxy.url}/messages", json=claude_body, headers={"x-api-key": "k"}).json()
+            assert proxy.stats()["recorded"] == 1
+        with RecordedLLM(path, latency=0.0) as llm:
+            # Recorded through Claude, answered to an OpenAI-shaped request
+            replayed = httpx.post(f"{llm.url}/chat/completions", json=openai_body).json()
+            other = dict(openai_body, messages=[{"role": "user", "content": "Something else"}])
+            httpx.post(f"{llm.url}/chat/completions", json=other)
+            stats = llm.stats()
+        with RecordedLLM(path, strict=True) as strict:
+            missing = httpx.post(f"{strict.url}/chat/completions", json=other)
+
+    assert replayed["choices"][0]["message"]["content"] == recorded["content"][0]["text"]
+    assert stats["hits"] == 1 and stats["misses"] == 1 and stats["mode"] == "replay"
+    assert missing.status_code == 500 and "No recorded response" in missing.json()["error"]["message"]
+    print("✅ Recorded LLM answers replay across providers; unrecorded requests are counted as misses")
+
+
+if __name__ == "__main__":
+    test_records_are_structured_and_replayable()
+    test_log_tool_call_writes_records_when_called_directly()
+    test_arguments_are_redacted_and_written_off_the_call()
+    test_replay_paces_calls_and_shadow_finds_differences()
+    test_recorded_llm_replays_provider_answers()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Test script for request deadlines and cancellation of upstream LLM calls
+"""
+import sys
+import time
+import asyncio
+from pathlib import Path
+
+# Add shared utils and benchmarks to path
+sys.path.append(str(Path(__file__).parent / "shared" / "utils"))
+sys.path.append(str(Path(__file__).parent / "benchmarks"))
+
+import deadline
+from deadline import Deadline, DeadlineExceeded, RequestCancelled
+from openai_client import OpenAIClient
+from claude_client import ClaudeClient
+from stub_llm import StubLLM
+
+
+def upstream(name: str) -> dict:
+    return deadline.upstream_metrics(name).snapshot()
+
+
+def test_scopes_only_shorten():
+    with deadline.scope(5.0) as outer:
+        with deadline.scope(60.0) as inner:
+            assert inner.expires_at == outer.expires_at
+            assert deadline.remaining() <= 5.0
+        with deadline.scope(0.5):
+            assert deadline.remaining() <= 0.5
+        outer.cancel()
+        assert inner.cancelled
+    assert deadline.current() is None
+    print("✅ Nested scopes can shorten the request deadline but never extend it")
+
+
+def test_llm_call_cut_at_deadline():
+    with StubLLM(latency=0.3) as stub:
+        client = OpenAIClient(api_key="test", base_url=stub.url)
+        messages = [{"role": "user", "content": "hello"}]
+        before = upstream("openai")
+
+        async def scenario():
+            await client.chat(messages)  # one full call teaches the typical latency
+            with deadline.scope(0.05):
+                started = time.perf_counter()
+                try:
+                    await client.chat(messages)
+                    assert False, "call should have been cut short"
+                except DeadlineExceeded:
+                    return time.perf_counter() - started
+
+        elapsed = asyncio.run(scenario())
+    after = upstream("openai")
+    assert elapsed < 0.2, elapsed
+    assert after["deadline_exceeded"] == before["deadline_exceeded"] + 1
+    saved = after["saved_ms"] - before["saved_ms"]
+    assert 150 < saved < 300, saved
+    print(f"✅ LLM call cancelled at the deadline after {elapsed * 1000:.0f}ms, ~{saved:.0f}ms upstream time saved")
+
+
+def test_expired_request_skips_upstream():
+    with StubLLM() as stub:
+        client = ClaudeClient(api_key="test", base_url=stub.url)
+
+        async def scenario():
+            with deadline.scope(0.0):
+                await client.chat([{"role": "user", "content": "hello"}])
+
+        try:
+            asyncio.run(scenario())
+            assert False, "expired request should not reach the LLM"
+        except DeadlineExceeded:
+            pass
+        assert stub.calls == 0
+    print("✅ A request already past its deadline never reaches the LLM")
+
+
+def test_router_neither_trips_breaker_nor_fails_over():
+    from llm_router import LLMRouter
+
+    with StubLLM(latency=0.5) as stub:
+        router = LLMRouter(
+            {"openai": OpenAIClient(api_key="test", base_url=stub.url),
+             "claude": ClaudeClient(api_key="test", base_url=stub.url)},
+            hedge=False, failure_threshold=1,
+        )
+
+        async def scenario():
+            with deadline.scope(0.05):
+                await router.chat([{"role": "user", "content": "hello"}])
+
+        try:
+            asyncio.run(scenario())
+            assert False, "router should give up at the deadline"
+        except DeadlineExceeded:
+            pass
+        assert stub.calls == 1
+    assert {b.state for b in router.breakers.values()} == {"closed"}
+    print("✅ Router gives up at the deadline without opening a circuit or failing over")
+
+
+def test_client_disconnect_cancels_sync_tool_llm_call():
+    from fastmcp import FastMCP, Client
+    from admission import DeadlineMiddleware
+
+    server = FastMCP("TestMCP")
+    server.add_middleware(DeadlineMiddleware(default=30.0))
+    finished = {}
+
+    with StubLLM(latency=2.0) as stub:
+        llm = OpenAIClient(api_key="test", base_url=stub.url)
+
+        # Sync tools run in a worker thread with their own event loop, like qualify_lead
+        @server.tool
+        def score() -> str:
+            started = time.perf_counter()
+            try:
+                return asyncio.run(llm.chat([{"role": "user", "content": "hot or cold?"}]))
+            except RequestCancelled:
+                return "cancelled"
+            finally:
+                finished["after"] = time.perf_counter() - started
+
+        before = upstream("openai")
+
+        async def scenario():
+            async with Client(server) as client:
+                try:
+                    await client.call_tool("score", {}, timeout=0.2)
+                except Exception:
+                    pass
+                await asyncio.sleep(0.3)
+
+        asyncio.run(scenario())
+    after = upstream("openai")
+    assert finished["after"] < 1.0, finished
+    assert after["client_cancelled"] == before["client_cancelled"] + 1
+    print(f"✅ Client timeout cancelled the worker thread's LLM call after {finished['after'] * 1000:.0f}ms")
+
+
+def test_cancel_from_another_thread():
+    import threading
+
+    request = Deadline()
+
+    async def waiter():
+        with deadline.scope(deadline=request):
+            await deadline.bounded(asyncio.sleep(5), "test_upstream")
+
+    timer = threading.Timer(0.05, request.cancel)
+    timer.start()
+    started = time.perf_counter()
+    try:
+        asyncio.run(waiter())
+        assert False, "cancel should interrupt the call"
+    except RequestCancelled:
+        pass
+    assert time.perf_counter() - started < 1.0
+    assert upstream("test_upstream")["client_cancelled"] == 1
+    print("✅ Cancelling a deadline from another thread interrupts the upstream call")
+
+
+if __name__ == "__main__":
+    test_scopes_only_shorten()
+    test_llm_call_cut_at_deadline()
+    test_expired_request_skips_upstream()
+    test_router_neither_trips_breaker_nor_fails_over()
+    test_client_disconnect_cancels_sync_tool_llm_call()
+    test_cancel_from_another_thread()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Test script for ClientSide disclosure packet assembly (cached static sections, per-packet pages)
+"""
+import os
+import re
+import sys
+import zlib
+import time
+import tempfile
+from pathlib import Path
+
+# Add shared utils and the ClientSide tools to path
+sys.path.append(str(Path(__file__).parent / "shared" / "utils"))
+sys.path.append(str(Path(__file__).parent / "mcp-servers" / "clientside" / "tools"))
+
+from disclosure_packets import DisclosureAssembler, SECTIONS, normalize_type
+
+FIELDS = {
+    "disclosure_id": "disclosure_1",
+    "transaction_id": "txn_42",
+    "property_address": "12 Oak St (Unit 3), Austin TX",
+    "year_built": 1962,
+    "client_names": ["Dana Ruiz", "Sam Ruiz"],
+    "agent_name": "Alex Kim",
+}
+
+
+def check_pdf(pdf: bytes) -> int:
+    """Check the xref table points at every object; returns the page count"""
+    assert pdf.startswith(b"%PDF-1.4") and pdf.endswith(b"%%EOF\n")
+    startxref = int(pdf.rsplit(b"startxref\n", 1)[1].split(b"\n")[0])
+    assert pdf[startxref:startxref + 5] == b"xref\n"
+    count = int(pdf[startxref:].split(b"\n")[1].split()[1])
+    entries = pdf[startxref:].split(b"\n")[3:3 + count - 1]
+    for number, entry in enumerate(entries, start=1):
+        offset = int(entry[:10])
+        assert pdf[offset:].startswith(b"%d 0 obj\n" % number), number
+    return int(re.search(rb"/Type /Pages /Kids \[[^\]]*\] /Count (\d+)", pdf).group(1))
+
+
+def page_text(pdf: bytes) -> bytes:
+    text = []
+    for head, content in re.findall(rb"(<< /Length \d+[^>]*>>)\nstream\n(.*?)\nendstream", pdf, re.S):
+        text.append(zlib.decompress(content) if b"FlateDecode" in head else content)
+    return b"".join(text)
+
+
+def test_packets_are_valid_pdfs():
+    assert normalize_type("Lead paint") == "lead_paint" and normalize_type("NHD") == "natural_hazard"
+    assert normalize_type("property") is None
+    assembler = DisclosureAssembler()
+    packet = assembler.assemble("full", FIELDS)
+    assert packet["sections"] == ["agency", "lead_paint", "natural_hazard"]
+    assert check_pdf(packet["pdf"]) == packet["pages"] >= 5
+    text = page_text(packet["pdf"])
+    # Dynamic fields are escaped; static sections carry their form version
+    assert b"12 Oak St \\(Unit 3\\)" in text and b"Sam Ruiz" in text and b"Housing built before 1978" in text
+    assert b"Form LP v2" in text and b"LEAD WARNING STATEMENT" in text
+    try:
+        assembler.assemble("property", FIELDS)
+        assert False, "no template"
+    except ValueError:
+        pass
+    print(f"✅ A full packet is a {packet['pages']}-page PDF with a valid cross-reference table")
+
+
+def test_static_sections_render_once_per_version():
+    sections = {key: dict(value) for key, value in SECTIONS.items()}
+    assembler = DisclosureAssembler(sections=sections)
+    assert assembler.warm()["sections"] == 3 and assembler.stats["renders"] == 3
+    first = assembler.assemble("agency", {**FIELDS, "disclosure_id": "a"})["pdf"]
+    second = assembler.assemble("agency", {**FIELDS, "disclosure_id": "b", "agent_name": "Jo Park"})["pdf"]
+    assert assembler.stats["renders"] == 3 and first != second
+    cached = assembler._section_pages("agency")[0]
+    assert cached in first and cached in second
+
+    sections["agency"] = {**sections["agency"], "version": 4,
+                          "paragraphs": sections["agency"]["paragraphs"] + ["New paragraph for version 4."]}
+    third = assembler.assemble("agency", FIELDS)["pdf"]
+    assert assembler.stats["renders"] == 4 and cached not in third
+    assert b"Form AG v4" in page_text(third) and assembler.snapshot()["cached_sections"] == 3
+    print("✅ Static sections are rendered once per template version and shared by every packet")
+
+
+def test_throughput():
+    assembler = DisclosureAssembler()
+    assembler.warm()
+    count = 1000
+    started = time.perf_counter()
+    for i in range(count):
+        assembler.assemble("full", {**FIELDS, "disclosure_id": f"disclosure_{i}"})
+    rate = count / (time.perf_counter() - started)
+    assert rate > 300, rate
+    print(f"✅ Assembled {rate:,.0f} full packets per second on one core")
+
+
+def test_send_disclosure_stores_packet():
+    from client_tools import ClientTools
+    import search_index
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["ARTIFACT_STORE_DIR"] = tmp
+        try:
+            tools = ClientTools()
+            result = tools.send_disclosure("dana@example.com", "natural hazard", "txn_42",
+                                           fields={"property_address": "12 Oak St", "year_built": 1990})
+            packet = result["data"]["packet"]
+            assert packet["packet_type"] == "natural_hazard" and packet["download_url"].endswith(packet["digest"])
+
+            from artifact_store import ArtifactStore
+            store = ArtifactStore(tmp)
+            assert store.resolve(result["disclosure_id"]) == packet["digest"]
+            assert store.stat(packet["digest"])["size"] == packet["size_bytes"]
+            assert tools.send_disclosure("dana@example.com", "property")["data"]["packet"] is None
+
+            # The store is opened once per ClientTools, not per packet
+            import artifact_store
+            opened = artifact_store.open_artifact_store
+            artifact_store.open_artifact_store = lambda: (_ for _ in ()).throw(AssertionError("store reopened"))
+            try:
+                again = tools.send_disclosure("dana@example.com", "lead paint", fields={"year_built": 1962})
+            finally:
+                artifact_store.open_artifact_store = opened
+            assert tools.artifacts.resolve(again["disclosure_id"]) == again["data"]["packet"]["digest"]
+        finally:
+            del os.environ["ARTIFACT_STORE_DIR"]
+            search_index._index = None
+    print("✅ send_disclosure assembles the packet and stores it under the disclosure id")
+
+
+if __name__ == "__main__":
+    test_packets_are_valid_pdfs()
+    test_static_sections_render_once_per_version()
+    test_throughput()
+    test_send_disclosure_stores_packet()
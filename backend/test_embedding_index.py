@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Test script for local embeddings, the quantized nearest-neighbour index and
+the sentiment/intent scores built on them
+"""
+import os
+import sys
+import time
+import random
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+# Add shared utils, the ClientSide tools and the LeadGen server to path
+sys.path.append(str(Path(__file__).parent / "shared" / "utils"))
+sys.path.append(str(Path(__file__).parent / "mcp-servers" / "clientside" / "tools"))
+sys.path.append(str(Path(__file__).parent / "mcp-servers" / "leadgen"))
+
+from embedding_index import EmbeddingIndex, HashingEmbedder, letter_sentiments, inquiry_intents, quantize
+from offer_utils import rank_offers
+from record_store import RecordStore
+
+WORDS = ("family home near good schools big yard garage pool quiet street downtown condo investment "
+         "rental cash offer preapproved relocating first time buyer kitchen garden hoa fees view").split()
+
+
+def random_texts(count: int, seed: int = 1) -> list:
+    rng = random.Random(seed)
+    return [" ".join(rng.choices(WORDS, k=15)) for _ in range(count)]
+
+
+def test_scores_letters_and_inquiries_locally():
+    embedder = HashingEmbedder()
+    a, b = embedder.embed(["We love the big yard", "we LOVE the big yard!"])
+    assert np.allclose(a, b) and abs(np.linalg.norm(a) - 1) < 1e-5
+    codes, scales = quantize(embedder.embed(["cash offer today"]))
+    assert codes.dtype == np.int8 and np.abs(codes).max() == 127
+
+    warm, cold, empty = letter_sentiments([
+        "We fell in love with your home and would cherish it for our family",
+        "Honestly the kitchen is dated and the roof needs repairs, so the price is too high",
+        None,
+    ])
+    assert warm > 0.8 and cold < 0.2 and empty == 0.5
+    hot, browsing = inquiry_intents(["Pre-approved and ready to write an offer this week",
+                                     "just browsing listings, maybe next year"])
+    assert max(hot, key=hot.get) == "hot" and max(browsing, key=browsing.get) == "cold"
+
+    offers = [
+        {"price": 500000, "close_date": "2026-01-01", "contingencies": [], "buyer_letter": "The roof has problems and we have concerns"},
+        {"price": 500000, "close_date": "2026-01-01", "contingencies": [], "buyer_letter": "Our dream home, we love it"},
+    ]
+    ranked = rank_offers(offers)
+    assert ranked[0]["buyer_letter"].startswith("Our dream") and ranked[0]["score"] > ranked[1]["score"]
+    print(f"✅ Letter sentiment {warm:.2f} vs {cold:.2f}; inquiry intent and offer ranking without an LLM call")
+
+
+def test_ivf_search_recall_and_latency():
+    texts = random_texts(50000)
+    index = EmbeddingIndex()
+    started = time.perf_counter()
+    index.add_texts([f"doc{i}" for i in range(len(texts))], texts, [{"n": i} for i in range(len(texts))])
+    index.build()
+    build_s = time.perf_counter() - started
+    assert len(index) == 50000 and index.snapshot()["lists"] > 100
+
+    queries = HashingEmbedder().embed(random_texts(100, seed=2))
+    exact = (np.asarray(index._codes, dtype=np.float32) @ queries.T) * np.asarray(index._scales)[:, None]
+    recall = 0.0
+    started = time.perf_counter()
+    for j, query in enumerate(queries):
+        hits = index.search(query, k=10)
+        kth = np.sort(exact[:, j])[-10]
+        recall += sum(hit["similarity"] >= round(float(kth), 4) - 1e-4 for hit in hits) / 10
+    per_query_ms = (time.perf_counter() - started) / len(queries) * 1000
+    recall /= len(queries)
+    assert recall >= 0.75, recall
+    assert per_query_ms < 20, per_query_ms
+    assert index.search_text(texts[123], k=1)[0]["n"] == 123
+    print(f"✅ Embedded and indexed 50k texts in {build_s:.1f}s; top-10 recall {recall:.2f} at {per_query_ms:.1f}ms per query")
+
+
+def test_save_load_memory_mapped_with_updates():
+    texts = random_texts(3000, seed=5)
+    with tempfile.TemporaryDirectory() as tmp:
+        index = EmbeddingIndex(path=tmp)
+        index.add_texts([f"doc{i}" for i in range(3000)], texts, [{"n": i} for i in range(3000)])
+        index.build().save()
+
+        started = time.perf_counter()
+        loaded = EmbeddingIndex.load(tmp)
+        load_ms = (time.perf_counter() - started) * 1000
+        assert isinstance(loaded._codes, np.memmap) and len(loaded) == 3000
+        assert loaded.search_text(texts[7], k=1)[0]["id"] == "doc7"
+
+        # Replace one vector, remove another and add a new one; the tail is searchable before saving
+        loaded.add_texts(["doc7"], ["completely different words about a lighthouse"], [{"n": "new"}])
+        assert loaded.remove("doc8") and not loaded.remove("doc8")
+        loaded.add_texts(["doc9000"], ["a lighthouse with a view"])
+        assert loaded.search_text(texts[7], k=1)[0]["id"] != "doc7"
+        assert loaded.search_text("lighthouse", k=2)[0]["id"] in ("doc7", "doc9000")
+        loaded.save()
+
+        reopened = EmbeddingIndex.load(tmp)
+        assert len(reopened) == 3000 and sorted(os.listdir(tmp)) == ["CURRENT", "v2"]
+        assert "doc8" not in [hit["id"] for hit in reopened.search_text(texts[8], k=5)]
+        assert reopened.search_text("lighthouse", k=1)[0]["id"] in ("doc7", "doc9000")
+    print(f"✅ Saved index reopened memory-mapped in {load_ms:.1f}ms; replacements and removals survive a save")
+
+
+def test_replaced_and_removed_tail_ids_stay_out_of_results():
+    index = EmbeddingIndex()
+    index.add_texts(["a", "b"], ["harbor lighthouse at dusk", "garden shed with tools"])
+    # Both rows are still in the unmerged tail: replace one, then remove the other
+    index.add_texts(["a"], ["mountain cabin in the snow"])
+    assert index.remove("b")
+    ids = [hit["id"] for hit in index.search_text("harbor lighthouse at dusk", k=5)]
+    assert ids == ["a"] and len(index) == 1
+    assert index.search_text("mountain cabin in the snow", k=1)[0]["similarity"] > 0.99
+    index.add_texts(["b"], ["garden shed with tools"])
+    assert sorted(hit["id"] for hit in index.search_text("garden shed", k=5)) == ["a", "b"]
+    print("✅ Replaced and removed ids in the unmerged tail are not returned")
+
+
+def test_lead_tools_find_similar_leads_and_score_offline():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = RecordStore(f"{tmp}/leads.jsonl", key="lead_id")
+        store.put_many([
+            {"lead_id": "a", "client_name": "Ana", "status": "closed",
+             "notes": "Pre-approved, want to tour the Maple house this weekend and write an offer"},
+            {"lead_id": "b", "client_name": "Bo", "status": "closed",
+             "notes": "We are pre-approved and want to write an offer after a tour this weekend"},
+            {"lead_id": "c", "client_name": "Cy", "status": "lost",
+             "notes": "Just browsing, maybe next year"},
+            {"lead_id": "d", "client_name": "Di", "status": "new"},
+        ])
+        os.environ["LEAD_STORE_PATH"] = store.path
+        os.environ["EMBEDDING_INDEX_PATH"] = f"{tmp}/embeddings"
+        try:
+            from tools.lead_tools import LeadGenTools
+            tools = LeadGenTools()
+            assert len(tools.embeddings) == 3 and os.path.exists(f"{tmp}/embeddings/CURRENT")
+
+            similar = tools.similar_leads("pre-approved buyers, want to tour this weekend and write an offer", k=2)
+            assert sorted(hit["lead_id"] for hit in similar["results"]) == ["a", "b"]
+            assert similar["outcomes"] == {"closed": 2} and max(similar["intent"], key=similar["intent"].get) == "hot"
+            assert tools.similar_leads("  ")["status"] == "error"
+
+            # No keyword signals, but it reads like the leads that closed
+            result = tools.qualify_lead("Eve", "eve@example.com", "Pre-approved, we'd like to tour Saturday and write an offer")
+            assert tools.keyword_score("Pre-approved, we'd like to tour Saturday and write an offer")["score"] == "cold"
+            assert result["score"] == "hot" and "similar past inquiries" in result["explanation"]
+
+            tools.generate_lead("5 Pine Rd", "Fay", "fay@example.com", notes="Relocating for work, need a condo downtown")
+            tools.embeddings.save()
+            # A restarted server maps the saved index instead of re-embedding the store
+            restarted = LeadGenTools()
+            assert len(restarted.embeddings) == 5
+            assert restarted.similar_leads("condo downtown relocating", k=1)["results"][0]["client_name"] == "Fay"
+        finally:
+            del os.environ["LEAD_STORE_PATH"], os.environ["EMBEDDING_INDEX_PATH"]
+    print("✅ similar_leads returns past leads with their outcomes; qualify_lead falls back to them offline")
+
+
+def test_index_follows_the_configured_embedder():
+    import json
+    import embedding_index
+
+    class WideEmbedder(HashingEmbedder):
+        name = "wide-test-model"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = RecordStore(f"{tmp}/leads.jsonl", key="lead_id")
+        store.put_many([{"lead_id": f"l{i}", "client_name": f"N{i}", "notes": text}
+                        for i, text in enumerate(random_texts(20))])
+        os.environ["LEAD_STORE_PATH"] = store.path
+        os.environ["EMBEDDING_INDEX_PATH"] = f"{tmp}/embeddings"
+        previous = embedding_index._embedder
+        try:
+            from tools.lead_tools import LeadGenTools
+            assert LeadGenTools().embeddings.dim == 256
+
+            # EMBEDDING_MODEL now names a 384-dim model: the saved 256-dim index is rebuilt
+            embedding_index._embedder = WideEmbedder(384)
+            tools = LeadGenTools()
+            assert tools.embeddings.dim == 384 and len(tools.embeddings) == 20
+            tools.generate_lead("7 Elm St", "Gus", "gus@example.com", notes="cash buyer, quick close")
+            tools.embeddings.save()
+            current = open(f"{tmp}/embeddings/CURRENT").read()
+            manifest = json.load(open(f"{tmp}/embeddings/{current}/manifest.json"))
+            assert manifest["dim"] == 384 and manifest["embedder"] == "wide-test-model"
+            assert tools.similar_leads("cash buyer quick close", k=1)["results"][0]["client_name"] == "Gus"
+
+            # Same dimension, different model: vectors are not comparable either
+            embedding_index._embedder = HashingEmbedder(384)
+            assert LeadGenTools().embeddings.embedder_name == "hashing"
+            try:
+                tools.embeddings.add_texts(["x"], ["text"])
+                assert False, "mixing embedders should be refused"
+            except ValueError:
+                pass
+        finally:
+            embedding_index._embedder = previous
+            del os.environ["LEAD_STORE_PATH"], os.environ["EMBEDDING_INDEX_PATH"]
+    print("✅ The inquiry index is sized by the embedder and rebuilt when the model changes")
+
+
+if __name__ == "__main__":
+    test_scores_letters_and_inquiries_locally()
+    test_ivf_search_recall_and_latency()
+    test_save_load_memory_mapped_with_updates()
+    test_replaced_and_removed_tail_ids_stay_out_of_results()
+    test_lead_tools_find_similar_leads_and_score_offline()
+    test_index_follows_the_configured_embedder()
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Test script for the LeadGen drip follow-up scheduler
+"""
+import os
+import sys
+import time
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add shared utils and the LeadGen server to path
+sys.path.append(str(Path(__file__).parent / "shared" / "utils"))
+sys.path.append(str(Path(__file__).parent / "mcp-servers" / "leadgen"))
+sys.path.append(str(Path(__file__).parent / "benchmarks"))
+
+from tools.follow_up_scheduler import FollowUpScheduler, CADENCES, DAY
+from record_store import RecordStore
+from stub_llm import StubLLM
+
+
+class Clock:
+    def __init__(self, now: float = 1_700_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def recording_sender(log):
+    def send(batch):
+        log.append([item.key for item in batch])
+        return [{"status": "sent"} for _ in batch]
+    return send
+
+
+def test_dispatches_in_due_order_and_batches():
+    clock = Clock()
+    sent = []
+    with tempfile.TemporaryDirectory() as tmp:
+        scheduler = FollowUpScheduler(tmp, recording_sender(sent), batch_size=100, clock=clock).load()
+        count = 100_000
+        started = time.perf_counter()
+        scheduler.enroll_many([(f"lead_{i}", "warm") for i in range(count)], start_at=clock.now)
+        # Reschedule the even leads; their old heap entries must be skipped
+        scheduler.enroll_many([(f"lead_{i}", "warm") for i in range(0, count, 2)], start_at=clock.now + 60)
+        enroll_s = time.perf_counter() - started
+
+        dispatched = scheduler.dispatch_due(clock.now)
+        assert dispatched == 100 and len(sent) == 1
+        assert all(int(key.split(":")[0].split("_")[1]) % 2 == 1 for key in sent[0])
+        status = scheduler.status("lead_1")
+        assert status["step"] == 1 and status["due_at"] == clock.now + CADENCES["warm"][1][0] * DAY
+
+        while scheduler.dispatch_due(clock.now):
+            pass
+        # Only the odd leads were due; the even ones were rescheduled a minute out
+        assert sum(len(b) for b in sent) == count // 2 and max(len(b) for b in sent) == 100
+        assert scheduler.status("lead_0")["step"] == 0
+        scheduler.close()
+    print(f"✅ Enrolled {count + count // 2} follow-ups in {enroll_s:.2f}s; dispatched due ones oldest first in batches of 100")
+
+
+def test_restart_replays_journal_without_resending():
+    clock = Clock()
+    sent = []
+    with tempfile.TemporaryDirectory() as tmp:
+        scheduler = FollowUpScheduler(tmp, recording_sender(sent), batch_size=10, clock=clock).load()
+        scheduler.enroll_many([(f"lead_{i}", "hot") for i in range(20)], start_at=clock.now)
+        scheduler.cancel("lead_19")
+        scheduler.dispatch_due(clock.now)
+        scheduler.compact()
+        scheduler.dispatch_due(clock.now)
+        scheduler.close()
+        with open(os.path.join(tmp, "journal.jsonl"), "a") as f:
+            f.write('{"op":"schedule","lead":"lead_x","du')  # crash mid-write
+
+        restarted = FollowUpScheduler(tmp, recording_sender(sent), batch_size=10, clock=clock).load()
+        assert len(restarted) == 19 and restarted.status("lead_19") is None
+        assert restarted.status("lead_3")["step"] == 1 and restarted.dispatch_due(clock.now) == 0
+        clock.now += DAY
+        assert restarted.dispatch_due() == 10
+        restarted.close()
+    print(f"✅ Restart rebuilt 19 schedules from snapshot + journal in {restarted.load_ms}ms")
+
+
+def test_sent_keys_are_not_resent_after_crash():
+    clock = Clock()
+    sent = []
+    with tempfile.TemporaryDirectory() as tmp:
+        scheduler = FollowUpScheduler(tmp, recording_sender(sent), clock=clock).load()
+        scheduler.enroll_many([("a", "cold"), ("b", "cold")], start_at=clock.now)
+        a, b = scheduler.claim_due()
+        # Crash after a's first step was recorded as sent but before its next step was scheduled
+        scheduler._write([{"op": "sent", "key": a.key, "at": clock.now}])
+        scheduler.close()
+
+        restarted = FollowUpScheduler(tmp, recording_sender(sent), clock=clock).load()
+        assert restarted.dispatch_due() == 2
+        assert sent == [[b.key]]
+        assert restarted.status("a")["step"] == 1 and restarted.stats["duplicates_skipped"] == 1
+        restarted.close()
+    print("✅ Idempotency keys kept a follow-up from being sent twice across a crash")
+
+
+def test_reenrolling_after_cancel_sends_again():
+    clock = Clock()
+    sent = []
+    with tempfile.TemporaryDirectory() as tmp:
+        scheduler = FollowUpScheduler(tmp, recording_sender(sent), clock=clock).load()
+        scheduler.enroll("a", "hot", start_at=clock.now)
+        scheduler.dispatch_due()
+        scheduler.cancel("a")
+        scheduler.enroll("a", "hot", start_at=clock.now)
+        scheduler.close()
+
+        # The new enrollment's first step is a different follow-up, also after a restart
+        restarted = FollowUpScheduler(tmp, recording_sender(sent), clock=clock).load()
+        assert restarted.dispatch_due() == 1
+        assert len(sent) == 2 and sent[0] != sent[1] and restarted.stats["duplicates_skipped"] == 0
+        assert restarted.status("a")["step"] == 1
+
+        # Re-enrolled while its first step was out for sending: that outcome is dropped
+        restarted.enroll("b", "hot", start_at=clock.now)
+        batch = restarted.claim_due()
+        restarted.enroll("b", "hot", start_at=clock.now)
+        restarted.complete(batch, [{"status": "sent"}])
+        assert restarted.status("b")["step"] == 0 and batch[0].key not in restarted._sent
+        restarted.compact()
+        restarted.close()
+        assert FollowUpScheduler(tmp, clock=clock).load().status("b")["step"] == 0
+    print("✅ A lead re-enrolled after a cancel gets its cadence again")
+
+
+def test_short_or_failed_completion_does_not_strand_claims():
+    clock = Clock()
+    with tempfile.TemporaryDirectory() as tmp:
+        # A sender that answers for only the first item of each batch
+        scheduler = FollowUpScheduler(tmp, lambda batch: [{"status": "sent"}], batch_size=10, clock=clock).load()
+        scheduler.enroll_many([(f"lead_{i}", "warm") for i in range(3)], start_at=clock.now)
+        assert scheduler.dispatch_due() == 3
+        assert scheduler.stats["sent"] == 1 and scheduler.stats["failed"] == 2
+        assert [scheduler.status(f"lead_{i}")["step"] for i in range(3)] == [1, 0, 0]
+
+        # The journal write fails after the send: the claimed entries go back on the heap
+        clock.now += 600
+        write = scheduler._write
+        scheduler._write = lambda records: (_ for _ in ()).throw(OSError("disk full"))
+        try:
+            scheduler.dispatch_due()
+            assert False, "dispatch should fail"
+        except OSError:
+            pass
+        scheduler._write = write
+        assert len(scheduler.claim_due()) == 2
+        scheduler.close()
+    print("✅ Missing outcomes are retried, and claims from a failed dispatch return to the heap")
+
+
+def test_lead_tools_drive_cadence_from_lead_store():
+    with tempfile.TemporaryDirectory() as tmp, StubLLM() as webhook:
+        os.environ["LEAD_STORE_PATH"] = f"{tmp}/leads.jsonl"
+        os.environ["FOLLOWUP_STATE_DIR"] = f"{tmp}/follow-ups"
+        try:
+            from tools.lead_tools import LeadGenTools
+            tools = LeadGenTools()
+        finally:
+            del os.environ["LEAD_STORE_PATH"], os.environ["FOLLOWUP_STATE_DIR"]
+        leads = RecordStore(f"{tmp}/leads.jsonl", key="lead_id")
+        now = datetime.now()
+        leads.put_many([
+            {"lead_id": "open", "client_name": "Ana", "property_address": "1 Main St", "status": "new"},
+            {"lead_id": "won", "client_name": "Bo", "status": "closed"},
+            {"lead_id": "touched", "client_name": "Cy", "status": "new",
+             "last_contact": (now - timedelta(minutes=10)).isoformat()},
+        ])
+        tools._leads = leads
+        os.environ["FOLLOWUP_WEBHOOK_URL"] = webhook.env()["FOLLOWUP_WEBHOOK_URL"]
+        past = now.timestamp() - 60
+        tools.scheduler.enroll_many([("open", "warm"), ("won", "warm"), ("touched", "hot")], start_at=past)
+
+        try:
+            assert tools.scheduler.dispatch_due() == 3
+        finally:
+            del os.environ["FOLLOWUP_WEBHOOK_URL"]
+        # Only the open lead was due a send; the key travels with it
+        [(key, delivered)] = webhook.follow_ups.items()
+        assert delivered["lead_id"] == "open" and key == delivered["idempotency_key"] == "open:warm:1:0"
+        assert leads.get("open")["follow_up_count"] == 1 and tools.follow_up_status("open")["next"]["step"] == 1
+        assert tools.follow_up_status("won")["next"] is None
+        # Contacted ten minutes ago: the one-hour step moves to an hour after that contact
+        touched = tools.follow_up_status("touched")["next"]
+        assert touched["step"] == 0 and "follow_up_count" not in leads.get("touched")
+        assert abs(touched["due_at"] - (now - timedelta(minutes=10)).timestamp() - 3600) < 1
+
+        # Without a delivery webhook nothing is sent, so nothing is recorded as sent
+        leads.put({"lead_id": "quiet", "client_name": "Di", "status": "new"})
+        tools.scheduler.enroll("quiet", "warm", start_at=past)
+        assert tools.scheduler.dispatch_due() == 1
+        assert tools.follow_up_status("quiet")["next"]["step"] == 0 and "follow_up_count" not in leads.get("quiet")
+        assert tools.scheduler.stats["failed"] == 1
+        unsent = tools.follow_up("open", "Saw your note")
+        assert unsent["status"] == "error" and "FOLLOWUP_WEBHOOK_URL" in unsent["message"]
+        assert leads.get("open")["follow_up_count"] == 1
+
+        os.environ["FOLLOWUP_WEBHOOK_URL"] = webhook.env()["FOLLOWUP_WEBHOOK_URL"]
+        try:
+            assert tools.follow_up("open", "Saw your note")["status"] == "success"
+        finally:
+            del os.environ["FOLLOWUP_WEBHOOK_URL"]
+        assert leads.get("open")["follow_up_count"] == 2 and len(webhook.follow_ups) == 2
+        assert tools.follow_up("missing", "hi")["status"] == "error"
+        assert tools.schedule_follow_ups("open", "lukewarm")["status"] == "error"
+        assert tools.cancel_follow_ups("open")["cancelled"] is True
+        tools.scheduler.close()
+    print("✅ Scheduled follow-ups update the lead store and skip closed leads")
+
+
+if __name__ == "__main__":
+    test_dispatches_in_due_order_and_batches()
+    test_restart_replays_journal_without_resending()
+    test_sent_keys_are_not_resent_after_crash()
+    test_reenrolling_after_cancel_sends_again()
+    test_short_or_failed_completion_does_not_strand_claims()
+    test_lead_tools_drive_cadence_from_lead_store()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Test script for lead deduplication (insert-time index and bulk clustering)
+"""
+import os
+import sys
+import time
+import random
+import tempfile
+from pathlib import Path
+
+# Add shared utils, the LeadGen server and jobs to path
+sys.path.append(str(Path(__file__).parent / "shared" / "utils"))
+sys.path.append(str(Path(__file__).parent / "mcp-servers" / "leadgen"))
+sys.path.append(str(Path(__file__).parent / "jobs"))
+
+from tools.lead_dedup import LeadDedupIndex, cluster_leads, normalize_email, normalize_phone, normalize_address
+from record_store import RecordStore
+from dedup_leads import dedup_leads
+
+FIRST = ["James", "Mary", "Robert", "Patricia", "John", "Jennifer", "Michael", "Linda", "David", "Elizabeth"]
+LAST = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez"]
+STREETS = ["Oak", "Maple", "Pine", "Cedar", "Elm", "Lake", "Hill", "Park", "View", "Sunset"]
+
+
+def synthetic_leads(count: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    return [{
+        "lead_id": f"lead_{i}",
+        "client_name": f"{rng.choice(FIRST)} {rng.choice(LAST)}",
+        "client_email": f"buyer{i}@example.com",
+        "property_address": f"{rng.randint(1, 99999)} {rng.choice(STREETS)} Street, Austin, TX",
+    } for i in range(count)]
+
+
+def portal_copy(lead: dict, lead_id: str) -> dict:
+    """The same inquiry as another portal would submit it (portals mask the buyer's email)"""
+    first, last = lead["client_name"].split()
+    variant = sum(map(ord, lead_id)) % 3
+    name = [f"{first} {last}.".upper(), f"{first[:-1]} {last}", f"{first} R. {last}"][variant]
+    return {
+        "lead_id": lead_id,
+        "client_name": name,
+        "client_email": None,
+        "property_address": lead["property_address"].replace("Street", "St.").split(",")[0],
+    }
+
+
+def test_normalizes_contact_details():
+    assert normalize_email("Jane.Doe+zillow@GoogleMail.com") == "janedoe@gmail.com"
+    assert normalize_email("jane.doe@work.com") == "jane.doe@work.com"
+    assert normalize_phone("+1 (512) 555-0199") == normalize_phone("512.555.0199") == "5125550199"
+    assert normalize_address("100 N. Main Street, Austin TX") == normalize_address("100 north main st") == "100 n main st"
+    print("✅ Emails, phones and street addresses normalize to the same keys")
+
+
+def test_insert_time_detection_is_sub_millisecond():
+    leads = synthetic_leads(20000)
+    index = LeadDedupIndex()
+    index.add_many(leads, workers=1)
+
+    original = leads[42]
+    found = index.match(portal_copy(original, "copy"))
+    assert found["lead_id"] == "lead_42" and found["reason"] == "name_address"
+    # Same person's email with a +tag and different case, no address given
+    assert index.match({"client_name": "?", "client_email": "BUYER7+redfin@example.com"})["lead_id"] == "lead_7"
+    # Someone else asking about the same house is a different lead
+    assert index.match({"client_name": "Zed Quill", "property_address": original["property_address"]}) is None
+
+    started = time.perf_counter()
+    false_matches = 0
+    for lead in synthetic_leads(2000, seed=99):
+        lead["client_email"] = None
+        false_matches += index.check_and_add(lead) is not None
+    per_insert_ms = (time.perf_counter() - started) / 2000 * 1000
+    assert per_insert_ms < 1.0, per_insert_ms
+    assert false_matches < 20, false_matches
+    print(f"✅ Insert-time check over {len(index)} leads: {per_insert_ms * 1000:.0f}µs per lead, "
+          f"{false_matches} matches among 2000 unrelated leads")
+
+
+def test_bulk_clustering_in_parallel():
+    leads = synthetic_leads(5000)
+    copies = [portal_copy(leads[i], f"copy_{i}") for i in range(0, 5000, 10)]
+    table = leads + copies
+
+    started = time.perf_counter()
+    duplicates = cluster_leads(table, workers=2)
+    elapsed = time.perf_counter() - started
+    found = sum(1 for i in range(0, 5000, 10) if duplicates.get(f"copy_{i}") == f"lead_{i}")
+    false = sum(1 for lead_id in duplicates if lead_id.startswith("lead_"))
+    assert found >= 0.95 * len(copies), found
+    assert false < 10, false
+    print(f"✅ Clustered {len(table)} leads in {elapsed:.2f}s: {found}/{len(copies)} portal copies found, {false} false merges")
+
+
+def test_generate_lead_merges_repeat_inquiries():
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["LEAD_STORE_PATH"] = f"{tmp}/leads.jsonl"
+        try:
+            from tools.lead_tools import LeadGenTools
+            tools = LeadGenTools()
+        finally:
+            del os.environ["LEAD_STORE_PATH"]
+
+        first = tools.generate_lead("12 Oak Avenue, Austin, TX", "Maria Garcia", "maria.garcia@gmail.com")
+        second = tools.generate_lead("12 Oak Ave", "Maria  Garcia", "mariagarcia+zillow@gmail.com", "512-555-0101")
+        third = tools.generate_lead("12 Oak Ave", "Marie Garcia", "")
+        other = tools.generate_lead("12 Oak Ave", "Tom Lee", "tom@example.com")
+        # A similar name at the same house, but a different email: someone else
+        namesake = tools.generate_lead("12 Oak Ave", "Marie Garcia", "mg@work.com")
+
+        assert second["duplicate"] and second["lead_id"] == first["lead_id"] and second["match"]["reason"] == "email"
+        assert third["lead_id"] == first["lead_id"] and third["match"]["reason"] == "name_address"
+        assert "duplicate" not in other and other["lead_id"] != first["lead_id"]
+        assert "duplicate" not in namesake and namesake["lead_id"] != first["lead_id"]
+        lead = RecordStore(f"{tmp}/leads.jsonl", key="lead_id").get(first["lead_id"])
+        assert lead["inquiry_count"] == 3 and lead["client_phone"] == "512-555-0101"
+        assert lead["client_email"] == "maria.garcia@gmail.com"
+        assert tools.find_duplicate("MARIA GARCIA", property_address="12 Oak Avenue")["duplicate"]
+
+        # The bulk job finds the same clusters in an un-deduplicated table
+        store = RecordStore(f"{tmp}/raw.jsonl", key="lead_id")
+        store.put_many(synthetic_leads(300) + [portal_copy(lead, f"copy_{lead['lead_id']}") for lead in synthetic_leads(30)])
+        report = dedup_leads(store.path, workers=1)
+        assert report["duplicates"] >= 29 and report["updated"] == report["duplicates"]
+        assert RecordStore(store.path, key="lead_id").get("copy_lead_3")["duplicate_of"] == "lead_3"
+    print("✅ generate_lead merged two repeat inquiries; the bulk job marked portal copies in a raw table")
+
+
+def test_different_contacts_are_different_people():
+    mary = {"lead_id": "mary", "client_name": "Mary Smith", "client_email": "mary@y.com",
+            "property_address": "12 Oak St"}
+    mark = {"lead_id": "mark", "client_name": "Mark Smith", "client_email": "mark@x.com",
+            "property_address": "12 Oak Street"}
+    index = LeadDedupIndex()
+    index.add(mark)
+    assert index.match(mary) is None
+    # Different phones: also kept apart
+    index.add({"lead_id": "ann", "client_name": "Ann Lee", "client_phone": "512-555-0100", "property_address": "9 Elm St"})
+    assert index.match({"client_name": "Ann Lee", "client_phone": "512-555-0199", "property_address": "9 Elm St"}) is None
+    # Without the email, Mary is still too far from Mark's name to merge
+    assert index.match({**mary, "client_email": None}) is None
+    # A typo of the same person with no conflicting contact still merges
+    found = index.match({"client_name": "Mark Smth", "property_address": "12 Oak St."})
+    assert found["lead_id"] == "mark" and found["reason"] == "name_address" and found["name_similarity"] >= 0.5
+
+    assert cluster_leads([mark, mary], workers=1) == {}
+    print("✅ Mary Smith and Mark Smith at the same address stay separate leads")
+
+
+if __name__ == "__main__":
+    test_normalizes_contact_details()
+    test_insert_time_detection_is_sub_millisecond()
+    test_bulk_clustering_in_parallel()
+    test_generate_lead_merges_repeat_inquiries()
+    test_different_contacts_are_different_people()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Test script for the LLM router using two local stub provider servers
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import threading
+import subprocess
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add shared utils and the tool packages to path
+sys.path.append(str(Path(__file__).parent / "shared" / "utils"))
+sys.path.append(str(Path(__file__).parent / "mcp-servers" / "clientside" / "tools"))
+sys.path.append(str(Path(__file__).parent / "mcp-servers" / "leadgen"))
+
+from openai_client import OpenAIClient
+from claude_client import ClaudeClient
+import llm_router
+from llm_router import LLMRouter
+
+
+class StubProvider:
+    """Local HTTP server mimicking the OpenAI or Claude chat endpoint"""
+
+    def __init__(self, kind: str, delay: float = 0.0, fail: bool = False):
+        self.kind = kind
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("content-length", 0))
+                self.rfile.read(length)
+                stub.calls += 1
+                time.sleep(stub.delay)
+                if stub.fail:
+                    self.send_response(500)
+                    self.end_headers()
+                    return
+                text = json.dumps({"provider": stub.kind})
+                if stub.kind == "openai":
+                    body = {"choices": [{"message": {"content": text}}]}
+                else:
+                    body = {"content": [{"text": text}]}
+                payload = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header("content-type", "application/json")
+                self.send_header("content-length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def make_router(openai_stub: StubProvider, claude_stub: StubProvider, **kwargs) -> LLMRouter:
+    return LLMRouter(
+        {
+            "openai": OpenAIClient(api_key="test", base_url=openai_stub.url),
+            "claude": ClaudeClient(api_key="test", base_url=claude_stub.url),
+        },
+        **kwargs,
+    )
+
+
+async def ask(router: LLMRouter) -> str:
+    text = await router.chat([{"role": "user", "content": "hi"}])
+    return router.extract_json(text)["provider"]
+
+
+def test_failover():
+    """A failing provider falls over to the healthy one and trips its circuit"""
+    openai_stub = StubProvider("openai", fail=True)
+    claude_stub = StubProvider("claude")
+    try:
+        router = make_router(openai_stub, claude_stub, hedge=False, failure_threshold=2)
+        answers = [asyncio.run(ask(router)) for _ in range(4)]
+        stats = router.stats()
+        print(f"Failover answers: {answers}")
+        print(f"Stats: {stats}")
+        assert answers == ["claude"] * 4
+        assert stats["openai"]["circuit"] == "open"
+        # Once the circuit is open, OpenAI stops receiving traffic
+        assert openai_stub.calls == 2
+        print("✅ Failover and circuit breaker work")
+    finally:
+        openai_stub.close()
+        claude_stub.close()
+
+
+def test_hedged_request():
+    """A slow primary is hedged after its p95 and the faster answer wins"""
+    openai_stub = StubProvider("openai", delay=0.02)
+    claude_stub = StubProvider("claude", delay=0.02)
+    try:
+        router = make_router(openai_stub, claude_stub, min_samples=3, min_hedge_delay=0.01)
+
+        async def scenario():
+            # Warm up both providers so they have latency samples
+            for name in ("openai", "claude"):
+                for _ in range(3):
+                    await router._call(name, [{"role": "user", "content": "hi"}], None)
+            # Make whichever provider is ranked first slow
+            primary = router._ranked()[0]
+            slow = openai_stub if primary == "openai" else claude_stub
+            slow.delay = 1.0
+            started = time.monotonic()
+            answer = await ask(router)
+            return primary, answer, time.monotonic() - started
+
+        primary, answer, elapsed = asyncio.run(scenario())
+        stats = router.stats()
+        print(f"Primary: {primary}, answered by: {answer} in {elapsed * 1000:.0f}ms")
+        assert answer != primary
+        assert elapsed < 0.5
+        assert stats[answer]["hedges_won"] == 1
+        print("✅ Hedged request returned the faster provider")
+    finally:
+        openai_stub.close()
+        claude_stub.close()
+
+
+def test_all_providers_down():
+    """The router raises once every provider has failed"""
+    openai_stub = StubProvider("openai", fail=True)
+    claude_stub = StubProvider("claude", fail=True)
+    try:
+        router = make_router(openai_stub, claude_stub, hedge=False)
+        try:
+            asyncio.run(ask(router))
+        except RuntimeError as e:
+            print(f"✅ Raised when all providers failed: {e}")
+        else:
+            raise AssertionError("Expected RuntimeError")
+    finally:
+        openai_stub.close()
+        claude_stub.close()
+
+
+def test_tools_use_router():
+    """Offer analysis and lead scoring send their LLM calls through the shared router"""
+    import offer_utils
+    from tools import lead_tools
+
+    # The tool modules fall back to stand-ins when the shared utils cannot be
+    # imported, so check they find the router through their own sys.path entries
+    found = subprocess.run(
+        [sys.executable, "-c", "import offer_utils; from tools import lead_tools; "
+                               "print(offer_utils.get_router.__module__, lead_tools.get_router.__module__)"],
+        env={**os.environ, "PYTHONPATH": os.pathsep.join([
+            str(Path(__file__).parent / "mcp-servers" / "clientside" / "tools"),
+            str(Path(__file__).parent / "mcp-servers" / "leadgen"),
+        ])},
+        capture_output=True, text=True, check=True,
+    )
+    assert found.stdout.split() == ["llm_router", "llm_router"], found.stdout
+    assert offer_utils.get_router is llm_router.get_router and lead_tools.get_router is llm_router.get_router
+
+    openai_stub = StubProvider("openai")
+    claude_stub = StubProvider("claude")
+    previous = llm_router._router
+    try:
+        llm_router._router = make_router(openai_stub, claude_stub, hedge=False)
+        offers = [{"price": 500000, "close_date": "2026-12-01", "contingencies": []},
+                  {"price": 510000, "close_date": "2026-11-15", "contingencies": ["inspection"]}]
+        asyncio.run(offer_utils.generate_gpt_analysis(offers, offer_utils.rank_offers(offers)))
+        try:
+            asyncio.run(lead_tools.LeadGenTools()._gpt_score("Dana", "dana@example.com", "Cash buyer"))
+        except ValueError:
+            pass  # the stub's answer is not a lead score
+        assert openai_stub.calls + claude_stub.calls == 2, (openai_stub.calls, claude_stub.calls)
+        print("✅ Offer analysis and lead scoring call the LLM through the router")
+    finally:
+        llm_router._router = previous
+        openai_stub.close()
+        claude_stub.close()
+
+
+if __name__ == "__main__":
+    test_failover()
+    test_hedged_request()
+    test_all_providers_down()
+    test_tools_use_router()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Test script for the MCP load-testing harness and stub LLM
+"""
+import re
+import sys
+import json
+import asyncio
+from pathlib import Path
+
+import httpx
+
+# Add benchmarks to path
+sys.path.append(str(Path(__file__).parent / "benchmarks"))
+
+from stub_llm import StubLLM
+from load_mcp_servers import BACKEND, SERVERS, WORKLOAD, run_benchmark, compare
+
+
+def test_stub_llm_speaks_both_providers():
+    with StubLLM(error_rate=0.5, seed=3) as stub:
+        codes = []
+        for path in ("/chat/completions", "/messages") * 10:
+            response = httpx.post(stub.url + path, json={
+                "messages": [{"role": "user", "content": "rate the lead as hot/warm/cold: urgent cash buyer"}],
+            })
+            codes.append(response.status_code)
+            if response.status_code == 200:
+                body = response.json()
+                text = body["choices"][0]["message"]["content"] if "choices" in body else body["content"][0]["text"]
+                assert json.loads(text)["score"] == "hot"
+    assert stub.stats()["errors"] == codes.count(500)
+    assert 0 < codes.count(500) < len(codes)
+    print(f"✅ Stub LLM answered {codes.count(200)} of {len(codes)} requests with an injected 50% error rate")
+
+
+def test_workload_covers_every_tool():
+    for name in SERVERS:
+        source = (BACKEND / "mcp-servers" / name / "main.py").read_text()
+        tools = set(re.findall(r"@server\.tool\s*\n(?:async )?def (\w+)\(", source))
+        assert tools, name
+        assert tools == set(WORKLOAD[name]), (name, tools ^ set(WORKLOAD[name]))
+    print(f"✅ Load workload covers all {sum(len(w) for w in WORKLOAD.values())} MCP tools")
+
+
+def test_benchmark_drives_tools_over_http():
+    report = asyncio.run(run_benchmark(
+        ["clientside"],
+        tools=["ping", "estimate_value", "compare_offers"],
+        requests=20,
+        concurrency=4,
+        llm_latency=0.01,
+        llm_jitter=0.0,
+        properties=2000,
+    ))
+    results = report["results"]
+    assert set(results) == {"clientside.ping", "clientside.estimate_value", "clientside.compare_offers"}
+    for key, r in results.items():
+        assert r["requests"] == 20 and r["errors"] == 0, (key, r)
+        assert r["latency_ms"]["p50"] <= r["latency_ms"]["p99"] <= r["latency_ms"]["max"]
+    assert report["llm_stub"]["calls"] >= 20
+    json.dumps(report)
+
+    lines = compare(report, report)
+    assert all("+0.0%" in line for line in lines[1:])
+    print(f"✅ Benchmarked {len(results)} tools: " + ", ".join(
+        f"{k.split('.')[1]} {r['throughput_rps']:.0f} req/s" for k, r in results.items()))
+
+
+if __name__ == "__main__":
+    test_stub_llm_speaks_both_providers()
+    test_workload_covers_every_tool()
+    test_benchmark_drives_tools_over_http()
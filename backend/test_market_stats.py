@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Test script for rolling market stats (price per sqft, days on market, sale-to-list)
+"""
+import os
+import sys
+import time
+import tempfile
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+
+# Add shared utils and clientside tools to path
+sys.path.append(str(Path(__file__).parent / "shared" / "utils"))
+sys.path.append(str(Path(__file__).parent / "mcp-servers" / "clientside" / "tools"))
+
+import property_table
+from schema_validators import Property
+from property_table import PropertyTable
+from market_stats import MarketStats
+from offer_utils import build_offer_prompts, rank_offers
+
+TODAY = date(2026, 10, 19)
+
+
+class Clock:
+    def __init__(self, today: date = TODAY):
+        self.today = today
+
+    def __call__(self) -> date:
+        return self.today
+
+
+def make_sales(n: int, seed: int = 5, days: int = 150) -> list:
+    rng = np.random.default_rng(seed)
+    sales = []
+    for i in range(n):
+        sqft = int(rng.integers(700, 3000))
+        list_price = float(sqft * rng.uniform(400, 800))
+        sales.append({
+            "zip_code": "94110" if i % 3 else "78701",
+            "property_type": "condo" if i % 2 else "single_family",
+            "price": round(list_price * rng.uniform(0.93, 1.08)),
+            "square_feet": sqft,
+            "list_price": list_price,
+            "days_on_market": int(rng.integers(1, 90)),
+            "sold_date": (TODAY - timedelta(days=int(rng.integers(0, days)))).isoformat(),
+        })
+    return sales
+
+
+def exact(sales, zip_code, property_type=None):
+    rows = [s for s in sales if s["zip_code"] == zip_code and property_type in (None, s["property_type"])]
+    return {
+        "price_per_sqft": np.array([s["price"] / s["square_feet"] for s in rows]),
+        "days_on_market": np.array([s["days_on_market"] for s in rows], dtype=float),
+        "sale_to_list": np.array([s["price"] / s["list_price"] for s in rows]),
+    }
+
+
+def test_aggregates_match_exact_values():
+    sales = make_sales(4000)
+    stats = MarketStats(window_days=180, clock=Clock())
+    assert stats.add_sales(sales) == len(sales)
+
+    for zip_code, property_type in (("94110", "condo"), ("78701", None)):
+        result = stats.stats(zip_code, property_type)
+        truth = exact(sales, zip_code, property_type)
+        assert result["sales"] == len(truth["price_per_sqft"])
+        # Histogram quantiles are within half a bin: 0.5% for $/sqft, exact for days, 0.0005 for the ratio
+        for name, tolerance in (("price_per_sqft", 0.006), ("days_on_market", 0.0), ("sale_to_list", 0.0006)):
+            for key, q in (("median", 50), ("p25", 25), ("p75", 75)):
+                expected = np.percentile(truth[name], q)
+                error = abs(result[name][key] - expected)
+                assert error <= tolerance * (expected if name == "price_per_sqft" else 1) + 0.06, (name, key, error)
+            assert abs(result[name]["mean"] - truth[name].mean()) < 1e-3 * max(1.0, truth[name].mean())
+    print(f"✅ Rolling medians/quartiles match exact values: {stats.stats('94110', 'condo')['price_per_sqft']}")
+
+
+def test_window_rolls_and_falls_back():
+    clock = Clock()
+    stats = MarketStats(window_days=28, period_days=7, min_sales=5, clock=clock)
+    for day in range(28):
+        stats.add_sale({"zip_code": "94110", "property_type": "Condo", "price": 500000 + day * 10000,
+                        "square_feet": 1000, "list_price": 500000, "days_on_market": day,
+                        "sold_date": TODAY - timedelta(days=day)})
+    # Too old for the window, and unusable without any metric
+    assert not stats.add_sale({"zip_code": "94110", "price": 1, "square_feet": 1,
+                               "sold_date": TODAY - timedelta(days=60)})
+    assert not stats.add_sale({"zip_code": "94110", "price": 500000})
+    full = stats.stats("94110", "condo")
+    assert full["scope"] == "zip_and_type" and 22 <= full["sales"] <= 28
+
+    # Two weeks later the oldest weeks have left the window
+    clock.today = TODAY + timedelta(days=14)
+    later = stats.stats("94110", "condo")
+    assert later["sales"] < full["sales"]
+    assert later["days_on_market"]["median"] < full["days_on_market"]["median"]
+
+    # A type with too few sales answers with the whole zip; an unknown zip has no stats
+    stats.add_sale({"zip_code": "94110", "property_type": "townhouse", "price": 900000, "square_feet": 1000,
+                    "sold_date": clock.today})
+    fallback = stats.stats("94110", "townhouse")
+    assert fallback["scope"] == "zip" and fallback["property_type"] == "townhouse"
+    assert fallback["sales"] == later["sales"] + 1
+    assert stats.stats("00000") is None
+
+    clock.today = TODAY + timedelta(days=120)
+    assert stats.stats("94110") is None
+    # Sales in the partial week before the window are stale too
+    assert stats.snapshot()["stale"] == 28 - full["sales"] + 1 and stats.snapshot()["rejected"] == 1
+    print("✅ Sales leave the window by the week; thin property types fall back to the zip")
+
+
+def test_future_sales_do_not_move_the_window():
+    stats = MarketStats(window_days=180, min_sales=1, clock=Clock())
+    assert stats.add_sale({"zip_code": "78701", "price": 400000, "square_feet": 1000, "sold_date": TODAY})
+    # A mistyped year would otherwise push the window past every real sale
+    assert not stats.add_sale({"zip_code": "78701", "price": 400000, "square_feet": 1000,
+                               "sold_date": TODAY.replace(year=2062)})
+    assert stats.stats("78701")["sales"] == 1
+    assert stats.snapshot()["future"] == 1 and stats.snapshot()["recorded"] == 1
+    print("✅ Sales dated after today are refused instead of emptying the window")
+
+
+def test_updates_and_queries_are_fast():
+    sales = make_sales(20000, days=400)
+    stats = MarketStats(window_days=180, clock=Clock())
+    started = time.perf_counter()
+    stats.add_sales(sales)
+    add_us = (time.perf_counter() - started) / len(sales) * 1e6
+
+    stats.stats("94110", "condo")
+    started = time.perf_counter()
+    for _ in range(20000):
+        stats.stats("94110", "condo")
+    query_us = (time.perf_counter() - started) / 20000 * 1e6
+    assert add_us < 50 and query_us < 20, (add_us, query_us)
+    print(f"✅ {add_us:.1f}µs per recorded sale, {query_us:.1f}µs per cached query")
+
+
+def test_seeded_from_table_and_used_by_tools():
+    from client_tools import ClientTools
+
+    rng = np.random.default_rng(3)
+    props = [Property(address=f"{i} Market St", city="San Francisco", state="CA", zip_code="94110",
+                      price=float(round(sqft * rng.uniform(550, 650), -3)), bedrooms=3, bathrooms=2.0,
+                      square_feet=int(sqft), property_type="condo", year_built=1990)
+             for i, sqft in enumerate(rng.integers(900, 2000, 400))]
+    with tempfile.TemporaryDirectory() as path:
+        PropertyTable.from_properties(props).save(path)
+        os.environ["PROPERTY_TABLE_PATH"] = path
+        try:
+            tools = ClientTools()
+            market = tools.market_stats("94110", "condo")
+            recorded = tools.record_sales([{
+                "address": "999 Market St", "zip_code": "94110", "property_type": "condo", "price": 1_000_000,
+                "square_feet": 1600, "bedrooms": 3, "bathrooms": 2.0, "list_price": 950_000,
+                "days_on_market": 12,
+            }])
+            context = tools.market_context(property_address=props[0].address)
+            comps = tools.generate_comps(props[1].address)
+        finally:
+            del os.environ["PROPERTY_TABLE_PATH"]
+            property_table._shared_tables.clear()
+
+    assert market["status"] == "success" and market["data"]["sales"] == 400
+    assert 550 <= market["data"]["price_per_sqft"]["median"] <= 650
+    assert market["data"]["days_on_market"] is None
+    assert recorded["recorded"] == 1 and recorded["valuation_sales"] == 1
+    assert context["subject_square_feet"] == props[0].square_feet
+    assert context["days_on_market"]["median"] == 12 and context["sale_to_list"]["median"] == 1.053
+    assert all("price_per_sqft" in c and "vs_market_pct" in c for c in comps)
+
+    offers = [{"price": props[0].square_feet * 700, "closing_date": "2026-12-01", "contingencies": []},
+              {"price": props[0].square_feet * 560, "closing_date": "2026-11-15", "contingencies": ["inspection"]}]
+    prompt = build_offer_prompts(rank_offers(offers), market=context)["prompts"][0]
+    assert "Market: zip 94110 condo, 401 sales" in prompt and "$/sqft median" in prompt
+    assert '"price_per_sqft":700.0' in prompt and '"vs_market_pct":' in prompt
+    assert "Market:" not in build_offer_prompts(rank_offers(offers))["prompts"][0]
+    print(f"✅ Table-seeded market stats feed compare_offers prompts and comps: {prompt.splitlines()[1]}")
+
+
+if __name__ == "__main__":
+    test_aggregates_match_exact_values()
+    test_window_rolls_and_falls_back()
+    test_future_sales_do_not_move_the_window()
+    test_updates_and_queries_are_fast()
+    test_seeded_from_table_and_used_by_tools()
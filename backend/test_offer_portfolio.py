@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Test script for portfolio offer comparison (many properties' offers in one call)
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import subprocess
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import httpx
+
+# Add shared utils, clientside tools and benchmarks to path
+sys.path.append(str(Path(__file__).parent / "shared" / "utils"))
+sys.path.append(str(Path(__file__).parent / "mcp-servers" / "clientside" / "tools"))
+sys.path.append(str(Path(__file__).parent / "benchmarks"))
+
+from fastmcp import Client
+import llm_router
+from llm_router import LLMRouter
+from claude_client import ClaudeClient
+from offer_utils import rank_offers, rank_offer_groups
+from client_tools import ClientTools
+from load_mcp_servers import free_port
+from stub_llm import StubLLM
+
+LETTERS = ["We love this home and can't wait to raise our kids here", "Cash offer, quick close", None, "",
+           "Our family dreams of this place"]
+
+
+def make_offers(rng: random.Random, n: int, aware: bool = False) -> list:
+    offers = []
+    for i in range(n):
+        offer = {
+            "offer_id": i,
+            "price": rng.choice([500000, 510000, rng.randint(400000, 600000)]),
+            "contingencies": rng.sample(["inspection", "financing", "appraisal"], rng.randint(0, 3)),
+            "buyer_letter": rng.choice(LETTERS),
+            "financing": rng.choice(["cash", "conventional", "FHA"]),
+        }
+        if rng.random() < 0.8:
+            close = datetime(2026, 11, 1, tzinfo=timezone.utc if aware else None)
+            offer["close_date"] = (close + timedelta(days=rng.randint(0, 60), hours=rng.randint(0, 23))).isoformat()
+        offers.append(offer)
+    return offers
+
+
+def test_group_ranking_matches_rank_offers():
+    rng = random.Random(7)
+    groups = [make_offers(rng, rng.randint(0, 8), aware=g % 5 == 0) for g in range(300)]
+    # Ties on price and score keep input order, as rank_offers' stable sort does
+    groups.append([{"price": 500000, "contingencies": [], "offer_id": i} for i in range(4)])
+
+    started = time.perf_counter()
+    expected = [rank_offers(group) for group in groups]
+    looped = time.perf_counter() - started
+    started = time.perf_counter()
+    ranked = rank_offer_groups(groups)
+    grouped = time.perf_counter() - started
+
+    assert ranked == expected
+    assert [o["offer_id"] for o in ranked[-1]] == [0, 1, 2, 3]
+    assert rank_offer_groups([]) == [] and rank_offer_groups([[], []]) == [[], []]
+    print(f"✅ {len(groups)} offer sets ranked in one pass exactly as rank_offers ranks each "
+          f"({grouped * 1000:.1f}ms vs {looped * 1000:.1f}ms looped)")
+
+
+def test_portfolio_is_concurrent_and_shares_prompt_prefix():
+    rng = random.Random(3)
+    properties = [{"property_id": f"listing-{i}", "offers": make_offers(rng, 3)} for i in range(12)]
+    properties.append({"property_id": "listing-empty", "offers": []})
+
+    previous_router = llm_router._router
+    with StubLLM(latency=0.1) as llm:
+        llm_router._router = LLMRouter({"claude": ClaudeClient(api_key="test", base_url=llm.url)})
+        try:
+            finished = []
+
+            async def on_result(done, total, result):
+                finished.append((done, total, result["property_id"]))
+
+            result = asyncio.run(ClientTools().compare_offer_portfolio(properties, max_concurrency=4,
+                                                                       on_result=on_result))
+        finally:
+            llm_router._router = previous_router
+        stats = llm.stats()
+
+    results = {r["property_id"]: r for r in result["results"]}
+    assert result["total_properties"] == 13 and result["total_offers"] == 36
+    assert [done for done, _, _ in finished] == list(range(1, 14)) and finished[0][1] == 13
+    # Results come back in completion order: the property without offers finishes first
+    assert [r["property_id"] for r in result["results"]] == [pid for _, _, pid in finished]
+    assert finished[0][2] == "listing-empty" and results["listing-empty"]["status"] == "error"
+    listing = results["listing-0"]
+    assert listing["status"] == "success" and listing["data"]["summary"] == "Stub analysis of 3 offers"
+    assert listing["data"]["ranked_offers"] == rank_offers(properties[0]["offers"])
+    assert len({r["comparison_id"] for r in result["results"]}) == 13
+
+    # 12 analyses of at least 0.1s, 4 at a time: well under the 1.2s they take one by one
+    assert stats["calls"] == 12 and result["elapsed_ms"] < 1100, result["elapsed_ms"]
+    # Every analysis after the first reads the shared system prompt from the provider's cache
+    assert stats["cache_reads"] == 11 and stats["cached_tokens"] > 0, stats
+    print(f"✅ 12 properties analyzed in {result['elapsed_ms']:.0f}ms at 4 concurrent LLM calls; "
+          f"{stats['cache_reads']} prompt-cache reads")
+
+
+def test_one_bad_property_does_not_fail_the_portfolio():
+    rng = random.Random(5)
+    properties = [{"property_id": f"listing-{i}", "offers": make_offers(rng, 3)} for i in range(4)]
+    properties[1]["offers"][0]["close_date"] = "soon"
+    tools = ClientTools()
+    analyze = tools._analyze_offers
+
+    async def flaky_analysis(comparison_id, offers, ranked_offers, market=None, limit=None):
+        if comparison_id.endswith("_3"):
+            raise RuntimeError("storage full")
+        return await analyze(comparison_id, offers, ranked_offers, market, limit)
+
+    tools._analyze_offers = flaky_analysis
+    previous_router = llm_router._router
+    with StubLLM() as llm:
+        llm_router._router = LLMRouter({"claude": ClaudeClient(api_key="test", base_url=llm.url)})
+        try:
+            result = asyncio.run(tools.compare_offer_portfolio(properties, max_concurrency=1000))
+        finally:
+            llm_router._router = previous_router
+
+    results = {r["property_id"]: r for r in result["results"]}
+    assert len(results) == 4 and result["message"] == "Compared offers on 2 of 4 properties"
+    assert results["listing-1"]["status"] == "error" and "soon" in results["listing-1"]["message"]
+    assert results["listing-2"]["status"] == "error" and "storage full" in results["listing-2"]["message"]
+    assert results["listing-0"]["data"]["ranked_offers"] == rank_offers(properties[0]["offers"])
+    # A caller cannot raise concurrency past the server's limit
+    assert result["max_concurrency"] == int(os.getenv("PORTFOLIO_MAX_CONCURRENCY", "8"))
+    print("✅ A malformed offer or failed analysis errors only its own property; concurrency is capped")
+
+
+def test_progress_notifications_over_mcp():
+    port = free_port()
+    with StubLLM(latency=0.05) as llm:
+        proc = subprocess.Popen(
+            [sys.executable, "main.py"], cwd=Path(__file__).parent / "mcp-servers" / "clientside",
+            env={**os.environ, "CLIENTSIDE_MCP_PORT": str(port), "OPENAI_API_KEY": "test",
+                 "OPENAI_BASE_URL": llm.url, "ADMISSION_CLIENT_RATE": "0"},
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            deadline = time.monotonic() + 60
+            while True:
+                try:
+                    if httpx.get(f"http://127.0.0.1:{port}/readyz").status_code == 200:
+                        break
+                except httpx.HTTPError:
+                    pass
+                assert time.monotonic() < deadline and proc.poll() is None, "server did not become ready"
+                time.sleep(0.2)
+
+            rng = random.Random(5)
+            properties = [{"property_id": f"listing-{i}", "offers": make_offers(rng, 4)} for i in range(5)]
+            progress = []
+
+            async def on_progress(done, total, message):
+                progress.append((done, total, json.loads(message)))
+
+            async def scenario():
+                async with Client(f"http://127.0.0.1:{port}/mcp", timeout=60) as client:
+                    return await client.call_tool("compare_offer_portfolio", {"properties": properties},
+                                                  progress_handler=on_progress)
+
+            result = asyncio.run(scenario()).structured_content
+        finally:
+            proc.terminate()
+            proc.wait(10)
+
+    assert result["status"] == "success" and len(result["results"]) == 5
+    assert [done for done, _, _ in progress] == [1, 2, 3, 4, 5] and {t for _, t, _ in progress} == {5}
+    assert sorted(m["property_id"] for _, _, m in progress) == [f"listing-{i}" for i in range(5)]
+    assert all(m["status"] == "success" and m["top_offer"]["score"] for _, _, m in progress)
+    print(f"✅ Each property's result arrived as a progress notification ({len(progress)} of 5)")
+
+
+if __name__ == "__main__":
+    test_group_ranking_matches_rank_offers()
+    test_portfolio_is_concurrent_and_shares_prompt_prefix()
+    test_one_bad_property_does_not_fail_the_portfolio()
+    test_progress_notifications_over_mcp()
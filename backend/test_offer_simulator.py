@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Test script for the offer what-if simulator (simulate_offer_rankings)
+"""
+import sys
+import time
+import random
+from pathlib import Path
+
+# Add shared utils and the ClientSide tools to path
+sys.path.append(str(Path(__file__).parent / "shared" / "utils"))
+sys.path.append(str(Path(__file__).parent / "mcp-servers" / "clientside" / "tools"))
+
+from offer_simulator import weight_grid, grid_size, sample_weights
+from offer_utils import rank_offers, RANK_WEIGHTS
+from client_tools import ClientTools
+
+
+def random_offers(count: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    return [{
+        "offer_id": f"offer_{i}",
+        "price": rng.randint(480, 560) * 1000,
+        "close_date": f"2026-0{rng.randint(1, 9)}-15",
+        "contingencies": ["inspection", "appraisal", "financing"][:rng.randint(0, 3)],
+        "buyer_letter": rng.choice(["We love this home", "The roof needs repairs", ""]),
+    } for i in range(count)]
+
+
+def test_weight_grid_and_samples_cover_the_simplex():
+    grid = weight_grid(4, 0.05)
+    # Stars and bars: C(20 + 3, 3) weightings in steps of 0.05
+    assert grid.shape == (1771, 4) and abs(grid.sum(axis=1) - 1).max() < 1e-12
+    assert [1.0, 0.0, 0.0, 0.0] in grid.tolist() and grid.min() == 0
+    samples = sample_weights(4, 1000, seed=1)
+    assert abs(samples.sum(axis=1) - 1).max() < 1e-9
+    around = sample_weights(4, 1000, seed=1, around=list(RANK_WEIGHTS.values()), concentration=200)
+    assert abs(around.mean(axis=0)[0] - 0.5) < 0.02
+    try:
+        weight_grid(4, 0.03)
+        assert False, "0.03 does not divide 1"
+    except ValueError:
+        pass
+    # Rows come in order and every composition of the parts appears once
+    assert weight_grid(3, 0.5).tolist() == [[0, 0, 1], [0, 0.5, 0.5], [0, 1, 0], [0.5, 0, 0.5], [0.5, 0.5, 0], [1, 0, 0]]
+    assert len({tuple(row) for row in grid.tolist()}) == 1771 == grid_size(4, 0.05)
+    print("✅ Grid and random weightings lie on the simplex")
+
+
+def test_oversized_grid_is_refused_before_it_is_built():
+    # 0.0001 would be C(10003, 3), about 1.7e11 weightings
+    assert grid_size(4, 0.0001) == 166_766_685_001
+    started = time.perf_counter()
+    result = ClientTools().simulate_offer_rankings(random_offers(5, seed=2), grid_step=0.0001)
+    elapsed = time.perf_counter() - started
+    assert result["status"] == "error" and "over the limit" in result["message"] and elapsed < 0.5
+    started = time.perf_counter()
+    assert len(weight_grid(4, 0.005, max_rows=2_000_000)) == grid_size(4, 0.005) == 1_373_701
+    build_s = time.perf_counter() - started
+    print(f"✅ An oversized grid is refused up front; 1.37M weightings built in {build_s:.2f}s")
+
+
+def test_current_weights_reproduce_rank_offers():
+    offers = random_offers(12)
+    tools = ClientTools()
+    result = tools.simulate_offer_rankings(offers, weights=[RANK_WEIGHTS, {"closing": 1}])
+    top = rank_offers(offers)[0]["offer_id"]
+    assert result["status"] == "success" and result["mode"] == "explicit"
+    assert result["offers"][result["baseline"]["winner"]]["offer_id"] == top
+    assert result["offers"][result["baseline"]["winner"]]["win_share"] >= 0.5
+    assert abs(sum(o["win_share"] for o in result["offers"]) - 1) < 1e-3
+
+    assert tools.simulate_offer_rankings([])["status"] == "error"
+    assert tools.simulate_offer_rankings(offers, weights=[[1, 2]])["status"] == "error"
+    assert tools.simulate_offer_rankings(offers, weights=[[-1, 1, 1, 1]])["status"] == "error"
+    assert tools.simulate_offer_rankings(offers, samples=0)["status"] == "error"
+    print(f"✅ The current weights pick the same winner as rank_offers ({top})")
+
+
+def test_sensitivity_finds_the_crossover():
+    # A pays more, B closes two months sooner
+    offers = [
+        {"offer_id": "A", "price": 500000, "close_date": "2026-03-01", "contingencies": []},
+        {"offer_id": "B", "price": 450000, "close_date": "2026-01-01", "contingencies": []},
+    ]
+    result = ClientTools().simulate_offer_rankings(offers, grid_step=0.05)
+    assert result["mode"] == "grid" and result["samples"] == 1771
+    closing = result["sensitivity"]["closing"]
+    # With the other weights in proportion, A wins until closing weighs 0.0588 / 1.0588
+    assert closing["winner_at_zero"] == 0 and closing["changes"] == [{"weight": 0.06, "from": 0, "to": 1}]
+    assert result["sensitivity"]["price"]["changes"][0]["to"] == 0
+    b_region = result["offers"][1]["wins_when"]["closing"]
+    assert b_region["min"] >= 0.05 and b_region["max"] == 1.0
+    print(f"✅ Closing weight above {closing['changes'][0]['weight']} flips the winner from A to B")
+
+
+def test_hundred_thousand_samples_under_a_second():
+    offers = random_offers(25, seed=3)
+    started = time.perf_counter()
+    result = ClientTools().simulate_offer_rankings(offers, samples=100_000, seed=7)
+    elapsed = time.perf_counter() - started
+    assert result["samples"] == 100_000 and elapsed < 1.0, elapsed
+    shares = [o["win_share"] for o in result["offers"]]
+    assert abs(sum(shares) - 1) < 1e-3 and all(1 <= o["mean_rank"] <= 25 for o in result["offers"])
+    assert abs(sum(o["top3_share"] for o in result["offers"]) - 3) < 1e-3
+    print(f"✅ Ranked 25 offers under 100k weightings in {elapsed * 1000:.0f}ms: {result['message']}")
+
+
+if __name__ == "__main__":
+    test_weight_grid_and_samples_cover_the_simplex()
+    test_oversized_grid_is_refused_before_it_is_built()
+    test_current_weights_reproduce_rank_offers()
+    test_sensitivity_finds_the_crossover()
+    test_hundred_thousand_samples_under_a_second()
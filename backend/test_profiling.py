@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Test script for runtime profiling (phase timings, slow-call traces, sampling and cProfile sessions, admin routes)
+"""
+import os
+import sys
+import time
+import asyncio
+from pathlib import Path
+
+import httpx
+
+# Add shared utils to path
+sys.path.append(str(Path(__file__).parent / "shared" / "utils"))
+
+from fastmcp import FastMCP, Client
+from admission import AdmissionControl, ToolLimit
+from call_phases import phase
+from llm_router import LLMRouter
+from profiling import Profiler
+from schema_validators import Property, validate_many
+
+PROPERTIES = [{"address": f"{i} Oak St", "city": "Austin", "state": "TX", "zip_code": "78701",
+               "price": 500000 + i} for i in range(5000)]
+
+
+class SlowProvider:
+    async def chat(self, messages, system=None):
+        await asyncio.sleep(0.1)
+        return '{"summary": "Offer 1 is strongest"}'
+
+
+def hot_loop(seconds: float) -> int:
+    total, until = 0, time.perf_counter() + seconds
+    while time.perf_counter() < until:
+        total += sum(range(200))
+    return total
+
+
+def profiled_server(slow_ms: float = 50):
+    server = FastMCP("TestMCP")
+    profiler = Profiler(slow_ms=slow_ms)
+    profiler.register(server)
+    server.add_middleware(AdmissionControl({"compare": ToolLimit(concurrency=1, queue=4)}, client_rate=0))
+    router = LLMRouter({"openai": SlowProvider()})
+
+    @server.tool
+    async def compare(count: int = 3) -> dict:
+        valid = validate_many(Property, PROPERTIES).valid
+        with phase("ranking"):
+            hot_loop(0.05)
+        summary = await router.chat([{"role": "user", "content": "Compare these offers"}])
+        return {"summary": summary, "rows": [{"address": p.address, "price": p.price} for p in valid[:count]]}
+
+    @server.tool
+    def crunch(seconds: float = 0.05) -> int:
+        return hot_loop(seconds)
+
+    @server.tool
+    def fast() -> str:
+        return "done"
+
+    return server, profiler
+
+
+def test_slow_calls_keep_phase_timings():
+    server, profiler = profiled_server()
+
+    async def scenario():
+        async with Client(server) as client:
+            await asyncio.gather(client.call_tool("compare", {}), client.call_tool("compare", {}))
+            for _ in range(20):
+                await client.call_tool("fast", {})
+
+    asyncio.run(scenario())
+    slow = profiler.slowest()
+    assert [call["tool"] for call in slow] == ["compare", "compare"]
+    first, second = slow[1]["phases_ms"], slow[0]["phases_ms"]
+    for phases in (first, second):
+        assert phases["llm_wait"] >= 95 and phases["ranking"] >= 45 and phases["validation"] > 0, phases
+        assert phases["serialization"] > 0 and phases["other"] >= 0
+    # The second call waited in admission for the first
+    assert second["queued"] >= 140 > first["queued"], (first, second)
+    assert abs(sum(second.values()) - slow[0]["total_ms"]) < 5
+
+    tools = profiler.snapshot()["tools"]
+    assert tools["fast"]["calls"] == 20 and tools["fast"]["mean_ms"] < 50
+    assert set(tools["compare"]["phases_mean_ms"]) == {"queued", "validation", "ranking", "llm_wait",
+                                                      "serialization", "other"}
+    print(f"✅ Slow calls keep per-phase timings: {second}")
+
+
+def test_sampling_session_collapses_stacks():
+    server, profiler = profiled_server()
+
+    async def scenario():
+        async with Client(server) as client:
+            sampled = profiler.start("crunch", duration_s=10, interval_ms=2)
+            waiting = profiler.start("compare", duration_s=10, interval_ms=2)
+            for _ in range(3):
+                await client.call_tool("crunch", {"seconds": 0.1})
+            await client.call_tool("compare", {})
+            profiler.stop(sampled.id)
+            profiler.stop(waiting.id)
+            return sampled, waiting
+
+    sampled, waiting = asyncio.run(scenario())
+    time.sleep(0.05)
+    collapsed = sampled.collapsed().splitlines()
+    # The sampler needs the GIL, so a CPU-bound tool is sampled about once per switch interval (5ms)
+    assert sampled.calls == 3 and sampled.samples >= 30, sampled.summary()
+    assert all(line.rsplit(" ", 1)[1].isdigit() and line.startswith("crunch;") for line in collapsed)
+    hot = sum(int(line.rsplit(" ", 1)[1]) for line in collapsed if "hot_loop (test_profiling.py" in line)
+    assert hot / sampled.samples > 0.8, collapsed[:5]
+    # The async tool spends most of its time awaiting the LLM
+    stacks = {entry["stack"]: entry["count"] for entry in waiting.result()["stacks"]}
+    assert stacks.get("compare;(suspended)", 0) > 20, stacks
+    try:
+        profiler.start("crunch", mode="perf")
+        assert False, "unknown mode"
+    except ValueError:
+        pass
+    print(f"✅ Stack sampling: {sampled.samples} samples, {hot / sampled.samples:.0%} in hot_loop")
+
+
+def test_cprofile_session_profiles_sampled_calls():
+    server, profiler = profiled_server()
+
+    async def scenario():
+        async with Client(server) as client:
+            await client.call_tool("crunch", {"seconds": 0.001})
+            session = profiler.start("crunch", mode="cprofile", duration_s=10, sample_rate=1.0)
+            for _ in range(5):
+                await client.call_tool("crunch", {"seconds": 0.02})
+            profiler.stop(session.id)
+            await client.call_tool("crunch", {"seconds": 0.001})
+            return session
+
+    session = asyncio.run(scenario())
+    result = session.result()
+    assert result["calls"] == 5 and result["profiled_calls"] == 5
+    functions = {row["function"]: row for row in result["functions"]}
+    assert functions["hot_loop"]["calls"] == 5 and functions["hot_loop"]["cumulative_ms"] >= 90
+    print(f"✅ cProfile session: hot_loop {functions['hot_loop']['cumulative_ms']:.0f}ms over 5 calls")
+
+
+def test_admin_routes():
+    server, profiler = profiled_server()
+    app = server.http_app()
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            started = await http.post("/admin/profiling", json={"tool": "crunch", "duration_s": 5, "interval_ms": 2})
+            assert started.status_code == 201, started.text
+            session_id = started.json()["id"]
+            assert (await http.post("/admin/profiling", json={"tool": "crunch"})).status_code == 409
+            assert (await http.post("/admin/profiling", json={"tool": "missing"})).status_code == 404
+            assert (await http.post("/admin/profiling", json={"tool": "fast", "duration_s": 9999})).status_code == 400
+
+            async with Client(server) as client:
+                await client.call_tool("crunch", {"seconds": 0.1})
+                await client.call_tool("compare", {})
+            stopped = await http.delete(f"/admin/profiling/{session_id}")
+            assert stopped.json()["status"] == "finished"
+            collapsed = await http.get(f"/admin/profiling/{session_id}", params={"format": "collapsed"})
+            assert collapsed.headers["content-type"].startswith("text/plain") and "hot_loop" in collapsed.text
+            assert (await http.get("/admin/profiling/prof_missing")).status_code == 404
+
+            slow = (await http.get("/admin/slow-calls", params={"tool": "compare"})).json()
+            assert slow["calls"][0]["phases_ms"]["llm_wait"] >= 95
+            overview = (await http.get("/admin/profiling")).json()
+            assert overview["sessions"][0]["id"] == session_id
+
+            os.environ["ADMIN_TOKEN"] = "s3cret"
+            try:
+                assert (await http.get("/admin/profiling")).status_code == 403
+                authorized = await http.get("/admin/profiling", headers={"Authorization": "Bearer s3cret"})
+                assert authorized.status_code == 200
+            finally:
+                del os.environ["ADMIN_TOKEN"]
+
+        # Without a token only loopback clients are let in
+        remote = httpx.ASGITransport(app=app, client=("10.0.0.8", 4000))
+        async with httpx.AsyncClient(transport=remote, base_url="http://test") as http:
+            assert (await http.get("/admin/slow-calls")).status_code == 403
+
+    asyncio.run(scenario())
+    print("✅ Admin routes start, read, stop and list sessions, and refuse non-admin clients")
+
+
+if __name__ == "__main__":
+    test_slow_calls_keep_phase_timings()
+    test_sampling_session_collapses_stacks()
+    test_cprofile_session_profiles_sampled_calls()
+    test_admin_routes()
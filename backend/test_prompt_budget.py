@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Test script for token-budgeted offer analysis prompts
+"""
+import sys
+import json
+import asyncio
+from pathlib import Path
+from datetime import datetime, timedelta
+
+# Add the clientside tools to path
+sys.path.append(str(Path(__file__).parent / "mcp-servers" / "clientside" / "tools"))
+
+import offer_utils
+from offer_utils import rank_offers, build_offer_prompts, generate_gpt_analysis
+from prompt_budget import count_tokens, summarize_to_tokens, prompt_metrics_snapshot
+
+
+def make_offers(count: int, letter_sentences: int) -> list:
+    letter = " ".join(
+        f"We have dreamed about raising our family in a home like this one for {i} years."
+        for i in range(letter_sentences)
+    )
+    return [
+        {
+            "price": 800000 + i * 5000,
+            "close_date": (datetime.now() + timedelta(days=20 + i)).date().isoformat(),
+            "contingencies": ["inspection"] if i % 2 else [],
+            "buyer_letter": letter,
+            "financing": "Conventional",
+            "earnest_money": 20000,
+        }
+        for i in range(count)
+    ]
+
+
+class FakeRouter:
+    """Stand-in LLM that answers with one pros/cons row per offer in the prompt"""
+
+    def __init__(self, fail_reduce: bool = False):
+        self.prompts = []
+        self.reduce_prompts = []
+        self.fail_reduce = fail_reduce
+
+    async def chat(self, messages, system=None):
+        prompt = messages[0]["content"]
+        if system == offer_utils.OFFER_REDUCE_SYSTEM_PROMPT:
+            self.reduce_prompts.append(prompt)
+            if self.fail_reduce:
+                raise RuntimeError("reduce failed")
+            parts = sum(1 for line in prompt.splitlines() if line.startswith("Part "))
+            return json.dumps({"summary": f"Across {parts} parts, offer 1 is strongest"})
+        self.prompts.append(prompt)
+        ranks = [json.loads(line)["rank"] for line in prompt.splitlines() if line.startswith("{")]
+        return json.dumps({
+            "summary": f"Offer {min(ranks)} is strongest of this part",
+            "pros_cons_table": [{"rank": r, "pros": [], "cons": []} for r in ranks],
+        })
+
+    def extract_json(self, text):
+        return json.loads(text)
+
+
+def analyze_with(router: FakeRouter, offers: list, budget: int = 1500) -> dict:
+    original, original_budget = offer_utils.get_router, offer_utils.OFFER_PROMPT_MAX_TOKENS
+    offer_utils.get_router = lambda: router
+    offer_utils.OFFER_PROMPT_MAX_TOKENS = budget
+    try:
+        return asyncio.run(generate_gpt_analysis(offers, rank_offers(offers)))
+    finally:
+        offer_utils.get_router = original
+        offer_utils.OFFER_PROMPT_MAX_TOKENS = original_budget
+
+
+def test_small_comparison_is_untouched():
+    ranked = rank_offers(make_offers(3, 2))
+    built = build_offer_prompts(ranked, max_tokens=2000)
+    assert len(built["prompts"]) == 1
+    assert built["letters_compacted"] == 0
+    print(f"✅ 3 offers fit in one prompt ({built['prompt_tokens']} tokens)")
+
+
+def test_letters_are_summarized_to_budget():
+    ranked = rank_offers(make_offers(20, 40))
+    built = build_offer_prompts(ranked, max_tokens=3000)
+    assert built["letters_compacted"] == 20
+    assert all(count_tokens(p) <= 3000 for p in built["prompts"])
+    print(f"✅ 20 long letters compacted into {len(built['prompts'])} prompt(s), {built['prompt_tokens']} tokens")
+
+
+def test_map_reduce_when_still_over_budget():
+    router = FakeRouter()
+    before = prompt_metrics_snapshot().get("generate_gpt_analysis", {}).get("total_prompt_tokens", 0)
+    analysis = analyze_with(router, make_offers(60, 40))
+
+    stats = analysis["prompt_stats"]
+    ranks = [row["rank"] for row in analysis["pros_cons_table"]]
+    assert stats["chunks"] == len(router.prompts) > 1
+    assert ranks == list(range(1, 61))
+    # One reduce call sees every part's summary and the overall top offers
+    assert len(router.reduce_prompts) == 1
+    reduce_prompt = router.reduce_prompts[0]
+    assert all(f"Part {i + 1} (offers ranked" in reduce_prompt for i in range(stats["chunks"]))
+    assert "Offer 1 is strongest of this part" in reduce_prompt and '"rank":3' in reduce_prompt
+    assert "buyer_letter" not in reduce_prompt.split("Top offers by score")[1]
+    assert analysis["summary"] == f"Across {stats['chunks']} parts, offer 1 is strongest"
+    metrics = prompt_metrics_snapshot()["generate_gpt_analysis"]
+    assert metrics["chunked_calls"] >= 1
+    # The reduce prompt counts towards the recorded size
+    reduce_tokens = count_tokens(reduce_prompt) + count_tokens(offer_utils.OFFER_REDUCE_SYSTEM_PROMPT)
+    assert metrics["total_prompt_tokens"] - before == stats["prompt_tokens"] and stats["prompt_tokens"] > reduce_tokens
+    print(f"✅ 60 offers analyzed in {stats['chunks']} concurrent chunks and one reduce call: {stats}")
+
+
+def test_failed_reduce_names_top_offer():
+    offers = make_offers(60, 40)
+    analysis = analyze_with(FakeRouter(fail_reduce=True), offers)
+    top = rank_offers(offers)[0]
+    # Not the first chunk's summary, which only saw part of the offers
+    assert analysis["summary"].endswith(f"Top offer: ${top['price']:,} with score {top['score']}")
+    assert len(analysis["pros_cons_table"]) == 60
+    # A single chunk needs no reduce call
+    router = FakeRouter()
+    assert analyze_with(router, make_offers(3, 2), budget=6000)["summary"] == "Offer 1 is strongest of this part"
+    assert router.reduce_prompts == []
+    print("✅ Without a reduce summary, a split analysis names the top-ranked offer")
+
+
+def test_summarize_keeps_whole_sentences():
+    text = "First sentence here. Second one follows! Third is a question?"
+    summary = summarize_to_tokens(text, count_tokens("First sentence here. Second one follows!"))
+    assert summary == "First sentence here. Second one follows!"
+    print("✅ Extractive summary keeps leading sentences")
+
+
+if __name__ == "__main__":
+    test_small_comparison_is_untouched()
+    test_letters_are_summarized_to_budget()
+    test_map_reduce_when_still_over_budget()
+    test_failed_reduce_names_top_offer()
+    test_summarize_keeps_whole_sentences()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Test script for the columnar PropertyTable and table-backed comps
+"""
+import os
+import sys
+import time
+import random
+import tempfile
+import subprocess
+from pathlib import Path
+
+import numpy as np
+
+# Add shared utils and clientside tools to path
+sys.path.append(str(Path(__file__).parent / "shared" / "utils"))
+sys.path.append(str(Path(__file__).parent / "mcp-servers" / "clientside" / "tools"))
+
+from schema_validators import Property
+import property_table
+from property_table import PropertyTable
+
+
+def make_properties(n: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    zips = ["94110", "94114", "94117", "78701"]
+    return [
+        Property(
+            address=f"{i} {rng.choice(['Oak', 'Elm', 'Pine'])} St",
+            city="Austin" if i % 4 == 3 else "San Francisco",
+            state="TX" if i % 4 == 3 else "CA",
+            zip_code=zips[i % 4],
+            price=float(rng.randint(500, 2500) * 1000),
+            bedrooms=rng.randint(1, 5),
+            bathrooms=rng.choice([1.0, 1.5, 2.0, 3.0]),
+            square_feet=rng.randint(800, 3500),
+            mls_id=f"ML{i}" if i % 2 else None,
+            property_type=rng.choice(["single_family", "condo"]),
+        )
+        for i in range(n)
+    ]
+
+
+def test_row_views_match_properties():
+    props = make_properties(500)
+    table = PropertyTable.from_properties(props)
+    assert len(table) == 500
+    assert all(row == prop for row, prop in zip(table, props))
+    assert table[10].to_property() == props[10]
+    assert table[1].mls_id == "ML1" and table[0].mls_id is None
+    print("✅ Row views behave like Property records")
+
+
+def test_vectorized_filters():
+    props = make_properties(2000)
+    table = PropertyTable.from_properties(props)
+    view = table.filter(min_price=800000, max_price=1500000, min_beds=3, zip_codes=["94110", "94117"])
+    expected = [
+        p for p in props
+        if 800000 <= p.price <= 1500000 and p.bedrooms >= 3 and p.zip_code in ("94110", "94117")
+    ]
+    assert [row.address for row in view] == [p.address for p in expected]
+    # Filters compose on views
+    narrower = view.filter(zip_codes=["94110"])
+    assert all(row.zip_code == "94110" for row in narrower)
+    print(f"✅ Vectorized filter selected {len(view)} of {len(table)} rows")
+
+
+def test_save_and_memory_mapped_load():
+    props = make_properties(1000)
+    table = PropertyTable.from_properties(props)
+    with tempfile.TemporaryDirectory() as path:
+        table.save(path)
+        loaded = PropertyTable.load(path)
+        assert isinstance(loaded.column("price"), np.memmap)
+        assert all(row == prop for row, prop in zip(loaded, props))
+        assert loaded.find("  5 " + props[5].address.split(" ", 1)[1].upper()) == props[5]
+
+        # A second process maps the same files instead of copying the data
+        code = (
+            "import sys; sys.path.append(sys.argv[1]);"
+            "from property_table import PropertyTable;"
+            "t = PropertyTable.load(sys.argv[2]);"
+            "print(len(t), t[42].address)"
+        )
+        out = subprocess.run(
+            [sys.executable, "-c", code, str(Path(__file__).parent / "shared" / "utils"), path],
+            capture_output=True, text=True, check=True,
+        ).stdout.split(None, 1)
+        assert out == ["1000", props[42].address + "\n"]
+    print("✅ Saved table loads memory-mapped in this and another process")
+
+
+def test_resave_never_rewrites_mapped_files():
+    old_props, new_props = make_properties(500), make_properties(800)
+    with tempfile.TemporaryDirectory() as path:
+        # A table written before versioning, with its files directly in path
+        PropertyTable.from_properties(old_props).save(path)
+        version = open(os.path.join(path, "CURRENT")).read()
+        for name in os.listdir(os.path.join(path, version)):
+            os.replace(os.path.join(path, version, name), os.path.join(path, name))
+        os.rmdir(os.path.join(path, version))
+        os.remove(os.path.join(path, "CURRENT"))
+        mapped = PropertyTable.load(path)
+        assert len(mapped) == 500
+
+        for _ in range(3):
+            PropertyTable.from_properties(new_props).save(path)
+        # A process that mapped the old table still reads it intact
+        assert len(mapped) == 500 and all(row == prop for row, prop in zip(mapped, old_props))
+        assert len(PropertyTable.load(path)) == 800
+        assert sorted(os.listdir(path)) == ["CURRENT", "v2", "v3"]
+    print("✅ Re-saving switches to a new version; mapped readers keep the old one")
+
+
+def test_generate_comps_uses_shared_table():
+    from client_tools import ClientTools
+
+    props = make_properties(4000)
+    with tempfile.TemporaryDirectory() as path:
+        PropertyTable.from_properties(props).save(path)
+        os.environ["PROPERTY_TABLE_PATH"] = path
+        try:
+            subject = props[100]
+            comps = ClientTools().generate_comps(subject.address)
+        finally:
+            del os.environ["PROPERTY_TABLE_PATH"]
+            property_table._shared_tables.clear()
+
+    assert 0 < len(comps) <= 3
+    by_address = {p.address: p for p in props}
+    for comp in comps:
+        match = by_address[comp["address"]]
+        assert match.zip_code == subject.zip_code
+        assert abs(match.bedrooms - subject.bedrooms) <= 1
+    print(f"✅ generate_comps returned {len(comps)} table-backed comps for {subject.address}")
+
+
+def test_filter_speed():
+    n = 200_000
+    props = make_properties(n)
+    table = PropertyTable.from_properties(props)
+    started = time.perf_counter()
+    view = table.filter(min_price=900000, max_price=1200000, min_beds=3, zip_codes=["94114"])
+    elapsed = time.perf_counter() - started
+    print(f"✅ Filtered {n:,} rows to {len(view):,} in {elapsed * 1000:.1f}ms "
+          f"({table.nbytes / n:.0f} bytes/row)")
+
+
+if __name__ == "__main__":
+    test_row_views_match_properties()
+    test_vectorized_filters()
+    test_save_and_memory_mapped_load()
+    test_resave_never_rewrites_mapped_files()
+    test_generate_comps_uses_shared_table()
+    test_filter_speed()
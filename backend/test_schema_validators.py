@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Test script for compiled schema validators
+"""
+import sys
+import dataclasses
+from pathlib import Path
+
+# Add shared utils to path
+sys.path.append(str(Path(__file__).parent / "shared" / "utils"))
+
+from schema_validators import (
+    Property,
+    ValidationError,
+    validate_property,
+    validate_transaction,
+    validate_many,
+)
+
+
+def test_coerces_compatible_types():
+    prop = validate_property({
+        "address": "500 Maple Ave", "city": "Austin", "state": "TX",
+        "zip_code": 78701, "price": "1,250,000", "bedrooms": "3", "square_feet": 2100.0,
+    })
+    assert prop.zip_code == "78701"
+    assert prop.price == 1250000.0
+    assert prop.bedrooms == 3 and prop.square_feet == 2100
+    print(f"✅ Coerced property: {prop}")
+
+
+def test_reports_every_error_with_path():
+    try:
+        validate_transaction({
+            "transaction_id": "txn_1",
+            "status": "sold",
+            "property": {"address": "1 Elm St", "city": "Austin", "bedrooms": "many", "pool": True},
+            "clients": [{"name": "Ann"}, "Bob"],
+        })
+    except ValidationError as e:
+        paths = {err["path"] for err in e.errors}
+        assert paths == {
+            "status", "property.state", "property.zip_code", "property.bedrooms",
+            "property.pool", "clients[0].email", "clients[1]",
+        }, paths
+        print(f"✅ Reported {len(e.errors)} errors: {e}")
+    else:
+        raise AssertionError("Expected ValidationError")
+
+
+def test_records_are_frozen_and_slotted():
+    prop = validate_property({"address": "1 Elm St", "city": "Austin", "state": "TX", "zip_code": "78701"})
+    assert not hasattr(prop, "__dict__")
+    try:
+        prop.price = 1
+    except dataclasses.FrozenInstanceError:
+        print("✅ Property records are slotted and frozen")
+    else:
+        raise AssertionError("Expected FrozenInstanceError")
+
+
+def test_validate_many_indexes_errors():
+    records = [
+        {"address": "1 Elm St", "city": "Austin", "state": "TX", "zip_code": "78701"},
+        {"address": "2 Elm St", "city": "Austin", "state": "TX"},
+        {"address": "3 Elm St", "city": "Austin", "state": "TX", "zip_code": "78701", "bedrooms": 4},
+    ]
+    result = validate_many(Property, records)
+    assert [p.address for p in result.valid] == ["1 Elm St", "3 Elm St"]
+    assert result.errors == [{"index": 1, "path": "zip_code", "message": "Missing required field"}]
+    print("✅ validate_many keeps valid records and indexes errors")
+
+
+def test_stored_transactions_without_timestamps_load():
+    data = {
+        "transaction_id": "txn_old",
+        "property": {"address": "1 Elm St", "city": "Austin", "state": "TX", "zip_code": "78701"},
+        "clients": [{"name": "Ana", "email": "ana@example.com"}],
+    }
+    old = validate_transaction({**data, "created_at": None, "updated_at": None})
+    assert old.created_at is None and old.updated_at is None
+    assert validate_transaction(data).created_at is not None
+    print("✅ Transactions stored with null timestamps still validate")
+
+
+if __name__ == "__main__":
+    test_coerces_compatible_types()
+    test_reports_every_error_with_path()
+    test_records_are_frozen_and_slotted()
+    test_validate_many_indexes_errors()
+    test_stored_transactions_without_timestamps_load()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Test script for full-text search over leads, contracts and disclosures
+"""
+import sys
+import random
+import tempfile
+from pathlib import Path
+
+# Add shared utils and the MCP servers to path
+sys.path.append(str(Path(__file__).parent / "shared" / "utils"))
+sys.path.append(str(Path(__file__).parent / "mcp-servers" / "leadgen"))
+
+import search_index
+from search_index import SearchIndex, build_query, flatten
+
+STREETS = ["Elm", "Oak", "Maple", "Pine", "Cedar", "Birch", "Walnut", "Spruce", "Willow", "Aspen"]
+WORDS = ("looking for a family home near good schools with a big yard garage pool quiet street "
+         "downtown condo investment rental cash offer preapproved relocating first time buyer").split()
+
+
+def test_query_building_is_safe():
+    assert build_query("elm st") == '"elm"* AND "st"*'
+    assert build_query('"Oak Street" purch') == '"Oak Street" AND "purch"*'
+    # FTS5 syntax in user input is treated as plain words
+    assert build_query('NEAR(a b) OR "unclosed') == '"NEAR"* AND "a" AND "b" AND "OR"* AND "unclosed"*'
+    assert build_query("  ") is None
+    assert flatten({"buyer_name": "Ana", "terms": {"price": 500000}, "items": ["fridge", None]}) == (
+        "buyer name: Ana\nterms: price: 500000\nitems: fridge"
+    )
+    index = SearchIndex()
+    assert index.search('title:") AND *')["status"] == "success"
+    print("✅ Free-text queries become quoted FTS5 terms with prefix matching")
+
+
+def test_incremental_updates_and_ranking():
+    index = SearchIndex()
+    index.index("lead:1", "lead", "Maria Garcia", "12 Elm Street\nasked about the Elm St house", {"lead_id": "1"})
+    index.index("lead:2", "lead", "Elmer Fudd", "40 Oak Ave", {"lead_id": "2"})
+    index.index("contract:1", "contract", "purchase contract", flatten({"property_address": "9 Oak Street"}))
+    index.index("contract:2", "contract", "listing contract", flatten({"property_address": "9 Oak Street"}))
+
+    hits = index.search("elm st")["results"]
+    assert [h["doc_id"] for h in hits] == ["lead:1"] and "[Elm]" in hits[0]["snippet"]
+    # Prefix on the title ranks above a body mention
+    assert [h["doc_id"] for h in index.search("elm")["results"]][0] == "lead:2"
+    assert [h["doc_id"] for h in index.search("purch oak", kinds=["contract"])["results"]] == ["contract:1"]
+
+    index.index("lead:1", "lead", "Maria Garcia", "now looking on Pine Road")
+    assert "lead:1" not in [h["doc_id"] for h in index.search("elm st")["results"]]
+    assert index.search("pine")["results"][0]["doc_id"] == "lead:1"
+    assert index.delete("contract:2") and index.count("contract") == 1
+    fallback = index.search("oak zebra")
+    assert fallback["matched"] == "any" and fallback["results"]
+    print("✅ Writes, updates and deletes are searchable immediately; BM25 favours title matches")
+
+
+def test_p99_latency_on_large_index():
+    rng = random.Random(3)
+    index = SearchIndex(p99_target_ms=25)
+    index.index_many(
+        (f"lead:{i}", "lead", f"Client {i}",
+         f"{rng.randint(1, 9999)} {rng.choice(STREETS)} Street\n" + " ".join(rng.choices(WORDS, k=20)), None)
+        for i in range(50000)
+    )
+    for _ in range(500):
+        query = f"{rng.choice(STREETS).lower()} {rng.choice(WORDS)[:rng.randint(2, 6)]}"
+        index.search(query, limit=10)
+    stats = index.snapshot()
+    assert stats["documents"] == 50000 and stats["queries"] == 500
+    assert stats["within_target"], stats
+    print(f"✅ 500 queries over 50k documents: p50 {stats['p50_ms']}ms, p99 {stats['p99_ms']}ms "
+          f"(target {stats['p99_target_ms']}ms)")
+
+
+def test_tools_index_on_write_into_shared_index():
+    with tempfile.TemporaryDirectory() as tmp:
+        search_index._index = SearchIndex(f"{tmp}/search.db")
+        try:
+            from tools.lead_tools import LeadGenTools
+            sys.path.append(str(Path(__file__).parent / "mcp-servers" / "paperwork" / "tools"))
+            sys.path.append(str(Path(__file__).parent / "mcp-servers" / "clientside" / "tools"))
+            from document_tools import DocumentTools
+            from client_tools import ClientTools
+
+            lead = LeadGenTools().generate_lead("18 Elm St, Austin TX", "Dana Whitfield", "dana@example.com",
+                                                notes="Wants a big yard, asked about the Elm St house")
+            LeadGenTools().qualify_lead("Sam Ortiz", "sam@example.com", "Urgent: cash offer ready for Walnut Ave")
+            contract = DocumentTools().fill_contract("purchase", {
+                "property_address": "77 Oak Street", "buyer": {"name": "Dana Whitfield"}, "price": 640000,
+            })
+            ClientTools().send_disclosure("dana@example.com", "lead paint", message="Built 1962, see attached report")
+
+            # A second process opening the same file sees every server's writes
+            reader = SearchIndex(f"{tmp}/search.db")
+            assert reader.search("elm st house")["results"][0]["meta"]["lead_id"] == lead["lead_id"]
+            assert reader.search("walnut cash")["results"][0]["kind"] == "inquiry"
+            hits = reader.search("purchase oak", kinds=["contract"])["results"]
+            assert hits[0]["meta"]["contract_id"] == contract["contract_id"]
+            assert reader.search("whitfield")["results"][0]["kind"] in ("lead", "contract")
+            assert reader.search("paint 1962")["results"][0]["kind"] == "disclosure"
+        finally:
+            search_index._index = None
+    print("✅ Leads, inquiries, contracts and disclosures are indexed on write and searchable across processes")
+
+
+if __name__ == "__main__":
+    test_query_building_is_safe()
+    test_incremental_updates_and_ranking()
+    test_p99_latency_on_large_index()
+    test_tools_index_on_write_into_shared_index()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Test script for the shared cache/state backends (memory, SQLite, Redis protocol)
+and the LLM response cache built on them
+"""
+import sys
+import time
+import asyncio
+import tempfile
+import subprocess
+from pathlib import Path
+
+# Add shared utils and benchmarks (stub Redis) to path
+sys.path.append(str(Path(__file__).parent / "shared" / "utils"))
+sys.path.append(str(Path(__file__).parent / "benchmarks"))
+
+from shared_state import MemoryBackend, SQLiteBackend, RedisBackend, StateBackendError, open_backend
+from llm_router import LLMRouter
+from stub_redis import StubRedis
+
+
+class Clock:
+    def __init__(self, now: float = 1_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def check_backend(backend, expire):
+    """Behaviour every backend shares; expire() moves past a 10 s TTL"""
+    record = {"lead_id": "lead_1", "score": "hot", "tags": ["cash", "urgent"], "price": 512000.5}
+    backend.set("lead:1", record)
+    backend.set_many({f"comp:{i}": {"i": i} for i in range(1200)}, ttl=10)
+    assert backend.get("lead:1") == record and backend.get("missing", "default") == "default"
+    found = backend.get_many(["lead:1", "comp:5", "comp:1199", "missing"])
+    assert found == {"lead:1": record, "comp:5": {"i": 5}, "comp:1199": {"i": 1199}}
+
+    assert backend.incr("hits") == 1 and backend.incr("hits", 5) == 6
+    assert backend.incr("window", ttl=10) == 1 and backend.incr("window") == 2
+    try:
+        backend.set("bad", 1, ttl=0)
+        assert False, "ttl must be positive"
+    except ValueError:
+        pass
+
+    expire()
+    assert backend.get_many(["comp:5", "comp:1199"]) == {} and backend.get("window") is None
+    assert backend.get("lead:1") == record and backend.get("hits") == 6
+    assert backend.delete("lead:1") and not backend.delete("lead:1")
+    backend.clear()
+    assert backend.get("hits") is None
+    snapshot = backend.snapshot()
+    assert snapshot["hits"] > 0 and snapshot["misses"] > 0
+
+
+def test_backends_share_one_behaviour():
+    clock = Clock()
+
+    def advance():
+        clock.now += 11
+
+    check_backend(MemoryBackend(clock=clock), advance)
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = SQLiteBackend(f"{tmp}/state.db", clock=clock)
+        check_backend(backend, advance)
+        backend.close()
+    with StubRedis() as stub:
+        # Redis expires keys itself, so shorten the TTL on the server instead of waiting
+        backend = RedisBackend(stub.url)
+
+        def expire_on_server():
+            for key, (value, expires_at) in list(stub.data.items()):
+                if expires_at is not None:
+                    stub.data[key] = (value, time.monotonic() - 1)
+
+        check_backend(backend, expire_on_server)
+        backend.close()
+
+    small = MemoryBackend(max_entries=100)
+    small.set_many({f"k{i}": i for i in range(150)})
+    assert len(small) == 100 and small.get("k0") is None and small.get("k149") == 149
+    print("✅ Memory, SQLite and Redis backends agree on values, batches, TTLs and counters")
+
+
+def test_sqlite_is_shared_between_processes():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = f"{tmp}/state.db"
+        backend = open_backend(f"sqlite://{path}")
+        backend.set("comps:78701", [{"address": "123 Oak St", "price": 950000}], ttl=60)
+        script = (
+            "import sys; sys.path.append(sys.argv[1]); from shared_state import open_backend; "
+            "b = open_backend('sqlite://' + sys.argv[2]); "
+            "print(b.get('comps:78701')[0]['price']); b.set_many({'from_child': 1, 'n': 2}, ttl=60)"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", script, str(Path(__file__).parent / "shared" / "utils"), path],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        assert output.strip() == "950000"
+        assert backend.get_many(["from_child", "n"]) == {"from_child": 1, "n": 2}
+        backend.close()
+    print("✅ A second process reads and writes the same SQLite state")
+
+
+def test_redis_batches_are_pipelined():
+    with StubRedis(latency=0.01, password="s3cret") as stub:
+        url = stub.url.replace("redis://", "redis://:s3cret@")
+        backend = RedisBackend(url, prefix="ew:")
+        other = RedisBackend(url, prefix="other:")
+        other.set("keep", True)
+
+        started = time.perf_counter()
+        backend.set_many({f"k{i}": i for i in range(2000)}, ttl=60)
+        values = backend.get_many(f"k{i}" for i in range(2000))
+        elapsed = time.perf_counter() - started
+        assert len(values) == 2000 and values["k1999"] == 1999
+        # One round trip each (plus the AUTH on connect), not one per key
+        assert backend.round_trips == 2 and elapsed < 0.2, (backend.round_trips, elapsed)
+        assert stub.data[b"ew:k1"][1] is not None
+
+        backend.clear()
+        assert stub.stats()["keys"] == 1 and other.get("keep") is True
+        try:
+            RedisBackend(stub.url).get("x")
+            assert False, "missing password"
+        except StateBackendError as e:
+            assert "NOAUTH" in str(e)
+        backend.close()
+        other.close()
+
+    try:
+        backend.get("k1")
+        assert False, "server is gone"
+    except StateBackendError:
+        pass
+    print(f"✅ 2000-key set_many and get_many took {elapsed * 1000:.0f}ms against a 10ms-latency server")
+
+
+class CountingProvider:
+    def __init__(self):
+        self.calls = 0
+
+    async def chat(self, messages, system=None):
+        self.calls += 1
+        return f'{{"score": "hot", "call": {self.calls}}}'
+
+
+def test_llm_responses_are_shared_between_servers():
+    messages = [{"role": "user", "content": "Rate this lead as hot/warm/cold: cash buyer"}]
+    with StubRedis() as stub:
+        provider = CountingProvider()
+        leadgen = LLMRouter({"openai": provider}, cache=RedisBackend(stub.url), cache_ttl=60)
+        clientside = LLMRouter({"openai": provider}, cache=RedisBackend(stub.url), cache_ttl=60)
+
+        first = asyncio.run(leadgen.chat(messages, system="You score leads"))
+        assert asyncio.run(clientside.chat(messages, system="You score leads")) == first
+        assert provider.calls == 1 and clientside.cache_stats["hits"] == 1
+        asyncio.run(clientside.chat(messages, system="Another system prompt"))
+        assert provider.calls == 2
+    leadgen.cache.close()
+
+    # An unreachable cache degrades to calling the provider
+    assert asyncio.run(leadgen.chat(messages, system="You score leads")).endswith("3}")
+    assert leadgen.cache_stats["errors"] == 2
+    print("✅ A response cached by one server answers the same prompt on another")
+
+
+if __name__ == "__main__":
+    test_backends_share_one_behaviour()
+    test_sqlite_is_shared_between_processes()
+    test_redis_batches_are_pipelined()
+    test_llm_responses_are_shared_between_servers()
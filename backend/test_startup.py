@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Test script for deferred server startup and liveness/readiness probes
+"""
+import sys
+import time
+import threading
+import subprocess
+from pathlib import Path
+
+# Add shared utils and benchmarks to path
+sys.path.append(str(Path(__file__).parent / "shared" / "utils"))
+sys.path.append(str(Path(__file__).parent / "benchmarks"))
+
+from startup import Lazy, Startup
+
+
+def test_lazy_builds_once_across_threads():
+    builds = []
+
+    def factory():
+        time.sleep(0.05)
+        builds.append(1)
+        return object()
+
+    lazy = Lazy("resource", factory)
+    values = []
+    threads = [threading.Thread(target=lambda: values.append(lazy.get())) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(builds) == 1 and len(set(map(id, values))) == 1
+    print("✅ Lazy resource built once for 8 concurrent callers")
+
+
+def test_readiness_tracks_warmup():
+    startup = Startup("TestMCP")
+    startup.resource("tools", lambda: "tools")
+    startup.warm("llm_router", lambda: 1 / 0)
+    assert startup.live and not startup.ready
+
+    startup.run_now()
+    status = startup.status()
+    # Optional steps may fail without blocking readiness
+    assert status["ready"]
+    assert status["warmup"]["tools"]["state"] == "done"
+    assert status["warmup"]["llm_router"]["error"].startswith("ZeroDivisionError")
+
+    blocked = Startup("TestMCP")
+    blocked.warm("templates", lambda: 1 / 0, required=True)
+    blocked.run_now()
+    assert not blocked.ready
+    print("✅ Readiness waits for required warm-up steps only")
+
+
+def test_servers_import_without_tool_dependencies():
+    for name in ("leadgen", "paperwork", "clientside"):
+        code = "import sys, main; print(sorted(m for m in ('numpy', 'httpx', 'tools.client_tools', 'tools.lead_tools') if m in sys.modules))"
+        out = subprocess.run(
+            [sys.executable, "-c", code], cwd=Path(__file__).parent / "mcp-servers" / name,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip().splitlines()[-1]
+        # fastmcp itself depends on httpx; tool modules and NumPy must stay unloaded
+        assert "numpy" not in out and "tools." not in out, (name, out)
+    print("✅ Importing main.py leaves tool modules and NumPy unloaded")
+
+
+def test_probes_report_live_before_ready():
+    from bench_startup import time_to_ready
+
+    result = time_to_ready("clientside", {"LLM_HEDGE": "0"})
+    assert result["live_ms"] <= result["ready_ms"]
+    assert result["warmup"]["client_tools"]["state"] == "done"
+    print(f"✅ ClientSide live after {result['live_ms']:.0f}ms, ready after {result['ready_ms']:.0f}ms")
+
+
+if __name__ == "__main__":
+    test_lazy_builds_once_across_threads()
+    test_readiness_tracks_warmup()
+    test_servers_import_without_tool_dependencies()
+    test_probes_report_live_before_ready()
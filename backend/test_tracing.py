@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Test script for distributed tracing (W3C trace context, tool-call spans, OTLP export)
+"""
+import io
+import os
+import sys
+import time
+import asyncio
+import tempfile
+from pathlib import Path
+from contextlib import redirect_stdout
+
+import httpx
+
+# Add shared utils, the ClientSide and LeadGen tools and benchmarks to path
+sys.path.append(str(Path(__file__).parent / "shared" / "utils"))
+sys.path.append(str(Path(__file__).parent / "mcp-servers" / "clientside" / "tools"))
+sys.path.append(str(Path(__file__).parent / "mcp-servers" / "leadgen"))
+sys.path.append(str(Path(__file__).parent / "benchmarks"))
+
+from fastmcp import FastMCP, Client
+import llm_router
+import trace_context
+from admission import DeadlineMiddleware
+from llm_router import LLMRouter
+from openai_client import OpenAIClient
+from trace_context import OTLPExporter, parse_traceparent
+from tracing import TracingMiddleware
+from stub_llm import StubLLM
+from stub_otlp import StubCollector
+
+CALLER = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+CALLER_TRACE = "0af7651916cd43dd8448eb211c80319c"
+
+OFFERS = [
+    {"price": 510000, "closing_date": "2026-12-01", "contingencies": ["inspection"], "buyer_letter": "We love it"},
+    {"price": 495000, "closing_date": "2026-11-15", "contingencies": [], "buyer_letter": None},
+]
+
+
+def collector_exporter(collector: StubCollector) -> OTLPExporter:
+    return trace_context.configure(OTLPExporter(collector.url, "test-mcp", interval=0.05))
+
+
+def traced_server():
+    import offer_utils
+    server = FastMCP("TestMCP")
+    server.add_middleware(TracingMiddleware())
+    server.add_middleware(DeadlineMiddleware())
+
+    @server.tool
+    async def compare(count: int = 2) -> dict:
+        ranked = offer_utils.rank_offers(OFFERS[:count])
+        analysis = await offer_utils.generate_gpt_analysis(OFFERS[:count], ranked)
+        return {"top": ranked[0]["price"], "summary": analysis["summary"]}
+
+    @server.tool
+    def whoami() -> str:
+        return trace_context.current().traceparent
+
+    @server.tool
+    def broken() -> str:
+        raise RuntimeError("disk full")
+
+    return server
+
+
+def test_traceparent_parsing():
+    assert parse_traceparent(CALLER) == (CALLER_TRACE, "b7ad6b7169203331", True)
+    assert parse_traceparent(CALLER[:-2] + "00")[2] is False
+    # Future versions may append fields; version 00 may not
+    assert parse_traceparent("01-" + CALLER[3:] + "-extra")[0] == CALLER_TRACE
+    for bad in (None, "", "garbage", CALLER + "-extra", "ff" + CALLER[2:],
+                "00-" + "0" * 32 + "-b7ad6b7169203331-01", "00-0af7651916cd43dd8448eb211c80319c-" + "0" * 16 + "-01",
+                "00-0af7651916cd43dd8448eb211c8031zz-b7ad6b7169203331-01"):
+        assert parse_traceparent(bad) is None, bad
+
+    # Outside a traced call spans are free no-ops and nothing is injected
+    assert trace_context.current() is None and trace_context.log_fields() == ""
+    with trace_context.span("noop") as span:
+        span.set("ignored", 1)
+    assert trace_context.inject({}) == {}
+
+    with trace_context.start_trace("root", CALLER, "vendor=abc") as root:
+        with trace_context.span("child") as child:
+            headers = trace_context.inject({})
+    assert root.trace_id == child.trace_id == CALLER_TRACE and root.parent_id == "b7ad6b7169203331"
+    assert child.parent_id == root.span_id and headers["tracestate"] == "vendor=abc"
+    assert headers["traceparent"] == f"00-{CALLER_TRACE}-{child.span_id}-01"
+    with trace_context.start_trace("fresh", "00-bad") as fresh:
+        assert fresh.trace_id != CALLER_TRACE and fresh.parent_id is None
+    print("✅ traceparent headers are parsed, continued and injected per W3C trace context")
+
+
+def test_tool_call_spans_reach_collector():
+    previous_router = llm_router._router
+    with StubLLM(latency=0.02) as llm, StubCollector() as collector:
+        exporter = collector_exporter(collector)
+        llm_router._router = LLMRouter({"openai": OpenAIClient(api_key="test", base_url=llm.url)})
+        try:
+            async def scenario():
+                async with Client(traced_server()) as client:
+                    await client.call_tool("compare", {}, meta={"traceparent": CALLER})
+                    await client.call_tool("compare", {"count": 1})
+                    try:
+                        await client.call_tool("broken", {})
+                    except Exception:
+                        pass
+
+            asyncio.run(scenario())
+            assert exporter.flush(5.0)
+        finally:
+            llm_router._router = previous_router
+            trace_context.configure(None)
+
+        spans = {span["name"]: span for span in collector.trace(CALLER_TRACE)}
+        assert set(spans) == {"tools/call compare", "rank_offers", "generate_gpt_analysis", "llm_router.chat",
+                              "chat gpt-4o"}, set(spans)
+        call = spans["tools/call compare"]
+        assert call["parent_id"] == "b7ad6b7169203331" and call["kind"] == 2 and call["service"] == "test-mcp"
+        assert spans["rank_offers"]["parent_id"] == call["span_id"]
+        assert spans["rank_offers"]["attributes"]["offers.count"] == 2
+        assert spans["generate_gpt_analysis"]["parent_id"] == call["span_id"]
+        assert spans["llm_router.chat"]["parent_id"] == spans["generate_gpt_analysis"]["span_id"]
+        llm_call = spans["chat gpt-4o"]
+        assert llm_call["kind"] == 3 and llm_call["attributes"]["http.response.status_code"] == 200
+        # The LLM provider was handed the client span as its parent
+        assert f"00-{CALLER_TRACE}-{llm_call['span_id']}-01" in llm.traceparents
+
+        # The call without a caller trace started its own; the failing one is marked as an error
+        others = [row for row in collector.summary() if row["trace_id"] != CALLER_TRACE]
+        assert sorted(row["root"] for row in others) == ["tools/call broken", "tools/call compare"]
+        broken = [span for span in collector.spans() if span["name"] == "tools/call broken"][0]
+        assert broken["status"] == 2
+        assert collector.stats()["rejected"] == 0 and exporter.snapshot()["failed"] == 0
+    print(f"✅ One tool call exported {len(spans)} spans in the caller's trace, down to the LLM request")
+
+
+def test_http_header_continues_trace():
+    app = traced_server().http_app(stateless_http=True, json_response=True)
+
+    async def scenario():
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+                response = await http.post("/mcp", headers={
+                    "accept": "application/json, text/event-stream",
+                    "traceparent": CALLER,
+                }, json={"jsonrpc": "2.0", "id": 1, "method": "tools/call",
+                         "params": {"name": "whoami", "arguments": {}}})
+                return response.json()["result"]["structuredContent"]["result"]
+
+    traceparent = asyncio.run(scenario())
+    trace_id, parent_id, sampled = parse_traceparent(traceparent)
+    assert trace_id == CALLER_TRACE and parent_id != "b7ad6b7169203331" and sampled
+    print("✅ The traceparent HTTP header is continued by the tool call's span")
+
+
+def test_storage_spans_and_log_lines():
+    from tools.lead_tools import LeadGenTools
+    import search_index
+    with tempfile.TemporaryDirectory() as tmp, StubCollector() as collector:
+        os.environ["SEARCH_INDEX_PATH"] = f"{tmp}/search.db"
+        exporter = collector_exporter(collector)
+        try:
+            tools = LeadGenTools()
+            output = io.StringIO()
+            with trace_context.start_trace("tools/call qualify_lead", CALLER):
+                with redirect_stdout(output):
+                    tools.ping()
+                # No LLM is configured, so _gpt_score fails and the keyword fallback answers
+                tools.qualify_lead("Dana", "dana@example.com", "Cash buyer, need to close ASAP")
+            assert exporter.flush(5.0)
+        finally:
+            del os.environ["SEARCH_INDEX_PATH"]
+            search_index._index = None
+            trace_context.configure(None)
+
+        line = output.getvalue().strip().splitlines()[-1]
+        assert line.startswith("[") and "ping(" in line and f"trace_id={CALLER_TRACE} span_id=" in line, line
+        spans = {span["name"]: span for span in collector.trace(CALLER_TRACE)}
+        assert spans["_gpt_score"]["status"] == 2
+        assert spans["search_index.index_many"]["attributes"]["db.system"] == "sqlite"
+    print("✅ log_tool_call lines carry trace ids; _gpt_score and storage calls are spans")
+
+
+def test_exporter_is_bounded_and_best_effort():
+    exporter = OTLPExporter("http://127.0.0.1:9", batch_size=10, interval=0.05, max_queue=50, timeout=0.5)
+    trace_context.configure(exporter)
+    try:
+        with trace_context.start_trace("burst"):
+            for _ in range(100):
+                with trace_context.span("write"):
+                    pass
+        exporter.flush(5.0)
+    finally:
+        trace_context.configure(None)
+    stats = exporter.snapshot()
+    # Nothing listens on the discard port: spans are dropped past the queue bound and failed sends counted
+    assert stats["dropped"] == 51 and stats["failed"] == 50 and stats["exported"] == 0, stats
+    print("✅ A missing collector costs dropped spans, never a failed tool call")
+
+
+def test_overhead_per_call():
+    server = FastMCP("TestMCP")
+    traced = FastMCP("TracedMCP")
+    traced.add_middleware(TracingMiddleware())
+    for target in (server, traced):
+        @target.tool
+        def work(n: int = 10) -> int:
+            total = 0
+            for i in range(n):
+                with trace_context.span("step", {"i": i}):
+                    total += i
+            return total
+
+    with StubCollector() as collector:
+        exporter = collector_exporter(collector)
+        try:
+            async def timed(target, count: int = 300) -> float:
+                async with Client(target) as client:
+                    for _ in range(20):
+                        await client.call_tool("work", {})
+                    started = time.perf_counter()
+                    for _ in range(count):
+                        await client.call_tool("work", {})
+                    return (time.perf_counter() - started) / count
+
+            plain = min(asyncio.run(timed(server)) for _ in range(3))
+            with_tracing = min(asyncio.run(timed(traced)) for _ in range(3))
+            assert exporter.flush(10.0)
+        finally:
+            trace_context.configure(None)
+    overhead_us = (with_tracing - plain) * 1e6
+    # 11 spans per call, exported in the background
+    assert overhead_us < 1000, (plain, with_tracing)
+    assert collector.stats()["spans"] == 11 * (3 * 320)
+    print(f"✅ Tracing adds {overhead_us:.0f}µs to a call with 11 spans ({plain * 1e6:.0f}µs untraced)")
+
+
+if __name__ == "__main__":
+    test_traceparent_parsing()
+    test_tool_call_spans_reach_collector()
+    test_http_header_continues_trace()
+    test_storage_spans_and_log_lines()
+    test_exporter_is_bounded_and_best_effort()
+    test_overhead_per_call()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Test script for the Paperwork transaction pipeline (state machine, indexed queries, write-ahead log)
+"""
+import os
+import sys
+import time
+import random
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add shared utils and the Paperwork tools to path
+sys.path.append(str(Path(__file__).parent / "shared" / "utils"))
+sys.path.append(str(Path(__file__).parent / "mcp-servers" / "paperwork" / "tools"))
+
+from transaction_engine import TransactionEngine, TransitionError
+from schema_validators import ValidationError
+
+TODAY = datetime(2026, 6, 1, 9, 30)
+
+
+def clock():
+    return TODAY
+
+
+def transaction(i: int, status: str = "pending", agent: str = "agent_1", close_in_days: int = 30) -> dict:
+    return {
+        "transaction_id": f"txn_{i}",
+        "property": {"address": f"{i} Oak St", "city": "Austin", "state": "TX", "zip_code": "78701", "price": 500000},
+        "clients": [{"name": f"Client {i}", "email": f"client{i}@example.com"}],
+        "status": status,
+        "agent_id": agent,
+        "close_date": (TODAY + timedelta(days=close_in_days)).date().isoformat(),
+    }
+
+
+def test_transitions_are_validated_and_versioned():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = TransactionEngine(tmp, clock=clock).load()
+        assert engine.open(transaction(1))["version"] == 1
+        try:
+            engine.open(transaction(1))
+            assert False, "duplicate id"
+        except ValueError:
+            pass
+        try:
+            engine.open({**transaction(2), "status": "done"})
+            assert False, "unknown status"
+        except ValidationError as e:
+            assert e.errors[0]["path"] == "status"
+
+        moved = engine.advance("txn_1", "active", expected_version=1)
+        assert moved["previous_status"] == "pending" and moved["version"] == 2
+        try:
+            engine.advance("txn_1", "closed", expected_version=1)
+            assert False, "stale version"
+        except TransitionError:
+            pass
+        engine.advance("txn_1", "closed")
+        try:
+            engine.advance("txn_1", "active")
+            assert False, "closed is final"
+        except TransitionError as e:
+            assert "closed" in str(e)
+        try:
+            engine.advance("txn_missing", "active")
+            assert False, "unknown transaction"
+        except KeyError:
+            pass
+        assert engine.get("txn_1")["status"] == "closed" and engine.get("txn_1")["version"] == 3
+        engine.close()
+    print("✅ Transitions follow the state machine; stale versions and duplicates are refused")
+
+
+def test_indexed_queries_over_many_transactions():
+    rng = random.Random(4)
+    count = 200_000
+    statuses = ["pending", "active", "active", "closed", "cancelled"]
+    records = [transaction(i, rng.choice(statuses), f"agent_{rng.randrange(500)}", rng.randint(-200, 200))
+               for i in range(count)]
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = TransactionEngine(tmp, clock=clock).load()
+        assert engine.open_many(records + [{"transaction_id": "bad"}])["opened"] == count
+
+        # Brute force over the records for comparison
+        def expected(status, agent=None, low="0000", high="9999"):
+            return sorted(
+                (r["close_date"], r["transaction_id"]) for r in records
+                if r["status"] in status and (agent is None or r["agent_id"] == agent)
+                and low <= r["close_date"] <= high
+            )
+
+        started = time.perf_counter()
+        soon = engine.closing_within(14, limit=20)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        want = expected(("active",), low="2026-06-01", high="2026-06-15")
+        assert soon["total"] == len(want)
+        assert [t["transaction_id"] for t in soon["transactions"]] == [tid for _, tid in want[:20]]
+        assert elapsed_ms < 50, elapsed_ms
+
+        agent = engine.query(status=["pending", "active"], agent_id="agent_7", limit=1000, ids_only=True)
+        assert sorted(agent["transaction_ids"]) == sorted(tid for _, tid in expected(("pending", "active"), "agent_7"))
+        assert engine.query(limit=1)["total"] == count
+        try:
+            engine.query(status="done")
+            assert False, "unknown status"
+        except ValueError:
+            pass
+
+        started = time.perf_counter()
+        for _ in range(200):
+            engine.query(status="active", agent_id=f"agent_{rng.randrange(500)}", closing_from=TODAY, limit=50)
+        per_query_ms = (time.perf_counter() - started) / 200 * 1000
+        assert per_query_ms < 10, per_query_ms
+        engine.close()
+    print(f"✅ {count:,} transactions: 14-day closing query in {elapsed_ms:.2f}ms, agent queries {per_query_ms:.2f}ms")
+
+
+def test_restart_replays_journal_and_compaction():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = TransactionEngine(tmp, clock=clock).load()
+        engine.open_many([transaction(i) for i in range(100)])
+        engine.advance("txn_5", "active")
+        engine.link("txn_5", lead_id="lead_9", contract_id="contract_1")
+        engine.link("txn_5", disclosure_id="disc_2")
+        engine.close()
+        # A crash mid-append leaves a torn last line
+        with open(os.path.join(tmp, "journal.jsonl"), "ab") as f:
+            f.write(b'{"op":"move","id":"txn_6","to":"act')
+
+        restarted = TransactionEngine(tmp, clock=clock).load()
+        record = restarted.get("txn_5")
+        assert len(restarted) == 100 and restarted.get("txn_6")["status"] == "pending"
+        assert record["status"] == "active" and record["lead_id"] == "lead_9"
+        assert record["contract_ids"] == ["contract_1"] and record["disclosure_ids"] == ["disc_2"]
+        restarted.advance("txn_6", "cancelled")
+
+        restarted.compact()
+        assert os.path.getsize(os.path.join(tmp, "journal.jsonl")) == 0
+        assert restarted.get("txn_5") == record
+        restarted.close()
+        reopened = TransactionEngine(tmp, clock=clock).load()
+        assert reopened.get("txn_5") == record and reopened.get("txn_6")["status"] == "cancelled"
+        assert reopened.snapshot()["by_status"] == {"pending": 98, "active": 1, "closed": 0, "cancelled": 1}
+        reopened.close()
+    print("✅ A restart replays the journal past a torn line; compaction keeps every record")
+
+
+def test_document_tools_pipeline():
+    from document_tools import DocumentTools
+    assert DocumentTools().query_transactions()["status"] == "error"
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["TRANSACTION_STATE_DIR"] = tmp
+        try:
+            tools = DocumentTools()
+            opened = tools.open_transaction({k: v for k, v in transaction(0, "active").items() if k != "transaction_id"})
+            transaction_id = opened["transaction_id"]
+            assert opened["status"] == "success" and transaction_id.startswith("txn_")
+            assert tools.open_transaction({"status": "active"})["status"] == "error"
+
+            contract = tools.fill_contract("purchase", {"transaction_id": transaction_id, "price": 500000})
+            assert tools.link_transaction(transaction_id, lead_id="lead_1")["status"] == "success"
+            record = tools.get_transaction(transaction_id)["data"]
+            assert record["contract_ids"] == [contract["contract_id"]] and record["lead_id"] == "lead_1"
+
+            assert tools.advance_transaction(transaction_id, "pending", expected_version=1)["status"] == "error"
+            assert tools.advance_transaction(transaction_id, "closed")["status"] == "success"
+            assert tools.advance_transaction("txn_missing", "closed")["status"] == "error"
+            result = tools.query_transactions(status=["closed"], closing_from="2000-01-01")
+            assert result["total"] == 1 and result["transactions"][0]["transaction_id"] == transaction_id
+            assert tools.query_transactions(closing_within_days=60)["total"] == 0
+        finally:
+            del os.environ["TRANSACTION_STATE_DIR"]
+    print("✅ Paperwork tools open, link, advance and query transactions")
+
+
+if __name__ == "__main__":
+    test_transitions_are_validated_and_versioned()
+    test_indexed_queries_over_many_transactions()
+    test_restart_replays_journal_and_compaction()
+    test_document_tools_pipeline()
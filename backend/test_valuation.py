@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Test script for the comps-based automated valuation model
+"""
+import os
+import sys
+import time
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+# Add shared utils and clientside tools to path
+sys.path.append(str(Path(__file__).parent / "shared" / "utils"))
+sys.path.append(str(Path(__file__).parent / "mcp-servers" / "clientside" / "tools"))
+
+import property_table
+from schema_validators import Property
+from property_table import PropertyTable
+from valuation import ValuationModel
+
+ZIPS = {"94110": 300000.0, "94114": 450000.0, "78701": 100000.0}
+CURRENT_YEAR = 2026
+
+
+def true_value(zip_code, sqft, beds, baths, year_built):
+    """Synthetic market: a zip premium plus linear hedonic terms"""
+    age = CURRENT_YEAR - year_built
+    return ZIPS[zip_code] + 400 * sqft + 12000 * beds + 20000 * baths - 1500 * age
+
+
+def make_sales(n: int, seed: int = 11) -> list:
+    rng = np.random.default_rng(seed)
+    zips = list(ZIPS)
+    sales = []
+    for i in range(n):
+        zip_code = zips[i % len(zips)]
+        sqft = int(rng.integers(900, 3200))
+        beds = int(rng.integers(1, 6))
+        baths = float(rng.choice([1.0, 1.5, 2.0, 2.5, 3.0]))
+        year_built = int(rng.integers(1920, 2024))
+        price = true_value(zip_code, sqft, beds, baths, year_built) * rng.normal(1.0, 0.03)
+        sales.append(Property(
+            address=f"{i} Market St", city="Anytown", state="CA", zip_code=zip_code,
+            price=round(price, -2), bedrooms=beds, bathrooms=baths, square_feet=sqft,
+            property_type="single_family", year_built=year_built,
+        ))
+    return sales
+
+
+def test_estimates_track_market_value():
+    sales = make_sales(6000)
+    model = ValuationModel(PropertyTable.from_properties(sales), current_year=CURRENT_YEAR)
+    subject = {"zip_code": "94110", "square_feet": 2000, "bedrooms": 3, "bathrooms": 2.0, "year_built": 1990}
+    result = model.estimate_many([subject], include_comps=True)[0]
+
+    expected = true_value("94110", 2000, 3, 2.0, 1990)
+    error = abs(result["estimated_value"] - expected) / expected
+    interval = result["confidence_interval"]
+    assert error < 0.05, result
+    assert interval["low"] <= result["estimated_value"] <= interval["high"]
+    assert len(result["comps"]) == model.comps
+    assert 300 < result["adjustments"]["per_sqft"] < 500
+    print(f"✅ Estimated ${result['estimated_value']:,.0f} vs true ${expected:,.0f} "
+          f"({error:.1%} off, {result['confidence']} confidence)")
+
+
+def test_portfolio_batch_is_fast():
+    sales = make_sales(60000)
+    model = ValuationModel(PropertyTable.from_properties(sales), current_year=CURRENT_YEAR)
+    subjects = [
+        {
+            "address": p.address, "zip_code": p.zip_code, "square_feet": p.square_feet,
+            "bedrooms": p.bedrooms, "bathrooms": p.bathrooms, "year_built": p.year_built,
+            "row_id": i,
+        }
+        for i, p in enumerate(sales[:20000])
+    ]
+
+    started = time.perf_counter()
+    results = model.estimate_many(subjects)
+    elapsed = time.perf_counter() - started
+
+    estimates = np.array([r["estimated_value"] for r in results])
+    truth = np.array([true_value(s["zip_code"], s["square_feet"], s["bedrooms"],
+                                 s["bathrooms"], s["year_built"]) for s in subjects])
+    median_error = float(np.median(np.abs(estimates - truth) / truth))
+    assert all(r["status"] == "success" for r in results)
+    assert median_error < 0.05
+    assert elapsed < 10
+    print(f"✅ Valued {len(subjects):,} properties in {elapsed:.2f}s (median error {median_error:.1%})")
+
+
+def test_interval_covers_sale_prices():
+    sales = make_sales(6000)
+    model = ValuationModel(PropertyTable.from_properties(sales), current_year=CURRENT_YEAR)
+    subjects = [{"zip_code": p.zip_code, "square_feet": p.square_feet, "bedrooms": p.bedrooms,
+                 "bathrooms": p.bathrooms, "year_built": p.year_built, "row_id": i}
+                for i, p in enumerate(sales[:2000])]
+    results = model.estimate_many(subjects)
+    inside = [r["confidence_interval"]["low"] <= p.price <= r["confidence_interval"]["high"]
+              for r, p in zip(results, sales)]
+    coverage = sum(inside) / len(inside)
+    # A 90% interval for a single home's value holds about 90% of actual sale prices
+    assert 0.75 <= coverage <= 0.97, coverage
+    print(f"✅ {coverage:.1%} of sale prices fall inside their 90% interval")
+
+
+def test_string_fields_are_coerced():
+    model = ValuationModel(PropertyTable.from_properties(make_sales(3000)), current_year=CURRENT_YEAR)
+    numeric = {"zip_code": "94110", "square_feet": 2000, "bedrooms": 3, "bathrooms": 2.0, "year_built": 1998}
+    text = {"zip_code": "94110", "square_feet": "2000", "bedrooms": "3", "bathrooms": "2.0", "year_built": "1998"}
+    unknown = dict(numeric, year_built="unknown")
+    results = model.estimate_many([numeric, text, unknown, dict(numeric, square_feet="big"), "94110"])
+    assert all(r["status"] == "success" for r in results[:3])
+    assert results[0]["estimated_value"] == results[1]["estimated_value"]
+    assert results[3]["status"] == "error" and "square_feet" in results[3]["message"]
+    assert results[4]["status"] == "error"
+
+    added = model.add_sales([{"address": "1 Csv St", "zip_code": "94110", "price": "950000", "square_feet": "2000",
+                              "bedrooms": "3", "bathrooms": "2", "year_built": "1998"},
+                             dict(numeric, address="2 Csv St", price=950000.0, year_built="")])
+    assert added == 2
+    # A sale without year_built gets the zip's median age, not a brand-new house's
+    partition = model._partitions["94110"]
+    age = partition.features[list(partition.addresses).index("2 Csv St"), 3]
+    assert age == np.median(partition.features[:, 3]) and age > 10
+    assert model.add_sales([dict(numeric, address="3 Csv St", price="n/a")]) == 0
+    print("✅ year_built and other fields given as strings are coerced; bad values are refused per item")
+
+
+def test_new_sales_refresh_only_their_zip():
+    model = ValuationModel(PropertyTable.from_properties(make_sales(3000)), current_year=CURRENT_YEAR)
+    before = {z: model.coefficients(z).copy() for z in ZIPS}
+
+    new_sales = [
+        {"address": f"{i} New St", "zip_code": "78701", "price": 2_000_000.0,
+         "square_feet": 1500, "bedrooms": 3, "bathrooms": 2.0, "year_built": 2020}
+        for i in range(200)
+    ]
+    assert model.add_sales(new_sales) == 200
+
+    assert np.allclose(model.coefficients("94110"), before["94110"])
+    assert not np.allclose(model.coefficients("78701"), before["78701"])
+    print("✅ Loading sales refits only the affected zip")
+
+
+def test_client_tools_estimate_value():
+    from client_tools import ClientTools
+
+    sales = make_sales(3000)
+    with tempfile.TemporaryDirectory() as path:
+        PropertyTable.from_properties(sales).save(path)
+        os.environ["PROPERTY_TABLE_PATH"] = path
+        try:
+            tools = ClientTools()
+            single = tools.estimate_value(address=sales[5].address)
+            batch = tools.estimate_values([sales[6].address, "1 Nowhere Ln", {
+                "zip_code": "94114", "square_feet": 1800, "bedrooms": 3, "bathrooms": 2.0,
+            }, 42, {"zip_code": "94114", "square_feet": "lots"}])
+            bad = tools.estimate_value(property={"zip_code": "94114", "bedrooms": "three"})
+        finally:
+            del os.environ["PROPERTY_TABLE_PATH"]
+            property_table._shared_tables.clear()
+
+    # The subject itself is excluded from its own comps
+    assert single["status"] == "success"
+    assert sales[5].address not in [c["address"] for c in single["comps"]]
+    assert batch["valued"] == 2 and batch["failed"] == 3
+    assert [r["status"] for r in batch["results"]] == ["success", "error", "success", "error", "error"]
+    assert "bedrooms" in bad["message"] and bad["status"] == "error"
+    print(f"✅ estimate_value: {single['message']}; estimate_values: {batch['message']}")
+
+
+if __name__ == "__main__":
+    test_estimates_track_market_value()
+    test_portfolio_batch_is_fast()
+    test_interval_covers_sale_prices()
+    test_string_fields_are_coerced()
+    test_new_sales_refresh_only_their_zip()
+    test_client_tools_estimate_value()
@@ -1,4 +1,5 @@
 import { NextRequest, NextResponse } from 'next/server';
+import { continueTrace } from '../../../utils/traceContext';
 
 // MCP server configuration - matching our backend setup
 const MCP_SERVER_URLS: Record<string, string> = {
@@ -28,6 +29,7 @@ export async function POST(req: NextRequest) {
     }
 
     console.log(`Sending message to ${server} at ${backendUrl}:`, message);
+    const traceparent = continueTrace(req.headers.get('traceparent'));
 
     // Try multiple endpoint patterns for different MCP server implementations
     const endpoints = [
@@ -51,7 +53,8 @@ export async function POST(req: NextRequest) {
           method: 'POST',
           headers: { 
             'Content-Type': 'application/json',
-            'Accept': 'application/json'
+            'Accept': 'application/json',
+            traceparent
           },
           body: JSON.stringify({ 
             message,
@@ -1,5 +1,6 @@
 import { NextRequest, NextResponse } from 'next/server';
 import { fetchFromMCPPost } from '../../../utils/fetchFromMCP';
+import { continueTrace, traceIdOf } from '../../../utils/traceContext';
 // MCP server configuration
 const MCP_SERVERS = {
   leadgen: 'http://localhost:3001',
@@ -32,6 +33,9 @@ export async function POST(request: NextRequest) {
     }
 
     const serverUrl = MCP_SERVERS[server as ServerName];
+    // Continue the browser's trace so every tool call of one action shares a trace id
+    const traceparent = continueTrace(request.headers.get('traceparent'));
+    const traceId = traceIdOf(traceparent);
     
     // Try common endpoint patterns
     const endpoints = [
@@ -52,6 +56,7 @@ export async function POST(request: NextRequest) {
           method: 'POST',
           headers: {
             'Content-Type': 'application/json',
+            traceparent,
           },
           body: JSON.stringify(params || {}),
           // Add timeout to prevent hanging requests
@@ -69,7 +74,8 @@ export async function POST(request: NextRequest) {
             server,
             tool,
             duration,
-            endpoint
+            endpoint,
+            traceId
           });
         } else {
           lastError = `HTTP ${response.status}: ${response.statusText}`;
@@ -96,7 +102,8 @@ export async function POST(request: NextRequest) {
       error: errorMessage,
       server,
       tool,
-      triedEndpoints: endpoints
+      triedEndpoints: endpoints,
+      traceId
     }, { status: response?.status || 500 });
 
   } catch (error) {
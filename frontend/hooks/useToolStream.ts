@@ -3,6 +3,7 @@
 import { useState, useEffect, useCallback, useRef } from 'react'
 import { ToolOutput } from '../components/ToolOutputCard'
 import { IssueReport } from '../components/IssueReportModal'
+import { newTraceparent } from '../utils/traceContext'
 
 export type ConnectionStatus = 'connected' | 'disconnected' | 'reconnecting'
 
@@ -17,6 +18,8 @@ interface ToolExecutionRequest {
   toolName: string
   server: string
   params?: Record<string, any>
+  // Pass the same traceparent to every tool an action runs to trace them together
+  traceparent?: string
 }
 
 export function useToolStream(options: UseToolStreamOptions = {}) {
@@ -133,6 +136,7 @@ export function useToolStream(options: UseToolStreamOptions = {}) {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
+          traceparent: request.traceparent || newTraceparent(),
         },
         body: JSON.stringify({
           server: request.server,
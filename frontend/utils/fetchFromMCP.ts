@@ -1,3 +1,5 @@
+import { continueTrace, traceIdOf } from './traceContext';
+
 // TODO: Move MCP base URL into .env.local
 const MCP_BASE_URL = 'http://localhost:3001';
 
@@ -16,6 +18,8 @@ export interface FetchFromMCPOptions {
   method?: 'GET' | 'POST' | 'PUT' | 'DELETE';
   headers?: Record<string, string>;
   timeout?: number;
+  /** W3C traceparent shared by every request of one user action (a new trace if omitted) */
+  traceparent?: string;
 }
 
 /**
@@ -37,6 +41,8 @@ export async function fetchFromMCP(
   } = options;
 
   const url = `${MCP_BASE_URL}/api/${endpoint}`;
+  const traceparent = continueTrace(options.traceparent);
+  const traceId = traceIdOf(traceparent);
   
   try {
     // Create AbortController for timeout handling
@@ -48,6 +54,7 @@ export async function fetchFromMCP(
       method,
       headers: {
         'Content-Type': 'application/json',
+        traceparent,
         ...headers,
       },
       signal: controller.signal,
@@ -58,7 +65,7 @@ export async function fetchFromMCP(
       requestConfig.body = JSON.stringify(payload);
     }
 
-    console.log(`[fetchFromMCP] Making ${method} request to: ${url}`);
+    console.log(`[fetchFromMCP] Making ${method} request to: ${url} (trace ${traceId})`);
     if (payload) {
       console.log(`[fetchFromMCP] Payload:`, payload);
     }
@@ -83,7 +90,8 @@ export async function fetchFromMCP(
       return {
         success: false,
         error: errorMessage,
-        status: response.status
+        status: response.status,
+        traceId
       };
     }
 
@@ -95,7 +103,8 @@ export async function fetchFromMCP(
     return {
       success: true,
       data: responseData,
-      status: response.status
+      status: response.status,
+      traceId
     };
 
   } catch (error) {
@@ -123,14 +132,16 @@ export async function fetchFromMCP(
       error: errorMessage,
       type: errorType,
       endpoint,
-      payload
+      payload,
+      traceId
     });
 
     return {
       success: false,
       error: errorMessage,
       errorType,
-      endpoint
+      endpoint,
+      traceId
     };
   }
 }
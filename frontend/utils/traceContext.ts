@@ -0,0 +1,47 @@
+/**
+ * W3C trace context for requests to the MCP servers.
+ *
+ * A dashboard action creates one `traceparent` and sends it with every MCP
+ * request it makes, so the spans recorded by the LeadGen, Paperwork and
+ * ClientSide servers (and their LLM calls) share one trace id.
+ * Format: `00-<32 hex trace id>-<16 hex parent span id>-<flags>`.
+ */
+
+const TRACEPARENT = /^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$/;
+
+function randomHex(bytes: number): string {
+  const values = new Uint8Array(bytes);
+  crypto.getRandomValues(values);
+  const hex = Array.from(values, (b) => b.toString(16).padStart(2, '0')).join('');
+  // All-zero ids are invalid
+  return /^0+$/.test(hex) ? randomHex(bytes) : hex;
+}
+
+/**
+ * Start a new sampled trace; returns its traceparent header value
+ */
+export function newTraceparent(): string {
+  return `00-${randomHex(16)}-${randomHex(8)}-01`;
+}
+
+/**
+ * Whether a header value is a usable version-00 traceparent
+ */
+export function isValidTraceparent(value: string | null | undefined): value is string {
+  const match = value ? TRACEPARENT.exec(value) : null;
+  return !!match && !/^0+$/.test(match[1]) && !/^0+$/.test(match[2]);
+}
+
+/**
+ * The incoming traceparent if it is valid, otherwise a new trace
+ */
+export function continueTrace(value: string | null | undefined): string {
+  return isValidTraceparent(value) ? value : newTraceparent();
+}
+
+/**
+ * Trace id of a traceparent, for logs and for looking the trace up in the collector
+ */
+export function traceIdOf(traceparent: string): string {
+  return traceparent.split('-')[1];
+}